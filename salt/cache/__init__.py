@@ -8,17 +8,31 @@ from __future__ import absolute_import
 import os
 import time
 from salt.loader import LazyLoader
+from salt.utils.odict import OrderedDict
+
+
+def factory(opts, **kwargs):
+    '''
+    Return the cache to use with ``opts``: a :class:`MemCache` when
+    ``memcache_expire_seconds`` is set, a plain :class:`Cache` otherwise
+    '''
+    if opts.get('memcache_expire_seconds', 0):
+        return MemCache(opts, **kwargs)
+    return Cache(opts, **kwargs)
 
 
 class Cache(object):
     '''
     Main caching object
+
+    Data is stored under a ``key`` inside a ``bank``; banks may be nested by
+    using slashes in their names. The ``cache`` option selects the driver.
     '''
     def __init__(self, opts, driver=None):
         self.opts = opts
         self.modules = self._modules()
         if driver is None:
-            driver = 'msgpack'
+            driver = opts.get('cache', 'msgpack')
         self.driver = driver
 
     def _modules(self, functions=None, whitelist=None):
@@ -127,3 +141,135 @@ class Cache(object):
         '''
         fun = '{0}.{1}'.format(self.driver, 'updated')
         return self.modules[fun](bank, key)
+
+    def flush(self, bank, key=None):
+        '''
+        Remove the key from the cache bank with all the key content. If no key
+        is specified, remove the entire bank with all of its keys and the
+        banks nested in it.
+        '''
+        fun = '{0}.{1}'.format(self.driver, 'flush')
+        return self.modules[fun](bank, key=key)
+
+    def list(self, bank):
+        '''
+        Return the names of the keys and nested banks stored in the bank
+        '''
+        fun = '{0}.{1}'.format(self.driver, 'list')
+        return self.modules[fun](bank)
+
+    def contains(self, bank, key=None):
+        '''
+        Check whether the bank exists, or whether the key exists in the bank
+        if a key is given
+        '''
+        fun = '{0}.{1}'.format(self.driver, 'contains')
+        return self.modules[fun](bank, key=key)
+
+
+class MemCache(Cache):
+    '''
+    Cache keeping recently used data in memory in front of a driver
+
+    Reads and writes go through an in-memory LRU, so hot keys are served
+    without reaching the driver until they expire. Each top level bank (the
+    ``minions`` of ``minions/<minion id>``) has an LRU of its own, bounded
+    by the ``memcache_expire_seconds`` and ``memcache_max_items`` options,
+    which ``memcache_banks`` can override per top level bank:
+
+    .. code-block:: yaml
+
+        memcache_expire_seconds: 30
+        memcache_max_items: 1024
+        memcache_banks:
+          minions:
+            expire_seconds: 10
+            max_items: 20000
+
+    The memory tier is shared by all the caches of a process using the same
+    driver and cachedir. Setting the expiry of a bank to ``0`` bypasses the
+    memory tier for it. Data is only kept coherent with writes done through
+    the same process, other writers are seen once the entry expires.
+    '''
+    # (driver, cachedir) -> {top level bank: OrderedDict((bank, key) -> (stored, data))}
+    data = {}
+
+    def __init__(self, opts, driver=None, expire=None, max_items=None):
+        super(MemCache, self).__init__(opts, driver=driver)
+        if expire is None:
+            expire = opts.get('memcache_expire_seconds', 0)
+        if max_items is None:
+            max_items = opts.get('memcache_max_items', 1024)
+        self.expire = expire
+        self.max_items = max_items
+        self.banks = opts.get('memcache_banks') or {}
+        self.storage = MemCache.data.setdefault(
+            (self.driver, opts.get('cachedir')), {})
+
+    def _lru(self, bank):
+        '''
+        Return the LRU of the bank with its expiry and size bound
+        '''
+        group = bank.split('/', 1)[0]
+        settings = self.banks.get(group) or {}
+        expire = settings.get('expire_seconds', self.expire)
+        max_items = settings.get('max_items', self.max_items)
+        return self.storage.setdefault(group, OrderedDict()), expire, max_items
+
+    def _remember(self, bank, key, data):
+        lru, expire, max_items = self._lru(bank)
+        if not expire:
+            return
+        lru.pop((bank, key), None)
+        lru[(bank, key)] = (time.time(), data)
+        while len(lru) > max_items:
+            lru.popitem(last=False)
+
+    def fetch(self, bank, key):
+        '''
+        Fetch data from memory, or from the driver if it is not there or has
+        expired
+        '''
+        lru, expire, _ = self._lru(bank)
+        entry = lru.pop((bank, key), None)
+        if entry is not None and time.time() - entry[0] < expire:
+            # Move it to the most recently used end
+            lru[(bank, key)] = entry
+            return entry[1]
+        data = super(MemCache, self).fetch(bank, key)
+        self._remember(bank, key, data)
+        return data
+
+    def store(self, bank, key, data):
+        '''
+        Store data using the driver and keep it in memory
+        '''
+        ret = super(MemCache, self).store(bank, key, data)
+        self._remember(bank, key, data)
+        return ret
+
+    def flush(self, bank, key=None):
+        '''
+        Remove the key, or the whole bank, from memory and from the driver
+        '''
+        lru, _, _ = self._lru(bank)
+        if key is None:
+            prefix = bank.rstrip('/') + '/'
+            for item in [item for item in lru
+                         if item[0] == bank or item[0].startswith(prefix)]:
+                del lru[item]
+        else:
+            lru.pop((bank, key), None)
+        return super(MemCache, self).flush(bank, key=key)
+
+    def contains(self, bank, key=None):
+        '''
+        Check whether the bank or key exists, answering from memory for keys
+        which are held there
+        '''
+        if key is not None:
+            lru, expire, _ = self._lru(bank)
+            entry = lru.get((bank, key))
+            if entry is not None and time.time() - entry[0] < expire:
+                return entry[1] is not None
+        return super(MemCache, self).contains(bank, key=key)
@@ -4,20 +4,39 @@ Cache data using msgpack
 
 .. versionadded:: carbon
 
+Banks are directories inside the configured ``cachedir`` and keys are
+msgpack files named ``<key>.p`` inside them, which is the layout of the
+minion data cache on the master (``minions/<minion id>/data.p``).
+
 Expirations can be set in the relevant config file (``/etc/salt/master`` for
 the master, ``/etc/salt/cloud`` for Salt Cloud, etc).
 '''
 from __future__ import absolute_import
+import errno
 import os
 import os.path
+import shutil
 import logging
-import msgpack
+import tempfile
+import salt.payload
 import salt.utils
+import salt.utils.atomicfile
 import salt.syspaths
 from salt.exceptions import SaltCacheError
 
 log = logging.getLogger(__name__)
 
+__func_alias__ = {'list_': 'list'}
+
+
+def _bank_dir(bank):
+    '''
+    Return the directory holding ``bank``
+    '''
+    return os.path.join(
+        __opts__.get('cachedir', salt.syspaths.CACHE_DIR),
+        os.path.normpath(bank))
+
 
 def store(bank, key, data):
     '''
@@ -36,26 +55,35 @@ def store(bank, key, data):
     data
         The data which will be stored in the msgpack file. This data can be
         anything which can be serialized by msgpack.
+
+    The data is written to a temporary file which is then renamed over the
+    key, so readers never see a partially written file.
     '''
-    base = os.path.join(salt.syspaths.CACHE_DIR, bank)
+    base = _bank_dir(bank)
     if not os.path.isdir(base):
         try:
             os.makedirs(base)
         except OSError as exc:
-            raise SaltCacheError(
-                'The cache directory, {0}, does not exist and could not be '
-                'created: {1}'.format(base, exc)
-            )
+            if exc.errno != errno.EEXIST:
+                raise SaltCacheError(
+                    'The cache directory, {0}, does not exist and could not be '
+                    'created: {1}'.format(base, exc)
+                )
 
     outfile = os.path.join(base, '{0}.p'.format(key))
+    serial = salt.payload.Serial(__opts__)
     try:
-        with salt.utils.fopen(outfile, 'wb') as fh_:
-            fh_.write(msgpack.packb(data))
+        tmpfh, tmpfname = tempfile.mkstemp(prefix='.', dir=base)
+        os.close(tmpfh)
+        with salt.utils.fopen(tmpfname, 'w+b') as fh_:
+            fh_.write(serial.dumps(data))
+        # On Windows, os.rename will fail if the destination file exists.
+        salt.utils.atomicfile.atomic_rename(tmpfname, outfile)
         return True
-    except IOError as exc:
+    except (IOError, OSError) as exc:
         raise SaltCacheError(
             'There was an error writing the cache file, {0}: {1}'.format(
-                base, exc
+                outfile, exc
             )
         )
 
@@ -73,19 +101,19 @@ def fetch(bank, key):
         The name of the file which holds the data. This filename will have
         ``.p`` appended to it.
     '''
-    base = os.path.join(salt.syspaths.CACHE_DIR, bank)
-    if not os.path.isdir(base):
-        log.debug('Cache directory %s does not exist', base)
+    infile = os.path.join(_bank_dir(bank), '{0}.p'.format(key))
+    if not os.path.isfile(infile):
+        log.debug('Cache file %s does not exist', infile)
         return None
 
-    outfile = os.path.join(base, '{0}.p'.format(key))
+    serial = salt.payload.Serial(__opts__)
     try:
-        with salt.utils.fopen(outfile, 'rb') as fh_:
-            return msgpack.unpack(fh_)
+        with salt.utils.fopen(infile, 'rb') as fh_:
+            return serial.load(fh_)
     except IOError as exc:
         log.warn(
             'There was an error reading the cache file, {0}: {1}'.format(
-                base, exc
+                infile, exc
             )
         )
         return None
@@ -95,18 +123,76 @@ def updated(bank, key):
     '''
     Return the epoch of the mtime for this cache file
     '''
-    base = os.path.join(salt.syspaths.CACHE_DIR, bank)
-    if not os.path.isdir(base):
-        log.warn('Cache directory %s does not exist', base)
-        return None
-
-    outfile = os.path.join(base, '{0}.p'.format(key))
+    keyfile = os.path.join(_bank_dir(bank), '{0}.p'.format(key))
     try:
-        return int(os.path.getmtime(base))
-    except IOError as exc:
-        log.warn(
+        return int(os.path.getmtime(keyfile))
+    except (IOError, OSError) as exc:
+        log.debug(
             'There was an error reading the mtime for, {0}: {1}'.format(
-                base, exc
+                keyfile, exc
             )
         )
         return None
+
+
+def flush(bank, key=None):
+    '''
+    Remove the key from the cache bank, or the whole bank with all of the
+    keys and banks nested in it if no key is given
+    '''
+    base = _bank_dir(bank)
+    try:
+        if key is None:
+            if not os.path.isdir(base):
+                return False
+            shutil.rmtree(base)
+        else:
+            keyfile = os.path.join(base, '{0}.p'.format(key))
+            if not os.path.isfile(keyfile):
+                return False
+            os.remove(keyfile)
+    except OSError as exc:
+        raise SaltCacheError(
+            'There was an error removing "{0}": {1}'.format(
+                base if key is None else keyfile, exc
+            )
+        )
+    return True
+
+
+def list_(bank):
+    '''
+    Return the names of the keys and nested banks found in the bank
+    '''
+    base = _bank_dir(bank)
+    try:
+        items = os.listdir(base)
+    except OSError as exc:
+        if exc.errno != errno.ENOENT:
+            raise SaltCacheError(
+                'There was an error accessing directory "{0}": {1}'.format(
+                    base, exc
+                )
+            )
+        return []
+    ret = []
+    for item in items:
+        if item.startswith('.'):
+            # Temporary files of stores in progress
+            continue
+        if item.endswith('.p') and os.path.isfile(os.path.join(base, item)):
+            ret.append(item[:-2])
+        else:
+            ret.append(item)
+    return ret
+
+
+def contains(bank, key=None):
+    '''
+    Return whether the bank exists, or whether the key exists in it if a key
+    is given
+    '''
+    base = _bank_dir(bank)
+    if key is None:
+        return os.path.isdir(base)
+    return os.path.isfile(os.path.join(base, '{0}.p'.format(key)))
@@ -250,6 +250,13 @@ VALID_OPTS = {
     # Whether or not processes should be forked when needed. The alternative is to use threading.
     'multiprocessing': bool,
 
+    # The number of pre-forked processes running the jobs of a multiprocessing
+    # minion, how many jobs each of them runs and by how many bytes it may grow
+    # before it is replaced
+    'job_workers': int,
+    'job_worker_max_jobs': int,
+    'job_worker_max_memory': int,
+
     # Whether or not the salt minion should run scheduled mine updates
     'mine_enabled': bool,
 
@@ -323,6 +330,11 @@ VALID_OPTS = {
     # Tell the loader to attempt to import *.zip archives
     'enable_zip_modules': bool,
 
+    # Persist the __virtual__ results of the modules found by the loader, and
+    # how many seconds they are used for
+    'loader_manifest': bool,
+    'loader_manifest_ttl': int,
+
     # Tell the client to show minions that have timed out
     'show_timeout': bool,
 
@@ -344,6 +356,14 @@ VALID_OPTS = {
     # Fire events as state chunks are processed by the state compiler
     'state_events': bool,
 
+    # The number of processes the state compiler runs independent state chunks
+    # on at the same time. 0 or 1 runs the chunks one at a time.
+    'state_parallel_workers': int,
+
+    # Store the low chunks compiled by a highstate and run them again as long
+    # as the files, pillar and grains they were compiled from do not change
+    'state_compile_cache': bool,
+
     # The number of seconds a minion should wait before retry when attempting authentication
     'acceptance_wait_time': float,
 
@@ -396,14 +416,33 @@ VALID_OPTS = {
     'return_retry_timer': int,
     'return_retry_timer_max': int,
 
-    # Specify a returner in which all events will be sent to. Requires that the returner in question
-    # have an event_return(event) function!
-    'event_return': str,
+    # Stream the requests sent to the master which are larger than this many
+    # bytes in chunks of this size, 0 sends them whole
+    'req_chunk_size': int,
+
+    # Specify a returner or a list of returners in which all events will be sent to. Requires that the
+    # returners in question have an event_return(event) function!
+    'event_return': (string_types, list),
 
     # The number of events to queue up in memory before pushing them down the pipe to an event returner
     # specified by 'event_return'
     'event_return_queue': int,
 
+    # Push the queued events to the event returners once the oldest of them waited this many seconds,
+    # 0 waits for 'event_return_queue' events
+    'event_return_queue_max_seconds': int,
+
+    # The number of events held in memory for each event returner, the events queued past it are
+    # written to the cachedir until the returner catches up
+    'event_return_buffer': int,
+
+    # How many more times to try storing a batch of events after an event returner failed to, with
+    # a growing delay. A negative number tries until the returner succeeds.
+    'event_return_retries': int,
+
+    # Fire an event with the queue sizes and throughput of the event returners this often, in seconds
+    'event_return_stats_interval': int,
+
     # Only forward events to an event returner if it matches one of the tags in this list
     'event_return_whitelist': list,
 
@@ -451,6 +490,14 @@ VALID_OPTS = {
     # ZMQ HWM for EventPublisher pub socket
     'event_publisher_pub_hwm': int,
 
+    # The most events the event publisher queues for a subscriber before it
+    # drops the events to it, 0 does not limit the queue
+    'event_subscriber_hwm': int,
+
+    # The number of seconds between the salt/event/publisher/stats events,
+    # 0 disables them
+    'event_publisher_stats_interval': int,
+
     # The number of MWorker processes for a master to startup. This number needs to scale up as
     # the number of connected minions increases.
     'worker_threads': int,
@@ -519,6 +566,18 @@ VALID_OPTS = {
     # Specify a list of external pillar systems to use
     'ext_pillar': list,
 
+    # The number of threads the external pillars are fetched at the same time
+    # on, they are fetched one after the other unless it is above 1
+    'ext_pillar_workers': int,
+
+    # The seconds to wait for the external pillars fetched by the
+    # ext_pillar_workers, or a dict of them by external pillar
+    'ext_pillar_timeout': (int, dict),
+
+    # The most seconds to wait for all of the external pillars fetched by the
+    # ext_pillar_workers, 0 waits until they return
+    'ext_pillar_total_timeout': int,
+
     # Reserved for future use to version the pillar structure
     'pillar_version': int,
 
@@ -534,6 +593,10 @@ VALID_OPTS = {
     # Pillar cache backend. Defaults to `disk` which stores caches in the master cache
     'pillar_cache_backend': str,
 
+    # Keep the pillar data compiled from the pillar sls files until one of the
+    # files or grains it was compiled from changes
+    'pillar_compile_cache': bool,
+
     'pillar_safe_render_error': bool,
 
     # When creating a pillar, there are several strategies to choose from when
@@ -575,6 +638,11 @@ VALID_OPTS = {
     'token_expire_user_override': (bool, dict),
     'file_recv': bool,
     'file_recv_max_size': int,
+
+    # The most megabytes the loads streamed by a minion in chunks may spool
+    # in the master cachedir at a time
+    'req_stream_max_size': int,
+
     'file_ignore_regex': (list, string_types),
     'file_ignore_glob': (list, string_types),
     'fileserver_backend': list,
@@ -582,6 +650,13 @@ VALID_OPTS = {
     'fileserver_ignoresymlinks': bool,
     'fileserver_limit_traversal': bool,
 
+    # The number of file hashes the roots fileserver backend keeps in memory in each master process
+    'fileserver_hash_cache_size': int,
+
+    # Serve the file lists of the roots fileserver backend from a snapshot kept up to date by the
+    # fileserver update of the master, instead of walking the file_roots when the cache expires
+    'fileserver_list_cache_incremental': bool,
+
     # The number of open files a daemon is allowed to have open. Frequently needs to be increased
     # higher than the system default in order to account for the way zeromq consumes file handles.
     'max_open_files': int,
@@ -612,12 +687,39 @@ VALID_OPTS = {
     # Specify whether the master should store end times for jobs as returns come in
     'job_cache_store_endtime': bool,
 
+    # The number of seconds of jobs kept in each segment of the local_segment_cache job cache
+    'job_cache_segment_seconds': int,
+
+    # The number of returns the local_segment_cache job cache appends to a job at once
+    'job_cache_batch_size': int,
+
+    # The number of seconds the local_segment_cache job cache waits for more returns before
+    # appending the pending returns
+    'job_cache_batch_interval': float,
+
     # The minion data cache is a cache of information about the minions stored on the master.
     # This information is primarily the pillar and grains data. The data is cached in the master
     # cachedir under the name of the minion and used to predetermine what minions are expected to
     # reply from executions.
     'minion_data_cache': bool,
 
+    # Resolve grain and pillar targets through an in-memory index of the minion data cache
+    # instead of reading the cached data of every minion on each publish.
+    'minion_data_cache_index': bool,
+
+    # The salt.cache driver used for the minion data cache, the mine and other cached banks
+    'cache': str,
+
+    # The number of seconds data is kept in the in-memory tier of salt.cache, 0 disables it
+    'memcache_expire_seconds': int,
+
+    # The maximum number of keys kept in memory per top level salt.cache bank
+    'memcache_max_items': int,
+
+    # Per top level bank overrides of memcache_expire_seconds (expire_seconds) and
+    # memcache_max_items (max_items)
+    'memcache_banks': dict,
+
     # The number of seconds between AES key rotations on the master
     'publish_session': int,
 
@@ -627,12 +729,24 @@ VALID_OPTS = {
     # The TTL for the cache of the reactor configuration
     'reactor_refresh_interval': int,
 
-    # The number of workers for the runner/wheel in the reactor
+    # The number of seconds between the salt/reactors/stats events of the
+    # reactor, 0 disables them
+    'reactor_stats_interval': int,
+
+    # The number of workers running the reactions of the reactor
     'reactor_worker_threads': int,
 
     # The queue size for workers in the reactor
     'reactor_worker_hwm': int,
 
+    # The most reactions of a type (local, runner, wheel, caller) the reactor
+    # runs at once
+    'reactor_worker_limits': dict,
+
+    # What the reactor does with new reactions once reactor_worker_hwm
+    # reactions are queued: drop_new, drop_oldest or block
+    'reactor_overflow': str,
+
     # Defines engines. See https://docs.saltstack.com/en/latest/topics/engines/
     'engines': list,
 
@@ -683,6 +797,10 @@ VALID_OPTS = {
     # The number of minutes between the minion refreshing its cache of grains
     'grains_refresh_every': int,
 
+    # The number of publication targets whose match is cached by the minion
+    # until its grains or pillar change. Set to 0 to disable the cache.
+    'matcher_cache_size': int,
+
     # Use lspci to gather system data for grains on a minion
     'enable_lspci': bool,
 
@@ -697,6 +815,12 @@ VALID_OPTS = {
     # If this is set to True the first newline after a Jinja block is removed
     'jinja_trim_blocks': bool,
 
+    # Keep the code Jinja compiles templates to in memory and under the cachedir
+    'jinja_bytecode_cache': bool,
+
+    # The number of compiled Jinja templates kept by the bytecode cache
+    'jinja_bytecode_cache_size': int,
+
     # Cache minion ID to file
     'minion_id_caching': bool,
 
@@ -796,10 +920,21 @@ VALID_OPTS = {
     # Use zmq.SUSCRIBE to limit listening sockets to only process messages bound for them
     'zmq_filtering': bool,
 
+    # With zmq_filtering, publish jobs targeted to several minions once with a bloom filter of the
+    # targeted minions instead of once for each minion
+    'zmq_filtering_bloom': bool,
+
+    # The number of queued jobs the ZeroMQ publisher takes from its pull socket at once
+    'zmq_publish_batch': int,
+
     # Connection caching. Can greatly speed up salt performance.
     'con_cache': bool,
     'rotate_aes_key': bool,
 
+    # Encrypt the messages between the master and the minions with AES-GCM
+    # instead of AES-CBC and HMAC-SHA256
+    'aes_gcm': bool,
+
     # Cache ZeroMQ connections. Can greatly improve salt performance.
     'cache_sreqs': bool,
 
@@ -957,6 +1092,9 @@ DEFAULT_MINION_OPTS = {
     'auto_accept': True,
     'autosign_timeout': 120,
     'multiprocessing': True,
+    'job_workers': 0,
+    'job_worker_max_jobs': 100,
+    'job_worker_max_memory': 0,
     'mine_enabled': True,
     'mine_return_job': False,
     'mine_interval': 60,
@@ -978,12 +1116,18 @@ DEFAULT_MINION_OPTS = {
     'ext_job_cache': '',
     'cython_enable': False,
     'enable_zip_modules': False,
+    'loader_manifest': False,
+    'loader_manifest_ttl': 3600,
     'state_verbose': True,
     'state_output': 'full',
     'state_output_diff': False,
     'state_auto_order': True,
     'state_events': False,
     'state_aggregate': False,
+    'state_parallel_workers': 0,
+    'state_compile_cache': False,
+    'jinja_bytecode_cache': True,
+    'jinja_bytecode_cache_size': 1000,
     'acceptance_wait_time': 10,
     'acceptance_wait_time_max': 0,
     'rejected_retry': False,
@@ -1000,6 +1144,7 @@ DEFAULT_MINION_OPTS = {
     'recon_randomize': True,
     'return_retry_timer': 5,
     'return_retry_timer_max': 10,
+    'req_chunk_size': 0,
     'random_reauth_delay': 10,
     'winrepo_source_dir': 'salt://win/repo-ng/',
     'winrepo_dir': os.path.join(salt.syspaths.BASE_FILE_ROOTS_DIR, 'win', 'repo'),
@@ -1018,8 +1163,11 @@ DEFAULT_MINION_OPTS = {
     'pidfile': os.path.join(salt.syspaths.PIDFILE_DIR, 'salt-minion.pid'),
     'range_server': 'range:80',
     'reactor_refresh_interval': 60,
+    'reactor_stats_interval': 0,
     'reactor_worker_threads': 10,
     'reactor_worker_hwm': 10000,
+    'reactor_worker_limits': {},
+    'reactor_overflow': 'drop_new',
     'engines': [],
     'tcp_keepalive': True,
     'tcp_keepalive_idle': 300,
@@ -1027,6 +1175,7 @@ DEFAULT_MINION_OPTS = {
     'tcp_keepalive_intvl': -1,
     'modules_max_memory': -1,
     'grains_refresh_every': 0,
+    'matcher_cache_size': 1000,
     'minion_id_caching': True,
     'keysize': 2048,
     'transport': 'zeromq',
@@ -1066,6 +1215,8 @@ DEFAULT_MINION_OPTS = {
     'salt_event_pub_hwm': 2000,
     # ZMQ HWM for EventPublisher pub socket - different for minion vs. master
     'event_publisher_pub_hwm': 1000,
+    'event_subscriber_hwm': 0,
+    'event_publisher_stats_interval': 0,
     'event_match_type': 'startswith',
     'minion_restart_command': [],
     'pub_ret': True,
@@ -1079,6 +1230,8 @@ DEFAULT_MASTER_OPTS = {
     'salt_event_pub_hwm': 2000,
     # ZMQ HWM for EventPublisher pub socket - different for minion vs. master
     'event_publisher_pub_hwm': 1000,
+    'event_subscriber_hwm': 0,
+    'event_publisher_stats_interval': 0,
     'auth_mode': 1,
     'user': 'root',
     'worker_threads': 5,
@@ -1159,6 +1312,9 @@ DEFAULT_MASTER_OPTS = {
     'minionfs_whitelist': [],
     'minionfs_blacklist': [],
     'ext_pillar': [],
+    'ext_pillar_workers': 0,
+    'ext_pillar_timeout': 0,
+    'ext_pillar_total_timeout': 300,
     'pillar_version': 2,
     'pillar_opts': False,
     'pillar_safe_render_error': True,
@@ -1167,6 +1323,7 @@ DEFAULT_MASTER_OPTS = {
     'pillar_cache': False,
     'pillar_cache_ttl': 3600,
     'pillar_cache_backend': 'disk',
+    'pillar_compile_cache': False,
     'ping_on_rotate': False,
     'peer': {},
     'preserve_minion_cache': False,
@@ -1187,6 +1344,7 @@ DEFAULT_MASTER_OPTS = {
     'extension_modules': os.path.join(salt.syspaths.CACHE_DIR, 'master', 'extmods'),
     'file_recv': False,
     'file_recv_max_size': 100,
+    'req_stream_max_size': 100,
     'file_buffer_size': 1048576,
     'file_ignore_regex': [],
     'file_ignore_glob': [],
@@ -1194,6 +1352,8 @@ DEFAULT_MASTER_OPTS = {
     'fileserver_followsymlinks': True,
     'fileserver_ignoresymlinks': False,
     'fileserver_limit_traversal': False,
+    'fileserver_hash_cache_size': 10000,
+    'fileserver_list_cache_incremental': False,
     'max_open_files': 100000,
     'hash_type': 'md5',
     'conf_file': os.path.join(salt.syspaths.CONFIG_DIR, 'master'),
@@ -1211,7 +1371,15 @@ DEFAULT_MASTER_OPTS = {
     'ext_job_cache': '',
     'master_job_cache': 'local_cache',
     'job_cache_store_endtime': False,
+    'job_cache_segment_seconds': 3600,
+    'job_cache_batch_size': 100,
+    'job_cache_batch_interval': 0.1,
     'minion_data_cache': True,
+    'minion_data_cache_index': True,
+    'cache': 'msgpack',
+    'memcache_expire_seconds': 0,
+    'memcache_max_items': 1024,
+    'memcache_banks': {},
     'enforce_mine_cache': False,
     'ipc_mode': _DFLT_IPC_MODE,
     'ipv6': False,
@@ -1232,11 +1400,18 @@ DEFAULT_MASTER_OPTS = {
     'range_server': 'range:80',
     'reactor': [],
     'reactor_refresh_interval': 60,
+    'reactor_stats_interval': 0,
     'reactor_worker_threads': 10,
     'reactor_worker_hwm': 10000,
+    'reactor_worker_limits': {},
+    'reactor_overflow': 'drop_new',
     'engines': [],
     'event_return': '',
     'event_return_queue': 0,
+    'event_return_queue_max_seconds': 0,
+    'event_return_buffer': 10000,
+    'event_return_retries': 5,
+    'event_return_stats_interval': 0,
     'event_return_whitelist': [],
     'event_return_blacklist': [],
     'event_match_type': 'startswith',
@@ -1276,6 +1451,8 @@ DEFAULT_MASTER_OPTS = {
     'syndic_wait': 5,
     'jinja_lstrip_blocks': False,
     'jinja_trim_blocks': False,
+    'jinja_bytecode_cache': True,
+    'jinja_bytecode_cache_size': 1000,
     'tcp_keepalive': True,
     'tcp_keepalive_idle': 300,
     'tcp_keepalive_cnt': -1,
@@ -1321,9 +1498,12 @@ DEFAULT_MASTER_OPTS = {
     'master_pubkey_signature': 'master_pubkey_signature',
     'master_use_pubkey_signature': False,
     'zmq_filtering': False,
+    'zmq_filtering_bloom': False,
+    'zmq_publish_batch': 100,
     'zmq_monitor': False,
     'con_cache': False,
     'rotate_aes_key': True,
+    'aes_gcm': False,
     'cache_sreqs': True,
     'dummy_pub': False,
     'http_request_timeout': 1 * 60 * 60.0,  # 1 hour
@@ -30,9 +30,18 @@ try:
     from Crypto.Signature import PKCS1_v1_5
     # let this be imported, if possible
     import Crypto.Random  # pylint: disable=W0611
+    # AES-GCM needs pycryptodome
+    HAS_AES_GCM = hasattr(AES, 'MODE_GCM')
+    try:
+        # Ciphers of pycryptodome 3.7 and later can encrypt in place
+        AES.new(b'\0' * 16, AES.MODE_ECB).encrypt(b'\0' * 16,
+                                                 output=bytearray(16))
+        HAS_AES_OUTPUT = True
+    except TypeError:
+        HAS_AES_OUTPUT = False
 except ImportError:
     # No need for crypt in local mode
-    pass
+    HAS_AES_GCM = HAS_AES_OUTPUT = False
 
 # Import salt libs
 import salt.defaults.exitcodes
@@ -52,6 +61,20 @@ import tornado.gen
 log = logging.getLogger(__name__)
 
 
+def _compare_digest(digest_a, digest_b):
+    '''
+    Compare two digests in constant time
+    '''
+    if hasattr(hmac, 'compare_digest'):
+        return hmac.compare_digest(digest_a, digest_b)
+    if len(digest_a) != len(digest_b):
+        return False
+    result = 0
+    for byte_a, byte_b in zip(bytearray(digest_a), bytearray(digest_b)):
+        result |= byte_a ^ byte_b
+    return result == 0
+
+
 def dropfile(cachedir, user=None):
     '''
     Set an AES dropfile to request the master update the publish session key
@@ -389,7 +412,8 @@ class AsyncAuth(object):
         if key in AsyncAuth.creds_map:
             creds = AsyncAuth.creds_map[key]
             self._creds = creds
-            self._crypticle = Crypticle(self.opts, creds['aes'])
+            self._crypticle = Crypticle(self.opts, creds['aes'],
+                                        aes_gcm=creds.get('aes_gcm', False))
             self._authenticate_future = tornado.concurrent.Future()
             self._authenticate_future.set_result(True)
         else:
@@ -501,7 +525,8 @@ class AsyncAuth(object):
         else:
             AsyncAuth.creds_map[self.__key(self.opts)] = creds
             self._creds = creds
-            self._crypticle = Crypticle(self.opts, creds['aes'])
+            self._crypticle = Crypticle(self.opts, creds['aes'],
+                                        aes_gcm=creds.get('aes_gcm', False))
             self._authenticate_future.set_result(True)  # mark the sign-in as complete
 
     @tornado.gen.coroutine
@@ -577,6 +602,12 @@ class AsyncAuth(object):
                 # has the master returned that its maxed out with minions?
                 elif payload['load']['ret'] == 'full':
                     raise tornado.gen.Return('full')
+                elif payload['load']['ret'] == 'aes_gcm':
+                    log.critical(
+                        'The Salt Master encrypts with AES-GCM, which needs '
+                        'pycryptodome on this minion'
+                    )
+                    raise tornado.gen.Return('retry')
                 else:
                     log.error(
                         'The Salt Master has cached the public key for this '
@@ -608,6 +639,7 @@ class AsyncAuth(object):
                 if salt.utils.pem_finger(m_pub_fn, sum_type=self.opts['hash_type']) != self.opts['master_finger']:
                     self._finger_fail(self.opts['master_finger'], m_pub_fn)
         auth['publish_port'] = payload['publish_port']
+        auth['aes_gcm'] = payload.get('aes_gcm', False)
         raise tornado.gen.Return(auth)
 
     def get_keys(self):
@@ -658,6 +690,8 @@ class AsyncAuth(object):
         payload = {}
         payload['cmd'] = '_auth'
         payload['id'] = self.opts['id']
+        if HAS_AES_GCM:
+            payload['aes_gcm'] = True
         try:
             pubkey_path = os.path.join(self.opts['pki_dir'], self.mpub)
             with salt.utils.fopen(pubkey_path) as f:
@@ -1046,7 +1080,8 @@ class SAuth(AsyncAuth):
                 continue
             break
         self._creds = creds
-        self._crypticle = Crypticle(self.opts, creds['aes'])
+        self._crypticle = Crypticle(self.opts, creds['aes'],
+                                    aes_gcm=creds.get('aes_gcm', False))
 
     def sign_in(self, timeout=60, safe=True, tries=1, channel=None):
         '''
@@ -1119,6 +1154,12 @@ class SAuth(AsyncAuth):
                 # has the master returned that its maxed out with minions?
                 elif payload['load']['ret'] == 'full':
                     return 'full'
+                elif payload['load']['ret'] == 'aes_gcm':
+                    log.critical(
+                        'The Salt Master encrypts with AES-GCM, which needs '
+                        'pycryptodome on this minion'
+                    )
+                    return 'retry'
                 else:
                     log.error(
                         'The Salt Master has cached the public key for this '
@@ -1153,6 +1194,7 @@ class SAuth(AsyncAuth):
                 if salt.utils.pem_finger(m_pub_fn, sum_type=self.opts['hash_type']) != self.opts['master_finger']:
                     self._finger_fail(self.opts['master_finger'], m_pub_fn)
         auth['publish_port'] = payload['publish_port']
+        auth['aes_gcm'] = payload.get('aes_gcm', False)
         return auth
 
 
@@ -1162,17 +1204,27 @@ class Crypticle(object):
 
     Encryption algorithm: AES-CBC
     Signing algorithm: HMAC-SHA256
+
+    or AES-GCM when ``aes_gcm`` is set
+
+    The messages are built in a single buffer, the data is only copied once
+    into it and encrypted in place where the cipher supports it.
     '''
 
     PICKLE_PAD = b'pickle::'
     AES_BLOCK_SIZE = 16
     SIG_SIZE = hashlib.sha256().digest_size
+    GCM_NONCE_SIZE = 12
+    GCM_TAG_SIZE = 16
 
-    def __init__(self, opts, key_string, key_size=192):
+    def __init__(self, opts, key_string, key_size=192, aes_gcm=None):
         self.key_string = key_string
         self.keys = self.extract_keys(self.key_string, key_size)
         self.key_size = key_size
         self.serial = salt.payload.Serial(opts)
+        if aes_gcm is None:
+            aes_gcm = opts.get('aes_gcm', False)
+        self.aes_gcm = aes_gcm
 
     @classmethod
     def generate_key_string(cls, key_size=192):
@@ -1191,66 +1243,120 @@ class Crypticle(object):
         assert len(key) == key_size / 8 + cls.SIG_SIZE, 'invalid key'
         return key[:-cls.SIG_SIZE], key[-cls.SIG_SIZE:]
 
+    def _framing(self):
+        '''
+        Return the sizes of the header and the trailer of a message
+        '''
+        if self.aes_gcm:
+            return self.GCM_NONCE_SIZE, self.GCM_TAG_SIZE
+        return self.AES_BLOCK_SIZE, self.SIG_SIZE
+
+    def _cypher(self, head):
+        aes_key = self.keys[0]
+        if self.aes_gcm:
+            return AES.new(aes_key, AES.MODE_GCM, nonce=head)
+        return AES.new(aes_key, AES.MODE_CBC, head)
+
     def encrypt(self, data):
         '''
-        encrypt data with AES-CBC and sign it with HMAC-SHA256
+        encrypt data with AES-CBC and sign it with HMAC-SHA256, or encrypt and
+        sign it with AES-GCM
         '''
-        aes_key, hmac_key = self.keys
-        pad = self.AES_BLOCK_SIZE - len(data) % self.AES_BLOCK_SIZE
-        if six.PY2:
-            data = data + pad * chr(pad)
+        return self._encrypt(data)
+
+    def _encrypt(self, *parts):
+        '''
+        Encrypt the concatenation of ``parts``
+        '''
+        head, tail = self._framing()
+        size = sum(len(part) for part in parts)
+        pad = 0
+        if not self.aes_gcm:
+            pad = self.AES_BLOCK_SIZE - size % self.AES_BLOCK_SIZE
+        buf = bytearray(head + size + pad + tail)
+        buf[:head] = os.urandom(head)
+        pos = head
+        for part in parts:
+            buf[pos:pos + len(part)] = part
+            pos += len(part)
+        buf[pos:pos + pad] = bytearray([pad]) * pad
+        view = memoryview(buf)
+        body = view[head:head + size + pad]
+        cypher = self._cypher(view[:head].tobytes())
+        if HAS_AES_OUTPUT:
+            cypher.encrypt(body, output=body)
         else:
-            data = data + salt.utils.to_bytes(pad * chr(pad))
-        iv_bytes = os.urandom(self.AES_BLOCK_SIZE)
-        cypher = AES.new(aes_key, AES.MODE_CBC, iv_bytes)
-        data = iv_bytes + cypher.encrypt(data)
-        sig = hmac.new(hmac_key, data, hashlib.sha256).digest()
-        return data + sig
+            body[:] = cypher.encrypt(body.tobytes())
+        if self.aes_gcm:
+            view[-tail:] = cypher.digest()
+        else:
+            view[-tail:] = hmac.new(
+                self.keys[1], view[:-tail], hashlib.sha256).digest()
+        return bytes(buf)
 
     def decrypt(self, data):
         '''
-        verify HMAC-SHA256 signature and decrypt data with AES-CBC
+        verify HMAC-SHA256 signature and decrypt data with AES-CBC, or decrypt
+        and verify data with AES-GCM
         '''
-        aes_key, hmac_key = self.keys
-        sig = data[-self.SIG_SIZE:]
-        data = data[:-self.SIG_SIZE]
-        mac_bytes = hmac.new(hmac_key, data, hashlib.sha256).digest()
-        if len(mac_bytes) != len(sig):
-            log.debug('Failed to authenticate message')
-            raise AuthenticationError('message authentication failed')
-        result = 0
+        return bytes(self._decrypt(data))
 
-        if six.PY2:
-            for zipped_x, zipped_y in zip(mac_bytes, sig):
-                result |= ord(zipped_x) ^ ord(zipped_y)
-        else:
-            for zipped_x, zipped_y in zip(mac_bytes, sig):
-                result |= zipped_x ^ zipped_y
-        if result != 0:
+    def _decrypt(self, data):
+        '''
+        Verify and decrypt a message into a new bytearray
+        '''
+        head, tail = self._framing()
+        if len(data) < head + tail:
             log.debug('Failed to authenticate message')
             raise AuthenticationError('message authentication failed')
-        iv_bytes = data[:self.AES_BLOCK_SIZE]
-        data = data[self.AES_BLOCK_SIZE:]
-        cypher = AES.new(aes_key, AES.MODE_CBC, iv_bytes)
-        data = cypher.decrypt(data)
-        if six.PY2:
-            return data[:-ord(data[-1])]
+        view = memoryview(data)
+        body = view[head:len(data) - tail]
+        sig = view[len(data) - tail:].tobytes()
+        if not self.aes_gcm:
+            mac_bytes = hmac.new(
+                self.keys[1], view[:len(data) - tail], hashlib.sha256).digest()
+            if not _compare_digest(mac_bytes, sig):
+                log.debug('Failed to authenticate message')
+                raise AuthenticationError('message authentication failed')
+        cypher = self._cypher(view[:head].tobytes())
+        if HAS_AES_OUTPUT:
+            out = bytearray(len(body))
+            cypher.decrypt(body, output=out)
         else:
-            return data[:-data[-1]]
+            out = bytearray(cypher.decrypt(body.tobytes()))
+        if self.aes_gcm:
+            try:
+                cypher.verify(sig)
+            except ValueError:
+                log.debug('Failed to authenticate message')
+                raise AuthenticationError('message authentication failed')
+        elif out:
+            del out[len(out) - out[-1]:]
+        return out
 
     def dumps(self, obj):
         '''
         Serialize and encrypt a python object
         '''
-        return self.encrypt(self.PICKLE_PAD + self.serial.dumps(obj))
+        return self._encrypt(self.PICKLE_PAD, self.serial.dumps(obj))
+
+    def dumps_serialized(self, data):
+        '''
+        Encrypt a python object already serialized with ``self.serial``
+        '''
+        return self._encrypt(self.PICKLE_PAD, data)
 
     def loads(self, data, raw=False):
         '''
         Decrypt and un-serialize a python object
         '''
-        data = self.decrypt(data)
+        data = self._decrypt(data)
         # simple integrity check to verify that we got meaningful data
         if not data.startswith(self.PICKLE_PAD):
             return {}
-        load = self.serial.loads(data[len(self.PICKLE_PAD):], raw=raw)
+        if six.PY2:
+            data = buffer(data, len(self.PICKLE_PAD))  # pylint: disable=undefined-variable
+        else:
+            data = memoryview(data)[len(self.PICKLE_PAD):]
+        load = self.serial.loads(data, raw=raw)
         return load
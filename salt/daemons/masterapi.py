@@ -12,7 +12,6 @@ import os
 import re
 import time
 import stat
-import tempfile
 
 # Import salt libs
 import salt.crypt
@@ -27,8 +26,8 @@ import salt.wheel
 import salt.minion
 import salt.search
 import salt.key
+import salt.cache
 import salt.fileserver
-import salt.utils.atomicfile
 import salt.utils.event
 import salt.utils.verify
 import salt.utils.minions
@@ -36,7 +35,7 @@ import salt.utils.gzip_util
 import salt.utils.jid
 from salt.pillar import git_pillar
 from salt.utils.event import tagify
-from salt.exceptions import SaltMasterError
+from salt.exceptions import SaltMasterError, SaltCacheError
 
 # Import 3rd-party libs
 import salt.ext.six as six
@@ -50,6 +49,9 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# Streams which did not receive a chunk for this many seconds are removed
+STREAM_TTL = 3600
+
 # Things to do in lower layers:
 # only accept valid minion ids
 
@@ -171,6 +173,27 @@ def clean_pub_auth(opts):
         log.error('Unable to delete pub auth file')
 
 
+def clean_streams(opts):
+    '''
+    Remove the chunks of the loads minions started streaming and did not
+    send a chunk of for STREAM_TTL seconds
+    '''
+    streams = os.path.join(opts['cachedir'], 'streams')
+    if not os.path.isdir(streams):
+        return
+    try:
+        for minion in os.listdir(streams):
+            sdir = os.path.join(streams, minion)
+            for name in os.listdir(sdir):
+                path = os.path.join(sdir, name)
+                if os.path.getmtime(path) < time.time() - STREAM_TTL:
+                    os.remove(path)
+            if not os.listdir(sdir):
+                os.rmdir(sdir)
+    except (IOError, OSError) as exc:
+        log.error('Unable to remove the abandoned streams: {0}'.format(exc))
+
+
 def clean_old_jobs(opts):
     '''
     Clean out the old jobs from the job cache
@@ -421,6 +444,7 @@ class RemoteFuncs(object):
                 listen=False)
         self.serial = salt.payload.Serial(opts)
         self.ckminions = salt.utils.minions.CkMinions(opts)
+        self.cache = salt.cache.factory(opts)
         # Create the tops dict for loading external top data
         self.tops = salt.loader.tops(self.opts)
         # Make a client
@@ -581,16 +605,10 @@ class RemoteFuncs(object):
                 greedy=False
                 )
         for minion in minions:
-            mine = os.path.join(
-                    self.opts['cachedir'],
-                    'minions',
-                    minion,
-                    'mine.p')
             try:
-                with salt.utils.fopen(mine, 'rb') as fp_:
-                    fdata = self.serial.load(fp_).get(load['fun'])
-                    if fdata:
-                        ret[minion] = fdata
+                fdata = self.cache.fetch('minions/{0}'.format(minion), 'mine').get(load['fun'])
+                if fdata:
+                    ret[minion] = fdata
             except Exception:
                 continue
         return ret
@@ -603,19 +621,14 @@ class RemoteFuncs(object):
             if 'id' not in load or 'data' not in load:
                 return False
         if self.opts.get('minion_data_cache', False) or self.opts.get('enforce_mine_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions', load['id'])
-            if not os.path.isdir(cdir):
-                os.makedirs(cdir)
-            datap = os.path.join(cdir, 'mine.p')
+            bank = 'minions/{0}'.format(load['id'])
             if not load.get('clear', False):
-                if os.path.isfile(datap):
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        new = self.serial.load(fp_)
-                    if isinstance(new, dict):
-                        new.update(load['data'])
-                        load['data'] = new
-            with salt.utils.fopen(datap, 'w+b') as fp_:
-                fp_.write(self.serial.dumps(load['data']))
+                new = self.cache.fetch(bank, 'mine')
+                if isinstance(new, dict):
+                    new = dict(new)
+                    new.update(load['data'])
+                    load['data'] = new
+            self.cache.store(bank, 'mine', load['data'])
         return True
 
     def _mine_delete(self, load):
@@ -625,20 +638,17 @@ class RemoteFuncs(object):
         if 'id' not in load or 'fun' not in load:
             return False
         if self.opts.get('minion_data_cache', False) or self.opts.get('enforce_mine_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions', load['id'])
-            if not os.path.isdir(cdir):
+            bank = 'minions/{0}'.format(load['id'])
+            if not self.cache.contains(bank):
+                return False
+            try:
+                mine_data = self.cache.fetch(bank, 'mine')
+                if isinstance(mine_data, dict):
+                    mine_data = dict(mine_data)
+                    if mine_data.pop(load['fun'], False):
+                        self.cache.store(bank, 'mine', mine_data)
+            except SaltCacheError:
                 return False
-            datap = os.path.join(cdir, 'mine.p')
-            if os.path.isfile(datap):
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        mine_data = self.serial.load(fp_)
-                    if isinstance(mine_data, dict):
-                        if mine_data.pop(load['fun'], False):
-                            with salt.utils.fopen(datap, 'w+b') as fp_:
-                                fp_.write(self.serial.dumps(mine_data))
-                except OSError:
-                    return False
         return True
 
     def _mine_flush(self, load, skip_verify=False):
@@ -648,15 +658,13 @@ class RemoteFuncs(object):
         if not skip_verify and 'id' not in load:
             return False
         if self.opts.get('minion_data_cache', False) or self.opts.get('enforce_mine_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions', load['id'])
-            if not os.path.isdir(cdir):
+            bank = 'minions/{0}'.format(load['id'])
+            if not self.cache.contains(bank):
+                return False
+            try:
+                self.cache.flush(bank, 'mine')
+            except SaltCacheError:
                 return False
-            datap = os.path.join(cdir, 'mine.p')
-            if os.path.isfile(datap):
-                try:
-                    os.remove(datap)
-                except OSError:
-                    return False
         return True
 
     def _file_recv(self, load):
@@ -733,20 +741,14 @@ class RemoteFuncs(object):
         pillar_dirs = {}
         data = pillar.compile_pillar(pillar_dirs=pillar_dirs)
         if self.opts.get('minion_data_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions', load['id'])
-            if not os.path.isdir(cdir):
-                os.makedirs(cdir)
-            datap = os.path.join(cdir, 'data.p')
-            tmpfh, tmpfname = tempfile.mkstemp(dir=cdir)
-            os.close(tmpfh)
-            with salt.utils.fopen(tmpfname, 'w+b') as fp_:
-                fp_.write(
-                        self.serial.dumps(
-                            {'grains': load['grains'],
-                             'pillar': data})
-                            )
-            # On Windows, os.rename will fail if the destination file exists.
-            salt.utils.atomicfile.atomic_rename(tmpfname, datap)
+            self.cache.store('minions/{0}'.format(load['id']),
+                             'data',
+                             {'grains': load['grains'], 'pillar': data})
+            if self.opts.get('minion_data_cache_index', True):
+                salt.utils.minions.get_data_index(self.opts).update(
+                    load['id'],
+                    {'grains': load['grains'], 'pillar': data},
+                    datap=os.path.join(self.opts['cachedir'], 'minions', load['id'], 'data.p'))
         return data
 
     def _minion_event(self, load):
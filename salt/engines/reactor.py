@@ -11,6 +11,9 @@ Example Config in Master or Minion config
         refresh_interval: 60
         worker_threads: 10
         worker_hwm: 10000
+        worker_limits:
+          runner: 2
+        overflow: drop_oldest
 
     reactor:
       - 'salt/cloud/*/destroyed':
@@ -25,12 +28,17 @@ from __future__ import absolute_import
 import salt.utils.reactor
 
 
-def start(refresh_interval=None, worker_threads=None, worker_hwm=None):
+def start(refresh_interval=None, worker_threads=None, worker_hwm=None,
+          worker_limits=None, overflow=None):
     if refresh_interval is not None:
         __opts__['reactor_refresh_interval'] = refresh_interval
     if worker_threads is not None:
         __opts__['reactor_worker_threads'] = worker_threads
     if worker_hwm is not None:
         __opts__['reactor_worker_hwm'] = worker_hwm
+    if worker_limits is not None:
+        __opts__['reactor_worker_limits'] = worker_limits
+    if overflow is not None:
+        __opts__['reactor_overflow'] = overflow
 
     salt.utils.reactor.Reactor(__opts__).run()
@@ -21,15 +21,38 @@ from __future__ import absolute_import
 import os
 import errno
 import logging
+import mmap
+import shutil
+import stat
+import struct
+import tempfile
+import time
 
 # Import salt libs
 import salt.fileserver
+import salt.payload
 import salt.utils
+import salt.utils.atomicfile
 from salt.utils.event import tagify
+from salt.utils.odict import OrderedDict
 import salt.ext.six as six
 
 log = logging.getLogger(__name__)
 
+# The hashes of the files served by this process, by (saltenv, rel path)
+_HASHES = OrderedDict()
+# The offsets of the latest record of each file in the hash index, and how
+# much of the index has been read by this process
+_HASH_INDEX = {'ino': None, 'offset': 0, 'records': {}}
+# The length prefixing each record of the hash index
+HASH_HEADER = struct.Struct('>I')
+# The file lists of the snapshots, which sections are followed by the
+# settings they were built with
+FILE_LIST_FORMS = ('files', 'dirs', 'empty_dirs', 'links')
+SNAPSHOT_HEADER = struct.Struct('>5I')
+# The settings and file lists read from the snapshots, by saltenv
+_SNAPSHOTS = {}
+
 
 def find_file(path, saltenv='base', **kwargs):
     '''
@@ -118,14 +141,9 @@ def update():
     '''
     When we are asked to update (regular interval) lets reap the cache
     '''
-    try:
-        salt.fileserver.reap_fileserver_cache_dir(
-            os.path.join(__opts__['cachedir'], 'roots/hash'),
-            find_file
-        )
-    except (IOError, OSError):
-        # Hash file won't exist if no files have yet been served up
-        pass
+    # The hashes used to be cached in a file for each served file
+    shutil.rmtree(os.path.join(__opts__['cachedir'], 'roots/hash'),
+                  ignore_errors=True)
 
     mtime_map_path = os.path.join(__opts__['cachedir'], 'roots/mtime_map')
     # data to send on event
@@ -160,6 +178,17 @@ def update():
     data['files']['removed'] = list(old_files - new_files)
     data['files']['added'] = list(new_files - old_files)
 
+    try:
+        _compact_hash_index(new_mtime_map)
+    except (IOError, OSError) as exc:
+        log.error('Failed to compact the fileserver hash index: {0}'.format(exc))
+
+    if __opts__.get('fileserver_list_cache_incremental', False):
+        try:
+            _update_file_lists()
+        except (IOError, OSError) as exc:
+            log.error('Failed to update the file lists: {0}'.format(exc))
+
     # write out the new map
     mtime_map_path_dir = os.path.dirname(mtime_map_path)
     if not os.path.exists(mtime_map_path_dir):
@@ -199,67 +228,363 @@ def file_hash(load, fnd):
     ret = {}
 
     # if the file doesn't exist, we can't get a hash
-    if not path or not os.path.isfile(path):
+    if not path:
+        return ret
+    try:
+        fstat = os.stat(path)
+    except OSError:
+        return ret
+    if not stat.S_ISREG(fstat.st_mode):
         return ret
 
     # set the hash_type as it is determined by config-- so mechanism won't change that
     ret['hash_type'] = __opts__['hash_type']
 
-    # check if the hash is cached
-    # cache file's contents should be "hash:mtime"
-    cache_path = os.path.join(__opts__['cachedir'],
-                              'roots/hash',
-                              load['saltenv'],
-                              u'{0}.hash.{1}'.format(fnd['rel'],
-                              __opts__['hash_type']))
-    # if we have a cache, serve that if the mtime hasn't changed
-    if os.path.exists(cache_path):
-        try:
-            with salt.utils.fopen(cache_path, 'r') as fp_:
-                try:
-                    hsum, mtime = fp_.read().split(':')
-                except ValueError:
-                    log.debug('Fileserver attempted to read incomplete cache file. Retrying.')
-                    # Delete the file since its incomplete (either corrupted or incomplete)
-                    try:
-                        os.unlink(cache_path)
-                    except OSError:
-                        pass
-                    return file_hash(load, fnd)
-                if os.path.getmtime(path) == mtime:
-                    # check if mtime changed
-                    ret['hsum'] = hsum
-                    return ret
-        except (os.error, IOError):  # Can't use Python select() because we need Windows support
-            log.debug("Fileserver encountered lock when reading cache file. Retrying.")
-            # Delete the file since its incomplete (either corrupted or incomplete)
-            try:
-                os.unlink(cache_path)
-            except OSError:
-                pass
-            return file_hash(load, fnd)
+    # A cached hash is only served for the same file with the same mtime,
+    # size and inode
+    key = (load['saltenv'], fnd['rel'])
+    stamp = [path, fstat.st_mtime, fstat.st_size, fstat.st_ino]
+    entry = _HASHES.get(key)
+    if entry is None or entry[0] != stamp:
+        # Another master process may have hashed the file already
+        record = _lookup_hash_index(key)
+        if record is not None:
+            entry = (record[2:6], record[6])
+    if entry is not None and entry[0] == stamp:
+        _remember_hash(key, entry)
+        ret['hsum'] = entry[1]
+        return ret
 
-    # if we don't have a cache entry-- lets make one
     ret['hsum'] = salt.utils.get_hash(path, __opts__['hash_type'])
-    cache_dir = os.path.dirname(cache_path)
-    # make cache directory if it doesn't exist
-    if not os.path.exists(cache_dir):
+    if time.time() - fstat.st_mtime < 1:
+        # The file may be written to again without its mtime changing on
+        # filesystems with a coarse timestamp resolution
+        return ret
+    _remember_hash(key, (stamp, ret['hsum']))
+    try:
+        _write_hash_index([list(key) + stamp + [ret['hsum']]])
+    except (IOError, OSError) as exc:
+        log.error('Failed to add the hash of {0} to the fileserver hash '
+                  'index: {1}'.format(path, exc))
+    return ret
+
+
+def _hash_index_path():
+    '''
+    Return the path of the hash index shared by the master processes
+    '''
+    return os.path.join(__opts__['cachedir'],
+                        'roots',
+                        'hash_index.{0}'.format(__opts__['hash_type']))
+
+
+def _remember_hash(key, entry):
+    '''
+    Keep the hash of a file in memory, forgetting the least recently used
+    hashes beyond fileserver_hash_cache_size
+    '''
+    _HASHES.pop(key, None)
+    _HASHES[key] = entry
+    max_items = __opts__.get('fileserver_hash_cache_size', 10000)
+    while len(_HASHES) > max_items:
+        _HASHES.popitem(last=False)
+
+
+def _split_records(buf):
+    '''
+    Return the start and end offsets of the payload of each complete record
+    of the hash index data in buf
+    '''
+    ret = []
+    pos = 0
+    while pos + HASH_HEADER.size <= len(buf):
+        start = pos + HASH_HEADER.size
+        end = start + HASH_HEADER.unpack_from(buf, pos)[0]
+        if end > len(buf):
+            # A record which is still being written
+            break
+        ret.append((start, end))
+        pos = end
+    return ret
+
+
+def _lookup_hash_index(key):
+    '''
+    Return the latest record of the hash index for the given key. The
+    offsets of the records appended to the index since it was last read by
+    this process are added to the in-memory directory of the index first.
+    '''
+    serial = salt.payload.Serial(__opts__)
+    try:
+        fp_ = salt.utils.fopen(_hash_index_path(), 'rb')
+    except IOError:
+        return None
+    with fp_:
+        istat = os.fstat(fp_.fileno())
+        if _HASH_INDEX['ino'] != istat.st_ino \
+                or istat.st_size < _HASH_INDEX['offset']:
+            # The index was compacted
+            _HASH_INDEX.update({'ino': istat.st_ino, 'offset': 0, 'records': {}})
+        offset = _HASH_INDEX['offset']
+        if istat.st_size > offset:
+            fp_.seek(offset)
+            buf = fp_.read()
+            for start, end in _split_records(buf):
+                record = serial.loads(buf[start:end])
+                _HASH_INDEX['records'][tuple(record[:2])] = (offset + start,
+                                                             offset + end)
+                _HASH_INDEX['offset'] = offset + end
+        if key not in _HASH_INDEX['records']:
+            return None
+        start, end = _HASH_INDEX['records'][key]
+        fp_.seek(start)
+        return serial.loads(fp_.read(end - start))
+
+
+def _read_hash_index():
+    '''
+    Return all of the records of the hash index
+    '''
+    try:
+        with salt.utils.fopen(_hash_index_path(), 'rb') as fp_:
+            buf = fp_.read()
+    except IOError:
+        return []
+    serial = salt.payload.Serial(__opts__)
+    return [serial.loads(buf[start:end]) for start, end in _split_records(buf)]
+
+
+def _write_hash_index(records, compact=False):
+    '''
+    Append the records to the hash index, or replace the index with them
+    '''
+    index = _hash_index_path()
+    index_dir = os.path.dirname(index)
+    if not os.path.isdir(index_dir):
         try:
-            os.makedirs(cache_dir)
+            os.makedirs(index_dir)
         except OSError as err:
-            if err.errno == errno.EEXIST:
-                # rarely, the directory can be already concurrently created between
-                # the os.path.exists and the os.makedirs lines above
-                pass
-            else:
+            if err.errno != errno.EEXIST:
                 raise
-    # save the cache object "hash:mtime"
-    cache_object = '{0}:{1}'.format(ret['hsum'], os.path.getmtime(path))
-    with salt.utils.flopen(cache_path, 'w') as fp_:
-        fp_.write(cache_object)
+    serial = salt.payload.Serial(__opts__)
+    chunks = []
+    for record in records:
+        payload = serial.dumps(record)
+        chunks.append(HASH_HEADER.pack(len(payload)))
+        chunks.append(payload)
+    buf = b''.join(chunks)
+    if compact:
+        tmp_fh, tmp_path = tempfile.mkstemp(prefix='.', dir=index_dir)
+        os.close(tmp_fh)
+        with salt.utils.fopen(tmp_path, 'wb') as fp_:
+            fp_.write(buf)
+        salt.utils.atomicfile.atomic_rename(tmp_path, index)
+        return
+    # A single write of whole records, so that records appended by
+    # concurrent master processes do not interleave
+    fd_ = os.open(index, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        while buf:
+            buf = buf[os.write(fd_, buf):]
+    finally:
+        os.close(fd_)
+
+
+def _compact_hash_index(mtime_map):
+    '''
+    Rewrite the hash index without the superseded records and the records of
+    files which were changed or removed
+    '''
+    records = _read_hash_index()
+    latest = {}
+    for record in records:
+        saltenv, rel, path, mtime = record[:4]
+        if path in mtime_map and mtime_map[path] == mtime:
+            latest[(saltenv, rel)] = record
+    if len(latest) < len(records):
+        _write_hash_index(six.itervalues(latest), compact=True)
+
+
+def _list_cache_dir():
+    return os.path.join(__opts__['cachedir'], 'file_lists/roots')
+
+
+def _scan_tree(root, old, followlinks):
+    '''
+    Return the tree of the directories below root, in the order os.walk
+    would find them, along with whether anything changed from the old tree.
+    Only the directories which mtime changed since the old tree was scanned
+    are listed again.
+    '''
+    new = OrderedDict()
+    changed = []
+    now = time.time()
+
+    def _scan(rel):
+        full = root if rel == '.' else os.path.join(root, rel)
+        try:
+            mtime = os.stat(full).st_mtime
+        except OSError:
+            return
+        entry = old.get(rel)
+        if entry is None or entry[0] is None or entry[0] != mtime:
+            try:
+                names = os.listdir(full)
+            except OSError:
+                return
+            dirs, files, links, dir_links = [], [], [], []
+            for name in names:
+                path = os.path.join(full, name)
+                if os.path.isdir(path):
+                    dirs.append(name)
+                    if os.path.islink(path):
+                        dir_links.append(name)
+                else:
+                    files.append(name)
+                    if os.path.islink(path):
+                        links.append(name)
+            # The type of a symlink changes with its target without changing
+            # the mtime of its directory, and the mtime of a directory changed
+            # within the granularity of the filesystem may change again
+            if links or dir_links or now - mtime < 2:
+                mtime = None
+            if entry is None or entry[1:] != [dirs, files, links, dir_links]:
+                changed.append(rel)
+            entry = [mtime, dirs, files, links, dir_links]
+        new[rel] = entry
+        for name in entry[1]:
+            if followlinks or name not in entry[4]:
+                _scan(name if rel == '.' else os.path.join(rel, name))
+
+    _scan('.')
+    return new, bool(changed) or set(new) != set(old)
+
+
+def _tree_file_lists(saltenv, trees):
+    '''
+    Return the file lists of the saltenv from the trees of its file_roots
+    '''
+    ret = {
+        'files': [],
+        'dirs': [],
+        'empty_dirs': [],
+        'links': []
+    }
+    local = __opts__.get('file_client', 'remote') == 'local' and os.path.sep == "\\"
+    for path in __opts__['file_roots'][saltenv]:
+        for dir_rel_fn, entry in six.iteritems(trees.get(path, {})):
+            if local:
+                dir_rel_fn = dir_rel_fn.replace('\\', '/')
+            ret['dirs'].append(dir_rel_fn)
+            if not entry[1] and not entry[2]:
+                if not salt.fileserver.is_file_ignored(__opts__, dir_rel_fn):
+                    ret['empty_dirs'].append(dir_rel_fn)
+            for fname in entry[2]:
+                is_link = fname in entry[3]
+                if is_link:
+                    ret['links'].append(fname)
+                if __opts__['fileserver_ignoresymlinks'] and is_link:
+                    continue
+                rel_fn = fname if dir_rel_fn == '.' else os.path.join(dir_rel_fn, fname)
+                if not salt.fileserver.is_file_ignored(__opts__, rel_fn):
+                    if local:
+                        rel_fn = rel_fn.replace('\\', '/')
+                    ret['files'].append(rel_fn)
     return ret
 
 
+def _file_list_settings(saltenv):
+    '''
+    Return the settings the file lists of the saltenv are built from
+    '''
+    return {'file_roots': list(__opts__['file_roots'][saltenv]),
+            'followsymlinks': __opts__['fileserver_followsymlinks'],
+            'ignoresymlinks': __opts__['fileserver_ignoresymlinks'],
+            'file_ignore_regex': __opts__.get('file_ignore_regex'),
+            'file_ignore_glob': __opts__.get('file_ignore_glob')}
+
+
+def _update_file_lists():
+    '''
+    Update the tree index of each saltenv from the directories which changed
+    since the last update, and replace the file list snapshot read by the
+    master workers if anything changed
+    '''
+    list_cachedir = _list_cache_dir()
+    if not os.path.isdir(list_cachedir):
+        os.makedirs(list_cachedir)
+    serial = salt.payload.Serial(__opts__)
+    for saltenv, paths in six.iteritems(__opts__['file_roots']):
+        tree_cache = os.path.join(list_cachedir, '{0}.tree'.format(saltenv))
+        snapshot = os.path.join(list_cachedir, '{0}.snap'.format(saltenv))
+        trees = {}
+        if os.path.isfile(tree_cache):
+            try:
+                with salt.utils.fopen(tree_cache, 'rb') as fp_:
+                    trees = serial.load(fp_)
+            except Exception as exc:
+                log.warning('Discarding the file tree index {0}: {1}'
+                            .format(tree_cache, exc))
+        settings = _file_list_settings(saltenv)
+        changed = _snapshot_file_list(saltenv, 'files') is None
+        new_trees = {}
+        for path in paths:
+            new_trees[path], path_changed = _scan_tree(
+                path,
+                trees.get(path, {}),
+                __opts__['fileserver_followsymlinks'])
+            changed = changed or path_changed
+        if not changed:
+            continue
+        ret = _tree_file_lists(saltenv, new_trees)
+        sections = [serial.dumps(ret[form]) for form in FILE_LIST_FORMS]
+        sections.append(serial.dumps(settings))
+        header = SNAPSHOT_HEADER.pack(*[len(section) for section in sections])
+        for path, data in ((tree_cache, serial.dumps(new_trees)),
+                           (snapshot, header + b''.join(sections))):
+            tmp_fh, tmp_path = tempfile.mkstemp(prefix='.', dir=list_cachedir)
+            os.close(tmp_fh)
+            with salt.utils.fopen(tmp_path, 'w+b') as fp_:
+                fp_.write(data)
+            salt.utils.atomicfile.atomic_rename(tmp_path, path)
+
+
+def _snapshot_file_list(saltenv, form):
+    '''
+    Return the file list of the given form from the snapshot written by
+    roots.update(), or None if there is no snapshot for the current settings
+    of the saltenv. The lists are parsed once for each snapshot.
+    '''
+    snapshot = os.path.join(_list_cache_dir(), '{0}.snap'.format(saltenv))
+    try:
+        fp_ = salt.utils.fopen(snapshot, 'rb')
+    except IOError:
+        return None
+    with fp_:
+        fstat = os.fstat(fp_.fileno())
+        stamp = (fstat.st_ino, fstat.st_size, fstat.st_mtime)
+        cached = _SNAPSHOTS.get(saltenv)
+        if cached is None or cached[0] != stamp or form not in cached[2]:
+            serial = salt.payload.Serial(__opts__)
+            # Only the requested sections are read from the shared snapshot
+            snap = mmap.mmap(fp_.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                lengths = SNAPSHOT_HEADER.unpack_from(snap, 0)
+                offsets = [SNAPSHOT_HEADER.size]
+                for length in lengths:
+                    offsets.append(offsets[-1] + length)
+                if cached is None or cached[0] != stamp:
+                    cached = _SNAPSHOTS[saltenv] = (
+                        stamp, serial.loads(snap[offsets[-2]:offsets[-1]]), {})
+                idx = FILE_LIST_FORMS.index(form)
+                cached[2][form] = serial.loads(snap[offsets[idx]:offsets[idx + 1]])
+            finally:
+                snap.close()
+    if cached[1] != _file_list_settings(saltenv):
+        return None
+    return list(cached[2][form])
+
+
 def _file_lists(load, form):
     '''
     Return a dict containing the file lists for files, dirs, emtydirs and symlinks
@@ -276,7 +601,12 @@ def _file_lists(load, form):
     if load['saltenv'] not in __opts__['file_roots']:
         return []
 
-    list_cachedir = os.path.join(__opts__['cachedir'], 'file_lists/roots')
+    if __opts__.get('fileserver_list_cache_incremental', False):
+        ret = _snapshot_file_list(load['saltenv'], form)
+        if ret is not None:
+            return ret
+
+    list_cachedir = _list_cache_dir()
     if not os.path.isdir(list_cachedir):
         try:
             os.makedirs(list_cachedir)
@@ -14,6 +14,8 @@ import salt
 import time
 import logging
 import inspect
+import hashlib
+import json
 import tempfile
 import functools
 from collections import MutableMapping
@@ -24,10 +26,13 @@ from salt.exceptions import LoaderError
 from salt.template import check_render_pipe_str
 from salt.utils.decorators import Depends
 from salt.utils import is_proxy
+import salt.payload
+import salt.utils.atomicfile
 import salt.utils.context
 import salt.utils.lazy
 import salt.utils.event
 import salt.utils.odict
+import salt.version
 
 # Solve the Chicken and egg problem where grains need to run before any
 # of the modules are loaded and are generally available for any usage.
@@ -941,6 +946,155 @@ def _mod_type(module_path):
     return 'ext'
 
 
+def clear_manifests(opts):
+    '''
+    Remove the loader manifests, the modules are imported again the next time
+    they are looked for and their __virtual__ functions run again
+    '''
+    manifest_dir = os.path.join(opts['cachedir'], 'loader')
+    if not os.path.isdir(manifest_dir):
+        return
+    for fn_ in os.listdir(manifest_dir):
+        try:
+            os.remove(os.path.join(manifest_dir, fn_))
+        except OSError:
+            pass
+
+
+class LoaderManifest(object):
+    '''
+    The results of the __virtual__ functions of the modules of a loader,
+    persisted under the cachedir so that other processes loading the same
+    modules do not need to import them to know what they provide.
+
+    A result is used as long as the module file did not change, the grains and
+    options the __virtual__ function read have the same values and it is not
+    older than ``loader_manifest_ttl`` seconds.
+    '''
+    # Only single file modules are recorded, the mtime of a package directory
+    # does not change when its files do
+    SUFFIXES = ('.py', '.pyc', '.pyo', '.so')
+
+    def __init__(self, opts, tag, module_dirs):
+        self.opts = opts
+        self.ttl = opts.get('loader_manifest_ttl', 3600)
+        self.serial = salt.payload.Serial(opts)
+        digest = hashlib.md5(salt.utils.to_bytes(
+            '\n'.join(module_dirs))).hexdigest()
+        self.path = os.path.join(
+            opts['cachedir'], 'loader', '{0}-{1}.p'.format(tag, digest))
+        self.entries = self._read().get('entries', {})
+        # The entries checked against the files and grains, and the ones
+        # recorded since the manifest was last saved
+        self.checked = {}
+        self.updates = {}
+
+    def _read(self):
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with salt.utils.fopen(self.path, 'rb') as fp_:
+                data = self.serial.load(fp_)
+        except Exception as exc:
+            log.debug('Unable to read loader manifest {0}: {1}'.format(
+                self.path, exc))
+            return {}
+        if not isinstance(data, dict) or \
+                data.get('version') != salt.version.__version__:
+            return {}
+        return data
+
+    def _fingerprint(self, grains, opts):
+        '''
+        Return a digest of the values of the grains and options read
+        '''
+        all_grains = self.opts.get('grains', {})
+        data = {'grains': dict((key, [key in all_grains, all_grains.get(key)])
+                               for key in grains),
+                'opts': dict((key, [key in self.opts, self.opts.get(key)])
+                             for key in opts)}
+        return hashlib.sha256(salt.utils.to_bytes(
+            json.dumps(data, sort_keys=True, default=repr))).hexdigest()
+
+    def _stat(self, fpath):
+        stat = os.stat(fpath)
+        return [stat.st_mtime, stat.st_size]
+
+    def lookup(self, name, fpath):
+        '''
+        Return the entry recorded for the module file if it is still valid
+        '''
+        if name in self.checked:
+            return self.checked[name]
+        entry = self.entries.get(name)
+        try:
+            if entry is None or entry['path'] != fpath:
+                entry = None
+            elif self.ttl and time.time() - entry['time'] > self.ttl:
+                entry = None
+            elif entry['stat'] != self._stat(fpath) or \
+                    entry['fingerprint'] != self._fingerprint(entry['grains'],
+                                                              entry['opts']):
+                entry = None
+        except (KeyError, TypeError, OSError):
+            entry = None
+        self.checked[name] = entry
+        return entry
+
+    def record(self, name, fpath, virtual, module_name, error, grains, opts):
+        '''
+        Record the result of the __virtual__ function of a module, grains and
+        opts are the keys it read or None when it read all of them
+        '''
+        if grains is None or opts is None or \
+                os.path.splitext(fpath)[1] not in self.SUFFIXES:
+            return
+        current = self.lookup(name, fpath)
+        if current is not None and current['virtual'] == virtual and \
+                current['module_name'] == module_name:
+            # Nothing new to persist
+            return
+        try:
+            stat = self._stat(fpath)
+        except OSError:
+            return
+        grains = sorted(grains)
+        opts = sorted(opts)
+        entry = {'path': fpath,
+                 'stat': stat,
+                 'time': time.time(),
+                 'virtual': virtual,
+                 'module_name': module_name,
+                 'error': error if error is None or
+                          isinstance(error, six.string_types) else str(error),
+                 'grains': grains,
+                 'opts': opts,
+                 'fingerprint': self._fingerprint(grains, opts)}
+        self.entries[name] = self.updates[name] = entry
+        self.checked[name] = entry
+
+    def save(self):
+        '''
+        Merge the entries recorded into the manifest on disk
+        '''
+        if not self.updates:
+            return
+        data = self._read()
+        entries = data.get('entries', {})
+        entries.update(self.updates)
+        self.updates = {}
+        try:
+            manifest_dir = os.path.dirname(self.path)
+            if not os.path.isdir(manifest_dir):
+                os.makedirs(manifest_dir)
+            with salt.utils.atomicfile.atomic_open(self.path, 'wb') as fp_:
+                self.serial.dump({'version': salt.version.__version__,
+                                  'entries': entries}, fp_)
+        except (IOError, OSError) as exc:
+            log.debug('Unable to write loader manifest {0}: {1}'.format(
+                self.path, exc))
+
+
 # TODO: move somewhere else?
 class FilterDictWrapper(MutableMapping):
     '''
@@ -1032,6 +1186,11 @@ class LazyLoader(salt.utils.lazy.LazyDict):
 
         self.disabled = set(self.opts.get('disable_{0}s'.format(self.tag), []))
 
+        self.manifest = None
+        if self.opts.get('loader_manifest', False) and \
+                self.opts.get('cachedir') and self.virtual_enable:
+            self.manifest = LoaderManifest(self.opts, tag, module_dirs)
+
         self.refresh_file_mapping()
 
         super(LazyLoader, self).__init__()  # late init the lazy loader
@@ -1071,6 +1230,8 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                 # if we got what we wanted, we are done
                 if self._load_module(name) and mod_name in self.loaded_modules:
                     break
+            if self.manifest is not None:
+                self.manifest.save()
         if mod_name in self.loaded_modules:
             return self.loaded_modules[mod_name]
         else:
@@ -1184,6 +1345,9 @@ class LazyLoader(salt.utils.lazy.LazyDict):
             f_noext = smod.split('.')[-1]
             self.file_mapping[f_noext] = (smod, '.o')
 
+        if getattr(self, 'manifest', None) is not None:
+            self.manifest.checked = {}
+
     def clear(self):
         '''
         Clear the dict
@@ -1218,6 +1382,15 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         return mod_opts
 
     def _iter_files(self, mod_name):
+        '''
+        Iterate over all file_mapping files in order of closeness to mod_name,
+        leaving out the ones the loader manifest shows do not provide it
+        '''
+        for name in self._iter_file_names(mod_name):
+            if not self._manifest_skip(name, mod_name):
+                yield name
+
+    def _iter_file_names(self, mod_name):
         '''
         Iterate over all file_mapping files in order of closeness to mod_name
         '''
@@ -1235,6 +1408,23 @@ class LazyLoader(salt.utils.lazy.LazyDict):
             if mod_name not in k:
                 yield k
 
+    def _manifest_skip(self, name, mod_name=None):
+        '''
+        Return True if the loader manifest shows that the module file does not
+        need to be imported to find mod_name. Modules whose __virtual__
+        function returned False are marked missing the way loading them would.
+        '''
+        if self.manifest is None:
+            return False
+        entry = self.manifest.lookup(name, self.file_mapping[name][0])
+        if entry is None:
+            return False
+        if not entry['virtual']:
+            self.loaded_files.add(name)
+            self.missing_modules[name] = entry['error']
+            return True
+        return mod_name is not None and entry['module_name'] != mod_name
+
     def _reload_submodules(self, mod):
         submodules = (
             getattr(mod, sname) for sname in dir(mod) if
@@ -1355,10 +1545,28 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         # if virtual modules are enabled, we need to look for the
         # __virtual__() function inside that module and run it.
         if self.virtual_enable:
-            (virtual_ret, module_name, virtual_err) = self.process_virtual(
-                mod,
-                module_name,
-            )
+            if self.manifest is not None:
+                # Find out which grains and options the result depends on
+                grains, opts = mod.__grains__, mod.__opts__
+                # __grains__ is a NamespacedDictWrapper, copy it by key
+                mod.__grains__ = salt.utils.context.TrackedDict(
+                    (key, grains[key]) for key in grains)
+                mod.__opts__ = salt.utils.context.TrackedDict(opts)
+                try:
+                    (virtual_ret, module_name, virtual_err) = \
+                        self.process_virtual(mod, module_name)
+                finally:
+                    grains_read = mod.__grains__.read
+                    opts_read = mod.__opts__.read
+                    mod.__grains__, mod.__opts__ = grains, opts
+                self.manifest.record(name, fpath, virtual_ret is True,
+                                     module_name, virtual_err,
+                                     grains_read, opts_read)
+            else:
+                (virtual_ret, module_name, virtual_err) = self.process_virtual(
+                    mod,
+                    module_name,
+                )
             if virtual_err is not None:
                 log.debug('Error loading {0}.{1}: {2}'.format(self.tag,
                                                               module_name,
@@ -1481,6 +1689,8 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                     reloaded = True
                 continue
 
+        if self.manifest is not None:
+            self.manifest.save()
         return ret
 
     def _load_all(self):
@@ -1490,8 +1700,12 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         for name in self.file_mapping:
             if name in self.loaded_files or name in self.missing_modules:
                 continue
+            if self._manifest_skip(name):
+                continue
             self._load_module(name)
 
+        if self.manifest is not None:
+            self.manifest.save()
         self.loaded = True
 
     def _apply_outputter(self, func, mod):
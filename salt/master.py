@@ -17,7 +17,6 @@ import signal
 import stat
 import logging
 import multiprocessing
-import tempfile
 import traceback
 
 # Import third party libs
@@ -57,12 +56,12 @@ import salt.search
 import salt.key
 import salt.acl
 import salt.engines
+import salt.cache
 import salt.fileserver
 import salt.daemons.masterapi
 import salt.defaults.exitcodes
 import salt.transport.server
 import salt.log.setup
-import salt.utils.atomicfile
 import salt.utils.event
 import salt.utils.job
 import salt.utils.verify
@@ -233,6 +232,7 @@ class Maintenance(SignalHandlingMultiprocessingProcess):
             if (now - last) >= self.loop_interval:
                 salt.daemons.masterapi.clean_old_jobs(self.opts)
                 salt.daemons.masterapi.clean_expired_tokens(self.opts)
+                salt.daemons.masterapi.clean_streams(self.opts)
             self.handle_search(now, last)
             self.handle_git_pillar()
             self.handle_schedule()
@@ -917,6 +917,7 @@ class AESFuncs(object):
         self.event = salt.utils.event.get_master_event(self.opts, self.opts['sock_dir'], listen=False)
         self.serial = salt.payload.Serial(opts)
         self.ckminions = salt.utils.minions.CkMinions(opts)
+        self.cache = salt.cache.factory(opts)
         # Make a client
         self.local = salt.client.get_local_client(self.opts['conf_file'])
         # Create the master minion to access the external job cache
@@ -1281,20 +1282,14 @@ class AESFuncs(object):
         data = pillar.compile_pillar(pillar_dirs=pillar_dirs)
         self.fs_.update_opts()
         if self.opts.get('minion_data_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions', load['id'])
-            if not os.path.isdir(cdir):
-                os.makedirs(cdir)
-            datap = os.path.join(cdir, 'data.p')
-            tmpfh, tmpfname = tempfile.mkstemp(dir=cdir)
-            os.close(tmpfh)
-            with salt.utils.fopen(tmpfname, 'w+b') as fp_:
-                fp_.write(
-                    self.serial.dumps(
-                        {'grains': load['grains'],
-                         'pillar': data})
-                    )
-            # On Windows, os.rename will fail if the destination file exists.
-            salt.utils.atomicfile.atomic_rename(tmpfname, datap)
+            self.cache.store('minions/{0}'.format(load['id']),
+                             'data',
+                             {'grains': load['grains'], 'pillar': data})
+            if self.opts.get('minion_data_cache_index', True):
+                salt.utils.minions.get_data_index(self.opts).update(
+                    load['id'],
+                    {'grains': load['grains'], 'pillar': data},
+                    datap=os.path.join(self.opts['cachedir'], 'minions', load['id'], 'data.p'))
         return data
 
     def _minion_event(self, load):
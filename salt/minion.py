@@ -819,6 +819,181 @@ class MinionManager(MinionBase):
             minion.destroy()
 
 
+class JobWorker(SignalHandlingMultiprocessingProcess):
+    '''
+    A process forked from the minion which runs the jobs sent to it one after
+    the other, instead of a new process being forked for every job
+    '''
+    def __init__(self, minion, **kwargs):
+        super(JobWorker, self).__init__(**kwargs)
+        self.minion = minion
+        self.parent_conn, self.child_conn = multiprocessing.Pipe()
+        self.ppid = os.getpid()
+        # Set in the minion while the worker runs a job
+        self.busy = False
+
+    def _rss(self):
+        if not HAS_PSUTIL:
+            return 0
+        return psutil.Process(os.getpid()).memory_info()[0]
+
+    def _clean_proc(self, data):
+        '''
+        The job is done but this process lives on, remove its proc file so
+        saltutil.running does not report it anymore
+        '''
+        try:
+            os.remove(os.path.join(self.minion.proc_dir, data['jid']))
+        except (KeyError, OSError):
+            pass
+
+    def run(self):
+        opts = self.minion.opts
+        max_jobs = opts.get('job_worker_max_jobs', 0)
+        max_memory = opts.get('job_worker_max_memory', 0)
+        self.minion.job_worker = True
+        self.parent_conn.close()
+        salt.utils.appendproctitle(self.__class__.__name__)
+        title = None
+        if salt.utils.HAS_SETPROCTITLE:
+            title = salt.utils.setproctitle.getproctitle()
+        start_rss = self._rss()
+        jobs = 0
+        while True:
+            if not self.child_conn.poll(5):
+                if os.getppid() != self.ppid:
+                    # The minion is gone
+                    break
+                continue
+            try:
+                job = self.child_conn.recv()
+            except EOFError:
+                break
+            if job is None:
+                break
+            data, connected = job
+            if title is not None:
+                # Do not let the job titles pile up
+                salt.utils.setproctitle.setproctitle(title)
+            self.minion.connected = connected
+            try:
+                self.minion._target(self.minion, opts, data, connected)
+            except Exception:
+                log.error('Job {0} failed in job worker {1}'.format(
+                    data.get('jid'), os.getpid()), exc_info=True)
+            finally:
+                self._clean_proc(data)
+            jobs += 1
+            if max_jobs and jobs >= max_jobs:
+                log.debug('Job worker {0} ran {1} jobs, recycling it'.format(
+                    os.getpid(), jobs))
+                break
+            if max_memory and self._rss() - start_rss > max_memory:
+                log.debug('Job worker {0} grew by more than {1} bytes, '
+                          'recycling it'.format(os.getpid(), max_memory))
+                break
+            try:
+                self.child_conn.send(True)
+            except (IOError, OSError):
+                break
+
+
+class JobWorkerPool(object):
+    '''
+    The pre-forked job workers of a minion. Jobs are handed to an idle worker,
+    when all of them are busy the minion forks a process for the job as it
+    does without the pool.
+    '''
+    def __init__(self, minion):
+        self.minion = minion
+        self.size = minion.opts.get('job_workers', 0)
+        self.workers = []
+        # Workers which were told to exit but may still run a job
+        self.retired = []
+        self.state = None
+
+    def _state(self):
+        '''
+        The workers hold a copy of the minion from when they were forked, they
+        are replaced once its modules, pillar, grains or master change
+        '''
+        opts = self.minion.opts
+        return (id(self.minion.functions), id(self.minion.returners),
+                id(getattr(self.minion, 'executors', None)),
+                id(opts.get('pillar')), id(opts.get('grains')),
+                opts.get('master_uri'))
+
+    def _reap(self):
+        '''
+        Mark the workers which finished their job idle and drop the dead ones
+        '''
+        for worker in list(self.workers):
+            alive = worker.is_alive()
+            if alive and worker.busy:
+                try:
+                    if worker.parent_conn.poll():
+                        worker.parent_conn.recv()
+                        worker.busy = False
+                except (EOFError, IOError, OSError):
+                    # The worker is exiting after its last job
+                    alive = False
+            if not alive:
+                worker.join()
+                worker.parent_conn.close()
+                self.workers.remove(worker)
+        for worker in list(self.retired):
+            if not worker.is_alive():
+                worker.join()
+                worker.parent_conn.close()
+                self.retired.remove(worker)
+
+    def _send(self, worker, job):
+        try:
+            worker.parent_conn.send(job)
+        except (IOError, OSError):
+            return False
+        return True
+
+    def fill(self):
+        '''
+        Fork workers until the pool is full
+        '''
+        while len(self.workers) < self.size:
+            worker = JobWorker(self.minion)
+            worker.start()
+            worker.child_conn.close()
+            self.workers.append(worker)
+
+    def dispatch(self, data, connected):
+        '''
+        Hand the job to an idle worker, return False if none could take it
+        '''
+        state = self._state()
+        if state != self.state:
+            self.stop()
+            self.state = state
+        self._reap()
+        self.fill()
+        for worker in self.workers:
+            if worker.busy or not worker.is_alive():
+                continue
+            if self._send(worker, (data, connected)):
+                worker.busy = True
+                log.debug('Job {0} handed to job worker {1}'.format(
+                    data['jid'], worker.pid))
+                return True
+        return False
+
+    def stop(self):
+        '''
+        Tell the workers to exit once they are done with their job
+        '''
+        for worker in self.workers:
+            self._send(worker, None)
+        self.retired.extend(self.workers)
+        self.workers = []
+
+
 class Minion(MinionBase):
     '''
     This class instantiates a minion, runs connections for a minion,
@@ -835,6 +1010,7 @@ class Minion(MinionBase):
 
         self._running = None
         self.win_proc = []
+        self.job_pool = None
         self.loaded_base_name = loaded_base_name
         self.connected = False
         self.restart = False
@@ -1187,6 +1363,12 @@ class Minion(MinionBase):
         # side.
         instance = self
         multiprocessing_enabled = self.opts.get('multiprocessing', True)
+        if multiprocessing_enabled and self.opts.get('job_workers', 0) > 0 \
+                and not salt.utils.is_windows():
+            if getattr(self, 'job_pool', None) is None:
+                self.job_pool = JobWorkerPool(self)
+            if self.job_pool.dispatch(data, self.connected):
+                return
         if multiprocessing_enabled:
             if sys.platform.startswith('win'):
                 # let python reconstruct the minion on the other side if we're
@@ -1278,7 +1460,8 @@ class Minion(MinionBase):
                 salt.log.setup.setup_logfile_logger(opts['log_file'], opts.get('log_level_logfile', 'info'))
         fn_ = os.path.join(minion_instance.proc_dir, data['jid'])
 
-        if opts['multiprocessing'] and not salt.utils.is_windows():
+        if opts['multiprocessing'] and not salt.utils.is_windows() and \
+                not getattr(minion_instance, 'job_worker', False):
             # Shutdown the multiprocessing before daemonizing
             salt.log.setup.shutdown_multiprocessing_logging()
 
@@ -1688,6 +1871,7 @@ class Minion(MinionBase):
             # Do not exit if a pillar refresh fails.
             log.error('Pillar data could not be refreshed. '
                       'One or more masters may be down!')
+        self.matcher.clear_cache()
         self.module_refresh(force_refresh)
 
     def manage_schedule(self, tag, data):
@@ -1830,6 +2014,7 @@ class Minion(MinionBase):
         elif tag.startswith('manage_beacons'):
             self.manage_beacons(tag, data)
         elif tag.startswith('grains_refresh'):
+            self.matcher.clear_cache()
             if self.grains_cache != self.opts['grains']:
                 self.pillar_refresh(force_refresh=True)
                 self.grains_cache = self.opts['grains']
@@ -2106,20 +2291,11 @@ class Minion(MinionBase):
         # pre-processing on the master and this minion should not see the
         # publication if the master does not determine that it should.
 
-        if 'tgt_type' in load:
-            match_func = getattr(self.matcher,
-                                 '{0}_match'.format(load['tgt_type']), None)
-            if match_func is None:
-                return False
-            if load['tgt_type'] in ('grain', 'grain_pcre', 'pillar'):
-                delimiter = load.get('delimiter', DEFAULT_TARGET_DELIM)
-                if not match_func(load['tgt'], delimiter=delimiter):
-                    return False
-            elif not match_func(load['tgt']):
-                return False
-        else:
-            if not self.matcher.glob_match(load['tgt']):
-                return False
+        if not self.matcher.target_match(load['tgt'],
+                                         load.get('tgt_type', 'glob'),
+                                         load.get('delimiter',
+                                                  DEFAULT_TARGET_DELIM)):
+            return False
 
         return True
 
@@ -2130,6 +2306,9 @@ class Minion(MinionBase):
         self._running = False
         if hasattr(self, 'schedule'):
             del self.schedule
+        if getattr(self, 'job_pool', None) is not None:
+            self.job_pool.stop()
+            self.job_pool = None
         if hasattr(self, 'pub_channel') and self.pub_channel is not None:
             self.pub_channel.on_recv(None)
             if hasattr(self.pub_channel, 'close'):
@@ -2670,9 +2849,93 @@ class Matcher(object):
     '''
     Use to return the value for matching calls from the master
     '''
+    # Matchers whose result only depends on the id, grains and pillar of the
+    # minion, and can be cached until these change
+    static_matchers = ('glob', 'pcre', 'list', 'grain', 'grain_pcre',
+                       'pillar', 'pillar_pcre', 'pillar_exact', 'ipcidr',
+                       'compound')
+    # Matchers of the compound target engines
+    compound_engines = {'G': 'grain',
+                        'P': 'grain_pcre',
+                        'I': 'pillar',
+                        'J': 'pillar_pcre',
+                        'L': 'list',
+                        'S': 'ipcidr',
+                        'E': 'pcre',
+                        'R': 'range'}
+
     def __init__(self, opts, functions=None):
         self.opts = opts
         self.functions = functions
+        # Results of the targets received from the master, and the data of
+        # the minion they were matched against
+        self._cache = OrderedDict()
+        self._cache_data = None
+
+    def clear_cache(self):
+        '''
+        Forget the results of the targets matched so far
+        '''
+        self._cache.clear()
+        self._cache_data = None
+
+    def target_match(self, tgt, tgt_type='glob',
+                     delimiter=DEFAULT_TARGET_DELIM):
+        '''
+        Returns true if the target of a publication matches this minion.
+
+        The results of the static matchers are kept in a LRU cache of
+        ``matcher_cache_size`` entries until the grains or the pillar of the
+        minion change, so that the publications received again and again by
+        the minion are not matched again.
+        '''
+        match_func = getattr(self, '{0}_match'.format(tgt_type), None)
+        if match_func is None:
+            return False
+        if tgt_type in ('grain', 'grain_pcre', 'pillar'):
+            args = (tgt, delimiter)
+        else:
+            args = (tgt,)
+
+        size = self.opts.get('matcher_cache_size', 0)
+        if not size or tgt_type not in self.static_matchers:
+            return match_func(*args)
+        key = (tgt_type, tuple(tgt) if isinstance(tgt, list) else tgt,
+               args[1:])
+        try:
+            hash(key)
+        except TypeError:
+            return match_func(*args)
+        data = (self.opts['id'], self.opts.get('grains'),
+                self.opts.get('pillar'))
+        if self._cache_data is None or \
+                any(new is not old for new, old in zip(data, self._cache_data)):
+            self._cache.clear()
+            self._cache_data = data
+
+        if key in self._cache:
+            match = self._cache.pop(key)
+        else:
+            match = match_func(*args)
+            if tgt_type == 'compound' and not self._static_compound(tgt):
+                return match
+            while len(self._cache) >= size:
+                self._cache.popitem(last=False)
+        self._cache[key] = match
+        return match
+
+    def _static_compound(self, tgt):
+        '''
+        Returns true if all of the engines of a compound target are static
+        '''
+        plan = salt.utils.minions.compile_compound(tgt)
+        if plan is None:
+            return True
+        for engine, _, _ in self._compound_terms(plan):
+            if engine is not None and \
+                    self.compound_engines.get(engine) not in self.static_matchers:
+                return False
+        return True
 
     def confirm_top(self, match, data, nodegroups=None):
         '''
@@ -2864,82 +3127,54 @@ class Matcher(object):
             log.error('Compound target received that is neither string, list nor tuple')
             return False
         log.debug('compound_match: {0} ? {1}'.format(self.opts['id'], tgt))
-        ref = {'G': 'grain',
-               'P': 'grain_pcre',
-               'I': 'pillar',
-               'J': 'pillar_pcre',
-               'L': 'list',
-               'N': None,      # Nodegroups should already be expanded
-               'S': 'ipcidr',
-               'E': 'pcre'}
-        if HAS_RANGE:
-            ref['R'] = 'range'
-
-        results = []
-        opers = ['and', 'or', 'not', '(', ')']
+        plan = salt.utils.minions.compile_compound(tgt)
+        if plan is None:
+            return False
+        for engine, pattern, _ in self._compound_terms(plan):
+            if engine is None:
+                continue
+            if engine not in self.compound_engines or \
+                    (engine == 'R' and not HAS_RANGE):
+                # If an unknown engine is called at any time, fail out
+                log.error('Unrecognized target engine "{0}" for'
+                          ' target expression "{1}@{2}"'.format(
+                              engine, engine, pattern))
+                return False
+        match = self._eval_compound(plan)
+        log.debug('compound_match {0} ? "{1}" => "{2}"'.format(self.opts['id'], tgt, match))
+        return match
 
-        if isinstance(tgt, six.string_types):
-            words = tgt.split()
+    def _compound_terms(self, plan):
+        '''
+        Yield the engine, pattern and delimiter of the terms of a compiled
+        compound target
+        '''
+        if plan[0] == 'term':
+            yield plan[1:]
         else:
-            words = tgt
-
-        for word in words:
-            target_info = salt.utils.minions.parse_target(word)
-
-            # Easy check first
-            if word in opers:
-                if results:
-                    if results[-1] == '(' and word in ('and', 'or'):
-                        log.error('Invalid beginning operator after "(": {0}'.format(word))
-                        return False
-                    if word == 'not':
-                        if not results[-1] in ('and', 'or', '('):
-                            results.append('and')
-                    results.append(word)
-                else:
-                    # seq start with binary oper, fail
-                    if word not in ['(', 'not']:
-                        log.error('Invalid beginning operator: {0}'.format(word))
-                        return False
-                    results.append(word)
-
-            elif target_info and target_info['engine']:
-                if 'N' == target_info['engine']:
-                    # Nodegroups should already be expanded/resolved to other engines
-                    log.error('Detected nodegroup expansion failure of "{0}"'.format(word))
-                    return False
-                engine = ref.get(target_info['engine'])
-                if not engine:
-                    # If an unknown engine is called at any time, fail out
-                    log.error('Unrecognized target engine "{0}" for'
-                              ' target expression "{1}"'.format(
-                                  target_info['engine'],
-                                  word,
-                                )
-                        )
-                    return False
-
-                engine_args = [target_info['pattern']]
-                engine_kwargs = {}
-                if target_info['delimiter']:
-                    engine_kwargs['delimiter'] = target_info['delimiter']
+            for node in plan[1:]:
+                for term in self._compound_terms(node):
+                    yield term
 
-                results.append(
-                    str(getattr(self, '{0}_match'.format(engine))(*engine_args, **engine_kwargs))
-                )
-
-            else:
+    def _eval_compound(self, plan):
+        '''
+        Evaluate a compound target compiled by
+        :func:`salt.utils.minions.compile_compound`
+        '''
+        if plan[0] == 'term':
+            engine, pattern, delimiter = plan[1:]
+            if engine is None:
                 # The match is not explicitly defined, evaluate it as a glob
-                results.append(str(self.glob_match(word)))
-
-        results = ' '.join(results)
-        log.debug('compound_match {0} ? "{1}" => "{2}"'.format(self.opts['id'], tgt, results))
-        try:
-            return eval(results)  # pylint: disable=W0123
-        except Exception:
-            log.error('Invalid compound target: {0} for results: {1}'.format(tgt, results))
-            return False
-        return False
+                return self.glob_match(pattern)
+            matcher = getattr(self, '{0}_match'.format(self.compound_engines[engine]))
+            if delimiter:
+                return bool(matcher(pattern, delimiter=delimiter))
+            return bool(matcher(pattern))
+        if plan[0] == 'not':
+            return not self._eval_compound(plan[1])
+        if plan[0] == 'and':
+            return all(self._eval_compound(node) for node in plan[1:])
+        return any(self._eval_compound(node) for node in plan[1:])
 
     def nodegroup_match(self, tgt, nodegroups):
         '''
@@ -216,6 +216,7 @@ ioloop.install()
 import salt.netapi
 import salt.utils
 import salt.utils.event
+import salt.utils.tagmatch
 from salt.utils.event import tagify
 import salt.client
 import salt.runner
@@ -302,8 +303,9 @@ class EventListener(object):
             io_loop=tornado.ioloop.IOLoop.current()
         )
 
-        # tag -> list of futures
-        self.tag_map = defaultdict(list)
+        # tag prefix -> futures, the futures waiting for an event are found
+        # by walking its tag once
+        self.tag_map = salt.utils.tagmatch.PrefixTrie()
 
         # request_obj -> list of (tag, future)
         self.request_map = defaultdict(list)
@@ -311,7 +313,8 @@ class EventListener(object):
         # map of future -> timeout_callback
         self.timeout_map = {}
 
-        self.event.set_event_handler(self._handle_event_socket_recv)
+        self.event.set_event_handler(self._handle_event_socket_recv,
+                                     batch=True)
 
     def clean_timeout_futures(self, request):
         '''
@@ -351,7 +354,7 @@ class EventListener(object):
                 tornado.ioloop.IOLoop.current().add_callback(callback, future)
             future.add_done_callback(handle_future)
         # add this tag and future to the callbacks
-        self.tag_map[tag].append(future)
+        self.tag_map.add(tag, future)
         self.request_map[request].append((tag, future))
 
         if timeout:
@@ -364,30 +367,28 @@ class EventListener(object):
         '''
         Timeout a specific future
         '''
-        if tag not in self.tag_map:
+        if not self.tag_map.remove(tag, future):
             return
         if not future.done():
             future.set_exception(TimeoutException())
-            self.tag_map[tag].remove(future)
-        if len(self.tag_map[tag]) == 0:
-            del self.tag_map[tag]
-
-    def _handle_event_socket_recv(self, raw):
-        '''
-        Callback for events on the event sub socket
-        '''
-        mtag, data = self.event.unpack(raw, self.event.serial)
-        # see if we have any futures that need this info:
-        for tag_prefix, futures in six.iteritems(self.tag_map):
-            if mtag.startswith(tag_prefix):
-                for future in futures:
-                    if future.done():
-                        continue
-                    future.set_result({'data': data, 'tag': mtag})
-                    self.tag_map[tag_prefix].remove(future)
-                    if future in self.timeout_map:
-                        tornado.ioloop.IOLoop.current().remove_timeout(self.timeout_map[future])
-                        del self.timeout_map[future]
+
+    def _handle_event_socket_recv(self, raws):
+        '''
+        Callback for the events read at once from the event sub socket
+        '''
+        for raw in raws:
+            # Only unpack the events there are futures for
+            if not len(self.tag_map):
+                return
+            mtag, data = self.event.unpack(raw, self.event.serial)
+            # take the futures that need this info:
+            for future in self.tag_map.pop(mtag):
+                if future.done():
+                    continue
+                future.set_result({'data': data, 'tag': mtag})
+                if future in self.timeout_map:
+                    tornado.ioloop.IOLoop.current().remove_timeout(self.timeout_map[future])
+                    del self.timeout_map[future]
 
 
 # TODO: move to a utils function within salt-- the batching stuff is a bit tied together
@@ -7,8 +7,13 @@ Render the pillar data
 from __future__ import absolute_import
 import copy
 import os
+import json
+import hashlib
 import collections
+import contextlib
 import logging
+import time
+import threading
 import tornado.gen
 
 # Import salt libs
@@ -17,8 +22,13 @@ import salt.fileclient
 import salt.minion
 import salt.crypt
 import salt.transport
+import salt.payload
 import salt.utils.url
 import salt.utils.cache
+import salt.utils.context
+import salt.utils.jinja
+import salt.utils.atomicfile
+import salt.utils.process
 from salt.exceptions import SaltClientError
 from salt.template import compile_template
 from salt.utils.dictupdate import merge
@@ -27,9 +37,30 @@ from salt.version import __version__
 
 # Import 3rd-party libs
 import salt.ext.six as six
+from salt.ext.six.moves import queue  # pylint: disable=import-error
 
 log = logging.getLogger(__name__)
 
+# The options which change how the pillar sls files are compiled, compiled
+# pillar data is rendered again when one of them changes
+COMPILE_CACHE_OPTS = (
+    'id',
+    'environment',
+    'pillarenv',
+    'pillar_roots',
+    'state_top',
+    'nodegroups',
+    'renderer',
+    'renderer_blacklist',
+    'renderer_whitelist',
+    'pillar_source_merging_strategy',
+    'pillar_merge_lists',
+    'jinja_trim_blocks',
+    'jinja_lstrip_blocks',
+    )
+# The lookups of the pillar compile cache made by this process
+COMPILE_CACHE_STATS = {'hits': 0, 'misses': 0}
+
 
 def get_pillar(opts, grains, minion_id, saltenv=None, ext=None, funcs=None,
                pillar=None, pillarenv=None):
@@ -254,6 +285,54 @@ class PillarCache(object):
             return fresh_pillar
 
 
+def _compiled_dir(opts):
+    '''
+    Return the directory the compiled pillar data is stored in
+    '''
+    return os.path.join(opts['cachedir'], 'pillar_compiled')
+
+
+def _count_compiled(opts, hit):
+    '''
+    Count a lookup of the pillar compile cache, the counters of every process
+    are written next to the compiled pillar data
+    '''
+    COMPILE_CACHE_STATS['hits' if hit else 'misses'] += 1
+    stats_dir = os.path.join(_compiled_dir(opts), 'stats')
+    try:
+        if not os.path.isdir(stats_dir):
+            os.makedirs(stats_dir, 0o700)
+        with salt.utils.atomicfile.atomic_open(
+                os.path.join(stats_dir, str(os.getpid())), 'wb') as fp_:
+            salt.payload.Serial(opts).dump(COMPILE_CACHE_STATS, fp_)
+    except (IOError, OSError) as exc:
+        log.debug('Unable to write the pillar compile cache counters: '
+                  '{0}'.format(exc))
+
+
+def compile_cache_stats(opts):
+    '''
+    Return the hits and misses of the pillar compile cache summed over every
+    process which looked it up
+    '''
+    ret = {'hits': 0, 'misses': 0}
+    stats_dir = os.path.join(_compiled_dir(opts), 'stats')
+    if not os.path.isdir(stats_dir):
+        return ret
+    serial = salt.payload.Serial(opts)
+    for name in os.listdir(stats_dir):
+        try:
+            with salt.utils.fopen(os.path.join(stats_dir, name), 'rb') as fp_:
+                stats = serial.load(fp_)
+        except Exception as exc:
+            log.debug('Unable to read pillar compile cache counters {0}: '
+                      '{1}'.format(name, exc))
+            continue
+        for key in ret:
+            ret[key] += stats.get(key, 0)
+    return ret
+
+
 class Pillar(object):
     '''
     Read over the pillar top files and render the pillar data
@@ -295,6 +374,11 @@ class Pillar(object):
 
         self.ext_pillars = salt.loader.pillars(ext_pillar_opts, self.functions)
         self.ignored_pillars = {}
+        # The seconds each external pillar took with ext_pillar_workers
+        self.ext_pillar_timing = []
+        # The (saltenv, url) of the files the pillar sls data is compiled from,
+        # only set while it is compiled for the pillar compile cache
+        self.compiled_files = None
         self.pillar_override = {}
         if pillar is not None:
             if isinstance(pillar, dict):
@@ -324,6 +408,8 @@ class Pillar(object):
             opts['grains'] = {}
         else:
             opts['grains'] = grains
+        if opts.get('pillar_compile_cache', False):
+            opts['grains'] = salt.utils.context.TrackedDict(opts['grains'])
         if 'environment' not in opts:
             opts['environment'] = saltenv
         opts['id'] = self.minion_id
@@ -420,12 +506,11 @@ class Pillar(object):
                     if sls in done[saltenv]:
                         continue
                     try:
+                        state_data = self.client.get_state(sls, saltenv)
+                        self.track_state(sls, saltenv)
                         tops[saltenv].append(
                                 compile_template(
-                                    self.client.get_state(
-                                        sls,
-                                        saltenv
-                                        ).get('dest', False),
+                                    state_data.get('dest', False),
                                     self.rend,
                                     self.opts['renderer'],
                                     self.opts['renderer_blacklist'],
@@ -548,6 +633,7 @@ class Pillar(object):
         err = ''
         errors = []
         fn_ = self.client.get_state(sls, saltenv).get('dest', False)
+        self.track_state(sls, saltenv)
         if not fn_:
             if sls in self.ignored_pillars.get(saltenv, []):
                 log.debug('Skipping ignored and missing SLS \'{0}\' in'
@@ -687,6 +773,158 @@ class Pillar(object):
 
         return pillar, errors
 
+    def track_state(self, sls, saltenv):
+        '''
+        Add the files a pillar sls is looked up at to the files the compiled
+        pillar data depends on, the data changes when one of them is added,
+        changed or removed
+        '''
+        if self.compiled_files is None:
+            return
+        path = sls.replace('.', '/')
+        for url in (path + '.sls', path + '/init.sls'):
+            self.compiled_files.add((saltenv, salt.utils.url.create(url)))
+
+    @contextlib.contextmanager
+    def track_templates(self):
+        '''
+        Add the templates loaded by the Jinja renderer to the files the
+        compiled pillar data depends on
+        '''
+        loaded = salt.utils.jinja.SaltCacheLoader.loaded
+        if self.compiled_files is not None:
+            salt.utils.jinja.SaltCacheLoader.loaded = self.compiled_files
+        try:
+            yield
+        finally:
+            salt.utils.jinja.SaltCacheLoader.loaded = loaded
+
+    def _compiled_key(self):
+        return '{0}|{1}'.format(self.opts['environment'], self.opts['pillarenv'])
+
+    def _compiled_path(self):
+        return os.path.join(_compiled_dir(self.opts),
+                            '{0}.p'.format(self.minion_id))
+
+    def _compiled_fingerprint(self, files, grains):
+        '''
+        Return a digest of the files, grains and options pillar data was
+        compiled from, ``grains`` are the keys of the grains read or None when
+        all of them were
+        '''
+        files = set(tuple(item) for item in files)
+        if self.opts['pillarenv']:
+            envs = [self.opts['pillarenv']]
+        else:
+            envs = self._get_envs()
+        for saltenv in envs:
+            files.add((saltenv, self.opts['state_top']))
+        all_grains = dict(self.opts['grains'])
+        if grains is not None:
+            all_grains = dict((key, [key in all_grains, all_grains.get(key)])
+                              for key in grains)
+        data = {'version': __version__,
+                'opts': dict((key, self.opts.get(key))
+                             for key in COMPILE_CACHE_OPTS),
+                'grains': all_grains,
+                'pillar': self.pillar_override,
+                'files': [(saltenv, path, self.client.hash_file(path, saltenv))
+                          for saltenv, path in sorted(files)]}
+        return hashlib.sha256(salt.utils.to_bytes(
+            json.dumps(data, sort_keys=True, default=repr))).hexdigest()
+
+    def _read_compiled(self):
+        path = self._compiled_path()
+        if not os.path.isfile(path):
+            return {}
+        try:
+            with salt.utils.fopen(path, 'rb') as fp_:
+                return salt.payload.Serial(self.opts).load(fp_)
+        except Exception as exc:
+            log.debug('Unable to read compiled pillar {0}: {1}'.format(
+                path, exc))
+            return {}
+
+    def load_compiled(self):
+        '''
+        Return the pillar data compiled from the pillar sls files by an earlier
+        run, or None when any of the files, grains or options it was compiled
+        from changed since
+        '''
+        compiled = self._read_compiled().get(self._compiled_key())
+        hit = False
+        if compiled:
+            try:
+                hit = compiled['fingerprint'] == self._compiled_fingerprint(
+                    compiled['files'], compiled['grains'])
+            except Exception as exc:
+                log.debug('Unable to check the compiled pillar: {0}'.format(
+                    exc))
+        _count_compiled(self.opts, hit)
+        if not hit:
+            log.debug('The compiled pillar of {0} is out of date'.format(
+                self.minion_id))
+            return None
+        log.debug('Using the compiled pillar of {0}'.format(self.minion_id))
+        return compiled['pillar']
+
+    def save_compiled(self, pillar):
+        '''
+        Store pillar data compiled from the pillar sls files with the files and
+        grains it was compiled from
+        '''
+        files = sorted(self.compiled_files)
+        self.compiled_files = None
+        grains = self.opts['grains'].read
+        if grains is not None:
+            grains = sorted(grains)
+        compiled = self._read_compiled()
+        try:
+            compiled[self._compiled_key()] = {
+                'fingerprint': self._compiled_fingerprint(files, grains),
+                'files': files,
+                'grains': grains,
+                'pillar': pillar}
+            data = salt.payload.Serial(self.opts).dumps(compiled)
+        except Exception as exc:
+            log.debug('Unable to store the compiled pillar: {0}'.format(exc))
+            return
+        try:
+            if not os.path.isdir(_compiled_dir(self.opts)):
+                os.makedirs(_compiled_dir(self.opts), 0o700)
+            with salt.utils.atomicfile.atomic_open(
+                    self._compiled_path(), 'wb') as fp_:
+                fp_.write(data)
+        except (IOError, OSError) as exc:
+            log.error('Unable to write to compiled pillar cache file {0}: '
+                      '{1}'.format(self._compiled_path(), exc))
+
+    def render_sls_pillar(self):
+        '''
+        Render the top file and the pillar sls files it matches, returns the
+        pillar data, the errors and the top file errors. With
+        ``pillar_compile_cache`` the pillar data compiled by an earlier run is
+        returned while it is up to date, data rendered with errors is not
+        kept.
+        '''
+        if self.opts.get('pillar_compile_cache', False):
+            pillar = self.load_compiled()
+            if pillar is not None:
+                return pillar, [], []
+            self.compiled_files = set()
+            self.opts['grains'].read = set()
+        with self.track_templates():
+            top, top_errors = self.get_top()
+            matches = self.top_matches(top)
+            pillar, errors = self.render_pillar(matches)
+        if self.compiled_files is not None:
+            if errors or top_errors:
+                # Render errors may go away without any of the files changing
+                self.compiled_files = None
+            else:
+                self.save_compiled(pillar)
+        return pillar, errors, top_errors
+
     def _external_pillar_data(self, pillar, val, pillar_dirs, key):
         '''
         Builds actual pillar data structure and updates the ``pillar`` variable
@@ -736,6 +974,8 @@ class Pillar(object):
                            self.opts.get('renderer', 'yaml'),
                            self.opts.get('pillar_merge_lists', False))
 
+        if self.opts.get('ext_pillar_workers', 0) > 1:
+            return self._parallel_ext_pillar(pillar, pillar_dirs, errors)
         for run in self.opts['ext_pillar']:
             if not isinstance(run, dict):
                 errors.append('The "ext_pillar" option is malformed')
@@ -768,41 +1008,164 @@ class Pillar(object):
                 ext = None
         return pillar, errors
 
+    def _ext_pillar_timeout(self, key):
+        '''
+        Return the seconds the external pillar ``key`` is waited for, 0 waits
+        until it returns
+        '''
+        timeout = self.opts.get('ext_pillar_timeout', 0)
+        if isinstance(timeout, dict):
+            timeout = timeout.get(key, timeout.get('default', 0))
+        return timeout or 0
+
+    def _fetch_external_pillar(self, results, index, pillar, val,
+                               pillar_dirs, key):
+        '''
+        Fetch an external pillar on a thread of its own and put its data on
+        ``results``
+        '''
+        start = time.time()
+        ext = error = None
+        try:
+            ext = self._external_pillar_data(pillar, val, pillar_dirs, key)
+        except Exception as exc:
+            error = exc
+        results.put((index, ext, error, time.time() - start))
+
+    def _parallel_ext_pillar(self, pillar, pillar_dirs, errors):
+        '''
+        Fetch up to ext_pillar_workers external pillars at the same time, each
+        on a daemon thread of its own, then merge their data in the order they
+        are configured in. Every external pillar is passed the pillar data
+        they are merged into.
+
+        An external pillar past its timeout is left running on its thread and
+        no longer counts against ext_pillar_workers, so one which hangs does
+        not hold up the external pillars of later pillars.
+        '''
+        sources = []
+        for run in self.opts['ext_pillar']:
+            if not isinstance(run, dict):
+                errors.append('The "ext_pillar" option is malformed')
+                log.critical(errors[-1])
+                return {}, errors
+            if next(six.iterkeys(run)) in self.opts.get('exclude_ext_pillar', []):
+                continue
+            for key, val in six.iteritems(run):
+                if key not in self.ext_pillars:
+                    log.critical(
+                        'Specified ext_pillar interface {0} is '
+                        'unavailable'.format(key)
+                    )
+                    continue
+                sources.append((key, val))
+
+        self.ext_pillar_timing = []
+        results = queue.Queue()
+        workers = self.opts['ext_pillar_workers']
+        total = self.opts.get('ext_pillar_total_timeout', 0)
+        # Pillars which time out keep running, they must not see the merges
+        snapshot = copy.deepcopy(pillar)
+        start = time.time()
+        waiting = list(range(len(sources)))
+        # The time each fetch still waited for was started at
+        running = {}
+        fetched = {}
+        timed_out = {}
+        while waiting or running:
+            now = time.time()
+            if total and now - start >= total:
+                break
+            for index, started in list(running.items()):
+                timeout = self._ext_pillar_timeout(sources[index][0])
+                if timeout and now - started >= timeout:
+                    del running[index]
+                    timed_out[index] = timeout
+            while waiting and len(running) < workers:
+                index = waiting.pop(0)
+                key, val = sources[index]
+                thread = threading.Thread(
+                    target=self._fetch_external_pillar,
+                    args=(results, index, snapshot, val, pillar_dirs, key),
+                    name='ext_pillar-{0}'.format(key))
+                thread.daemon = True
+                running[index] = time.time()
+                thread.start()
+            if not running:
+                continue
+            # Wake up for the next fetch to time out
+            deadlines = [started + self._ext_pillar_timeout(sources[index][0])
+                         for index, started in six.iteritems(running)
+                         if self._ext_pillar_timeout(sources[index][0])]
+            if total:
+                deadlines.append(start + total)
+            wait = max(min(deadlines) - now, 0) if deadlines else None
+            try:
+                index, ext, error, seconds = results.get(timeout=wait)
+            except queue.Empty:
+                continue
+            # The data of a fetch which already timed out is left out
+            if running.pop(index, None) is not None:
+                fetched[index] = (ext, error, seconds)
+
+        for index, (key, val) in enumerate(sources):
+            if index not in fetched:
+                self.ext_pillar_timing.append([key, None])
+                errors.append('ext_pillar {0} timed out after {1} '
+                              'seconds'.format(key,
+                                               timed_out.get(index, total)))
+                log.error(errors[-1])
+                continue
+            ext, error, seconds = fetched[index]
+            self.ext_pillar_timing.append([key, round(seconds, 3)])
+            if error is not None:
+                errors.append('Failed to load ext_pillar {0}: {1}'.format(
+                    key, error))
+                continue
+            if ext:
+                pillar = merge(
+                    pillar,
+                    ext,
+                    self.merge_strategy,
+                    self.opts.get('renderer', 'yaml'),
+                    self.opts.get('pillar_merge_lists', False))
+        log.debug('Fetched the external pillars of {0} in {1:.3f}s: '
+                  '{2}'.format(self.minion_id, time.time() - start,
+                               self.ext_pillar_timing))
+        return pillar, errors
+
     def compile_pillar(self, ext=True, pillar_dirs=None):
         '''
         Render the pillar data and return
         '''
-        top, top_errors = self.get_top()
-        if ext:
-            if self.opts.get('pillar_roots_override_ext_pillar', False) or self.opts.get('ext_pillar_first', False):
-                salt.utils.warn_until('Nitrogen',
-                     'The \'ext_pillar_first\' option has been deprecated and '
-                     'replaced by \'pillar_roots_override_ext_pillar\'.'
-                )
-                self.opts['pillar'], errors = self.ext_pillar({}, pillar_dirs)
-                self.rend = salt.loader.render(self.opts, self.functions)
-                matches = self.top_matches(top)
-                pillar, errors = self.render_pillar(matches, errors=errors)
-                if self.opts.get('pillar_roots_override_ext_pillar', False):
-                    pillar = merge(self.opts['pillar'],
-                                   pillar,
-                                   self.merge_strategy,
-                                   self.opts.get('renderer', 'yaml'),
-                                   self.opts.get('pillar_merge_lists', False))
-                else:
-                    pillar = merge(pillar,
-                                   self.opts['pillar'],
-                                   self.merge_strategy,
-                                   self.opts.get('renderer', 'yaml'),
-                                   self.opts.get('pillar_merge_lists', False))
+        if ext and (self.opts.get('pillar_roots_override_ext_pillar', False) or
+                    self.opts.get('ext_pillar_first', False)):
+            salt.utils.warn_until('Nitrogen',
+                 'The \'ext_pillar_first\' option has been deprecated and '
+                 'replaced by \'pillar_roots_override_ext_pillar\'.'
+            )
+            top, top_errors = self.get_top()
+            self.opts['pillar'], errors = self.ext_pillar({}, pillar_dirs)
+            self.rend = salt.loader.render(self.opts, self.functions)
+            matches = self.top_matches(top)
+            pillar, errors = self.render_pillar(matches, errors=errors)
+            if self.opts.get('pillar_roots_override_ext_pillar', False):
+                pillar = merge(self.opts['pillar'],
+                               pillar,
+                               self.merge_strategy,
+                               self.opts.get('renderer', 'yaml'),
+                               self.opts.get('pillar_merge_lists', False))
             else:
-                matches = self.top_matches(top)
-                pillar, errors = self.render_pillar(matches)
+                pillar = merge(pillar,
+                               self.opts['pillar'],
+                               self.merge_strategy,
+                               self.opts.get('renderer', 'yaml'),
+                               self.opts.get('pillar_merge_lists', False))
+        else:
+            pillar, errors, top_errors = self.render_sls_pillar()
+            if ext:
                 pillar, errors = self.ext_pillar(
                     pillar, pillar_dirs, errors=errors)
-        else:
-            matches = self.top_matches(top)
-            pillar, errors = self.render_pillar(matches)
         errors.extend(top_errors)
         if self.opts.get('pillar_opts', False):
             mopts = dict(self.opts)
@@ -816,6 +1179,8 @@ class Pillar(object):
             for error in errors:
                 log.critical('Pillar render error: {0}'.format(error))
             pillar['_errors'] = errors
+        if ext and self.opts.get('ext_pillar_workers', 0) > 1:
+            pillar['_ext_pillar_timing'] = self.ext_pillar_timing
 
         if self.pillar_override and isinstance(self.pillar_override, dict):
             pillar = merge(pillar,
@@ -0,0 +1,559 @@
+# -*- coding: utf-8 -*-
+'''
+Return data to a segmented local job cache
+
+.. versionadded:: Carbon
+
+This is a drop-in replacement for the :mod:`local_cache
+<salt.returners.local_cache>` job cache for masters with many minions. It is
+enabled in the master configuration file:
+
+.. code-block:: yaml
+
+    master_job_cache: local_segment_cache
+
+The :mod:`local_cache <salt.returners.local_cache>` creates a directory for
+every job and a directory and one or two files for every return, so a
+``test.ping`` to 10000 minions creates 10000 directories and 20000 files,
+which all have to be walked again to clean the job cache.
+
+This job cache keeps the jobs in a directory for each time segment of
+:conf_master:`job_cache_segment_seconds` (one hour by default), under
+``<cachedir>/job_segments``. A segment holds:
+
+``loads.seg``
+    An append-only index of the jobs started in the segment: their load,
+    their targeted minions and their end time.
+
+``<jid hash>.seg``
+    An append-only log of the returns of a job.
+
+The records of both files are msgpack payloads prefixed with their length.
+Returns received by a master worker are grouped and appended to the log of
+their job with a single write once :conf_master:`job_cache_batch_size`
+returns are pending, or :conf_master:`job_cache_batch_interval` seconds after
+the first one. Old jobs are cleaned by removing whole segments once all of
+their jobs are older than :conf_master:`keep_jobs`.
+
+The segment of a job is found from the time in its jid; the segment of a
+job passed with an arbitrary jid is recorded in an alias file.
+'''
+from __future__ import absolute_import
+
+# Import python libs
+import collections
+import datetime
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+from multiprocessing.util import Finalize
+
+# Import salt libs
+import salt.payload
+import salt.utils
+import salt.utils.jid
+import salt.utils.minions
+import salt.exceptions
+
+# Import 3rd-party libs
+import salt.ext.six as six
+
+
+log = logging.getLogger(__name__)
+
+# the index of the jobs of a segment
+LOADS_SEG = 'loads.seg'
+# suffix of the return log of a job
+RETURNS_SEG = '.seg'
+# suffix of the marker of a job which returns are not cached
+NOCACHE = '.nocache'
+# the segments of the jobs with an arbitrary jid
+ALIASES = 'aliases'
+# the length prefixing each record
+HEADER = struct.Struct('>I')
+# the number of segment files which records are kept in memory
+LOG_CACHE_SIZE = 256
+
+# Records waiting to be appended, by path
+_PENDING = {}
+_PENDING_LOCK = threading.Lock()
+_FLUSH_TIMER = []
+# The process which registered the flush of the pending records at exit
+_FLUSH_PID = []
+# The records parsed from segment files, by path, least recently read first
+_LOG_CACHE = collections.OrderedDict()
+
+
+def _seg_root():
+    '''
+    Return root of the segmented job cache directory
+    '''
+    return os.path.join(__opts__['cachedir'], 'job_segments')
+
+
+def _seg_seconds():
+    return int(__opts__.get('job_cache_segment_seconds', 3600)) or 3600
+
+
+def _jid_hash(jid):
+    if six.PY3:
+        return getattr(hashlib, __opts__['hash_type'])(jid.encode('utf-8')).hexdigest()
+    return getattr(hashlib, __opts__['hash_type'])(str(jid)).hexdigest()
+
+
+def _alias_path(jid):
+    return os.path.join(_seg_root(), ALIASES, _jid_hash(jid))
+
+
+def _seg_dir(jid, create=False):
+    '''
+    Return the segment directory of the given job id, or None if the job
+    is unknown and create is False
+    '''
+    seconds = _seg_seconds()
+    if salt.utils.jid.is_jid(jid):
+        jtime = time.mktime(
+            datetime.datetime.strptime(jid[:14], '%Y%m%d%H%M%S').timetuple())
+        start = int(jtime // seconds * seconds)
+    else:
+        alias = _alias_path(jid)
+        try:
+            with salt.utils.fopen(alias, 'r') as fp_:
+                start = int(fp_.read().strip())
+        except (IOError, ValueError):
+            if not create:
+                return None
+            start = int(time.time() // seconds * seconds)
+            _makedirs(os.path.dirname(alias))
+            with salt.utils.fopen(alias, 'w+') as fp_:
+                fp_.write(str(start))
+    seg_dir = os.path.join(_seg_root(), str(start))
+    if create:
+        _makedirs(seg_dir)
+    return seg_dir
+
+
+def _makedirs(path):
+    if os.path.isdir(path):
+        return
+    try:
+        os.makedirs(path)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST:
+            raise
+
+
+def _returns_path(jid, create=False):
+    seg_dir = _seg_dir(jid, create)
+    if seg_dir is None:
+        return None
+    return os.path.join(seg_dir, _jid_hash(jid) + RETURNS_SEG)
+
+
+def _append(path, records):
+    '''
+    Append the records to the segment file with a single write, so that
+    records appended by concurrent master processes do not interleave
+    '''
+    serial = salt.payload.Serial(__opts__)
+    chunks = []
+    for record in records:
+        payload = serial.dumps(record)
+        chunks.append(HEADER.pack(len(payload)))
+        chunks.append(payload)
+    buf = b''.join(chunks)
+    fd_ = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        while buf:
+            buf = buf[os.write(fd_, buf):]
+    finally:
+        os.close(fd_)
+
+
+def _queue(path, record):
+    '''
+    Queue a record to be appended to the segment file with other records
+    '''
+    size = int(__opts__.get('job_cache_batch_size', 1))
+    interval = float(__opts__.get('job_cache_batch_interval', 0))
+    if size <= 1 or interval <= 0:
+        _append(path, [record])
+        return
+    with _PENDING_LOCK:
+        _register_flush()
+        _PENDING.setdefault(path, []).append(record)
+        full = len(_PENDING[path]) >= size
+        if not full and not _FLUSH_TIMER:
+            timer = threading.Timer(interval, flush)
+            timer.daemon = True
+            _FLUSH_TIMER.append(timer)
+            timer.start()
+    if full:
+        flush(path)
+
+
+def flush(path=None):
+    '''
+    Append the returns waiting to be written to the job cache, for the
+    given segment file only if a path is passed
+    '''
+    with _PENDING_LOCK:
+        if path is None:
+            pending = list(_PENDING.items())
+            _PENDING.clear()
+            del _FLUSH_TIMER[:]
+        else:
+            pending = [(path, _PENDING.pop(path, []))]
+    for seg_path, records in pending:
+        if not records:
+            continue
+        try:
+            _append(seg_path, records)
+        except (IOError, OSError) as exc:
+            log.error(
+                'Failed to write {0} returns to job cache file {1}: {2}'
+                .format(len(records), seg_path, exc)
+            )
+
+
+def _register_flush():
+    '''
+    Flush the pending records when the process exits. The master workers
+    are multiprocessing children leaving through os._exit, which skips the
+    atexit handlers but runs the multiprocessing finalizers. The finalizers
+    of the parent are dropped in a forked child, so register again once in
+    each process; the records the child inherited are the parent's to
+    write. Must be called with _PENDING_LOCK held.
+    '''
+    pid = os.getpid()
+    if _FLUSH_PID == [pid]:
+        return
+    if _FLUSH_PID:
+        _PENDING.clear()
+        del _FLUSH_TIMER[:]
+    _FLUSH_PID[:] = [pid]
+    Finalize(None, flush, exitpriority=10)
+
+
+def _read(path):
+    '''
+    Return the records of a segment file. The records are kept in memory
+    and only the records appended since the last call are parsed.
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        _LOG_CACHE.pop(path, None)
+        return []
+    inode, offset, records = _LOG_CACHE.get(path, (None, 0, []))
+    if inode != stat.st_ino or stat.st_size < offset:
+        offset, records = 0, []
+    if stat.st_size > offset:
+        serial = salt.payload.Serial(__opts__)
+        records = list(records)
+        with salt.utils.fopen(path, 'rb') as fp_:
+            fp_.seek(offset)
+            buf = fp_.read()
+        pos = 0
+        while pos + HEADER.size <= len(buf):
+            length = HEADER.unpack_from(buf, pos)[0]
+            end = pos + HEADER.size + length
+            if end > len(buf):
+                # A record which is still being written
+                break
+            records.append(serial.loads(buf[pos + HEADER.size:end]))
+            pos = end
+        offset += pos
+    _LOG_CACHE.pop(path, None)
+    _LOG_CACHE[path] = (stat.st_ino, offset, records)
+    while len(_LOG_CACHE) > LOG_CACHE_SIZE:
+        _LOG_CACHE.popitem(last=False)
+    return records
+
+
+def _jobs(seg_dir):
+    '''
+    Return a dict of the jobs of the segment, mapping their jid to their
+    load, their minions and their end time
+    '''
+    jobs = {}
+    for record in _read(os.path.join(seg_dir, LOADS_SEG)):
+        job = jobs.setdefault(
+            record['jid'], {'load': None, 'minions': set(), 'endtime': None})
+        if 'load' in record:
+            job['load'] = record['load']
+        if 'minions' in record:
+            job['minions'].update(record['minions'])
+        if 'endtime' in record:
+            job['endtime'] = record['endtime']
+    return jobs
+
+
+def _segments():
+    '''
+    Return the start times of the segments of the job cache, newest first
+    '''
+    try:
+        names = os.listdir(_seg_root())
+    except OSError:
+        return []
+    # Forget the records of the segments removed by another process
+    seg_dirs = set(os.path.join(_seg_root(), name) for name in names)
+    for path in list(_LOG_CACHE):
+        if os.path.dirname(path) not in seg_dirs:
+            del _LOG_CACHE[path]
+    return sorted((int(name) for name in names if name.isdigit()), reverse=True)
+
+
+def _walk_through():
+    '''
+    Walk through the segments, newest first, and yield the jobs which
+    have a load
+    '''
+    for start in _segments():
+        jobs = _jobs(os.path.join(_seg_root(), str(start)))
+        for jid in sorted(jobs, reverse=True):
+            if jobs[jid]['load'] is not None:
+                yield jid, jobs[jid]
+
+
+def prep_jid(nocache=False, passed_jid=None, recurse_count=0):
+    '''
+    Return a job id and prepare the return log of the job.
+
+    This is the function responsible for making sure jids don't collide (unless
+    it is passed a jid).
+    '''
+    if recurse_count >= 5:
+        err = 'prep_jid could not store a jid after {0} tries.'.format(recurse_count)
+        log.error(err)
+        raise salt.exceptions.SaltCacheError(err)
+    if passed_jid is None:  # this can be a None or an empty string.
+        jid = salt.utils.jid.gen_jid()
+    else:
+        jid = passed_jid
+
+    try:
+        path = _returns_path(jid, create=True)
+        fd_ = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        os.close(fd_)
+        if nocache:
+            with salt.utils.fopen(path[:-len(RETURNS_SEG)] + NOCACHE, 'wb+'):
+                pass
+    except OSError as exc:
+        if exc.errno == errno.EEXIST:
+            if passed_jid is None:
+                time.sleep(0.01)
+                return prep_jid(nocache=nocache, recurse_count=recurse_count+1)
+            return jid
+        log.warning('Could not prepare the job cache for job {0}: {1}. '
+                    'Retrying.'.format(jid, exc))
+        time.sleep(0.1)
+        return prep_jid(passed_jid=passed_jid, nocache=nocache,
+                        recurse_count=recurse_count+1)
+    except IOError as exc:
+        log.warning('Could not prepare the job cache for job {0}: {1}. '
+                    'Retrying.'.format(jid, exc))
+        time.sleep(0.1)
+        return prep_jid(passed_jid=jid, nocache=nocache,
+                        recurse_count=recurse_count+1)
+
+    return jid
+
+
+def returner(load):
+    '''
+    Return data to the segmented job cache
+    '''
+    # if a minion is returning a standalone job, get a jobid
+    if load['jid'] == 'req':
+        load['jid'] = prep_jid(nocache=load.get('nocache', False))
+
+    path = _returns_path(load['jid'], create=True)
+    if os.path.exists(path[:-len(RETURNS_SEG)] + NOCACHE):
+        return
+
+    record = {'id': load['id'], 'return': load['return']}
+    if 'out' in load:
+        record['out'] = load['out']
+    _queue(path, record)
+
+
+def save_load(jid, clear_load, minions=None, recurse_count=0):
+    '''
+    Save the load to the specified jid
+
+    minions argument is to provide a pre-computed list of matched minions for
+    the job, for cases when this function can't compute that list itself (such
+    as for salt-ssh)
+    '''
+    record = {'jid': jid, 'load': clear_load}
+    # if you have a tgt, save that for the UI etc
+    if 'tgt' in clear_load:
+        if minions is None:
+            ckminions = salt.utils.minions.CkMinions(__opts__)
+            # Retrieve the minions list
+            minions = ckminions.check_minions(
+                    clear_load['tgt'],
+                    clear_load.get('tgt_type', 'glob')
+                    )
+        record['minions'] = minions
+    try:
+        _append(os.path.join(_seg_dir(jid, create=True), LOADS_SEG), [record])
+    except (IOError, OSError) as exc:
+        err = 'Could not write job invocation cache file: {0}'.format(exc)
+        log.error(err)
+        raise salt.exceptions.SaltCacheError(err)
+
+
+def save_minions(jid, minions, syndic_id=None):
+    '''
+    Save/update the list of minions for a given job
+    '''
+    log.debug(
+        'Adding minions for job %s%s: %s',
+        jid,
+        ' from syndic master \'{0}\''.format(syndic_id) if syndic_id else '',
+        minions
+    )
+    try:
+        _append(os.path.join(_seg_dir(jid, create=True), LOADS_SEG),
+                [{'jid': jid, 'minions': minions}])
+    except (IOError, OSError) as exc:
+        log.error(
+            'Failed to write minion list {0} of job {1} to the job cache: {2}'
+            .format(minions, jid, exc)
+        )
+
+
+def get_load(jid):
+    '''
+    Return the load data that marks a specified jid
+    '''
+    seg_dir = _seg_dir(jid)
+    if seg_dir is None:
+        return {}
+    job = _jobs(seg_dir).get(jid)
+    if job is None or job['load'] is None:
+        return {}
+    ret = dict(job['load'])
+    if job['minions']:
+        ret['Minions'] = sorted(job['minions'])
+    return ret
+
+
+def get_jid(jid):
+    '''
+    Return the information returned when the specified job id was executed
+    '''
+    path = _returns_path(jid)
+    if path is None:
+        return {}
+    flush(path)
+    ret = {}
+    for record in _read(path):
+        if record['id'] in ret:
+            log.error(
+                'An extra return was detected from minion {0}, please verify '
+                'the minion, this could be a replay attack'.format(record['id'])
+            )
+            continue
+        ret[record['id']] = {'return': record['return']}
+        if 'out' in record:
+            ret[record['id']]['out'] = record['out']
+    # The returns are not needed once they have been read
+    _LOG_CACHE.pop(path, None)
+    return ret
+
+
+def get_jids():
+    '''
+    Return a dict mapping all job ids to job information
+    '''
+    ret = {}
+    for jid, job in _walk_through():
+        ret[jid] = salt.utils.jid.format_jid_instance(jid, job['load'])
+
+        if __opts__.get('job_cache_store_endtime') and job['endtime']:
+            ret[jid]['EndTime'] = job['endtime']
+
+    return ret
+
+
+def get_jids_filter(count, filter_find_job=True):
+    '''
+    Return a list of all jobs information filtered by the given criteria.
+    :param int count: show not more than the count of most recent jobs
+    :param bool filter_find_jobs: filter out 'saltutil.find_job' jobs
+    '''
+    ret = []
+    for jid, job in _walk_through():
+        if len(ret) >= count:
+            # The older segments are not read
+            break
+        job = salt.utils.jid.format_jid_instance_ext(jid, job['load'])
+        if filter_find_job and job['Function'] == 'saltutil.find_job':
+            continue
+        ret.append(job)
+    ret.reverse()
+    return ret
+
+
+def clean_old_jobs():
+    '''
+    Clean out the segments which only hold jobs older than keep_jobs
+    '''
+    if __opts__['keep_jobs'] == 0:
+        return
+    cutoff = time.time() - __opts__['keep_jobs'] * 3600.0 - _seg_seconds()
+    removed = set()
+    for start in _segments():
+        if start < cutoff:
+            seg_dir = os.path.join(_seg_root(), str(start))
+            shutil.rmtree(seg_dir, ignore_errors=True)
+            for path in list(_LOG_CACHE):
+                if path.startswith(seg_dir + os.sep):
+                    del _LOG_CACHE[path]
+            removed.add(str(start))
+    alias_dir = os.path.join(_seg_root(), ALIASES)
+    if not removed or not os.path.isdir(alias_dir):
+        return
+    for name in os.listdir(alias_dir):
+        alias = os.path.join(alias_dir, name)
+        try:
+            with salt.utils.fopen(alias, 'r') as fp_:
+                if fp_.read().strip() in removed:
+                    os.remove(alias)
+        except (IOError, OSError):
+            continue
+
+
+def update_endtime(jid, time):
+    '''
+    Update (or store) the end time for a given job
+    '''
+    try:
+        _append(os.path.join(_seg_dir(jid, create=True), LOADS_SEG),
+                [{'jid': jid, 'endtime': time}])
+    except (IOError, OSError) as exc:
+        log.warning('Could not write job invocation cache file: {0}'.format(exc))
+
+
+def get_endtime(jid):
+    '''
+    Retrieve the stored endtime for a given job
+
+    Returns False if no endtime is present
+    '''
+    seg_dir = _seg_dir(jid)
+    if seg_dir is None:
+        return False
+    job = _jobs(seg_dir).get(jid)
+    if job is None or not job['endtime']:
+        return False
+    return job['endtime']
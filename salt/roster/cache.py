@@ -18,35 +18,28 @@ file. The default for this is:
 '''
 from __future__ import absolute_import
 
-# Import python libs
-import os.path
-import msgpack
-
 # Import Salt libs
+import salt.cache
 import salt.loader
 import salt.utils
 import salt.utils.cloud
 import salt.utils.validate.net
-from salt import syspaths
 
 
 def targets(tgt, tgt_type='glob', **kwargs):  # pylint: disable=W0613
     '''
-    Return the targets from the flat yaml file, checks opts for location but
-    defaults to /etc/salt/roster
+    Return the targets from the minion data cache of the master
     '''
-    cache = os.path.join(syspaths.CACHE_DIR, 'master', 'minions', tgt, 'data.p')
+    cache_data = salt.cache.factory(__opts__).fetch(
+        'minions/{0}'.format(tgt), 'data')
 
-    if not os.path.exists(cache):
+    if not cache_data:
         return {}
 
     roster_order = __opts__.get('roster_order', (
         'public', 'private', 'local'
     ))
 
-    with salt.utils.fopen(cache, 'r') as fh_:
-        cache_data = msgpack.load(fh_)
-
     ipv4 = cache_data.get('grains', {}).get('ipv4', [])
     preferred_ip = extract_ipv4(roster_order, ipv4)
     if preferred_ip is None:
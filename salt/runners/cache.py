@@ -11,6 +11,7 @@ import salt.log
 import salt.utils
 import salt.utils.master
 import salt.payload
+import salt.pillar
 from salt.exceptions import SaltInvocationError
 from salt.fileserver import clear_lock as _clear_lock
 from salt.fileserver.gitfs import PER_REMOTE_OVERRIDES as __GITFS_OVERRIDES
@@ -102,6 +103,22 @@ def _clear_cache(tgt=None,
                                                 clear_mine_func=clear_mine_func_flag)
 
 
+def pillar_compile_stats():
+    '''
+    Return the hits and misses of the compiled pillar cache enabled with
+    ``pillar_compile_cache``
+
+    .. versionadded:: Carbon
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt-run cache.pillar_compile_stats
+    '''
+    return salt.pillar.compile_cache_stats(__opts__)
+
+
 def clear_pillar(tgt=None, expr_form='glob'):
     '''
     Clear the cached pillar data of the targeted minions
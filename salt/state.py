@@ -17,12 +17,18 @@ from __future__ import absolute_import
 import os
 import sys
 import copy
+import json
+import pickle
+import hashlib
+import contextlib
 import site
 import fnmatch
 import logging
 import datetime
 import traceback
 import re
+import time
+import multiprocessing
 
 # Import salt libs
 import salt.utils
@@ -31,7 +37,9 @@ import salt.minion
 import salt.pillar
 import salt.fileclient
 import salt.utils.event
+import salt.utils.jinja
 import salt.utils.url
+import salt.version
 import salt.syspaths as syspaths
 from salt.utils import immutabletypes
 from salt.template import compile_template, compile_template_str
@@ -49,11 +57,13 @@ import salt.utils.yamlloader as yamlloader
 # Import third party libs
 # pylint: disable=import-error,no-name-in-module,redefined-builtin
 import salt.ext.six as six
-from salt.ext.six.moves import map, range, reload_module
+from salt.ext.six.moves import map, range, reload_module, queue
 # pylint: enable=import-error,no-name-in-module,redefined-builtin
 
 log = logging.getLogger(__name__)
 
+GLOB_CHARS = re.compile(r'[*?[]')
+
 
 # These are keywords passed to state module functions which are to be used
 # by salt in this state module and not on the actual state module function
@@ -66,6 +76,24 @@ STATE_REQUISITE_KEYWORDS = frozenset([
     'require',
     'listen',
     ])
+# The options which change how the highstate is compiled, a compiled highstate
+# is rendered again when one of them changes
+COMPILE_CACHE_OPTS = (
+    'id',
+    'environment',
+    'state_top',
+    'state_top_saltenv',
+    'top_file_merging_strategy',
+    'default_top',
+    'env_order',
+    'nodegroups',
+    'renderer',
+    'renderer_blacklist',
+    'renderer_whitelist',
+    'state_auto_order',
+    'jinja_trim_blocks',
+    'jinja_lstrip_blocks',
+    )
 STATE_REQUISITE_IN_KEYWORDS = frozenset([
     'onchanges_in',
     'onfail_in',
@@ -104,6 +132,7 @@ STATE_RUNTIME_KEYWORDS = frozenset([
     '__pub_pid',
     '__pub_tgt_type',
     '__prereq__',
+    '__auto_order__',
     ])
 
 STATE_INTERNAL_KEYWORDS = STATE_REQUISITE_KEYWORDS.union(STATE_REQUISITE_IN_KEYWORDS).union(STATE_RUNTIME_KEYWORDS)
@@ -173,12 +202,17 @@ def state_args(id_, state, high):
     return args
 
 
-def find_name(name, state, high):
+def find_name(name, state, high, index=None):
     '''
     Scan high data for the id referencing the given name and return a list of (IDs, state) tuples that match
 
     Note: if `state` is sls, then we are looking for all IDs that match the given SLS
+
+    The names are looked up in ``index`` instead of scanning the high data
+    when an index built by :py:func:`index_names` is passed.
     '''
+    if index is not None and name not in high:
+        return list(index.get((state, name), []))
     ext_id = []
     if name in high:
         ext_id.append((name, state))
@@ -203,6 +237,94 @@ def find_name(name, state, high):
     return ext_id
 
 
+def index_names(high):
+    '''
+    Map the (state, name) pairs looked up by :py:func:`find_name` to the
+    (ID, state) tuples it returns, in the order it finds them
+    '''
+    index = {}
+    for nid, item in six.iteritems(high):
+        if not isinstance(item, dict):
+            continue
+        if '__sls__' in item:
+            index.setdefault(('sls', item['__sls__']), []).append(
+                (nid, next(iter(item))))
+        for state, args in six.iteritems(item):
+            if not isinstance(args, list):
+                continue
+            for arg in args:
+                if not isinstance(arg, dict) or len(arg) != 1:
+                    continue
+                try:
+                    index.setdefault((state, arg[next(iter(arg))]), []).append(
+                        (nid, state))
+                except TypeError:
+                    continue
+    return index
+
+
+class RequisiteIndex(object):
+    '''
+    Find the chunks a requisite refers to without matching it against every
+    chunk. Requisites without glob characters are looked up in hash maps of
+    the state ids, names and sls files, globs are matched once and cached.
+    '''
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.length = len(chunks)
+        # fnmatch only compares exactly where paths are case sensitive
+        self.exact = os.path.normcase('A') == 'A'
+        self.refs = {}
+        self.sls = {}
+        self.globs = {}
+        for pos, chunk in enumerate(chunks):
+            for key in ((chunk['state'], chunk['name']),
+                        (chunk['state'], chunk['__id__']),
+                        (None, chunk['name']),
+                        (None, chunk['__id__'])):
+                positions = self.refs.setdefault(key, [])
+                if not positions or positions[-1] != pos:
+                    positions.append(pos)
+            self.sls.setdefault(chunk.get('__sls__'), []).append(pos)
+
+    def find(self, req_key, req_val):
+        '''
+        Return the chunks matched by a requisite, in the order of the chunks
+        '''
+        if req_val is None:
+            return []
+        if self.exact and isinstance(req_val, six.string_types) \
+                and not GLOB_CHARS.search(req_val):
+            if req_key == 'sls':
+                positions = self.sls.get(req_val, [])
+            else:
+                state = None if req_key == 'id' else req_key
+                positions = self.refs.get((state, req_val), [])
+        else:
+            key = (req_key, req_val)
+            if key not in self.globs:
+                self.globs[key] = self._match(req_key, req_val)
+            positions = self.globs[key]
+        return [self.chunks[pos] for pos in positions]
+
+    def _match(self, req_key, req_val):
+        '''
+        Match a glob requisite against the chunks
+        '''
+        if req_key == 'sls':
+            return sorted(
+                pos for sls, positions in six.iteritems(self.sls)
+                if sls is not None and fnmatch.fnmatch(sls, req_val)
+                for pos in positions)
+        positions = []
+        for pos, chunk in enumerate(self.chunks):
+            if (fnmatch.fnmatch(chunk['name'], req_val) or
+                    fnmatch.fnmatch(chunk['__id__'], req_val)):
+                if req_key == 'id' or chunk['state'] == req_key:
+                    positions.append(pos)
+        return positions
+
+
 def format_log(ret):
     '''
     Format the state into a log message
@@ -661,6 +783,7 @@ class State(object):
         self.mod_init = set()
         self.pre = {}
         self.__run_num = 0
+        self._requisites = None
         self.jid = jid
         self.instance_id = str(id(self))
         self.inject_globals = {}
@@ -882,6 +1005,9 @@ class State(object):
                 log.error('Error encountered during module reload. Modules were not reloaded.')
             except TypeError:
                 log.error('Error encountered during module reload. Modules were not reloaded.')
+        # Something was installed, the modules which could not be loaded
+        # before need to be looked at again
+        salt.loader.clear_manifests(self.opts)
         self.load_modules(proxy=self.proxy)
         if not self.opts.get('local', False) and self.opts.get('multiprocessing', True):
             self.functions['saltutil.refresh_modules']()
@@ -1421,6 +1547,7 @@ class State(object):
                     ]))
         extend = {}
         errors = []
+        names = index_names(high)
         for id_, body in six.iteritems(high):
             if not isinstance(body, dict):
                 continue
@@ -1517,7 +1644,7 @@ class State(object):
                                             )
                                 if key == 'prereq':
                                     # Add prerequired to prereqs
-                                    ext_ids = find_name(name, _state, high)
+                                    ext_ids = find_name(name, _state, high, names)
                                     for ext_id, _req_state in ext_ids:
                                         if ext_id not in extend:
                                             extend[ext_id] = {}
@@ -1530,7 +1657,7 @@ class State(object):
                                 if key == 'use_in':
                                     # Add the running states args to the
                                     # use_in states
-                                    ext_ids = find_name(name, _state, high)
+                                    ext_ids = find_name(name, _state, high, names)
                                     for ext_id, _req_state in ext_ids:
                                         if not ext_id:
                                             continue
@@ -1557,7 +1684,7 @@ class State(object):
                                 if key == 'use':
                                     # Add the use state's args to the
                                     # running state
-                                    ext_ids = find_name(name, _state, high)
+                                    ext_ids = find_name(name, _state, high, names)
                                     for ext_id, _req_state in ext_ids:
                                         if not ext_id:
                                             continue
@@ -1763,6 +1890,9 @@ class State(object):
         '''
         Iterate over a list of chunks and call them, checking for requires.
         '''
+        workers = self.opts.get('state_parallel_workers', 0)
+        if workers > 1 and len(chunks) > 1 and not salt.utils.is_windows():
+            return self._call_chunks_parallel(chunks, workers)
         running = {}
         for low in chunks:
             if '__FAILHARD__' in running:
@@ -1776,6 +1906,271 @@ class State(object):
             self.active = set()
         return running
 
+    def _chunk_requisites(self, low, chunks):
+        '''
+        Return the tags of the chunks which a low chunk has requisites on
+        '''
+        index = self.requisite_index(chunks)
+        tags = []
+        for r_state in ('require', 'watch', 'prereq', 'prerequired',
+                        'onfail', 'onchanges'):
+            for req in low.get(r_state) or []:
+                if isinstance(req, six.string_types):
+                    req = {'id': req}
+                req = trim_req(req)
+                req_key = next(iter(req))
+                tags.extend(_gen_tag(chunk)
+                            for chunk in index.find(req_key, req[req_key]))
+        return [tag for tag in tags if tag != _gen_tag(low)]
+
+    def _serial_chunk(self, low):
+        '''
+        Return True if a low chunk has to run on its own when the chunks are
+        run in parallel: prereqs look ahead at other chunks, states ordered
+        last have to run after everything else and module or pillar reloads
+        have to be seen by the states which follow them.
+        '''
+        if low.get('prereq') or low.get('prerequired'):
+            return True
+        if low.get('reload_modules') or low.get('reload_pillar') \
+                or low.get('reload_grains'):
+            return True
+        return low.get('order', 0) >= 1000000
+
+    def _barrier(self, low):
+        '''
+        Return the explicit order of a low chunk and whether it is failhard.
+        A chunk does not start before the chunks with a lower explicit order
+        and the failhard chunks in front of it have finished.
+        '''
+        order = low.get('order')
+        if not isinstance(order, (int, float)) or low.get('__auto_order__'):
+            order = None
+        else:
+            # Chunks of the same ID told apart by name_order share its order
+            order = int(order)
+        return order, bool(low.get('failhard') or self.opts['failhard'])
+
+    def _reset_context(self):
+        '''
+        Drop what __context__ holds in a worker process, like the file client
+        and its request channel, which are not safe to use after a fork. The
+        inherited objects stay referenced so that collecting them does not
+        close the sockets of the parent.
+        '''
+        self._inherited_context = []
+        for context in (self.state_con,
+                        getattr(self.states, 'pack', {}).get('__context__')):
+            if context:
+                self._inherited_context.append(dict(context))
+                context.clear()
+
+    def _run_low(self, low, status, reqs, chunks, running):
+        '''
+        Call a chunk whose requisites are met, calling mod_watch when one of
+        the watched states changed
+        '''
+        ret = self.call(low, chunks, running)
+        if status == 'change' and not ret['changes'] \
+                and not ret.get('skip_watch', False):
+            low = low.copy()
+            low['sfun'] = low['fun']
+            low['fun'] = 'mod_watch'
+            low['__reqs__'] = reqs
+            ret = self.call(low, chunks, running)
+        return ret
+
+    def _call_parallel(self, low, status, reqs, chunks, running, results):
+        '''
+        Call a chunk in a worker process and send its return back on the
+        results queue
+        '''
+        self._reset_context()
+        # The modules are reloaded by the parent once it has the return
+        self.check_refresh = lambda data, ret: None
+        try:
+            ret = self._run_low(low, status, reqs, chunks, running)
+        except Exception:
+            ret = {'result': False,
+                   'name': low['name'],
+                   'changes': {},
+                   'comment': 'An exception occurred in this state: {0}'.format(
+                       traceback.format_exc())}
+        results.put((_gen_tag(low), ret))
+
+    def _call_chunks_parallel(self, chunks, workers):
+        '''
+        Call the chunks on up to ``workers`` processes at a time. A chunk is
+        started as soon as the chunks it has requisites on, the chunks with a
+        lower explicit order and the failhard chunks in front of it have run,
+        the returns are numbered in the order they would have been run in one
+        at a time.
+        '''
+        lows = {}
+        requisites = {}
+        barriers = {}
+        for low in chunks:
+            tag = _gen_tag(low)
+            lows[tag] = low
+            requisites[tag] = self._chunk_requisites(low, chunks)
+            order, failhard = self._barrier(low)
+            if order is not None or failhard:
+                barriers[tag] = (order, failhard)
+
+        # The order call_chunks runs the chunks in: requisites first, then
+        # the order of the chunks
+        order = []
+        seen = set()
+        for low in chunks:
+            tag = _gen_tag(low)
+            if tag in seen:
+                continue
+            seen.add(tag)
+            stack = [(tag, iter(requisites[tag]))]
+            while stack:
+                for req in stack[-1][1]:
+                    if req not in seen:
+                        seen.add(req)
+                        stack.append((req, iter(requisites[req])))
+                        break
+                else:
+                    order.append(stack.pop()[0])
+        rank = dict((tag, num) for num, tag in enumerate(order))
+
+        def _blocked(tag, low):
+            '''
+            Return True while a barrier in front of the chunk is running
+            '''
+            order = low.get('order')
+            for b_tag, (b_order, b_failhard) in six.iteritems(barriers):
+                if b_tag == tag or b_tag in running:
+                    continue
+                if b_failhard and rank[b_tag] < rank[tag]:
+                    return True
+                if b_order is not None and isinstance(order, (int, float)) \
+                        and b_order < int(order):
+                    return True
+            return False
+
+        run_num = self.__run_num
+        running = {}
+        results = multiprocessing.Queue()
+        procs = {}
+        dead = set()
+        pending = list(chunks)
+        failhard = False
+        start = time.time()
+
+        def _call_serial(low):
+            '''
+            Call a chunk in this process, returns True on a failhard
+            '''
+            ret = self.call_chunk(low, running, chunks)
+            self.active = set()
+            if '__FAILHARD__' in ret:
+                ret.pop('__FAILHARD__')
+                return True
+            return self.check_failhard(low, ret)
+
+        while pending or procs:
+            for low in list(pending):
+                tag = _gen_tag(low)
+                if tag in running:
+                    pending.remove(low)
+                    continue
+                if failhard or len(procs) >= workers:
+                    break
+                if self._serial_chunk(low):
+                    if procs or low is not pending[0]:
+                        break
+                    pending.remove(low)
+                    failhard = _call_serial(low)
+                    continue
+                if any(req not in running for req in requisites[tag]):
+                    continue
+                if _blocked(tag, low):
+                    continue
+                pending.remove(low)
+                low = self._mod_aggregate(low, running, chunks)
+                self._mod_init(low)
+                status, reqs = self.check_requisite(low, running, chunks, True)
+                if status not in ('met', 'change'):
+                    failhard = _call_serial(low)
+                    continue
+                proc = multiprocessing.Process(
+                    target=self._call_parallel,
+                    args=(low, status, reqs, chunks, running, results))
+                proc.start()
+                procs[tag] = (proc, low)
+            if not procs:
+                if pending and not failhard:
+                    # Nothing left can start on its own, fall back to
+                    # calling the next chunk the way call_chunks does
+                    failhard = _call_serial(pending.pop(0))
+                    continue
+                break
+            try:
+                tag, ret = results.get(timeout=1)
+            except queue.Empty:
+                for tag, (proc, low) in list(procs.items()):
+                    if proc.is_alive():
+                        continue
+                    # A return sent before exiting is read by the next get,
+                    # a process still without one after that sent nothing,
+                    # e.g. because its return could not be pickled
+                    if tag not in dead:
+                        dead.add(tag)
+                        continue
+                    log.error(
+                        'The process running state [{0}] exited with code '
+                        '{1} without a return'.format(low['name'],
+                                                      proc.exitcode))
+                    results.put((tag, {
+                        'result': False,
+                        'name': low['name'],
+                        'changes': {},
+                        'comment': 'The process running this state exited '
+                                   'with code {0} without a return'.format(
+                                       proc.exitcode)}))
+                continue
+            if tag not in procs:
+                # The return of a process already reported as failed
+                continue
+            dead.discard(tag)
+            proc, low = procs.pop(tag)
+            proc.join()
+            ret['__run_num__'] = self.__run_num
+            self.__run_num += 1
+            ret.setdefault('__sls__', low.get('__sls__'))
+            running[tag] = ret
+            self.check_refresh(low, ret)
+            self.event(ret, len(chunks), fire_event=low.get('fire_event'))
+            if self.check_failhard(low, running):
+                failhard = True
+
+        tags = sorted(running, key=lambda tag: (rank.get(tag, len(rank)),
+                                                running[tag]['__run_num__']))
+        for num, tag in enumerate(tags, run_num):
+            running[tag]['__run_num__'] = num
+        self.__run_num = run_num + len(tags)
+
+        # The longest chain of requisites bounds how fast the chunks can run
+        path = {}
+        for tag in order:
+            if tag in running:
+                path[tag] = running[tag].get('duration', 0) + max(
+                    [path.get(req, 0) for req in requisites[tag]] or [0])
+        self.parallel_stats = {
+            'wall': (time.time() - start) * 1000,
+            'critical_path': max(list(path.values()) or [0]),
+            'serial': sum(ret.get('duration', 0) for ret in running.values())}
+        log.info(
+            'Ran {0} states on {1} processes in {2[wall]:.1f} ms, the longest '
+            'chain of requisites took {2[critical_path]:.1f} ms and the states '
+            'took {2[serial]:.1f} ms in total'.format(
+                len(running), workers, self.parallel_stats))
+        return running
+
     def check_failhard(self, low, running):
         '''
         Check if the low data chunk should send a failhard signal
@@ -1786,6 +2181,17 @@ class State(object):
             return not running[tag]['result']
         return False
 
+    def requisite_index(self, chunks):
+        '''
+        Return the index used to resolve the requisites of the chunks, it is
+        built again when a different list of chunks is passed
+        '''
+        index = self._requisites
+        if index is None or index.chunks is not chunks \
+                or index.length != len(chunks):
+            index = self._requisites = RequisiteIndex(chunks)
+        return index
+
     def check_requisite(self, low, running, chunks, pre=False):
         '''
         Look into the running data to check the status of all requisite
@@ -1821,31 +2227,19 @@ class State(object):
                 'onchanges': []}
         if pre:
             reqs['prerequired'] = []
+        index = self.requisite_index(chunks)
         for r_state in reqs:
             if r_state in low and low[r_state] is not None:
                 for req in low[r_state]:
                     if isinstance(req, six.string_types):
                         req = {'id': req}
                     req = trim_req(req)
-                    found = False
-                    for chunk in chunks:
-                        req_key = next(iter(req))
-                        req_val = req[req_key]
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                found = True
-                                reqs[r_state].append(chunk)
-                            continue
-                        if (fnmatch.fnmatch(chunk['name'], req_val) or
-                            fnmatch.fnmatch(chunk['__id__'], req_val)):
-                            if req_key == 'id' or chunk['state'] == req_key:
-                                found = True
-                                reqs[r_state].append(chunk)
+                    req_key = next(iter(req))
+                    # Entire sls files can be tracked as requisites too
+                    found = index.find(req_key, req[req_key])
                     if not found:
                         return 'unmet', ()
+                    reqs[r_state].extend(found)
         fun_stats = set()
         for r_state, chunks in six.iteritems(reqs):
             if r_state == 'prereq':
@@ -1953,6 +2347,7 @@ class State(object):
         if status == 'unmet':
             lost = {}
             reqs = []
+            index = self.requisite_index(chunks)
             for requisite in requisites:
                 lost[requisite] = []
                 if requisite not in low:
@@ -1961,29 +2356,14 @@ class State(object):
                     if isinstance(req, six.string_types):
                         req = {'id': req}
                     req = trim_req(req)
-                    found = False
                     req_key = next(iter(req))
-                    req_val = req[req_key]
-                    for chunk in chunks:
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                reqs.append(chunk)
-                                found = True
-                            continue
-                        if (fnmatch.fnmatch(chunk['name'], req_val) or
-                            fnmatch.fnmatch(chunk['__id__'], req_val)):
-                            if req_key == 'id' or chunk['state'] == req_key:
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                elif requisite == 'prerequired':
-                                    chunk['__prerequired__'] = True
-                                reqs.append(chunk)
-                                found = True
+                    found = index.find(req_key, req[req_key])
+                    for chunk in found:
+                        if requisite == 'prereq':
+                            chunk['__prereq__'] = True
+                        elif requisite == 'prerequired' and req_key != 'sls':
+                            chunk['__prerequired__'] = True
+                        reqs.append(chunk)
                     if not found:
                         lost[requisite].append(req)
             if lost['require'] or lost['watch'] or lost['prereq'] or lost['onfail'] or lost['onchanges'] or lost.get('prerequired'):
@@ -2091,14 +2471,7 @@ class State(object):
                 }
             self.__run_num += 1
         elif status == 'change' and not low.get('__prereq__'):
-            ret = self.call(low, chunks, running)
-            if not ret['changes'] and not ret.get('skip_watch', False):
-                low = low.copy()
-                low['sfun'] = low['fun']
-                low['fun'] = 'mod_watch'
-                low['__reqs__'] = reqs
-                ret = self.call(low, chunks, running)
-            running[tag] = ret
+            running[tag] = self._run_low(low, status, reqs, chunks, running)
         elif status == 'pre':
             pre_ret = {'changes': {},
                        'result': True,
@@ -2193,9 +2566,10 @@ class State(object):
         running.update(errors)
         return running
 
-    def call_high(self, high):
+    def compile_high(self, high):
         '''
-        Process a high data call and ensure the defined states.
+        Compile high data into the low chunks to run, returns the chunks and
+        the errors found in the high data
         '''
         errors = []
         # If there is extension data reconcile it
@@ -2203,15 +2577,28 @@ class State(object):
         errors += ext_errors
         errors += self.verify_high(high)
         if errors:
-            return errors
+            return [], errors
         high, req_in_errors = self.requisite_in(high)
         errors += req_in_errors
         high = self.apply_exclude(high)
         # Verify that the high data is structurally sound
         if errors:
-            return errors
+            return [], errors
         # Compile and verify the raw chunks
-        chunks = self.compile_high_data(high)
+        return self.compile_high_data(high), errors
+
+    def call_high(self, high, chunks=None):
+        '''
+        Process a high data call and ensure the defined states.
+
+        The low chunks compiled from the high data by compile_high can be
+        passed as ``chunks`` to skip compiling it again.
+        '''
+        errors = []
+        if chunks is None:
+            chunks, errors = self.compile_high(high)
+            if errors:
+                return errors
 
         # Check for any disabled states
         disabled = {}
@@ -2388,6 +2775,8 @@ class BaseHighState(object):
         self.avail = self.__gather_avail()
         self.serial = salt.payload.Serial(self.opts)
         self.building_highstate = {}
+        # The (saltenv, url) of the files a compiled highstate depends on
+        self.compiled_files = None
 
     def __gather_avail(self):
         '''
@@ -2574,12 +2963,11 @@ class BaseHighState(object):
                     for sls in fnmatch.filter(self.avail[saltenv], sls_match):
                         if sls in done[saltenv]:
                             continue
+                        state_data = self.client.get_state(sls, saltenv)
+                        self.track_state(sls, saltenv, state_data)
                         tops[saltenv].append(
                             compile_template(
-                                self.client.get_state(
-                                    sls,
-                                    saltenv
-                                ).get('dest', False),
+                                state_data.get('dest', False),
                                 self.state.rend,
                                 self.state.opts['renderer'],
                                 self.state.opts['renderer_blacklist'],
@@ -2751,6 +3139,7 @@ class BaseHighState(object):
         errors = []
         if not local:
             state_data = self.client.get_state(sls, saltenv)
+            self.track_state(sls, saltenv, state_data)
             fn_ = state_data.get('dest', False)
         else:
             fn_ = sls
@@ -2961,6 +3350,8 @@ class BaseHighState(object):
                         state[name][s_dec].append(
                                 {'order': self.iorder}
                                 )
+                        # Parallel runs only wait on the orders set by hand
+                        state[name][s_dec].append({'__auto_order__': True})
                         self.iorder += 1
         return state
 
@@ -3179,6 +3570,113 @@ class BaseHighState(object):
                     ret_matches[env].append(sls)
         return ret_matches
 
+    def track_state(self, sls, saltenv, state_data):
+        '''
+        Add a sls file fetched while compiling the highstate to the files the
+        compiled highstate depends on
+        '''
+        if self.compiled_files is None or not state_data:
+            return
+        self.compiled_files.add((saltenv, state_data['source']))
+        if state_data['source'].endswith('/init.sls'):
+            # The highstate changes if <sls>.sls is added next to it
+            self.compiled_files.add(
+                (saltenv, salt.utils.url.create(sls.replace('.', '/') + '.sls')))
+
+    @contextlib.contextmanager
+    def track_templates(self):
+        '''
+        Add the templates loaded by the Jinja renderer to the files the
+        compiled highstate depends on
+        '''
+        loaded = salt.utils.jinja.SaltCacheLoader.loaded
+        if self.compiled_files is not None:
+            salt.utils.jinja.SaltCacheLoader.loaded = self.compiled_files
+        try:
+            yield
+        finally:
+            salt.utils.jinja.SaltCacheLoader.loaded = loaded
+
+    def _compiled_fingerprint(self, files, exclude, whitelist):
+        '''
+        Return a digest of the files, data and options a compiled highstate
+        was built from
+        '''
+        if isinstance(exclude, six.string_types):
+            exclude = exclude.split(',')
+        files = set(files)
+        for saltenv in self.avail:
+            files.add((saltenv, self.opts['state_top']))
+        data = {'version': salt.version.__version__,
+                'opts': dict((key, self.opts.get(key))
+                             for key in COMPILE_CACHE_OPTS),
+                'grains': self.opts['grains'],
+                'pillar': self.state.opts['pillar'],
+                'avail': self.avail,
+                'ext_nodes': self.client.ext_nodes(),
+                'exclude': exclude,
+                'whitelist': whitelist,
+                'files': [(saltenv, path, self.client.hash_file(path, saltenv))
+                          for saltenv, path in sorted(files)]}
+        return hashlib.sha256(salt.utils.to_bytes(
+            json.dumps(data, sort_keys=True, default=repr))).hexdigest()
+
+    def load_compiled(self, cache_name, exclude, whitelist):
+        '''
+        Return the top file matches and the low chunks of the highstate
+        compiled by an earlier run, or None when anything it was compiled
+        from changed since
+        '''
+        cfn = os.path.join(self.opts['cachedir'],
+                           '{0}.compiled.p'.format(cache_name))
+        if not os.path.isfile(cfn):
+            return None
+        try:
+            with salt.utils.fopen(cfn, 'rb') as fp_:
+                compiled = pickle.load(fp_)
+            fingerprint = self._compiled_fingerprint(
+                compiled['files'], exclude, whitelist)
+        except Exception as exc:
+            log.debug('Unable to read compiled highstate {0}: {1}'.format(
+                cfn, exc))
+            return None
+        if fingerprint != compiled['fingerprint']:
+            log.debug('The compiled highstate is out of date')
+            return None
+        log.debug('Running the compiled highstate from {0}'.format(cfn))
+        return compiled['matches'], compiled['chunks']
+
+    def save_compiled(self, cache_name, exclude, whitelist, matches, chunks):
+        '''
+        Store the low chunks of a compiled highstate with the fingerprint of
+        what it was compiled from
+        '''
+        files = sorted(self.compiled_files)
+        self.compiled_files = None
+        cfn = os.path.join(self.opts['cachedir'],
+                           '{0}.compiled.p'.format(cache_name))
+        try:
+            compiled = pickle.dumps(
+                {'fingerprint': self._compiled_fingerprint(
+                    files, exclude, whitelist),
+                 'files': files,
+                 'matches': matches,
+                 'chunks': chunks},
+                pickle.HIGHEST_PROTOCOL)
+        except Exception as exc:
+            # Renderers like pydsl can leave objects which can not be stored
+            log.debug('Unable to store the compiled highstate: {0}'.format(exc))
+            return
+        cumask = os.umask(0o77)
+        try:
+            with salt.utils.fopen(cfn, 'w+b') as fp_:
+                fp_.write(compiled)
+        except (IOError, OSError):
+            log.error('Unable to write to compiled highstate cache file '
+                      '{0}'.format(cfn))
+        finally:
+            os.umask(cumask)
+
     def call_highstate(self, exclude=None, cache=None, cache_name='highstate',
                        force=False, whitelist=None):
         '''
@@ -3203,10 +3701,21 @@ class BaseHighState(object):
                 with salt.utils.fopen(cfn, 'rb') as fp_:
                     high = self.serial.load(fp_)
                     return self.state.call_high(high)
+        if self.opts.get('state_compile_cache', False):
+            compiled = self.load_compiled(cache_name, exclude, whitelist)
+            if compiled is not None:
+                matches, chunks = compiled
+                self.load_dynamic(matches)
+                if not self._check_pillar(force):
+                    return ['Pillar failed to render with the following messages:'] \
+                        + self.state.opts['pillar']['_errors']
+                return self.state.call_high({}, chunks)
+            self.compiled_files = set()
         # File exists so continue
         err = []
         try:
-            top = self.get_top()
+            with self.track_templates():
+                top = self.get_top()
         except SaltRenderError as err:
             ret[tag_name]['comment'] = 'Unable to render top file: '
             ret[tag_name]['comment'] += str(err.error)
@@ -3227,7 +3736,8 @@ class BaseHighState(object):
             err += ['Pillar failed to render with the following messages:']
             err += self.state.opts['pillar']['_errors']
         else:
-            high, errors = self.render_highstate(matches)
+            with self.track_templates():
+                high, errors = self.render_highstate(matches)
             if exclude:
                 if isinstance(exclude, str):
                     exclude = exclude.split(',')
@@ -3256,6 +3766,14 @@ class BaseHighState(object):
             log.error(msg.format(cfn))
 
         os.umask(cumask)
+        if self.compiled_files is not None:
+            # The compiled chunks are only reused while the highstate
+            # written above is current, so cache=True still replays it
+            chunks, errors = self.state.compile_high(high)
+            if errors:
+                return errors
+            self.save_compiled(cache_name, exclude, whitelist, matches, chunks)
+            return self.state.call_high({}, chunks)
         return self.state.call_high(high)
 
     def compile_highstate(self):
@@ -22,6 +22,7 @@ from tornado.iostream import IOStream
 # Import Salt libs
 import salt.transport.client
 import salt.transport.frame
+import salt.utils.tagmatch
 import salt.ext.six as six
 
 log = logging.getLogger(__name__)
@@ -439,8 +440,11 @@ class IPCMessagePublisher(object):
     '''
     A Tornado IPC Publisher similar to Tornado's TCPServer class
     but using either UNIX domain sockets or TCP sockets
+
+    Subscribers can send the glob patterns of the tags they want, the messages
+    published with a tag matching none of them are not sent to them.
     '''
-    def __init__(self, socket_path, io_loop=None):
+    def __init__(self, socket_path, io_loop=None, hwm=0):
         '''
         Create a new Tornado IPC server
         :param str/int socket_path: Path on the filesystem for the
@@ -452,15 +456,21 @@ class IPCMessagePublisher(object):
                                     which case it is used as the port
                                     for a tcp localhost connection.
         :param IOLoop io_loop: A Tornado ioloop to handle scheduling
+        :param int hwm: The most messages queued for a subscriber, the
+                        messages published while it has that many queued
+                        are dropped. 0 does not limit the queue.
         '''
         self.socket_path = socket_path
         self._started = False
+        self.hwm = hwm
 
         # Placeholders for attributes to be populated by method calls
         self.sock = None
         self.io_loop = io_loop or IOLoop.current()
         self._closing = False
         self.streams = set()
+        # stream -> the filter and counters of the subscriber
+        self.subscribers = {}
 
     def start(self):
         '''
@@ -487,31 +497,92 @@ class IPCMessagePublisher(object):
         )
         self._started = True
 
+    def _remove(self, stream):
+        self.streams.discard(stream)
+        self.subscribers.pop(stream, None)
+
     @tornado.gen.coroutine
     def _write(self, stream, pack):
         try:
             yield stream.write(pack)
         except tornado.iostream.StreamClosedError:
             log.trace('Client disconnected from IPC {0}'.format(self.socket_path))
-            self.streams.discard(stream)
+            self._remove(stream)
         except Exception as exc:
             log.error('Exception occurred while handling stream: {0}'.format(exc))
             if not stream.closed():
                 stream.close()
-            self.streams.discard(stream)
+            self._remove(stream)
+        else:
+            subscriber = self.subscribers.get(stream)
+            if subscriber is not None:
+                subscriber['queued'] -= 1
+                subscriber['sent'] += 1
 
-    def publish(self, msg):
+    def publish(self, msg, tag=None):
         '''
-        Send message to all connected sockets
+        Send message to all connected sockets, when the tag is passed only to
+        the sockets subscribed to it
         '''
         if not len(self.streams):
             return
 
-        pack = salt.transport.frame.frame_msg_ipc(msg, raw_body=True)
+        header = None if tag is None else {'tag': tag}
+        pack = salt.transport.frame.frame_msg_ipc(msg, header=header,
+                                                  raw_body=True)
 
         for stream in self.streams:
+            subscriber = self.subscribers[stream]
+            if tag is not None and subscriber['matcher'] is not None \
+                    and not subscriber['matcher'].match(tag):
+                subscriber['filtered'] += 1
+                continue
+            if self.hwm and subscriber['queued'] >= self.hwm:
+                if not subscriber['dropped']:
+                    log.warning(
+                        'IPC subscriber to {0} is too slow, dropping the '
+                        'messages published while it has {1} queued'.format(
+                            self.socket_path, self.hwm))
+                subscriber['dropped'] += 1
+                continue
+            subscriber['queued'] += 1
             self.io_loop.spawn_callback(self._write, stream, pack)
 
+    @tornado.gen.coroutine
+    def _read_subscriptions(self, stream):
+        '''
+        Read the tags a subscriber wants
+        '''
+        if six.PY2:
+            encoding = None
+        else:
+            encoding = 'utf-8'
+        unpacker = msgpack.Unpacker(encoding=encoding)
+        while not stream.closed():
+            try:
+                wire_bytes = yield stream.read_bytes(4096, partial=True)
+                unpacker.feed(wire_bytes)
+                for framed_msg in unpacker:
+                    head = framed_msg.get('head') or {}
+                    if 'subscribe' not in head:
+                        continue
+                    subscriber = self.subscribers.get(stream)
+                    if subscriber is None:
+                        return
+                    tags = head['subscribe']
+                    subscriber['filter'] = tags
+                    if tags is None:
+                        subscriber['matcher'] = None
+                    else:
+                        subscriber['matcher'] = salt.utils.tagmatch.TagMatcher(
+                            (tag, True) for tag in tags)
+            except tornado.iostream.StreamClosedError:
+                log.trace('Client disconnected from IPC {0}'.format(self.socket_path))
+                self._remove(stream)
+                break
+            except Exception as exc:
+                log.error('Exception occurred while reading subscriptions: {0}'.format(exc))
+
     def handle_connection(self, connection, address):
         log.trace('IPCServer: Handling connection to address: {0}'.format(address))
         try:
@@ -520,9 +591,22 @@ class IPCMessagePublisher(object):
                 io_loop=self.io_loop,
             )
             self.streams.add(stream)
+            self.subscribers[stream] = {'filter': None, 'matcher': None,
+                                        'queued': 0, 'sent': 0,
+                                        'filtered': 0, 'dropped': 0}
+            self.io_loop.spawn_callback(self._read_subscriptions, stream)
         except Exception as exc:
             log.error('IPC streaming error: {0}'.format(exc))
 
+    def stats(self):
+        '''
+        Return the filter, the messages queued and the messages sent, filtered
+        out and dropped of each subscriber
+        '''
+        return [dict((key, val) for key, val in six.iteritems(subscriber)
+                     if key != 'matcher')
+                for subscriber in six.itervalues(self.subscribers)]
+
     def close(self):
         '''
         Routines to handle any cleanup before the instance shuts down.
@@ -535,6 +619,7 @@ class IPCMessagePublisher(object):
         for stream in self.streams:
             stream.close()
         self.streams.clear()
+        self.subscribers.clear()
         if hasattr(self.sock, 'close'):
             self.sock.close()
 
@@ -582,6 +667,60 @@ class IPCMessageSubscriber(IPCClient):
         self._read_stream_future = None
         self._sync_ioloop_running = False
         self.saved_data = []
+        # owner -> the tags it subscribed to, the publisher is sent the tags
+        # of all of the owners sharing the subscriber
+        self._filters = weakref.WeakKeyDictionary()
+        self._sent_filter = None
+
+    def _filter(self):
+        '''
+        Return the tags all of the owners subscribed to, None if one of them
+        wants every message
+        '''
+        filters = list(self._filters.values())
+        if not filters:
+            return None
+        tags = set()
+        for owner_tags in filters:
+            if owner_tags is None:
+                return None
+            tags.update(owner_tags)
+        return sorted(tags)
+
+    @tornado.gen.coroutine
+    def _send_filter(self):
+        tags = self._filter()
+        if tags == self._sent_filter or not self.connected():
+            return
+        pack = salt.transport.frame.frame_msg_ipc(
+            None, header={'subscribe': tags}, raw_body=True)
+        yield self.stream.write(pack)
+        self._sent_filter = tags
+
+    @tornado.gen.coroutine
+    def set_filter(self, owner, tags=None):
+        '''
+        Subscribe the owner to the messages published with a tag matching one
+        of the glob patterns in tags, or to every message when tags is None.
+        The owners sharing the subscriber get the messages any of them
+        subscribed to.
+        '''
+        self._filters[owner] = None if tags is None else list(tags)
+        yield self._send_filter()
+
+    @tornado.gen.coroutine
+    def _connect(self, timeout=None):
+        '''
+        Connect to the publisher and send it the tags subscribed to
+        '''
+        # The publisher starts out sending every message on a new connection
+        self._sent_filter = None
+        yield super(IPCMessageSubscriber, self)._connect(timeout=timeout)
+        if self.connected():
+            try:
+                yield self._send_filter()
+            except tornado.iostream.StreamClosedError:
+                pass
 
     @tornado.gen.coroutine
     def _read_sync(self, timeout):
@@ -663,7 +802,7 @@ class IPCMessageSubscriber(IPCClient):
         return ret_future.result()
 
     @tornado.gen.coroutine
-    def _read_async(self, callback):
+    def _read_async(self, callback, batch=False):
         while not self.connected():
             try:
                 yield self.connect()
@@ -674,10 +813,17 @@ class IPCMessageSubscriber(IPCClient):
 
         while not self.stream.closed():
             try:
-                self._read_stream_future = self.stream.read_bytes(4096, partial=True)
+                self._read_stream_future = self.stream.read_bytes(
+                    65536 if batch else 4096, partial=True)
                 wire_bytes = yield self._read_stream_future
                 self._read_stream_future = None
                 self.unpacker.feed(wire_bytes)
+                if batch:
+                    bodies = [framed_msg['body']
+                              for framed_msg in self.unpacker]
+                    if bodies:
+                        self.io_loop.spawn_callback(callback, bodies)
+                    continue
                 for framed_msg in self.unpacker:
                     body = framed_msg['body']
                     self.io_loop.spawn_callback(callback, body)
@@ -687,13 +833,15 @@ class IPCMessageSubscriber(IPCClient):
             except Exception as exc:
                 log.error('Exception occurred while Subscriber handling stream: {0}'.format(exc))
 
-    def read_async(self, callback):
+    def read_async(self, callback, batch=False):
         '''
         Asynchronously read messages and invoke a callback when they are ready.
 
         :param callback: A callback with the received data
+        :param batch: Invoke the callback once with the list of the messages
+                      read at once, instead of once per message
         '''
-        self.io_loop.spawn_callback(self._read_async, callback)
+        self.io_loop.spawn_callback(self._read_async, callback, batch)
 
     def close(self):
         '''
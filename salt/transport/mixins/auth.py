@@ -8,6 +8,8 @@ import logging
 import os
 import hashlib
 import shutil
+import string
+import uuid
 import binascii
 
 # Import Salt Libs
@@ -15,7 +17,10 @@ import salt.crypt
 import salt.payload
 import salt.master
 import salt.transport.frame
+import salt.utils
 import salt.utils.event
+import salt.utils.verify
+import salt.exceptions
 import salt.ext.six as six
 from salt.utils.cache import CacheCli
 
@@ -52,6 +57,49 @@ class AESPubClientMixin(object):
         raise tornado.gen.Return(payload)
 
 
+class AESReqClientMixin(object):
+    '''
+    Mixin to send the loads of the minion-side AES request channels
+    '''
+    @tornado.gen.coroutine
+    def _send_load(self, load, send):
+        '''
+        Encrypt ``load`` and send it with the ``send`` coroutine, returns the
+        encrypted reply. Loads larger than ``req_chunk_size`` are streamed in
+        encrypted chunks of that size, which the master spools to disk and
+        puts back together.
+        '''
+        crypticle = self.auth.crypticle
+        chunk_size = self.opts.get('req_chunk_size', 0)
+        if not chunk_size:
+            ret = yield send(crypticle.dumps(load))
+            raise tornado.gen.Return(ret)
+        data = crypticle.serial.dumps(load)
+        if len(data) <= chunk_size:
+            ret = yield send(crypticle.dumps_serialized(data))
+            raise tornado.gen.Return(ret)
+        stream = uuid.uuid4().hex
+        for loc in range(0, len(data), chunk_size):
+            final = loc + chunk_size >= len(data)
+            ret = yield send(crypticle.dumps({'cmd': '_stream',
+                                              'id': self.opts['id'],
+                                              'stream': stream,
+                                              'loc': loc,
+                                              'data': data[loc:loc + chunk_size],
+                                              'final': final}))
+            if final:
+                break
+            if not ret or crypticle.loads(ret) is not True:
+                if loc == 0:
+                    log.debug('The master does not take streamed loads, '
+                              'sending the load whole')
+                    ret = yield send(crypticle.dumps_serialized(data))
+                    break
+                raise salt.exceptions.SaltClientError(
+                    'The master refused a chunk of a streamed load')
+        raise tornado.gen.Return(ret)
+
+
 # TODO: rename?
 class AESReqServerMixin(object):
     '''
@@ -144,6 +192,75 @@ class AESReqServerMixin(object):
                 payload['load'] = self.crypticle.loads(payload['load'])
         return payload
 
+    def _receive_stream(self, load):
+        '''
+        Spool a chunk of a load streamed by a minion to the master cachedir.
+        Returns the load once its last chunk was received, True while more
+        chunks are expected and False when the chunk is not valid.
+
+        The streams of a minion may not spool more than req_stream_max_size
+        megabytes in total, the streams minions gave up on are removed by
+        the maintenance process.
+        '''
+        if any(key not in load for key in ('id', 'stream', 'loc', 'data')):
+            return False
+        if not salt.utils.verify.valid_id(self.opts, load['id']):
+            return False
+        stream = str(load['stream'])
+        if not stream or any(char not in string.hexdigits for char in stream):
+            return False
+        if not isinstance(load['loc'], six.integer_types) or load['loc'] < 0:
+            return False
+        data = salt.utils.to_bytes(load['data'])
+        sdir = os.path.join(self.opts['cachedir'], 'streams', load['id'])
+        spath = os.path.join(sdir, stream)
+        max_size = 1024 * 1024 * self.opts.get('req_stream_max_size', 100)
+        try:
+            spooled = load['loc'] + len(data)
+            if os.path.isdir(sdir):
+                spooled += sum(os.path.getsize(os.path.join(sdir, name))
+                               for name in os.listdir(sdir) if name != stream)
+            if spooled > max_size:
+                log.error('The loads streamed by {0} exceed the '
+                          'req_stream_max_size limit: {1}'.format(load['id'],
+                                                                  max_size))
+                if os.path.isfile(spath):
+                    os.remove(spath)
+                return False
+            if load['loc'] == 0:
+                if not os.path.isdir(sdir):
+                    os.makedirs(sdir, 0o700)
+                mode = 'wb'
+            elif not os.path.isfile(spath) or \
+                    os.path.getsize(spath) < load['loc']:
+                log.error('Chunks of the load streamed by {0} are '
+                          'missing'.format(load['id']))
+                return False
+            else:
+                # A chunk sent again overwrites the one it replaces
+                mode = 'r+b'
+            with salt.utils.fopen(spath, mode) as fp_:
+                fp_.seek(load['loc'])
+                fp_.truncate()
+                fp_.write(data)
+            if not load.get('final'):
+                return True
+            # The load is read whole, streaming bounds the size of the
+            # messages, not the memory the master needs to handle the load
+            with salt.utils.fopen(spath, 'rb') as fp_:
+                ret = self.serial.load(fp_)
+            os.remove(spath)
+        except (IOError, OSError) as exc:
+            log.error('Unable to spool the load streamed by {0}: '
+                      '{1}'.format(load['id'], exc))
+            return False
+        except Exception as exc:
+            log.error('Bad load streamed by {0}: {1}'.format(load['id'], exc))
+            return False
+        if not isinstance(ret, dict) or ret.get('cmd') == '_stream':
+            return False
+        return ret
+
     def _auth(self, load):
         '''
         Authenticate the client, use the sent public key to encrypt the AES key
@@ -412,10 +529,18 @@ class AESReqServerMixin(object):
             return {'enc': 'clear',
                     'load': {'ret': False}}
 
+        if self.opts.get('aes_gcm', False) and not load.get('aes_gcm', False):
+            log.error('Authentication request from {0} rejected, the minion '
+                      'can not encrypt with AES-GCM'.format(load['id']))
+            return {'enc': 'clear',
+                    'load': {'ret': 'aes_gcm'}}
+
         cipher = PKCS1_OAEP.new(pub)
         ret = {'enc': 'pub',
                'pub_key': self.master_key.get_pub_str(),
                'publish_port': self.opts['publish_port']}
+        if self.opts.get('aes_gcm', False):
+            ret['aes_gcm'] = True
 
         # sign the masters pubkey (if enabled) before it is
         # send to the minion that was just authenticated
@@ -196,7 +196,8 @@ if USE_LOAD_BALANCER:
 
 
 # TODO: move serial down into message library
-class AsyncTCPReqChannel(salt.transport.client.ReqChannel):
+class AsyncTCPReqChannel(salt.transport.mixins.auth.AESReqClientMixin,
+                         salt.transport.client.ReqChannel):
     '''
     Encapsulate sending routines to tcp.
 
@@ -290,7 +291,8 @@ class AsyncTCPReqChannel(salt.transport.client.ReqChannel):
         key = self.auth.get_keys()
         cipher = PKCS1_OAEP.new(key)
         aes = cipher.decrypt(ret['key'])
-        pcrypt = salt.crypt.Crypticle(self.opts, aes)
+        pcrypt = salt.crypt.Crypticle(self.opts, aes,
+                                      aes_gcm=self.auth.crypticle.aes_gcm)
         data = pcrypt.loads(ret[dictkey])
         if six.PY3:
             data = salt.transport.frame.decode_embedded_strs(data)
@@ -304,11 +306,16 @@ class AsyncTCPReqChannel(salt.transport.client.ReqChannel):
         Indeed, we can fail too early in case of a master restart during a
         minion state execution call
         '''
+        @tornado.gen.coroutine
+        def _send(payload):
+            ret = yield self.message_client.send(self._package_load(payload),
+                                                 timeout=timeout,
+                                                 )
+            raise tornado.gen.Return(ret)
+
         @tornado.gen.coroutine
         def _do_transfer():
-            data = yield self.message_client.send(self._package_load(self.auth.crypticle.dumps(load)),
-                                                  timeout=timeout,
-                                                  )
+            data = yield self._send_load(load, _send)
             # we may not have always data
             # as for example for saltcall ret submission, this is a blind
             # communication, we do not subscribe to return events, we just
@@ -605,6 +612,15 @@ class TCPReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin, salt.tra
                 self._auth(payload['load']), header=header))
             raise tornado.gen.Return()
 
+        # put the loads streamed in chunks back together
+        if payload['enc'] == 'aes' and payload['load'].get('cmd') == '_stream':
+            load = self._receive_stream(payload['load'])
+            if not isinstance(load, dict):
+                yield stream.write(salt.transport.frame.frame_msg(
+                    self.crypticle.dumps(load), header=header))
+                raise tornado.gen.Return()
+            payload['load'] = load
+
         # TODO: test
         try:
             ret, req_opts = yield self.payload_handler(payload)
@@ -9,6 +9,7 @@ import os
 import copy
 import errno
 import signal
+import struct
 import hashlib
 import logging
 import weakref
@@ -49,8 +50,57 @@ from Crypto.Cipher import PKCS1_OAEP
 
 log = logging.getLogger(__name__)
 
+# The topic of the publishes which carry a bloom filter of their targets
+BLOOM_TOPIC = b'bloom'
+# The number of hash functions and of bits of a bloom filter
+BLOOM_HEADER = struct.Struct('>BI')
+BLOOM_HASHES = 7
+# About 1% of false positives, which are then dropped by the minion matcher
+BLOOM_BITS_PER_TARGET = 10
 
-class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
+
+def _bloom_positions(minion_id, hashes, bits):
+    '''
+    Return the bits of the bloom filter set for the minion id
+    '''
+    digest = hashlib.sha1(salt.utils.to_bytes(minion_id)).digest()
+    hash1, hash2 = struct.unpack('>II', digest[:8])
+    return [(hash1 + num * hash2) % bits for num in range(hashes)]
+
+
+def bloom_filter(minion_ids):
+    '''
+    Return a bloom filter of the minion ids, to be sent with a publish so
+    that the minions can tell whether they are targeted without the master
+    sending a copy of the publish to each of them
+    '''
+    bits = max(64, (len(minion_ids) * BLOOM_BITS_PER_TARGET + 7) // 8 * 8)
+    bitmap = bytearray(bits // 8)
+    for minion_id in minion_ids:
+        for pos in _bloom_positions(minion_id, BLOOM_HASHES, bits):
+            bitmap[pos >> 3] |= 1 << (pos & 7)
+    return BLOOM_HEADER.pack(BLOOM_HASHES, bits) + bytes(bitmap)
+
+
+def bloom_match(bloom, minion_id):
+    '''
+    Return whether the minion id may be in the bloom filter
+    '''
+    try:
+        hashes, bits = BLOOM_HEADER.unpack_from(bloom, 0)
+    except struct.error:
+        return False
+    bitmap = bytearray(bloom[BLOOM_HEADER.size:])
+    if not bits or len(bitmap) * 8 < bits:
+        return False
+    for pos in _bloom_positions(minion_id, hashes, bits):
+        if not bitmap[pos >> 3] & (1 << (pos & 7)):
+            return False
+    return True
+
+
+class AsyncZeroMQReqChannel(salt.transport.mixins.auth.AESReqClientMixin,
+                            salt.transport.client.ReqChannel):
     '''
     Encapsulate sending routines to ZeroMQ.
 
@@ -197,7 +247,8 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
                 tries=tries,
             )
         aes = cipher.decrypt(ret['key'])
-        pcrypt = salt.crypt.Crypticle(self.opts, aes)
+        pcrypt = salt.crypt.Crypticle(self.opts, aes,
+                                      aes_gcm=self.auth.crypticle.aes_gcm)
         data = pcrypt.loads(ret[dictkey])
         if six.PY3:
             data = salt.transport.frame.decode_embedded_strs(data)
@@ -219,13 +270,18 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
         :param int timeout: The number of seconds on a response before failing
         '''
         @tornado.gen.coroutine
-        def _do_transfer():
-            # Yield control to the caller. When send() completes, resume by populating data with the Future.result
-            data = yield self.message_client.send(
-                self._package_load(self.auth.crypticle.dumps(load)),
+        def _send(payload):
+            ret = yield self.message_client.send(
+                self._package_load(payload),
                 timeout=timeout,
                 tries=tries,
             )
+            raise tornado.gen.Return(ret)
+
+        @tornado.gen.coroutine
+        def _do_transfer():
+            # Yield control to the caller. When send() completes, resume by populating data with the Future.result
+            data = yield self._send_load(load, _send)
             # we may not have always data
             # as for example for saltcall ret submission, this is a blind
             # communication, we do not subscribe to return events, we just
@@ -304,6 +360,7 @@ class AsyncZeroMQPubChannel(salt.transport.mixins.auth.AESPubClientMixin, salt.t
         if self.opts['zmq_filtering']:
             # TODO: constants file for "broadcast"
             self._socket.setsockopt(zmq.SUBSCRIBE, b'broadcast')
+            self._socket.setsockopt(zmq.SUBSCRIBE, BLOOM_TOPIC)
             self._socket.setsockopt(zmq.SUBSCRIBE, self.hexid)
         else:
             self._socket.setsockopt(zmq.SUBSCRIBE, b'')
@@ -407,6 +464,12 @@ class AsyncZeroMQPubChannel(salt.transport.mixins.auth.AESPubClientMixin, salt.t
                 log.debug('Publish received for not this minion: {0}'.format(messages[0]))
                 raise tornado.gen.Return(None)
             payload = self.serial.loads(messages[1])
+        # 3 includes a bloom filter of the targeted minions
+        elif messages_len == 3 and messages[0] == BLOOM_TOPIC:
+            if not bloom_match(messages[1], self.opts['id']):
+                log.trace('Publish received for not this minion')
+                raise tornado.gen.Return(None)
+            payload = self.serial.loads(messages[2])
         else:
             raise Exception(('Invalid number of messages ({0}) in zeromq pub'
                              'message from master').format(len(messages_len)))
@@ -593,6 +656,14 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin, salt.
             stream.send(self.serial.dumps(self._auth(payload['load'])))
             raise tornado.gen.Return()
 
+        # put the loads streamed in chunks back together
+        if payload['enc'] == 'aes' and payload['load'].get('cmd') == '_stream':
+            load = self._receive_stream(payload['load'])
+            if not isinstance(load, dict):
+                stream.send(self.serial.dumps(self.crypticle.dumps(load)))
+                raise tornado.gen.Return()
+            payload['load'] = load
+
         # TODO: test
         try:
             # Take the payload_handler function that was registered when we created the channel
@@ -694,32 +765,23 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
         finally:
             os.umask(old_umask)
 
+        batch_size = max(1, self.opts.get('zmq_publish_batch', 1))
         try:
             while True:
                 # Catch and handle EINTR from when this process is sent
                 # SIGUSR1 gracefully so we don't choke and die horribly
                 try:
-                    package = pull_sock.recv()
-                    unpacked_package = salt.payload.unpackage(package)
-                    if six.PY3:
-                        unpacked_package = salt.transport.frame.decode_embedded_strs(unpacked_package)
-                    payload = unpacked_package['payload']
-                    if self.opts['zmq_filtering']:
-                        # if you have a specific topic list, use that
-                        if 'topic_lst' in unpacked_package:
-                            for topic in unpacked_package['topic_lst']:
-                                # zmq filters are substring match, hash the topic
-                                # to avoid collisions
-                                htopic = hashlib.sha1(topic).hexdigest()
-                                pub_sock.send(htopic, flags=zmq.SNDMORE)
-                                pub_sock.send(payload)
-                                # otherwise its a broadcast
-                        else:
-                            # TODO: constants file for "broadcast"
-                            pub_sock.send('broadcast', flags=zmq.SNDMORE)
-                            pub_sock.send(payload)
-                    else:
-                        pub_sock.send(payload)
+                    packages = [pull_sock.recv()]
+                    # Drain the publishes which are already queued
+                    while len(packages) < batch_size:
+                        try:
+                            packages.append(pull_sock.recv(zmq.NOBLOCK))
+                        except zmq.ZMQError as exc:
+                            if exc.errno == zmq.EAGAIN:
+                                break
+                            raise
+                    for package in packages:
+                        self._publish_package(pub_sock, package)
                 except zmq.ZMQError as exc:
                     if exc.errno == errno.EINTR:
                         continue
@@ -736,6 +798,38 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
             if context.closed is False:
                 context.term()
 
+    def _publish_package(self, pub_sock, package):
+        '''
+        Send a package received from the pull socket to the minions
+        '''
+        unpacked_package = salt.payload.unpackage(package)
+        if six.PY3:
+            unpacked_package = salt.transport.frame.decode_embedded_strs(unpacked_package)
+        payload = unpacked_package['payload']
+        if self.opts['zmq_filtering']:
+            # if you have a specific topic list, use that
+            if 'topic_lst' in unpacked_package:
+                topic_lst = unpacked_package['topic_lst']
+                if self.opts.get('zmq_filtering_bloom') and len(topic_lst) > 1:
+                    # send the payload once, the minions check whether they
+                    # are in the bloom filter
+                    pub_sock.send_multipart(
+                        [BLOOM_TOPIC, bloom_filter(topic_lst), payload])
+                    return
+                for topic in topic_lst:
+                    # zmq filters are substring match, hash the topic
+                    # to avoid collisions
+                    htopic = hashlib.sha1(topic).hexdigest()
+                    pub_sock.send(htopic, flags=zmq.SNDMORE)
+                    pub_sock.send(payload)
+                    # otherwise its a broadcast
+            else:
+                # TODO: constants file for "broadcast"
+                pub_sock.send('broadcast', flags=zmq.SNDMORE)
+                pub_sock.send(payload)
+        else:
+            pub_sock.send(payload)
+
     def pre_fork(self, process_manager):
         '''
         Do anything necessary pre-fork. Since this is on the master side this will
@@ -199,3 +199,53 @@ class NamespacedDictWrapper(collections.MutableMapping, dict):
     def __deepcopy__(self, memo):
         return type(self)(copy.deepcopy(self.__dict, memo),
                           copy.deepcopy(self.pre_keys, memo))
+
+
+class TrackedDict(dict):
+    '''
+    A dict which remembers which of its keys were read, used to find out
+    which grains or options a result depends on
+    '''
+    def __init__(self, *args, **kwargs):
+        super(TrackedDict, self).__init__(*args, **kwargs)
+        # The keys read, None once all of them were
+        self.read = set()
+
+    def _track(self, key):
+        if self.read is not None:
+            self.read.add(key)
+
+    def __getitem__(self, key):
+        self._track(key)
+        return super(TrackedDict, self).__getitem__(key)
+
+    def __contains__(self, key):
+        self._track(key)
+        return super(TrackedDict, self).__contains__(key)
+
+    def get(self, key, default=None):
+        self._track(key)
+        return super(TrackedDict, self).get(key, default)
+
+    def has_key(self, key):
+        return key in self
+
+
+def _reads_all_keys(name):
+    '''
+    Wrap a dict method which reads every key
+    '''
+    method = getattr(dict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.read = None
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+for _name in ('__iter__', '__len__', '__eq__', '__ne__', '__repr__', 'copy',
+              'keys', 'values', 'items', 'iterkeys', 'itervalues',
+              'iteritems', 'viewkeys', 'viewvalues', 'viewitems'):
+    if hasattr(dict, _name):
+        setattr(TrackedDict, _name, _reads_all_keys(_name))
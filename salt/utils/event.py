@@ -55,17 +55,20 @@ from __future__ import absolute_import
 # Import python libs
 import os
 import time
+import struct
 import fnmatch
 import hashlib
 import logging
 import datetime
-from collections import MutableMapping
+import threading
+from collections import MutableMapping, deque
 from multiprocessing.util import Finalize
 
 # Import third party libs
 import salt.ext.six as six
 import tornado.ioloop
 import tornado.iostream
+from tornado.ioloop import PeriodicCallback
 
 # Import salt libs
 import salt.config
@@ -74,8 +77,10 @@ import salt.loader
 import salt.utils
 import salt.utils.async
 import salt.utils.cache
+import salt.utils.atomicfile
 import salt.utils.dicttrim
 import salt.utils.process
+import salt.utils.tagmatch
 import salt.utils.zeromq
 import salt.log.setup
 import salt.defaults.exitcodes
@@ -110,6 +115,28 @@ TAGS = {
 }
 
 
+def packed_tag(raw):
+    '''
+    Return the tag of a packed event without unpacking its data
+    '''
+    if six.PY2:
+        return raw.partition(TAGEND)[0]
+    return salt.utils.to_str(raw.partition(salt.utils.to_bytes(TAGEND))[0])
+
+
+def _pack_event(tag, data):
+    '''
+    Pack an event published by the event publisher itself
+    '''
+    serial = salt.payload.Serial({'serial': 'msgpack'})
+    data['_stamp'] = datetime.datetime.utcnow().isoformat()
+    if six.PY2:
+        return '{0}{1}{2}'.format(tag, TAGEND, serial.dumps(data))
+    return b''.join([salt.utils.to_bytes(tag),
+                     salt.utils.to_bytes(TAGEND),
+                     serial.dumps(data, use_bin_type=True)])
+
+
 def get_event(
         node, sock_dir=None, transport='zeromq',
         opts=None, listen=True, io_loop=None):
@@ -195,6 +222,8 @@ class SaltEvent(object):
         self.cpush = False
         self.subscriber = None
         self.pusher = None
+        # The glob patterns of the tags the publisher sends, None for all
+        self.tag_filter = None
 
         if opts is None:
             opts = {}
@@ -325,6 +354,8 @@ class SaltEvent(object):
                 try:
                     self.io_loop.run_sync(
                         lambda: self.subscriber.connect(timeout=timeout))
+                    self.io_loop.run_sync(
+                        lambda: self.subscriber.set_filter(self, self.tag_filter))
                     self.cpub = True
                 except Exception:
                     pass
@@ -336,10 +367,35 @@ class SaltEvent(object):
             )
 
             # For the async case, the connect will be defered to when
-            # set_event_handler() is invoked.
+            # set_event_handler() is invoked, which sends the filter.
+            self.subscriber.set_filter(self, self.tag_filter)
             self.cpub = True
         return self.cpub
 
+    def set_filter(self, tags=None):
+        '''
+        Only have the publisher send the events with a tag matching one of the
+        glob patterns in tags, or every event when tags is None.
+
+        This saves unpacking the events nothing here waits for, get_event
+        still matches the tags of the events it returns. The SaltEvents
+        sharing an IO loop share the connection to the publisher and get the
+        events any of them subscribed to.
+        '''
+        self.tag_filter = None if tags is None else sorted(set(tags))
+        if not self.cpub or self.subscriber is None:
+            return
+        if self._run_io_loop_sync:
+            with salt.utils.async.current_ioloop(self.io_loop):
+                try:
+                    self.io_loop.run_sync(
+                        lambda: self.subscriber.set_filter(self, self.tag_filter))
+                except Exception as exc:
+                    log.debug('Failed to send the event filter: {0}'.format(exc))
+        else:
+            self.io_loop.spawn_callback(
+                self.subscriber.set_filter, self, self.tag_filter)
+
     def connect_pull(self, timeout=1):
         '''
         Establish a connection with the event pull socket
@@ -744,16 +800,18 @@ class SaltEvent(object):
                 except Exception:
                     pass
 
-    def set_event_handler(self, event_handler):
+    def set_event_handler(self, event_handler, batch=False):
         '''
-        Invoke the event_handler callback each time an event arrives.
+        Invoke the event_handler callback each time an event arrives. With
+        batch the callback is invoked with the list of the raw events read at
+        once.
         '''
         assert not self._run_io_loop_sync
 
         if not self.cpub:
             self.connect_pub()
         # This will handle reconnects
-        self.subscriber.read_async(event_handler)
+        self.subscriber.read_async(event_handler, batch=batch)
 
     def __del__(self):
         # skip exceptions in destroy-- since destroy() doesn't cover interpreter
@@ -884,7 +942,8 @@ class AsyncEventPublisher(object):
 
         self.publisher = salt.transport.ipc.IPCMessagePublisher(
             epub_uri,
-            io_loop=self.io_loop
+            io_loop=self.io_loop,
+            hwm=self.opts['event_subscriber_hwm']
         )
 
         self.puller = salt.transport.ipc.IPCMessageServer(
@@ -901,12 +960,28 @@ class AsyncEventPublisher(object):
         finally:
             os.umask(old_umask)
 
+        if self.opts['event_publisher_stats_interval']:
+            PeriodicCallback(
+                self.publish_stats,
+                self.opts['event_publisher_stats_interval'] * 1000,
+                io_loop=self.io_loop
+            ).start()
+
+    def publish_stats(self):
+        '''
+        Publish the filter, queue size and counters of each subscriber
+        '''
+        tag = 'salt/event/publisher/stats'
+        self.publisher.publish(
+            _pack_event(tag, {'subscribers': self.publisher.stats()}),
+            tag=tag)
+
     def handle_publish(self, package, _):
         '''
         Get something from epull, publish it out epub, and return the package (or None)
         '''
         try:
-            self.publisher.publish(package)
+            self.publisher.publish(package, tag=packed_tag(package))
             return package
         # Add an extra fallback in case a forked process leeks through
         except Exception:
@@ -971,7 +1046,8 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
 
             self.publisher = salt.transport.ipc.IPCMessagePublisher(
                 epub_uri,
-                io_loop=self.io_loop
+                io_loop=self.io_loop,
+                hwm=self.opts['event_subscriber_hwm']
             )
 
             self.puller = salt.transport.ipc.IPCMessageServer(
@@ -1002,18 +1078,34 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
             finally:
                 os.umask(old_umask)
 
+            if self.opts['event_publisher_stats_interval']:
+                PeriodicCallback(
+                    self.publish_stats,
+                    self.opts['event_publisher_stats_interval'] * 1000,
+                    io_loop=self.io_loop
+                ).start()
+
             # Make sure the IO loop and respective sockets are closed and
             # destroyed
             Finalize(self, self.close, exitpriority=15)
 
             self.io_loop.start()
 
+    def publish_stats(self):
+        '''
+        Publish the filter, queue size and counters of each subscriber
+        '''
+        tag = 'salt/event/publisher/stats'
+        self.publisher.publish(
+            _pack_event(tag, {'subscribers': self.publisher.stats()}),
+            tag=tag)
+
     def handle_publish(self, package, _):
         '''
         Get something from epull, publish it out epub, and return the package (or None)
         '''
         try:
-            self.publisher.publish(package)
+            self.publisher.publish(package, tag=packed_tag(package))
             return package
         # Add an extra fallback in case a forked process leeks through
         except Exception:
@@ -1036,10 +1128,296 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self.close()
 
 
+class SpillQueue(object):
+    '''
+    A FIFO queue holding up to size items in memory. The items put while it
+    is full are appended to a file at path and read back once the memory
+    drains, the items left in the file are found again by the next queue
+    using the same path.
+    '''
+    def __init__(self, path, size):
+        self.path = path
+        self.size = max(size, 1)
+        self.serial = salt.payload.Serial('msgpack')
+        self.memory = deque()
+        # The items in the file which were not read back yet, and where the
+        # first of them starts
+        self.spilled = 0
+        self._offset = 0
+        self._writer = None
+        if os.path.isfile(self.path):
+            with salt.utils.fopen(self.path, 'rb') as fp_:
+                while self._read(fp_) is not None:
+                    self.spilled += 1
+            if not self.spilled:
+                os.remove(self.path)
+
+    def __len__(self):
+        return len(self.memory) + self.spilled
+
+    def _read(self, fp_):
+        '''
+        Read the next item of the file, None at its end or at an item cut
+        short by a crash
+        '''
+        head = fp_.read(4)
+        if len(head) < 4:
+            return None
+        length = struct.unpack('>I', head)[0]
+        body = fp_.read(length)
+        if len(body) < length:
+            return None
+        return self.serial.loads(body)
+
+    def put(self, item):
+        '''
+        Add an item, return True if it was spilled to the file
+        '''
+        if not self.spilled and len(self.memory) < self.size:
+            self.memory.append(item)
+            return False
+        if self._writer is None:
+            self._writer = salt.utils.fopen(self.path, 'ab')
+        body = self.serial.dumps(item)
+        self._writer.write(struct.pack('>I', len(body)) + body)
+        self._writer.flush()
+        self.spilled += 1
+        return True
+
+    def _refill(self):
+        '''
+        Read the spilled items back until the memory is full
+        '''
+        with salt.utils.fopen(self.path, 'rb') as fp_:
+            fp_.seek(self._offset)
+            while self.spilled and len(self.memory) < self.size:
+                item = self._read(fp_)
+                if item is None:
+                    self.spilled = 0
+                    break
+                self.memory.append(item)
+                self.spilled -= 1
+            self._offset = fp_.tell()
+        if not self.spilled:
+            self._close_file()
+            os.remove(self.path)
+
+    def _close_file(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._offset = 0
+
+    def head(self, count):
+        '''
+        Return the first count items without removing them
+        '''
+        if len(self.memory) < count and self.spilled:
+            self._refill()
+        return [self.memory[index]
+                for index in range(min(count, len(self.memory)))]
+
+    def drop(self, count):
+        '''
+        Remove the first count items
+        '''
+        for _ in range(min(count, len(self.memory))):
+            self.memory.popleft()
+
+    def persist(self):
+        '''
+        Move the items held in memory to the front of the file so that they
+        survive a restart
+        '''
+        if not self.memory and not self._offset:
+            return
+        if self._writer is not None:
+            self._writer.flush()
+        count = len(self)
+        with salt.utils.atomicfile.atomic_open(self.path, 'wb') as fp_:
+            for item in self.memory:
+                body = self.serial.dumps(item)
+                fp_.write(struct.pack('>I', len(body)) + body)
+            if self.spilled:
+                with salt.utils.fopen(self.path, 'rb') as spill:
+                    spill.seek(self._offset)
+                    for chunk in iter(lambda: spill.read(65536), b''):
+                        fp_.write(chunk)
+        self._close_file()
+        self.memory.clear()
+        self.spilled = count
+
+
+class ReturnerPipeline(object):
+    '''
+    Store events with the event_return function of a returner on a thread
+    of its own, in batches of batch_size events or of the events queued for
+    max_seconds. A batch the returner fails to store is tried again after a
+    backoff doubling from backoff[0] to backoff[1] seconds, and dropped
+    after retries more failures unless retries is negative. Meanwhile the
+    events keep being queued, spilling to path past buffer_size events.
+    '''
+    def __init__(self, name, func, path, batch_size=1, max_seconds=0,
+                 buffer_size=10000, retries=5, backoff=(1, 60)):
+        self.name = name
+        self.func = func
+        self.batch_size = max(batch_size, 1)
+        self.max_seconds = max_seconds
+        self.retries = retries
+        self.backoff = backoff
+        # Events are queued with the time they were put
+        self.queue = SpillQueue(path, buffer_size)
+        self.cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._stats = {}
+        self._reset_stats(time.time())
+
+    def _reset_stats(self, now):
+        self._stats.update({'stored': 0, 'batches': 0, 'failures': 0,
+                            'spilled': 0, 'dropped': 0, 'lag_max': 0.0,
+                            'start': now})
+
+    def start(self):
+        '''
+        Start storing the queued events
+        '''
+        self._thread = threading.Thread(
+            target=self._run,
+            name='EventReturn-{0}'.format(self.name))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        '''
+        Store the queued events once more and stop, the events which could
+        not be stored are left in the spill file
+        '''
+        with self.cond:
+            self._stopping = True
+            self.cond.notify_all()
+
+    def join(self, timeout=None):
+        '''
+        Wait for the pipeline to stop, leave the queued events in the spill
+        file if the returner still has not returned after timeout seconds
+        '''
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                return
+        with self.cond:
+            self.queue.persist()
+
+    def put(self, event):
+        '''
+        Queue an event to store
+        '''
+        with self.cond:
+            if self.queue.put([time.time(), event]):
+                self._stats['spilled'] += 1
+            if len(self.queue) in (1, self.batch_size):
+                self.cond.notify()
+
+    def stats(self):
+        '''
+        Return the queue sizes and the counters of the pipeline and start
+        counting again. The lag is how long the oldest queued event waits.
+        '''
+        now = time.time()
+        with self.cond:
+            ret = dict((key, val) for key, val in six.iteritems(self._stats)
+                       if key != 'start')
+            ret['events_per_sec'] = (
+                self._stats['stored'] / max(now - self._stats['start'], 1e-6))
+            ret['queued'] = len(self.queue.memory)
+            ret['queued_on_disk'] = self.queue.spilled
+            head = self.queue.head(1)
+            ret['lag'] = now - head[0][0] if head else 0.0
+            self._reset_stats(now)
+        return ret
+
+    def _next_batch(self):
+        '''
+        Wait until a batch is due and return it, an empty batch once
+        stopping with nothing queued
+        '''
+        with self.cond:
+            while True:
+                if self.queue and (self._stopping or
+                                   len(self.queue) >= self.batch_size):
+                    break
+                if self._stopping:
+                    return []
+                timeout = None
+                if self.max_seconds and self.queue:
+                    timeout = (self.queue.head(1)[0][0] + self.max_seconds -
+                               time.time())
+                    if timeout <= 0:
+                        break
+                self.cond.wait(timeout)
+            return self.queue.head(self.batch_size)
+
+    def _store(self, batch):
+        '''
+        Store a batch, return False if it is to be kept for later
+        '''
+        failures = 0
+        while True:
+            try:
+                self.func([event for _, event in batch])
+            except Exception as exc:
+                failures += 1
+                with self.cond:
+                    self._stats['failures'] += 1
+                    if self._stopping:
+                        log.error('Could not store events - returner \'{0}\' '
+                                  'raised exception: {1}'.format(self.name,
+                                                                 exc))
+                        return False
+                    if 0 <= self.retries < failures:
+                        log.error('Dropping {0} events - returner \'{1}\' '
+                                  'raised exception: {2}'.format(
+                                      len(batch), self.name, exc))
+                        # don't waste processing power unnecessarily on
+                        # converting a potentially huge dataset to a string
+                        if log.level <= logging.DEBUG:
+                            log.debug('Event data that caused an exception: '
+                                      '{0}'.format(batch))
+                        self.queue.drop(len(batch))
+                        self._stats['dropped'] += len(batch)
+                        return True
+                    delay = min(self.backoff[0] * 2 ** (failures - 1),
+                                self.backoff[1])
+                    log.warning('Could not store events - returner \'{0}\' '
+                                'raised exception: {1}, trying again in {2}s'
+                                .format(self.name, exc, delay))
+                    deadline = time.time() + delay
+                    while not self._stopping and time.time() < deadline:
+                        self.cond.wait(deadline - time.time())
+                continue
+            now = time.time()
+            with self.cond:
+                self.queue.drop(len(batch))
+                self._stats['stored'] += len(batch)
+                self._stats['batches'] += 1
+                self._stats['lag_max'] = max(self._stats['lag_max'],
+                                             now - batch[0][0])
+            return True
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch or not self._store(batch):
+                break
+        with self.cond:
+            self.queue.persist()
+
+
 class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
     '''
     A dedicated process which listens to the master event bus and queues
-    and forwards events to the specified returner.
+    and forwards events to the specified returners.
     '''
     def __init__(self, opts, log_queue=None):
         '''
@@ -1054,7 +1432,11 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
         local_minion_opts = self.opts.copy()
         local_minion_opts['file_client'] = 'local'
         self.minion = salt.minion.MasterMinion(local_minion_opts)
-        self.event_queue = []
+        self.whitelist = salt.utils.tagmatch.TagMatcher(
+            (tag, True) for tag in self.opts['event_return_whitelist'])
+        self.blacklist = salt.utils.tagmatch.TagMatcher(
+            (tag, True) for tag in self.opts['event_return_blacklist'])
+        self.pipelines = []
         self.stop = False
 
     # __setstate__ and __getstate__ are only used on Windows.
@@ -1070,30 +1452,54 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
 
     def _handle_signals(self, signum, sigframe):
         # Flush and terminate
-        if self.event_queue:
-            self.flush_events()
         self.stop = True
+        self.stop_pipelines()
         super(EventReturn, self)._handle_signals(signum, sigframe)
 
-    def flush_events(self):
-        event_return = '{0}.event_return'.format(
-            self.opts['event_return']
-        )
-        if event_return in self.minion.returners:
-            try:
-                self.minion.returners[event_return](self.event_queue)
-            except Exception as exc:
-                log.error('Could not store events - returner \'{0}\' raised '
-                    'exception: {1}'.format(self.opts['event_return'], exc))
-                # don't waste processing power unnecessarily on converting a
-                # potentially huge dataset to a string
-                if log.level <= logging.DEBUG:
-                    log.debug('Event data that caused an exception: {0}'.format(
-                        self.event_queue))
-            del self.event_queue[:]
-        else:
-            log.error('Could not store return for event(s) - returner '
-                      '\'%s\' not found.', self.opts['event_return'])
+    def start_pipelines(self):
+        '''
+        Start a pipeline for each of the returners
+        '''
+        names = self.opts['event_return']
+        if isinstance(names, six.string_types):
+            names = [names]
+        spill_dir = os.path.join(self.opts['cachedir'], 'event_return')
+        if not os.path.isdir(spill_dir):
+            os.makedirs(spill_dir)
+        for name in names:
+            event_return = '{0}.event_return'.format(name)
+            # Load the returners here, the loader is not thread safe
+            if event_return not in self.minion.returners:
+                log.error('Could not store return for event(s) - returner '
+                          '\'%s\' not found.', name)
+                continue
+            pipeline = ReturnerPipeline(
+                name,
+                self.minion.returners[event_return],
+                os.path.join(spill_dir, '{0}.queue'.format(name)),
+                batch_size=self.event_return_queue,
+                max_seconds=self.opts['event_return_queue_max_seconds'],
+                buffer_size=self.opts['event_return_buffer'],
+                retries=self.opts['event_return_retries'])
+            pipeline.start()
+            self.pipelines.append(pipeline)
+
+    def stop_pipelines(self, timeout=10):
+        '''
+        Store what the pipelines have queued and stop them
+        '''
+        pipelines, self.pipelines = self.pipelines, []
+        for pipeline in pipelines:
+            pipeline.stop()
+        for pipeline in pipelines:
+            pipeline.join(timeout)
+
+    def stats_event(self):
+        '''
+        Return the data of the event return stats event
+        '''
+        return {'returners': dict((pipeline.name, pipeline.stats())
+                                  for pipeline in self.pipelines)}
 
     def run(self):
         '''
@@ -1101,21 +1507,31 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
         '''
         salt.utils.appendproctitle(self.__class__.__name__)
         self.event = get_event('master', opts=self.opts, listen=True)
-        events = self.event.iter_events(full=True)
+        if self.opts['event_return_whitelist']:
+            # Have the publisher send only the events to store
+            self.event.set_filter(
+                self.opts['event_return_whitelist'] + ['salt/event/exit'])
+        self.start_pipelines()
         self.event.fire_event({}, 'salt/event_listen/start')
+        stats_interval = self.opts['event_return_stats_interval']
+        next_stats = time.time() + stats_interval
         try:
-            for event in events:
+            while not self.stop:
+                event = self.event.get_event(wait=1 if stats_interval else 5,
+                                             full=True)
+                if stats_interval and time.time() >= next_stats:
+                    next_stats = time.time() + stats_interval
+                    self.event.fire_event(self.stats_event(),
+                                          'salt/event_return/stats')
+                if event is None:
+                    continue
                 if event['tag'] == 'salt/event/exit':
                     self.stop = True
                 if self._filter(event):
-                    self.event_queue.append(event)
-                if len(self.event_queue) >= self.event_return_queue:
-                    self.flush_events()
-                if self.stop:
-                    break
+                    for pipeline in self.pipelines:
+                        pipeline.put(event)
         finally:  # flush all we have at this moment
-            if self.event_queue:
-                self.flush_events()
+            self.stop_pipelines()
 
     def _filter(self, event):
         '''
@@ -1124,14 +1540,10 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
         Returns True if event should be stored, else False
         '''
         tag = event['tag']
-        if tag in self.opts['event_return_whitelist']:
-            if tag not in self.opts['event_return_blacklist']:
-                return True
-            else:
-                return False  # Event was whitelisted and blacklisted
-        elif tag in self.opts['event_return_blacklist']:
+        if self.opts['event_return_whitelist'] and \
+                not self.whitelist.match(tag):
             return False
-        return True
+        return not self.blacklist.match(tag)
 
 
 class StateFire(object):
@@ -5,15 +5,18 @@ Jinja loading utils to enable a more powerful backend for jinja templates
 
 # Import python libs
 from __future__ import absolute_import
+import os
 import json
 import pprint
 import logging
+import threading
 from os import path
 from functools import wraps
 
 # Import third party libs
 import salt.ext.six as six
-from jinja2 import BaseLoader, Markup, TemplateNotFound, nodes
+from jinja2 import BaseLoader, BytecodeCache, Markup, TemplateNotFound, nodes
+from jinja2.bccache import Bucket
 from jinja2.environment import TemplateModule
 from jinja2.ext import Extension
 from jinja2.exceptions import TemplateRuntimeError
@@ -24,16 +27,25 @@ import yaml
 import salt
 import salt.utils
 import salt.utils.url
+import salt.utils.atomicfile
 import salt.fileclient
 from salt.utils.odict import OrderedDict
 
 log = logging.getLogger(__name__)
 
 __all__ = [
+    'SaltBytecodeCache',
     'SaltCacheLoader',
     'SerializerExtension'
 ]
 
+# The code of the templates compiled in this process, keyed by the cache key
+# of their bucket, least recently used first
+_BYTECODE = OrderedDict()
+# Templates are rendered by the threads of minion jobs and of ext_pillar
+# fetches, which all share the cache
+_BYTECODE_LOCK = threading.Lock()
+
 
 # To dump OrderedDict objects as regular dicts. Used by the yaml
 # template filter.
@@ -54,6 +66,11 @@ class SaltCacheLoader(BaseLoader):
     Templates are cached like regular salt states
     and only loaded once per loader instance.
     '''
+    # While this is set to a set the (saltenv, url) of every template loaded
+    # is added to it, this tells when compiled highstate or pillar data is out
+    # of date
+    loaded = None
+
     def __init__(self, opts, saltenv='base', encoding='utf-8',
                  pillar_rend=False):
         self.opts = opts
@@ -91,6 +108,9 @@ class SaltCacheLoader(BaseLoader):
         if template not in self.cached:
             self.cache_file(template)
             self.cached.append(template)
+        if SaltCacheLoader.loaded is not None:
+            SaltCacheLoader.loaded.add(
+                (self.saltenv, salt.utils.url.create(template)))
 
     def get_source(self, environment, template):
         # checks for relative '..' paths
@@ -135,6 +155,109 @@ class SaltCacheLoader(BaseLoader):
         raise TemplateNotFound(template)
 
 
+class SaltBytecodeCache(BytecodeCache):
+    '''
+    A Jinja bytecode cache which keeps the code compiled templates were
+    compiled to in memory and in the cachedir, templates are then only
+    compiled again when their source changes.
+
+    The cache is shared by every environment in the process, the options
+    which change the code a template compiles to are part of the cache key.
+    '''
+    def __init__(self, opts):
+        self.directory = path.join(opts['cachedir'], 'jinja')
+        self.size = opts.get('jinja_bytecode_cache_size', 1000)
+
+    def get_bucket(self, environment, name, filename, source):
+        signature = (environment.trim_blocks,
+                     getattr(environment, 'lstrip_blocks', False),
+                     getattr(environment, 'keep_trailing_newline', False),
+                     sorted(environment.extensions))
+        key = self.get_cache_key(
+            u'{0}|{1!r}'.format(name, signature), filename)
+        bucket = Bucket(environment, key, self.get_source_checksum(source))
+        self.load_bytecode(bucket)
+        return bucket
+
+    def _path(self, key):
+        return path.join(self.directory, '{0}.cache'.format(key))
+
+    def _remember(self, bucket):
+        with _BYTECODE_LOCK:
+            _BYTECODE.pop(bucket.key, None)
+            _BYTECODE[bucket.key] = (bucket.checksum, bucket.code)
+            while len(_BYTECODE) > self.size:
+                _BYTECODE.popitem(last=False)
+
+    def load_bytecode(self, bucket):
+        with _BYTECODE_LOCK:
+            entry = _BYTECODE.pop(bucket.key, None)
+            if entry is not None:
+                # Most recently used
+                _BYTECODE[bucket.key] = entry
+        if entry is not None and entry[0] == bucket.checksum:
+            bucket.code = entry[1]
+            return
+        try:
+            with salt.utils.fopen(self._path(bucket.key), 'rb') as fp_:
+                bucket.load_bytecode(fp_)
+        except (IOError, OSError):
+            return
+        if bucket.code is not None:
+            self._remember(bucket)
+
+    def dump_bytecode(self, bucket):
+        self._remember(bucket)
+        try:
+            if not path.isdir(self.directory):
+                os.makedirs(self.directory, 0o700)
+            with salt.utils.atomicfile.atomic_open(
+                    self._path(bucket.key), 'wb') as fp_:
+                bucket.write_bytecode(fp_)
+            self._prune()
+        except (IOError, OSError) as exc:
+            log.debug('Unable to write Jinja bytecode to {0}: {1}'.format(
+                self.directory, exc))
+
+    def _prune(self):
+        '''
+        Remove the oldest files once there are more than the size of the
+        cache
+        '''
+        names = os.listdir(self.directory)
+        if len(names) <= self.size:
+            return
+        paths = [path.join(self.directory, name) for name in names]
+        paths.sort(key=path.getmtime)
+        for name in paths[:len(paths) - self.size]:
+            os.remove(name)
+
+    def clear(self):
+        with _BYTECODE_LOCK:
+            _BYTECODE.clear()
+        if path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                os.remove(path.join(self.directory, name))
+
+
+def compile_string(environment, source):
+    '''
+    Return the template for ``source``, it is only compiled when the bytecode
+    cache of the environment does not have its code yet
+    '''
+    cache = environment.bytecode_cache
+    if cache is None:
+        return environment.from_string(source)
+    # Templates from strings have no name, they are stored by their source
+    bucket = cache.get_bucket(
+        environment, cache.get_source_checksum(source), None, source)
+    if bucket.code is None:
+        bucket.code = environment.compile(source)
+        cache.set_bucket(bucket)
+    return environment.template_class.from_code(
+        environment, bucket.code, environment.make_globals(None))
+
+
 class PrintableDict(OrderedDict):
     '''
     Ensures that dict str() and repr() are YAML friendly.
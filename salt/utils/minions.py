@@ -7,11 +7,14 @@ expected to return
 # Import python libs
 from __future__ import absolute_import
 import os
+import bisect
 import fnmatch
 import re
+import time
 import logging
 
 # Import salt libs
+import salt.cache
 import salt.payload
 import salt.utils
 from salt.defaults import DEFAULT_TARGET_DELIM
@@ -31,6 +34,11 @@ try:
     HAS_RANGE = True
 except ImportError:
     pass
+try:
+    import pyinotify
+    HAS_PYINOTIFY = True
+except ImportError:
+    HAS_PYINOTIFY = False
 
 log = logging.getLogger(__name__)
 
@@ -70,30 +78,22 @@ def get_minion_data(minion, opts):
     Return value is a tuple of the minion ID, grains, and pillar
     '''
     if opts.get('minion_data_cache', False):
-        serial = salt.payload.Serial(opts)
-        cdir = os.path.join(opts['cachedir'], 'minions')
-        if not os.path.isdir(cdir):
+        cache = salt.cache.factory(opts)
+        if not cache.contains('minions'):
             return minion if minion else None, None, None
-        minions = os.listdir(cdir)
         if minion is None:
             # If no minion specified, take first one with valid grains
-            for id_ in minions:
-                datap = os.path.join(cdir, id_, 'data.p')
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        miniondata = serial.load(fp_)
-                except (IOError, OSError):
+            for id_ in cache.list('minions'):
+                miniondata = cache.fetch('minions/{0}'.format(id_), 'data')
+                if miniondata is None:
                     continue
                 grains = miniondata.get('grains')
                 pillar = miniondata.get('pillar')
                 return id_, grains, pillar
         else:
             # Search for specific minion
-            datap = os.path.join(cdir, minion, 'data.p')
-            try:
-                with salt.utils.fopen(datap, 'rb') as fp_:
-                    miniondata = serial.load(fp_)
-            except (IOError, OSError):
+            miniondata = cache.fetch('minions/{0}'.format(minion), 'data')
+            if miniondata is None:
                 return minion, None, None
             grains = miniondata.get('grains')
             pillar = miniondata.get('pillar')
@@ -163,6 +163,499 @@ def nodegroup_comp(nodegroup, nodegroups, skip=None, first_call=True):
         return nodegroups[nodegroup]
 
 
+# Compiled compound target plans, keyed by the compound expression
+_COMPOUND_PLANS = {}
+COMPOUND_PLAN_CACHE_SIZE = 1000
+
+
+def compile_compound(expr):
+    '''
+    Parse a compound target expression, as a string or as the list returned
+    by :func:`nodegroup_comp`, into a plan of set operations. Return ``None``
+    if the expression is invalid.
+
+    The plan is a nested tuple: ``('and', node, ...)``, ``('or', node, ...)``
+    and ``('not', node)`` combine the nodes below them, and the leaves are
+    ``('term', engine, pattern, delimiter)``. Operators bind as in the
+    original evaluation: ``not`` before ``and`` before ``or``, and a ``not``
+    directly following a term is joined to it with ``and``.
+
+    Plans are cached by expression, so repeated targets are parsed once.
+    '''
+    if isinstance(expr, six.string_types):
+        key = expr
+        words = expr.split()
+    else:
+        key = tuple(expr)
+        words = list(expr)
+    if key in _COMPOUND_PLANS:
+        return _COMPOUND_PLANS[key]
+    try:
+        plan = _CompoundParser(words).parse()
+    except ValueError as exc:
+        log.error('{0}: {1}'.format(exc, expr))
+        return None
+    log.debug('Compiled compound target {0} => {1}'.format(expr, plan))
+    if len(_COMPOUND_PLANS) >= COMPOUND_PLAN_CACHE_SIZE:
+        _COMPOUND_PLANS.clear()
+    _COMPOUND_PLANS[key] = plan
+    return plan
+
+
+class _CompoundParser(object):
+    '''
+    Recursive descent parser for compound target expressions
+    '''
+    opers = ('and', 'or', 'not', '(', ')')
+
+    def __init__(self, words):
+        self.words = words
+        self.pos = 0
+
+    def _peek(self):
+        if self.pos < len(self.words):
+            return self.words[self.pos]
+        return None
+
+    def parse(self):
+        plan = self._parse_or()
+        if self._peek() == ')':
+            raise ValueError('Invalid compound expr (unexpected right parenthesis)')
+        elif self._peek() is not None:
+            raise ValueError('Invalid compound target')
+        return plan
+
+    def _parse_or(self):
+        nodes = [self._parse_and()]
+        while self._peek() == 'or':
+            self.pos += 1
+            nodes.append(self._parse_and())
+        if len(nodes) == 1:
+            return nodes[0]
+        return ('or',) + tuple(nodes)
+
+    def _parse_and(self):
+        nodes = [self._parse_not()]
+        while self._peek() in ('and', 'not'):
+            if self._peek() == 'and':
+                self.pos += 1
+            nodes.append(self._parse_not())
+        if len(nodes) == 1:
+            return nodes[0]
+        return ('and',) + tuple(nodes)
+
+    def _parse_not(self):
+        word = self._peek()
+        self.pos += 1
+        if word is None:
+            raise ValueError('Invalid compound target (unexpected end)')
+        if word == 'not':
+            return ('not', self._parse_not())
+        if word == '(':
+            if self._peek() in ('and', 'or'):
+                raise ValueError('Invalid beginning operator after "(": {0}'.format(self._peek()))
+            plan = self._parse_or()
+            # Parentheses left open are closed at the end of the expression
+            if self._peek() == ')':
+                self.pos += 1
+            return plan
+        if word in self.opers:
+            raise ValueError('Expression may begin with binary operator: {0}'.format(word))
+
+        target_info = parse_target(word)
+        engine = target_info['engine']
+        if engine == 'N':
+            # Nodegroups should already be expanded/resolved to other engines
+            raise ValueError('Detected nodegroup expansion failure of "{0}"'.format(word))
+        delimiter = None
+        if engine in ('G', 'P', 'I', 'J'):
+            delimiter = target_info['delimiter'] or ':'
+        return ('term', engine, target_info['pattern'], delimiter)
+
+
+# Per-process views of the accepted minion keys, keyed by the directory
+# holding them
+_ACCEPTED_KEYS = {}
+
+
+def get_accepted_keys(opts, acc='minions'):
+    '''
+    Return the :class:`AcceptedKeys` of this process for the ``acc``
+    directory under ``opts['pki_dir']``
+    '''
+    path = os.path.join(opts['pki_dir'], acc)
+    if path not in _ACCEPTED_KEYS:
+        _ACCEPTED_KEYS[path] = AcceptedKeys(path)
+    return _ACCEPTED_KEYS[path]
+
+
+class AcceptedKeys(object):
+    '''
+    Sorted, in-memory view of the minion keys held in a pki directory
+
+    Changes to the directory are picked up by :meth:`refresh` from an
+    inotify watch when pyinotify is available, and from the mtime of the
+    directory otherwise, so the directory is only listed again after keys
+    have been accepted or deleted.
+    '''
+    # Directory mtimes can be this coarse (in seconds); a scan done within
+    # this window of the last change is not trusted to have seen all of it
+    mtime_granularity = 2
+
+    def __init__(self, path, use_inotify=True):
+        self.path = path
+        self.keys = set()
+        # [(name.lower(), name), ...], the order of salt.utils.isorted
+        self._sorted = []
+        self._mtime = None
+        self._scanned = 0
+        self._rescan = True
+        self._notifier = None
+        if use_inotify and HAS_PYINOTIFY:
+            self._watch()
+
+    def _watch(self):
+        '''
+        Set up an inotify watch on the key directory
+        '''
+        wm = pyinotify.WatchManager()
+        notifier = pyinotify.Notifier(wm, self._process_event, timeout=0)
+        mask = (pyinotify.IN_CREATE | pyinotify.IN_DELETE |
+                pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO |
+                pyinotify.IN_DELETE_SELF | pyinotify.IN_MOVE_SELF)
+        if wm.add_watch(self.path, mask).get(self.path, -1) < 0:
+            log.debug('Unable to watch {0}, polling it instead'.format(self.path))
+            notifier.stop()
+            return
+        self._notifier = notifier
+
+    def _unwatch(self):
+        '''
+        Drop the inotify watch and fall back to polling the directory mtime
+        '''
+        if self._notifier is not None:
+            try:
+                self._notifier.stop()
+            except OSError:
+                pass
+            self._notifier = None
+
+    def _process_event(self, event):
+        '''
+        Apply a single inotify event to the key set
+        '''
+        if event.mask & pyinotify.IN_Q_OVERFLOW:
+            self._rescan = True
+        elif event.mask & (pyinotify.IN_DELETE_SELF |
+                           pyinotify.IN_MOVE_SELF |
+                           pyinotify.IN_IGNORED):
+            self._unwatch()
+            self._rescan = True
+        elif event.mask & pyinotify.IN_ISDIR or not event.name \
+                or event.name.startswith('.'):
+            return
+        elif event.mask & (pyinotify.IN_CREATE | pyinotify.IN_MOVED_TO):
+            self._add(event.name)
+        else:
+            self._discard(event.name)
+
+    def _add(self, name):
+        if name not in self.keys:
+            self.keys.add(name)
+            bisect.insort(self._sorted, (name.lower(), name))
+
+    def _discard(self, name):
+        if name in self.keys:
+            self.keys.discard(name)
+            del self._sorted[bisect.bisect_left(self._sorted, (name.lower(), name))]
+
+    def refresh(self):
+        '''
+        Bring the key set up to date with the directory
+        '''
+        if self._notifier is not None:
+            while self._notifier is not None and self._notifier.check_events():
+                self._notifier.read_events()
+                self._notifier.process_events()
+            if not self._rescan:
+                return
+            mtime = None
+        else:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if not self._rescan and mtime is not None and mtime == self._mtime \
+                    and self._scanned - mtime > self.mtime_granularity:
+                return
+        self._scan(mtime)
+
+    def _scan(self, mtime):
+        '''
+        List the whole directory
+        '''
+        scanned = time.time()
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            names = []
+        self.keys = set(
+            fn_ for fn_ in names
+            if not fn_.startswith('.') and os.path.isfile(os.path.join(self.path, fn_))
+        )
+        self._sorted = sorted((fn_.lower(), fn_) for fn_ in self.keys)
+        self._mtime = mtime
+        self._scanned = scanned
+        self._rescan = False
+
+    def minions(self):
+        '''
+        Return the accepted minion ids, sorted ignoring case
+        '''
+        return [name for _, name in self._sorted]
+
+    def __contains__(self, name):
+        return name in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Per-process inverted indexes over the minion data cache, keyed by the
+# directory they index
+_DATA_INDEXES = {}
+
+
+def get_data_index(opts):
+    '''
+    Return the :class:`MinionDataIndex` of this process for the minion data
+    cache found under ``opts['cachedir']``
+    '''
+    cdir = os.path.join(opts['cachedir'], 'minions')
+    if cdir not in _DATA_INDEXES:
+        _DATA_INDEXES[cdir] = MinionDataIndex(opts)
+    return _DATA_INDEXES[cdir]
+
+
+class MinionDataIndex(object):
+    '''
+    Inverted index over the grains and pillar stored in the minion data cache
+
+    Every scalar found by walking the nested dicts of a minion's grains or
+    pillar is recorded as a posting from its key path and lowercased string
+    value to the set of minion ids holding it, so grain and pillar targets
+    are resolved against the distinct values instead of by loading ``data.p``
+    for every minion.
+
+    Minions which cannot be resolved through the postings alone (a dict or a
+    list of dicts at the targeted path, or a list somewhere along it) are
+    remembered per path and re-checked with :func:`salt.utils.subdict_match`,
+    which keeps the results identical to a full scan of the cache.
+
+    The index is refreshed incrementally: only minions whose ``data.p`` has a
+    new mtime, size or inode since the last refresh are loaded again.
+    '''
+    search_types = ('grains', 'pillar')
+
+    def __init__(self, opts):
+        self.opts = opts
+        # The index tracks the files themselves, bypass any memory tier
+        self.cache = salt.cache.Cache(opts, driver='msgpack')
+        self.cdir = os.path.join(opts['cachedir'], 'minions')
+        # minion id -> (mtime, size, inode) of the indexed data.p
+        self.stamps = {}
+        # minion id -> [(search_type, table, path, value), ...] it appears in
+        self.entries = {}
+        self.postings = {}
+        self.complex = {}
+        self.lists = {}
+        self.irregular = {}
+        for search_type in self.search_types:
+            # path -> {value: set(ids)}
+            self.postings[search_type] = {}
+            # path -> set(ids) holding a dict or a list of dicts at path
+            self.complex[search_type] = {}
+            # path -> set(ids) holding a list at path
+            self.lists[search_type] = {}
+            # ids which can only be matched with subdict_match
+            self.irregular[search_type] = set()
+
+    @property
+    def minions(self):
+        '''
+        The set of minion ids which currently have cached data
+        '''
+        return set(self.stamps)
+
+    def refresh(self):
+        '''
+        Bring the index up to date with the minion data cache on disk
+        '''
+        try:
+            ids = os.listdir(self.cdir)
+        except OSError:
+            ids = []
+        seen = set()
+        for id_ in ids:
+            datap = os.path.join(self.cdir, id_, 'data.p')
+            try:
+                stat = os.stat(datap)
+            except OSError:
+                continue
+            seen.add(id_)
+            stamp = (stat.st_mtime, stat.st_size, stat.st_ino)
+            if self.stamps.get(id_) != stamp:
+                self._load(id_, stamp)
+        for id_ in set(self.stamps) - seen:
+            self.remove(id_)
+
+    def _load(self, minion_id, stamp):
+        '''
+        Read the cached data of a single minion into the index
+        '''
+        data = self.cache.fetch('minions/{0}'.format(minion_id), 'data')
+        if data is None:
+            self.remove(minion_id)
+            return
+        self.update(minion_id, data, stamp=stamp)
+
+    def update(self, minion_id, data, datap=None, stamp=None):
+        '''
+        Replace the indexed grains and pillar of ``minion_id`` with ``data``,
+        a dict in the format written to ``data.p``. When ``datap`` is passed
+        the data is taken to be current for that file as it is on disk now.
+        '''
+        if stamp is None and datap is not None:
+            try:
+                stat = os.stat(datap)
+                stamp = (stat.st_mtime, stat.st_size, stat.st_ino)
+            except OSError:
+                pass
+        self.remove(minion_id)
+        entries = []
+        if not isinstance(data, dict):
+            data = {}
+        for search_type in self.search_types:
+            try:
+                self._index(minion_id, search_type, data.get(search_type), (), entries)
+            except UnicodeError:
+                # str() of the value fails, leave it to subdict_match
+                self.irregular[search_type].add(minion_id)
+                entries.append((search_type, 'irregular', None, None))
+        self.entries[minion_id] = entries
+        self.stamps[minion_id] = stamp
+
+    def _index(self, minion_id, search_type, data, path, entries):
+        '''
+        Record the postings of one level of a minion's grains or pillar
+        '''
+        if isinstance(data, dict):
+            if path:
+                self._add(minion_id, search_type, 'complex', path, None, entries)
+            for key, val in six.iteritems(data):
+                if isinstance(key, six.string_types):
+                    self._index(minion_id, search_type, val, path + (key,), entries)
+        elif isinstance(data, list):
+            if not path:
+                return
+            self._add(minion_id, search_type, 'lists', path, None, entries)
+            for member in data:
+                if isinstance(member, dict):
+                    self._add(minion_id, search_type, 'complex', path, None, entries)
+                else:
+                    self._add(minion_id, search_type, 'postings', path, str(member).lower(), entries)
+        elif path:
+            self._add(minion_id, search_type, 'postings', path, str(data).lower(), entries)
+
+    def _add(self, minion_id, search_type, table, path, value, entries):
+        '''
+        Add ``minion_id`` to one of the tables of the index
+        '''
+        if table == 'postings':
+            ids = self.postings[search_type].setdefault(path, {}).setdefault(value, set())
+        else:
+            ids = getattr(self, table)[search_type].setdefault(path, set())
+        if minion_id not in ids:
+            ids.add(minion_id)
+            entries.append((search_type, table, path, value))
+
+    def remove(self, minion_id):
+        '''
+        Drop everything recorded for ``minion_id`` from the index
+        '''
+        for search_type, table, path, value in self.entries.pop(minion_id, ()):
+            if table == 'irregular':
+                self.irregular[search_type].discard(minion_id)
+            elif table == 'postings':
+                values = self.postings[search_type][path]
+                values[value].discard(minion_id)
+                if not values[value]:
+                    del values[value]
+                    if not values:
+                        del self.postings[search_type][path]
+            else:
+                paths = getattr(self, table)[search_type]
+                paths[path].discard(minion_id)
+                if not paths[path]:
+                    del paths[path]
+        self.stamps.pop(minion_id, None)
+
+    def match(self,
+              search_type,
+              expr,
+              delimiter=DEFAULT_TARGET_DELIM,
+              regex_match=False,
+              exact_match=False):
+        '''
+        Return the set of indexed minion ids whose ``search_type`` data
+        matches ``expr``, following the semantics of
+        :func:`salt.utils.subdict_match`
+        '''
+        postings = self.postings[search_type]
+        matched = set()
+        recheck = set(self.irregular[search_type])
+        splits = expr.split(delimiter)
+        for idx in range(1, len(splits)):
+            path = tuple(splits[:idx])
+            pattern = delimiter.join(splits[idx:]).lower()
+            # A list along the path may be traversed by index or into the
+            # dicts it holds, only subdict_match knows how to follow those
+            for plen in range(1, len(path)):
+                recheck.update(self.lists[search_type].get(path[:plen], ()))
+            recheck.update(self.complex[search_type].get(path, ()))
+            values = postings.get(path)
+            if not values:
+                continue
+            if exact_match:
+                matched.update(values.get(pattern, ()))
+            elif regex_match:
+                try:
+                    reg = re.compile(pattern)
+                except Exception:
+                    log.error('Invalid regex \'{0}\' in match'.format(pattern))
+                    continue
+                for value, ids in six.iteritems(values):
+                    if reg.match(value):
+                        matched.update(ids)
+            elif not any(char in pattern for char in '*?['):
+                matched.update(values.get(pattern, ()))
+            else:
+                for value, ids in six.iteritems(values):
+                    if fnmatch.fnmatch(value, pattern):
+                        matched.update(ids)
+        for id_ in recheck - matched:
+            data = self.cache.fetch('minions/{0}'.format(id_), 'data')
+            if data is None:
+                continue
+            if salt.utils.subdict_match(data.get(search_type),
+                                        expr,
+                                        delimiter=delimiter,
+                                        regex_match=regex_match,
+                                        exact_match=exact_match):
+                matched.add(id_)
+        return matched
+
+
 class CkMinions(object):
     '''
     Used to check what minions should respond from a target
@@ -175,25 +668,36 @@ class CkMinions(object):
     def __init__(self, opts):
         self.opts = opts
         self.serial = salt.payload.Serial(opts)
+        self.cache = salt.cache.factory(opts)
         # TODO: this is actually an *auth* check
         if self.opts.get('transport', 'zeromq') in ('zeromq', 'tcp'):
             self.acc = 'minions'
         else:
             self.acc = 'accepted'
+        # Data index shared by the terms of a compound target being evaluated
+        self._index = None
+
+    def _accepted_keys(self):
+        '''
+        Return the up to date :class:`AcceptedKeys` of the accepted minions
+        '''
+        keys = get_accepted_keys(self.opts, self.acc)
+        keys.refresh()
+        return keys
+
+    def _use_data_index(self):
+        '''
+        Return whether grain and pillar targets go through the minion data
+        index, which follows the files written by the msgpack cache driver
+        '''
+        return self.opts.get('minion_data_cache_index', True) \
+            and self.cache.driver == 'msgpack'
 
     def _check_glob_minions(self, expr, greedy):  # pylint: disable=unused-argument
         '''
         Return the minions found by looking via globs
         '''
-        pki_dir = os.path.join(self.opts['pki_dir'], self.acc)
-        try:
-            files = []
-            for fn_ in salt.utils.isorted(os.listdir(pki_dir)):
-                if not fn_.startswith('.') and os.path.isfile(os.path.join(pki_dir, fn_)):
-                    files.append(fn_)
-            return fnmatch.filter(files, expr)
-        except OSError:
-            return []
+        return fnmatch.filter(self._accepted_keys().minions(), expr)
 
     def _check_list_minions(self, expr, greedy):  # pylint: disable=unused-argument
         '''
@@ -201,25 +705,15 @@ class CkMinions(object):
         '''
         if isinstance(expr, six.string_types):
             expr = [m for m in expr.split(',') if m]
-        ret = []
-        for minion in expr:
-            if os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, minion)):
-                ret.append(minion)
-        return ret
+        keys = self._accepted_keys()
+        return [minion for minion in expr if minion in keys]
 
     def _check_pcre_minions(self, expr, greedy):  # pylint: disable=unused-argument
         '''
         Return the minions found by looking via regular expressions
         '''
-        try:
-            minions = []
-            for fn_ in salt.utils.isorted(os.listdir(os.path.join(self.opts['pki_dir'], self.acc))):
-                if not fn_.startswith('.') and os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, fn_)):
-                    minions.append(fn_)
-            reg = re.compile(expr)
-            return [m for m in minions if reg.match(m)]
-        except OSError:
-            return []
+        reg = re.compile(expr)
+        return [m for m in self._accepted_keys().minions() if reg.match(m)]
 
     def _check_cache_minions(self,
                              expr,
@@ -234,31 +728,38 @@ class CkMinions(object):
         cache_enabled = self.opts.get('minion_data_cache', False)
 
         if greedy:
-            mlist = []
-            for fn_ in salt.utils.isorted(os.listdir(os.path.join(self.opts['pki_dir'], self.acc))):
-                if not fn_.startswith('.') and os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, fn_)):
-                    mlist.append(fn_)
-            minions = set(mlist)
+            minions = set(self._accepted_keys().minions())
         elif cache_enabled:
-            minions = os.listdir(os.path.join(self.opts['cachedir'], 'minions'))
+            minions = self.cache.list('minions')
         else:
             return list()
 
         if cache_enabled:
-            cdir = os.path.join(self.opts['cachedir'], 'minions')
-            if not os.path.isdir(cdir):
+            if not self.cache.contains('minions'):
                 return list(minions)
-            for id_ in os.listdir(cdir):
+            if self._use_data_index():
+                index = self._index
+                if index is None:
+                    index = get_data_index(self.opts)
+                    index.refresh()
+                matched = index.match(search_type,
+                                      expr,
+                                      delimiter=delimiter,
+                                      regex_match=regex_match,
+                                      exact_match=exact_match)
+                if greedy:
+                    # Minions without cached data are kept when greedy
+                    return list(minions - (index.minions - matched))
+                return list(matched)
+            for id_ in self.cache.list('minions'):
                 if not greedy and id_ not in minions:
                     continue
-                datap = os.path.join(cdir, id_, 'data.p')
-                if not os.path.isfile(datap):
+                mdata = self.cache.fetch('minions/{0}'.format(id_), 'data')
+                if mdata is None:
                     if not greedy and id_ in minions:
                         minions.remove(id_)
                     continue
-                search_results = self.serial.load(
-                    salt.utils.fopen(datap, 'rb')
-                ).get(search_type)
+                search_results = mdata.get(search_type)
                 if not salt.utils.subdict_match(search_results,
                                                 expr,
                                                 delimiter=delimiter,
@@ -316,19 +817,14 @@ class CkMinions(object):
         cache_enabled = self.opts.get('minion_data_cache', False)
 
         if greedy:
-            mlist = []
-            for fn_ in salt.utils.isorted(os.listdir(os.path.join(self.opts['pki_dir'], self.acc))):
-                if not fn_.startswith('.') and os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, fn_)):
-                    mlist.append(fn_)
-            minions = set(mlist)
+            minions = set(self._accepted_keys().minions())
         elif cache_enabled:
-            minions = os.listdir(os.path.join(self.opts['cachedir'], 'minions'))
+            minions = self.cache.list('minions')
         else:
             return []
 
         if cache_enabled:
-            cdir = os.path.join(self.opts['cachedir'], 'minions')
-            if not os.path.isdir(cdir):
+            if not self.cache.contains('minions'):
                 return list(minions)
 
             tgt = expr
@@ -344,19 +840,15 @@ class CkMinions(object):
                     return []
             proto = 'ipv{0}'.format(tgt.version)
 
-            for id_ in os.listdir(cdir):
+            for id_ in self.cache.list('minions'):
                 if not greedy and id_ not in minions:
                     continue
-                datap = os.path.join(cdir, id_, 'data.p')
-                if not os.path.isfile(datap):
+                mdata = self.cache.fetch('minions/{0}'.format(id_), 'data')
+                if mdata is None:
                     if not greedy and id_ in minions:
                         minions.remove(id_)
                     continue
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        grains = self.serial.load(fp_).get('grains')
-                except (IOError, OSError):
-                    continue
+                grains = mdata.get('grains')
 
                 if proto not in grains:
                     match = False
@@ -389,13 +881,9 @@ class CkMinions(object):
             )
             cache_enabled = self.opts.get('minion_data_cache', False)
             if greedy:
-                mlist = []
-                for fn_ in salt.utils.isorted(os.listdir(os.path.join(self.opts['pki_dir'], self.acc))):
-                    if not fn_.startswith('.') and os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, fn_)):
-                        mlist.append(fn_)
-                return mlist
+                return self._accepted_keys().minions()
             elif cache_enabled:
-                return os.listdir(os.path.join(self.opts['cachedir'], 'minions'))
+                return self.cache.list('minions')
             else:
                 return list()
 
@@ -422,147 +910,77 @@ class CkMinions(object):
         if not isinstance(expr, six.string_types) and not isinstance(expr, (list, tuple)):
             log.error('Compound target that is neither string, list nor tuple')
             return []
-        mlist = []
-        for fn_ in salt.utils.isorted(os.listdir(os.path.join(self.opts['pki_dir'], self.acc))):
-            if not fn_.startswith('.') and os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, fn_)):
-                mlist.append(fn_)
-        minions = set(mlist)
+        minions = set(self._accepted_keys().minions())
         log.debug('minions: {0}'.format(minions))
 
         if self.opts.get('minion_data_cache', False):
+            plan = compile_compound(expr)
+            if plan is None:
+                return []
             ref = {'G': self._check_grain_minions,
                    'P': self._check_grain_pcre_minions,
                    'I': self._check_pillar_minions,
                    'J': self._check_pillar_pcre_minions,
                    'L': self._check_list_minions,
-                   'N': None,    # nodegroups should already be expanded
                    'S': self._check_ipcidr_minions,
                    'E': self._check_pcre_minions,
-                   'R': self._all_minions}
+                   'R': self._all_minions,
+                   None: self._check_glob_minions}
             if pillar_exact:
                 ref['I'] = self._check_pillar_exact_minions
                 ref['J'] = self._check_pillar_exact_minions
 
-            results = []
-            unmatched = []
-            opers = ['and', 'or', 'not', '(', ')']
-
-            if isinstance(expr, six.string_types):
-                words = expr.split()
-            else:
-                words = expr
-
-            for word in words:
-                target_info = parse_target(word)
-
-                # Easy check first
-                if word in opers:
-                    if results:
-                        if results[-1] == '(' and word in ('and', 'or'):
-                            log.error('Invalid beginning operator after "(": {0}'.format(word))
-                            return []
-                        if word == 'not':
-                            if not results[-1] in ('&', '|', '('):
-                                results.append('&')
-                            results.append('(')
-                            results.append(str(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif word == 'and':
-                            results.append('&')
-                        elif word == 'or':
-                            results.append('|')
-                        elif word == '(':
-                            results.append(word)
-                            unmatched.append(word)
-                        elif word == ')':
-                            if not unmatched or unmatched[-1] != '(':
-                                log.error('Invalid compound expr (unexpected '
-                                          'right parenthesis): {0}'
-                                          .format(expr))
-                                return []
-                            results.append(word)
-                            unmatched.pop()
-                            if unmatched and unmatched[-1] == '-':
-                                results.append(')')
-                                unmatched.pop()
-                        else:  # Won't get here, unless oper is added
-                            log.error('Unhandled oper in compound expr: {0}'
-                                      .format(expr))
-                            return []
-                    else:
-                        # seq start with oper, fail
-                        if word == 'not':
-                            results.append('(')
-                            results.append(str(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif word == '(':
-                            results.append(word)
-                            unmatched.append(word)
-                        else:
-                            log.error(
-                                'Expression may begin with'
-                                ' binary operator: {0}'.format(word)
-                            )
-                            return []
-
-                elif target_info and target_info['engine']:
-                    if 'N' == target_info['engine']:
-                        # Nodegroups should already be expanded/resolved to other engines
-                        log.error('Detected nodegroup expansion failure of "{0}"'.format(word))
-                        return []
-                    engine = ref.get(target_info['engine'])
-                    if not engine:
-                        # If an unknown engine is called at any time, fail out
-                        log.error(
-                            'Unrecognized target engine "{0}" for'
-                            ' target expression "{1}"'.format(
-                                target_info['engine'],
-                                word,
-                            )
-                        )
-                        return []
-
-                    engine_args = [target_info['pattern']]
-                    if target_info['engine'] in ('G', 'P', 'I', 'J'):
-                        engine_args.append(target_info['delimiter'] or ':')
-                    engine_args.append(True)
-
-                    results.append(str(set(engine(*engine_args))))
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(')')
-                        unmatched.pop()
-
-                else:
-                    # The match is not explicitly defined, evaluate as a glob
-                    results.append(str(set(self._check_glob_minions(word, True))))
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(')')
-                        unmatched.pop()
-
-            # Add a closing ')' for each item left in unmatched
-            results.extend([')' for item in unmatched])
-
-            results = ' '.join(results)
-            log.debug('Evaluating final compound matching expr: {0}'
-                      .format(results))
+            # Resolve every distinct term once, against a single refresh of
+            # the minion data index
+            if self._use_data_index():
+                self._index = get_data_index(self.opts)
+                self._index.refresh()
             try:
-                return list(eval(results))  # pylint: disable=W0123
+                return list(self._evaluate_compound(plan, minions, ref, {}))
             except Exception:
                 log.error('Invalid compound target: {0}'.format(expr))
                 return []
+            finally:
+                self._index = None
 
         return list(minions)
 
+    def _evaluate_compound(self, plan, minions, ref, terms):
+        '''
+        Evaluate a plan made by :func:`compile_compound` into a set of
+        minions, memoizing the results of the terms in ``terms``
+        '''
+        oper = plan[0]
+        if oper == 'and':
+            ret = self._evaluate_compound(plan[1], minions, ref, terms)
+            for node in plan[2:]:
+                if not ret:
+                    break
+                ret = ret & self._evaluate_compound(node, minions, ref, terms)
+            return ret
+        if oper == 'or':
+            ret = set()
+            for node in plan[1:]:
+                ret = ret | self._evaluate_compound(node, minions, ref, terms)
+            return ret
+        if oper == 'not':
+            return minions - self._evaluate_compound(plan[1], minions, ref, terms)
+        if plan not in terms:
+            _, engine, pattern, delimiter = plan
+            engine_args = [pattern]
+            if delimiter is not None:
+                engine_args.append(delimiter)
+            engine_args.append(True)
+            terms[plan] = set(ref[engine](*engine_args))
+        return terms[plan]
+
     def connected_ids(self, subset=None, show_ipv4=False, include_localhost=False):
         '''
         Return a set of all connected minion ids, optionally within a subset
         '''
         minions = set()
         if self.opts.get('minion_data_cache', False):
-            cdir = os.path.join(self.opts['cachedir'], 'minions')
-            if not os.path.isdir(cdir):
+            if not self.cache.contains('minions'):
                 return minions
             addrs = salt.utils.network.local_port_tcp(int(self.opts['publish_port']))
             if '127.0.0.1' in addrs or '0.0.0.0' in addrs:
@@ -573,14 +991,12 @@ class CkMinions(object):
             if subset:
                 search = subset
             else:
-                search = os.listdir(cdir)
+                search = self.cache.list('minions')
             for id_ in search:
-                datap = os.path.join(cdir, id_, 'data.p')
-                try:
-                    with salt.utils.fopen(datap, 'rb') as fp_:
-                        grains = self.serial.load(fp_).get('grains', {})
-                except (AttributeError, IOError, OSError):
+                mdata = self.cache.fetch('minions/{0}'.format(id_), 'data')
+                if mdata is None:
                     continue
+                grains = mdata.get('grains', {})
                 for ipv4 in grains.get('ipv4', []):
                     if ipv4 == '127.0.0.1' and not include_localhost:
                         continue
@@ -598,11 +1014,7 @@ class CkMinions(object):
         '''
         Return a list of all minions that have auth'd
         '''
-        mlist = []
-        for fn_ in salt.utils.isorted(os.listdir(os.path.join(self.opts['pki_dir'], self.acc))):
-            if not fn_.startswith('.') and os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, fn_)):
-                mlist.append(fn_)
-        return mlist
+        return self._accepted_keys().minions()
 
     def check_minions(self,
                       expr,
@@ -1068,22 +1480,15 @@ def mine_get(tgt, fun, tgt_type='glob', opts=None):
     function to look up and the target type
     '''
     ret = {}
-    serial = salt.payload.Serial(opts)
     checker = CkMinions(opts)
     minions = checker.check_minions(
             tgt,
             tgt_type)
     for minion in minions:
-        mine = os.path.join(
-                opts['cachedir'],
-                'minions',
-                minion,
-                'mine.p')
         try:
-            with salt.utils.fopen(mine, 'rb') as fp_:
-                fdata = serial.load(fp_).get(fun)
-                if fdata:
-                    ret[minion] = fdata
+            fdata = checker.cache.fetch('minions/{0}'.format(minion), 'mine').get(fun)
+            if fdata:
+                ret[minion] = fdata
         except Exception:
             continue
     return ret
@@ -2,24 +2,84 @@
 from __future__ import absolute_import
 
 # Import python libs
-import fnmatch
+import os
+import copy
 import glob
+import time
 import logging
+import datetime
+import threading
+import collections
 
 import yaml
+import jinja2
+import jinja2.meta
+import jinja2.nodes
 
 # Import salt libs
 import salt.runner
 import salt.state
+import salt.template
 import salt.utils
 import salt.utils.cache
 import salt.utils.event
+import salt.utils.jinja
 import salt.utils.process
+import salt.utils.tagmatch
+import salt.utils.yamlencoding
 import salt.defaults.exitcodes
+from salt.ext import six
 from salt.ext.six import string_types, iterkeys
 from salt._compat import string_types
 log = logging.getLogger(__name__)
 
+# The variables of the Jinja context of a reaction which do not change from
+# one event to the next
+STATIC_JINJA_VARS = frozenset(('opts', 'saltenv', 'sls', 'slspath', 'sls_path',
+                               'grains', 'pillar'))
+
+
+def _static_jinja(source):
+    '''
+    Return True if a Jinja template renders the same for every event: it only
+    reads the variables in STATIC_JINJA_VARS and includes no other templates
+    '''
+    env = jinja2.Environment(
+        extensions=['jinja2.ext.do', salt.utils.jinja.SerializerExtension])
+    # The filters salt adds in salt.utils.templates.render_jinja_tmpl, the
+    # variables are only found once the filters are known
+    env.filters['strftime'] = salt.utils.date_format
+    env.filters['sequence'] = salt.utils.jinja.ensure_sequence_filter
+    env.filters['yaml_dquote'] = salt.utils.yamlencoding.yaml_dquote
+    env.filters['yaml_squote'] = salt.utils.yamlencoding.yaml_squote
+    env.filters['yaml_encode'] = salt.utils.yamlencoding.yaml_encode
+    try:
+        ast = env.parse(source)
+        if jinja2.meta.find_undeclared_variables(ast) - STATIC_JINJA_VARS:
+            return False
+    except jinja2.TemplateError:
+        return False
+    for node in ast.find_all((jinja2.nodes.Import, jinja2.nodes.FromImport,
+                              jinja2.nodes.Include, jinja2.nodes.Extends,
+                              jinja2.nodes.Filter)):
+        if not isinstance(node, jinja2.nodes.Filter) or node.name == 'random':
+            return False
+    return True
+
+
+def _stamp_age(stamp):
+    '''
+    Return the number of seconds since the _stamp of an event
+    '''
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            fired = datetime.datetime.strptime(stamp, fmt)
+        except (TypeError, ValueError):
+            continue
+        delta = datetime.datetime.utcnow() - fired
+        return delta.days * 86400 + delta.seconds + delta.microseconds / 1e6
+    return None
+
 
 class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.state.Compiler):
     '''
@@ -34,6 +94,19 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
         local_minion_opts['file_client'] = 'local'
         self.minion = salt.minion.MasterMinion(local_minion_opts)
         salt.state.Compiler.__init__(self, opts, self.minion.rend)
+        # The reactor map file read and the stat it was read at, the tag
+        # matcher compiled from the map and the rendered reactions which do not
+        # depend on the event
+        self._react_map = None
+        self._dispatch = None
+        self._tag_filter = None
+        self._cached_refs = salt.utils.cache.CacheDict(
+            opts.get('reactor_refresh_interval', 60))
+        self._static = {}
+        self._rendered = {}
+        self.stats = {'events': 0, 'reactions': 0,
+                      'render_hits': 0, 'render_misses': 0,
+                      'start': time.time(), 'stamp': None}
 
     # We need __setstate__ and __getstate__ to avoid pickling errors since
     # 'self.rend' (from salt.state.Compiler) contains a function reference
@@ -58,14 +131,16 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
         react = {}
 
         if glob_ref.startswith('salt://'):
-            glob_ref = self.minion.functions['cp.cache_file'](glob_ref)
+            # Only fetch the file from the fileserver again once the cached
+            # path expired
+            if glob_ref not in self._cached_refs:
+                self._cached_refs[glob_ref] = \
+                    self.minion.functions['cp.cache_file'](glob_ref)
+            glob_ref = self._cached_refs[glob_ref]
 
         for fn_ in glob.glob(glob_ref):
             try:
-                res = self.render_template(
-                    fn_,
-                    tag=tag,
-                    data=data)
+                res = self._render_cached(fn_, tag, data)
 
                 # for #20841, inject the sls name here since verify_high()
                 # assumes it exists in case there are any errors
@@ -77,31 +152,96 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                 log.error('Failed to render "{0}": '.format(fn_), exc_info=True)
         return react
 
-    def list_reactors(self, tag):
+    def _render_cached(self, fn_, tag, data):
         '''
-        Take in the tag from an event and return a list of the reactors to
-        process
+        Render a reaction file, the reactions which render the same for every
+        event are only rendered again once the file changed
         '''
-        log.debug('Gathering reactors for tag {0}'.format(tag))
-        reactors = []
-        if isinstance(self.opts['reactor'], string_types):
-            try:
-                with salt.utils.fopen(self.opts['reactor']) as fp_:
-                    react_map = yaml.safe_load(fp_.read())
-            except (OSError, IOError):
-                log.error(
-                    'Failed to read reactor map: "{0}"'.format(
-                        self.opts['reactor']
-                        )
+        try:
+            stat = os.stat(fn_)
+        except OSError:
+            return self.render_template(fn_, tag=tag, data=data)
+        key = (stat.st_mtime, stat.st_size, stat.st_ino)
+        if self._static.get(fn_, (None,))[0] != key:
+            self._static[fn_] = (key, self._is_static(fn_))
+            self._rendered.pop(fn_, None)
+        if not self._static[fn_][1]:
+            return self.render_template(fn_, tag=tag, data=data)
+        if fn_ in self._rendered:
+            self.stats['render_hits'] += 1
+        else:
+            self.stats['render_misses'] += 1
+            self._rendered[fn_] = self.render_template(fn_, tag=tag, data=data)
+        return copy.deepcopy(self._rendered[fn_])
+
+    def _is_static(self, fn_):
+        '''
+        Return True if a reaction file renders the same for every event, a
+        YAML file or Jinja not reading the tag, event data or the salt
+        functions
+        '''
+        try:
+            with salt.utils.fopen(fn_) as fp_:
+                source = fp_.read()
+            render_pipe = salt.template.template_shebang(
+                fn_,
+                self.rend,
+                self.opts['renderer'],
+                self.opts['renderer_blacklist'],
+                self.opts['renderer_whitelist'],
+                source)
+        except Exception:
+            return False
+        names = [render.__module__.rsplit('.', 1)[-1]
+                 for render, _ in render_pipe]
+        if names == ['yaml']:
+            return True
+        return names == ['jinja', 'yaml'] and _static_jinja(source)
+
+    def _read_react_map(self):
+        '''
+        Return the reactor map, a reactor map file is only read again once it
+        changed
+        '''
+        if not isinstance(self.opts['reactor'], string_types):
+            return self.opts['reactor']
+        try:
+            stat = os.stat(self.opts['reactor'])
+            key = (stat.st_mtime, stat.st_size, stat.st_ino)
+        except OSError:
+            key = None
+        if self._react_map is not None and self._react_map[0] == key:
+            return self._react_map[1]
+        log.debug('Reading reactors from yaml {0}'.format(self.opts['reactor']))
+        react_map = []
+        try:
+            with salt.utils.fopen(self.opts['reactor']) as fp_:
+                react_map = yaml.safe_load(fp_.read()) or []
+        except (OSError, IOError):
+            log.error(
+                'Failed to read reactor map: "{0}"'.format(
+                    self.opts['reactor']
                     )
-            except Exception:
-                log.error(
-                    'Failed to parse YAML in reactor map: "{0}"'.format(
-                        self.opts['reactor']
-                        )
+                )
+        except Exception:
+            log.error(
+                'Failed to parse YAML in reactor map: "{0}"'.format(
+                    self.opts['reactor']
                     )
-        else:
-            react_map = self.opts['reactor']
+                )
+        self._react_map = (key, react_map)
+        self._dispatch = None
+        return react_map
+
+    def _compile_react_map(self, react_map):
+        '''
+        Compile the reactor map into a tag matcher returning the indexes of
+        the matching rules, the reactions of each rule and the tags of the
+        rules
+        '''
+        matcher = salt.utils.tagmatch.TagMatcher()
+        reactions = []
+        tags = set()
         for ropt in react_map:
             if not isinstance(ropt, dict):
                 continue
@@ -109,38 +249,56 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                 continue
             key = next(iterkeys(ropt))
             val = ropt[key]
-            if fnmatch.fnmatch(tag, key):
-                if isinstance(val, string_types):
-                    reactors.append(val)
-                elif isinstance(val, list):
-                    reactors.extend(val)
+            if isinstance(val, string_types):
+                val = [val]
+            elif not isinstance(val, list):
+                continue
+            if not isinstance(key, string_types):
+                continue
+            # Match the way fnmatch.fnmatch does
+            matcher.add(os.path.normcase(key), len(reactions))
+            reactions.append(val)
+            tags.add(key)
+        return matcher, reactions, sorted(tags)
+
+    def _sync_filter(self):
+        '''
+        Only have the event publisher send the events of the tags in the
+        reactor map and the reactor management events
+        '''
+        react_map = self._read_react_map()
+        if self._dispatch is None:
+            self._dispatch = self._compile_react_map(react_map)
+        tags = self._dispatch[2] + ['*salt/reactors/manage/*']
+        if os.path.normcase('A') != 'A':
+            # fnmatch ignores the case of the tags here, the publisher does not
+            tags = None
+        if tags != self._tag_filter:
+            self.event.set_filter(tags)
+            self._tag_filter = tags
+
+    def list_reactors(self, tag):
+        '''
+        Take in the tag from an event and return a list of the reactors to
+        process
+        '''
+        log.debug('Gathering reactors for tag {0}'.format(tag))
+        react_map = self._read_react_map()
+        if self._dispatch is None:
+            self._dispatch = self._compile_react_map(react_map)
+        matcher, reactions, _ = self._dispatch
+        reactors = []
+        for index in sorted(matcher.match(os.path.normcase(tag))):
+            reactors.extend(reactions[index])
         return reactors
 
     def list_all(self):
         '''
         Return a list of the reactors
         '''
-        if isinstance(self.minion.opts['reactor'], string_types):
-            log.debug('Reading reactors from yaml {0}'.format(self.opts['reactor']))
-            try:
-                with salt.utils.fopen(self.opts['reactor']) as fp_:
-                    react_map = yaml.safe_load(fp_.read())
-            except (OSError, IOError):
-                log.error(
-                    'Failed to read reactor map: "{0}"'.format(
-                        self.opts['reactor']
-                        )
-                    )
-            except Exception:
-                log.error(
-                    'Failed to parse YAML in reactor map: "{0}"'.format(
-                        self.opts['reactor']
-                        )
-                    )
-        else:
+        if not isinstance(self.minion.opts['reactor'], string_types):
             log.debug('Not reading reactors from yaml')
-            react_map = self.minion.opts['reactor']
-        return react_map
+        return self._read_react_map()
 
     def add_reactor(self, tag, reaction):
         '''
@@ -153,6 +311,7 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                 return {'status': False, 'comment': 'Reactor already exists.'}
 
         self.minion.opts['reactor'].append({tag: reaction})
+        self._dispatch = None
         return {'status': True, 'comment': 'Reactor added.'}
 
     def delete_reactor(self, tag):
@@ -164,6 +323,7 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
             _tag = next(iterkeys(reactor))
             if _tag == tag:
                 self.minion.opts['reactor'].remove(reactor)
+                self._dispatch = None
                 return {'status': True, 'comment': 'Reactor deleted.'}
 
         return {'status': False, 'comment': 'Reactor does not exists.'}
@@ -190,12 +350,35 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
 
         return chunks
 
-    def call_reactions(self, chunks):
+    def call_reactions(self, chunks, key=None):
         '''
-        Execute the reaction state
+        Execute the reaction state, the reactions queued with the same key
+        run in order
         '''
         for chunk in chunks:
-            self.wrap.run(chunk)
+            self.wrap.run(chunk, key=key)
+
+    def stats_event(self):
+        '''
+        Return the data of the reactor stats event and start counting again.
+        The lag is how long ago the last event handled was fired, the reactor
+        is falling behind the event bus when it grows.
+        '''
+        now = time.time()
+        elapsed = max(now - self.stats['start'], 1e-6)
+        ret = {'events': self.stats['events'],
+               'events_per_sec': self.stats['events'] / elapsed,
+               'reactions': self.stats['reactions'],
+               'reactions_per_sec': self.stats['reactions'] / elapsed,
+               'lag': _stamp_age(self.stats['stamp']),
+               'render_cache': {'hits': self.stats['render_hits'],
+                                'misses': self.stats['render_misses']}}
+        if getattr(self, 'wrap', None) is not None:
+            ret.update(self.wrap.pool.metrics())
+        self.stats.update({'events': 0, 'reactions': 0,
+                           'render_hits': 0, 'render_misses': 0,
+                           'start': now})
+        return ret
 
     def run(self):
         '''
@@ -211,8 +394,20 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                 opts=self.opts,
                 listen=True)
         self.wrap = ReactWrap(self.opts)
-
-        for data in self.event.iter_events(full=True):
+        self._sync_filter()
+
+        stats_interval = self.opts.get('reactor_stats_interval', 0)
+        while True:
+            data = self.event.get_event(full=True)
+            # The reactor map file is read again once it changed
+            self._sync_filter()
+            if stats_interval and \
+                    time.time() - self.stats['start'] >= stats_interval:
+                self.event.fire_event(self.stats_event(), 'salt/reactors/stats')
+            if data is None:
+                continue
+            self.stats['events'] += 1
+            self.stats['stamp'] = data['data'].get('_stamp')
             # skip all events fired by ourselves
             if data['data'].get('user') == self.wrap.event_user:
                 continue
@@ -236,19 +431,196 @@ class Reactor(salt.utils.process.SignalHandlingMultiprocessingProcess, salt.stat
                 if not reactors:
                     continue
                 chunks = self.reactions(data['tag'], data['data'], reactors)
+                self.stats['reactions'] += len(chunks)
                 if chunks:
                     try:
-                        self.call_reactions(chunks)
+                        # Keep the order of the reactions to the events of
+                        # a tag from a minion
+                        self.call_reactions(
+                            chunks,
+                            key=(data['tag'], data['data'].get('id')))
                     except SystemExit:
                         log.warning('Exit ignored by reactor')
 
 
+class ReactionPool(object):
+    '''
+    Run reactions on a pool of threads.
+
+    At most ``limits[kind]`` reactions of a kind run at once and the reactions
+    queued with the same key run one after the other, in the order they were
+    queued. Once ``queue_size`` reactions wait for a thread the ``overflow``
+    policy applies: ``drop_new`` drops the new reaction, ``drop_oldest`` drops
+    the reaction which waited longest and ``block`` waits for a thread to take
+    a reaction.
+    '''
+    OVERFLOW = ('drop_new', 'drop_oldest', 'block')
+
+    def __init__(self, num_threads, queue_size=0, limits=None,
+                 overflow='drop_new'):
+        if overflow not in self.OVERFLOW:
+            log.error(
+                'Invalid reactor_overflow {0!r}, dropping new reactions once '
+                'the backlog is full'.format(overflow)
+            )
+            overflow = 'drop_new'
+        self.queue_size = queue_size
+        self.limits = limits or {}
+        self.overflow = overflow
+        self.queued = 0
+        self._seq = 0
+        self._cond = threading.Condition()
+        # key -> the queued reactions of the key, while none of them runs the
+        # key is in _ready under the kind of its first reaction
+        self._keys = {}
+        self._ready = {}
+        self._running_keys = set()
+        self._running = collections.defaultdict(int)
+        self._metrics = self._new_metrics()
+
+        self._workers = []
+        for _ in range(num_threads):
+            thread = threading.Thread(target=self._thread_target)
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    def _new_metrics(self):
+        return {'dropped': 0, 'completed': 0, 'wait': 0.0, 'latency': 0.0,
+                'latency_max': 0.0}
+
+    def submit(self, key, kind, func, args=(), kwargs=None):
+        '''
+        Queue a call of func, return False if it was dropped. A key of None
+        does not order the reaction after any other.
+        '''
+        with self._cond:
+            if self.queue_size and self.queued >= self.queue_size:
+                if self.overflow == 'block':
+                    while self.queued >= self.queue_size:
+                        self._cond.wait()
+                elif self.overflow == 'drop_oldest':
+                    self._drop_oldest()
+                else:
+                    self._metrics['dropped'] += 1
+                    return False
+            self._seq += 1
+            if key is None:
+                key = self._seq
+            pending = self._keys.get(key)
+            if pending is None:
+                pending = self._keys[key] = collections.deque()
+            pending.append(
+                (self._seq, kind, func, args, kwargs or {}, time.time()))
+            self.queued += 1
+            if len(pending) == 1 and key not in self._running_keys:
+                self._ready.setdefault(kind, collections.deque()).append(key)
+                self._cond.notify_all()
+        return True
+
+    def _drop_oldest(self):
+        '''
+        Drop the reaction which was queued first
+        '''
+        key = min(self._keys, key=lambda key: self._keys[key][0][0])
+        pending = self._keys[key]
+        kind = pending.popleft()[1]
+        log.warning('Reactor backlog is full, dropped a {0} reaction queued '
+                    'for {1}'.format(kind, key))
+        self.queued -= 1
+        self._metrics['dropped'] += 1
+        if key not in self._running_keys:
+            self._ready[kind].remove(key)
+            if pending:
+                self._ready.setdefault(
+                    pending[0][1], collections.deque()).append(key)
+        if not pending:
+            del self._keys[key]
+
+    def _take(self):
+        '''
+        Return the key and the reaction to run next, the reaction queued first
+        of the kinds below their limit
+        '''
+        first = None
+        for kind, keys in six.iteritems(self._ready):
+            if not keys:
+                continue
+            limit = self.limits.get(kind)
+            if limit and self._running[kind] >= limit:
+                continue
+            seq = self._keys[keys[0]][0][0]
+            if first is None or seq < first[0]:
+                first = (seq, kind)
+        if first is None:
+            return None
+        key = self._ready[first[1]].popleft()
+        pending = self._keys[key]
+        item = pending.popleft()
+        if not pending:
+            del self._keys[key]
+        self.queued -= 1
+        self._running_keys.add(key)
+        self._running[item[1]] += 1
+        return key, item
+
+    def _thread_target(self):
+        while True:
+            with self._cond:
+                task = self._take()
+                while task is None:
+                    self._cond.wait()
+                    task = self._take()
+                # Wake up a submit blocked on a full backlog
+                self._cond.notify_all()
+            key, (_, kind, func, args, kwargs, queued) = task
+            start = time.time()
+            try:
+                func(*args, **kwargs)
+            except Exception as exc:
+                log.error('Reaction failed: {0}'.format(exc), exc_info=True)
+            done = time.time()
+            with self._cond:
+                self._running_keys.discard(key)
+                self._running[kind] -= 1
+                if key in self._keys:
+                    self._ready.setdefault(
+                        self._keys[key][0][1], collections.deque()).append(key)
+                self._metrics['completed'] += 1
+                self._metrics['wait'] += start - queued
+                self._metrics['latency'] += done - queued
+                self._metrics['latency_max'] = max(
+                    self._metrics['latency_max'], done - queued)
+                self._cond.notify_all()
+
+    def metrics(self):
+        '''
+        Return the reactions running and queued now, and the reactions
+        dropped and completed and their latency since the last call
+        '''
+        with self._cond:
+            metrics, self._metrics = self._metrics, self._new_metrics()
+            running = dict((kind, count) for kind, count
+                           in six.iteritems(self._running) if count)
+            queued = self.queued
+        completed = metrics['completed'] or 1
+        return {'in_flight': sum(running.values()),
+                'in_flight_by_type': running,
+                'queued': queued,
+                'dropped': metrics['dropped'],
+                'completed': metrics['completed'],
+                'wait_avg': metrics['wait'] / completed,
+                'latency_avg': metrics['latency'] / completed,
+                'latency_max': metrics['latency_max']}
+
+
 class ReactWrap(object):
     '''
     Create a wrapper that executes low data for the reaction system
     '''
     # class-wide cache of clients
     client_cache = None
+    client_lock = threading.Lock()
     event_user = 'Reactor'
 
     def __init__(self, opts):
@@ -256,12 +628,58 @@ class ReactWrap(object):
         if ReactWrap.client_cache is None:
             ReactWrap.client_cache = salt.utils.cache.CacheDict(opts['reactor_refresh_interval'])
 
-        self.pool = salt.utils.process.ThreadPool(
-            self.opts['reactor_worker_threads'],  # number of workers for runner/wheel
-            queue_size=self.opts['reactor_worker_hwm']  # queue size for those workers
+        self.pool = ReactionPool(
+            self.opts['reactor_worker_threads'],
+            queue_size=self.opts['reactor_worker_hwm'],
+            limits=self.opts.get('reactor_worker_limits'),
+            overflow=self.opts.get('reactor_overflow', 'drop_new')
         )
 
-    def run(self, low):
+    def client(self, kind):
+        '''
+        Return the cached client for a kind of reaction, the LocalClient and
+        Caller are not shared between the worker threads
+        '''
+        key = kind
+        if kind in ('local', 'caller'):
+            key = (kind, threading.current_thread().ident)
+        with self.client_lock:
+            try:
+                return self.client_cache[key]
+            except KeyError:
+                pass
+            if kind == 'local':
+                client = salt.client.LocalClient(self.opts['conf_file'])
+            elif kind == 'caller':
+                client = salt.client.Caller(self.opts['conf_file'])
+            elif kind == 'runner':
+                client = salt.runner.RunnerClient(self.opts)
+            else:
+                client = salt.wheel.Wheel(self.opts)
+            if kind in ('runner', 'wheel'):
+                # The len() function will cause the module functions to load
+                # if they aren't already loaded. We want to load them so that
+                # the worker threads don't need to load them. Loading in the
+                # threads creates race conditions such as sometimes not
+                # finding the required function because another thread is in
+                # the middle of loading the functions.
+                len(client.functions)
+            self.client_cache[key] = client
+            return client
+
+    def run(self, low, key=None):
+        '''
+        Queue the specified function in the specified state to run on the
+        reaction pool, the reactions queued with the same key run in order
+        '''
+        kind = 'local' if low['state'] == 'cmd' else low['state']
+        if not self.pool.submit(key, kind, self.execute, (low,)):
+            log.warning(
+                'Reactor backlog is full, dropped {0} reaction {1}'.format(
+                    low['state'], low.get('__id__'))
+            )
+
+    def execute(self, low):
         '''
         Execute the specified function in the specified state by passing the
         low data
@@ -288,10 +706,8 @@ class ReactWrap(object):
         '''
         Wrap LocalClient for running :ref:`execution modules <all-salt.modules>`
         '''
-        if 'local' not in self.client_cache:
-            self.client_cache['local'] = salt.client.LocalClient(self.opts['conf_file'])
         try:
-            self.client_cache['local'].cmd_async(*args, **kwargs)
+            self.client('local').cmd_async(*args, **kwargs)
         except SystemExit:
             log.warning('Attempt to exit reactor. Ignored.')
         except Exception as exc:
@@ -303,17 +719,8 @@ class ReactWrap(object):
         '''
         Wrap RunnerClient for executing :ref:`runner modules <all-salt.runners>`
         '''
-        if 'runner' not in self.client_cache:
-            self.client_cache['runner'] = salt.runner.RunnerClient(self.opts)
-            # The len() function will cause the module functions to load if
-            # they aren't already loaded. We want to load them so that the
-            # spawned threads don't need to load them. Loading in the spawned
-            # threads creates race conditions such as sometimes not finding
-            # the required function because another thread is in the middle
-            # of loading the functions.
-            len(self.client_cache['runner'].functions)
         try:
-            self.pool.fire_async(self.client_cache['runner'].low, args=(fun, kwargs))
+            self.client('runner').low(fun, kwargs)
         except SystemExit:
             log.warning('Attempt to exit in reactor by runner. Ignored')
         except Exception as exc:
@@ -323,17 +730,8 @@ class ReactWrap(object):
         '''
         Wrap Wheel to enable executing :ref:`wheel modules <all-salt.wheel>`
         '''
-        if 'wheel' not in self.client_cache:
-            self.client_cache['wheel'] = salt.wheel.Wheel(self.opts)
-            # The len() function will cause the module functions to load if
-            # they aren't already loaded. We want to load them so that the
-            # spawned threads don't need to load them. Loading in the spawned
-            # threads creates race conditions such as sometimes not finding
-            # the required function because another thread is in the middle
-            # of loading the functions.
-            len(self.client_cache['wheel'].functions)
         try:
-            self.pool.fire_async(self.client_cache['wheel'].low, args=(fun, kwargs))
+            self.client('wheel').low(fun, kwargs)
         except SystemExit:
             log.warning('Attempt to in reactor by whell. Ignored.')
         except Exception as exc:
@@ -345,10 +743,8 @@ class ReactWrap(object):
         '''
         log.debug("in caller with fun {0} args {1} kwargs {2}".format(fun, args, kwargs))
         args = kwargs['args']
-        if 'caller' not in self.client_cache:
-            self.client_cache['caller'] = salt.client.Caller(self.opts['conf_file'])
         try:
-            self.client_cache['caller'].function(fun, *args)
+            self.client('caller').function(fun, *args)
         except SystemExit:
             log.warning('Attempt to exit reactor. Ignored.')
         except Exception as exc:
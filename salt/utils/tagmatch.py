@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+'''
+Match event tags against many prefixes or glob patterns at once
+'''
+
+# Import python libs
+from __future__ import absolute_import
+import re
+import fnmatch
+
+# Import salt libs
+from salt.utils.odict import OrderedDict
+
+GLOB_CHARS = re.compile(r'[*?[]')
+
+
+class PrefixTrie(object):
+    '''
+    Map tag prefixes to values. The values of every prefix of a tag are found
+    by walking the tag once, instead of testing each prefix with startswith.
+
+    The values of a prefix are kept in insertion order, they need to be
+    hashable so that removing one does not need to scan the others.
+    '''
+    def __init__(self):
+        # Nodes are dicts of the next character to the next node, the values
+        # of the prefix ending at a node are under the '' key, which no
+        # character of a tag can be
+        self.root = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, prefix, value):
+        '''
+        Add a value for the prefix
+        '''
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        values = node.get('')
+        if values is None:
+            values = node[''] = OrderedDict()
+        if value not in values:
+            values[value] = True
+            self.size += 1
+
+    def remove(self, prefix, value):
+        '''
+        Remove a value of the prefix, return False if it was not there
+        '''
+        path = []
+        node = self.root
+        for char in prefix:
+            child = node.get(char)
+            if child is None:
+                return False
+            path.append((node, char))
+            node = child
+        values = node.get('')
+        if not values or value not in values:
+            return False
+        del values[value]
+        self.size -= 1
+        if not values:
+            del node['']
+        # Drop the nodes nothing is under anymore
+        while path and not node:
+            node, char = path.pop()
+            del node[char]
+        return True
+
+    def match(self, tag):
+        '''
+        Return the values of all of the prefixes of the tag, the values of
+        shorter prefixes first
+        '''
+        ret = []
+        node = self.root
+        if '' in node:
+            ret.extend(node[''])
+        for char in tag:
+            node = node.get(char)
+            if node is None:
+                break
+            if '' in node:
+                ret.extend(node[''])
+        return ret
+
+    def pop(self, tag):
+        '''
+        Remove and return the values of all of the prefixes of the tag, the
+        values of shorter prefixes first
+        '''
+        ret = []
+        path = [(None, None, self.root)]
+        node = self.root
+        for char in tag:
+            node = node.get(char)
+            if node is None:
+                break
+            path.append((path[-1][2], char, node))
+        for _, _, node in path:
+            values = node.pop('', None)
+            if values:
+                ret.extend(values)
+        self.size -= len(ret)
+        # Drop the nodes nothing is under anymore
+        for parent, char, node in reversed(path):
+            if node or parent is None:
+                break
+            del parent[char]
+        return ret
+
+
+class TagMatcher(object):
+    '''
+    Match tags against a set of glob patterns the way fnmatch.fnmatchcase
+    does. Patterns without glob characters are looked up, patterns ending in
+    their only ``*`` are looked up in a PrefixTrie, only the other globs are
+    matched one after the other.
+    '''
+    def __init__(self, patterns=()):
+        self.exact = {}
+        self.prefixes = PrefixTrie()
+        self.globs = []
+        for pattern, value in patterns:
+            self.add(pattern, value)
+
+    def __len__(self):
+        return (sum(len(values) for values in self.exact.values()) +
+                len(self.prefixes) + len(self.globs))
+
+    def add(self, pattern, value):
+        '''
+        Add a value returned for the tags matching the pattern
+        '''
+        if not GLOB_CHARS.search(pattern):
+            self.exact.setdefault(pattern, []).append(value)
+        elif pattern.endswith('*') and not GLOB_CHARS.search(pattern[:-1]):
+            self.prefixes.add(pattern[:-1], value)
+        else:
+            self.globs.append(
+                (pattern, re.compile(fnmatch.translate(pattern)).match, value))
+
+    def remove(self, pattern, value):
+        '''
+        Remove a value added for the pattern, return False if it was not there
+        '''
+        if not GLOB_CHARS.search(pattern):
+            values = self.exact.get(pattern, [])
+            if value not in values:
+                return False
+            values.remove(value)
+            if not values:
+                del self.exact[pattern]
+            return True
+        if pattern.endswith('*') and not GLOB_CHARS.search(pattern[:-1]):
+            return self.prefixes.remove(pattern[:-1], value)
+        for index, (glob, _, glob_value) in enumerate(self.globs):
+            if glob == pattern and glob_value == value:
+                del self.globs[index]
+                return True
+        return False
+
+    def match(self, tag):
+        '''
+        Return the values of the patterns the tag matches
+        '''
+        ret = list(self.exact.get(tag, ()))
+        if self.prefixes.size:
+            ret.extend(self.prefixes.match(tag))
+        for _, match, value in self.globs:
+            if match(tag):
+                ret.append(value)
+        return ret
@@ -316,6 +316,9 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
 
     env_args = {'extensions': [], 'loader': loader}
 
+    if opts.get('jinja_bytecode_cache', True) and 'cachedir' in opts:
+        env_args['bytecode_cache'] = salt.utils.jinja.SaltBytecodeCache(opts)
+
     if hasattr(jinja2.ext, 'with_'):
         env_args['extensions'].append('jinja2.ext.with_')
     if hasattr(jinja2.ext, 'do'):
@@ -361,7 +364,7 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
         decoded_context[key] = salt.utils.locales.sdecode(value)
 
     try:
-        template = jinja_env.from_string(tmplstr)
+        template = salt.utils.jinja.compile_string(jinja_env, tmplstr)
         template.globals.update(decoded_context)
         output = template.render(**decoded_context)
     except jinja2.exceptions.TemplateSyntaxError as exc:
@@ -29,6 +29,7 @@ from salt.ext.six.moves import range
 from salt.config import minion_config
 # pylint: enable=no-name-in-module,redefined-builtin
 
+import salt.loader
 from salt.loader import LazyLoader, _module_dirs, grains
 
 loader_template = '''
@@ -668,3 +669,97 @@ class LazyLoaderDeepSubmodReloadingTest(TestCase):
                 self.update_lib(lib)
                 self.loader.clear()
                 self._verify_libs()
+
+
+manifest_modules = {
+    'manifest_plain': '''
+def ping():
+    return 'plain'
+''',
+    'manifest_false': '''
+def __virtual__():
+    if __grains__.get('manifest_test') == 'yes':
+        return True
+    return (False, 'manifest_test grain not set')
+
+def ping():
+    return 'false'
+''',
+    'manifest_named': '''
+__virtualname__ = 'renamed'
+
+def __virtual__():
+    return __virtualname__
+
+def ping():
+    return 'named'
+'''}
+
+
+class LazyLoaderManifestTest(TestCase):
+    '''
+    Test loading modules with the loader manifest
+    '''
+    def setUp(self):
+        self.opts = minion_config(None)
+        self.opts['grains'] = {'kernel': 'Linux'}
+        self.opts['loader_manifest'] = True
+        self.module_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.opts['cachedir'] = os.path.join(self.module_dir, 'cache')
+        for name, source in six.iteritems(manifest_modules):
+            self.write(name, source)
+
+    def tearDown(self):
+        shutil.rmtree(self.module_dir)
+
+    def write(self, name, source):
+        with open(os.path.join(self.module_dir, name + '.py'), 'w') as fh_:
+            fh_.write(source)
+
+    def loader(self):
+        '''
+        Return a new loader counting the modules it imports
+        '''
+        loader = LazyLoader([self.module_dir], self.opts, tag='module')
+        loader.imported = []
+
+        def _load_module(name, _load_module=loader._load_module):
+            loader.imported.append(name)
+            return _load_module(name)
+        loader._load_module = _load_module
+        return loader
+
+    def test_manifest(self):
+        '''
+        The modules are only imported to find out what they provide once
+        '''
+        loader = self.loader()
+        self.assertEqual(sorted(loader),
+                         ['manifest_plain.ping', 'renamed.ping'])
+        self.assertEqual(len(loader.imported), 3)
+        self.assertTrue(os.listdir(os.path.join(self.opts['cachedir'],
+                                                'loader')))
+
+        loader = self.loader()
+        self.assertEqual(loader['renamed.ping'](), 'named')
+        self.assertNotIn('manifest_false.ping', loader)
+        self.assertIn('manifest_test grain not set',
+                      loader.missing_fun_string('manifest_false.ping'))
+        self.assertNotIn('other.ping', loader)
+        self.assertEqual(loader.imported, ['manifest_named'])
+
+        # The modules are imported again once what they read changes
+        self.opts['grains']['manifest_test'] = 'yes'
+        loader = self.loader()
+        self.assertEqual(loader['manifest_false.ping'](), 'false')
+        self.assertEqual(loader.imported, ['manifest_false'])
+
+        os.utime(os.path.join(self.module_dir, 'manifest_named.py'), (0, 0))
+        loader = self.loader()
+        self.assertEqual(loader['renamed.ping'](), 'named')
+        self.assertEqual(loader.imported, ['manifest_named'])
+        self.assertIn('renamed.ping', self.loader())
+        salt.loader.clear_manifests(self.opts)
+        loader = self.loader()
+        self.assertEqual(len(loader), 3)
+        self.assertEqual(len(loader.imported), 3)
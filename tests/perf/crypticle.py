@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+'''
+Compare encrypting and decrypting payloads with Crypticle against building
+the messages by concatenation the way it used to.
+
+Usage: python tests/perf/crypticle.py [size in KB ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import os
+import sys
+import hmac
+import time
+import hashlib
+
+# Import third party libs
+from Crypto.Cipher import AES
+
+# Import salt libs
+import salt.crypt
+
+
+def old_encrypt(keys, data):
+    '''
+    Encrypt data by concatenation
+    '''
+    aes_key, hmac_key = keys
+    pad = 16 - len(data) % 16
+    data = data + bytearray([pad]) * pad
+    iv_bytes = os.urandom(16)
+    data = iv_bytes + AES.new(aes_key, AES.MODE_CBC, iv_bytes).encrypt(
+        bytes(data))
+    return data + hmac.new(hmac_key, data, hashlib.sha256).digest()
+
+
+def old_decrypt(keys, data):
+    '''
+    Decrypt data by slicing and compare the signature byte by byte
+    '''
+    aes_key, hmac_key = keys
+    sig = data[-32:]
+    data = data[:-32]
+    mac_bytes = hmac.new(hmac_key, data, hashlib.sha256).digest()
+    result = 0
+    for zipped_x, zipped_y in zip(bytearray(mac_bytes), bytearray(sig)):
+        result |= zipped_x ^ zipped_y
+    assert result == 0
+    data = AES.new(aes_key, AES.MODE_CBC, data[:16]).decrypt(data[16:])
+    return data[:-bytearray(data[-1:])[0]]
+
+
+def timed(func, *args):
+    start = time.time()
+    runs = 0
+    while True:
+        ret = func(*args)
+        runs += 1
+        if time.time() - start > 0.5:
+            return ret, (time.time() - start) / runs
+
+
+def run(size):
+    key = salt.crypt.Crypticle.generate_key_string()
+    data = os.urandom(size * 1024)
+    old = salt.crypt.Crypticle({}, key)
+    gcm = salt.crypt.Crypticle({'aes_gcm': True}, key)
+    message, old_enc = timed(old_encrypt, old.keys, data)
+    assert timed(old_decrypt, old.keys, message)[0] == data
+    old_dec = timed(old_decrypt, old.keys, message)[1]
+    message, enc = timed(old.encrypt, data)
+    assert old_decrypt(old.keys, message) == data
+    dec = timed(old.decrypt, message)[1]
+    times = [old_enc, old_dec, enc, dec]
+    if salt.crypt.HAS_AES_GCM:
+        message, gcm_enc = timed(gcm.encrypt, data)
+        times.extend([gcm_enc, timed(gcm.decrypt, message)[1]])
+    print('{0:>9} KB: concat {1:9.2f}/{2:9.2f} ms  buffer {3:9.2f}/{4:9.2f} ms'
+          .format(size, *[val * 1000 for val in times[:4]]) +
+          ('  gcm {0:9.2f}/{1:9.2f} ms'.format(*[val * 1000 for val in times[4:]])
+           if len(times) > 4 else ''))
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or (1, 64, 1024, 10240, 102400):
+        run(size)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+'''
+Compare how long the event bus waits for a slow event returner when the
+events are stored inline, the way the EventReturn process used to, with
+queueing them on a ReturnerPipeline.
+
+Usage: python tests/perf/event_return.py [events ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+from salt.utils.event import ReturnerPipeline
+
+BATCH = 100
+
+
+def returner(events):
+    # A database taking a while to commit a transaction
+    time.sleep(0.05 + 0.0005 * len(events))
+
+
+def run(count):
+    events = [{'tag': 'salt/job/{0}/ret/web1'.format(num),
+               'data': {'return': True}} for num in range(count)]
+
+    start = time.time()
+    queue = []
+    for evt in events:
+        queue.append(evt)
+        if len(queue) >= BATCH:
+            returner(queue)
+            del queue[:]
+    inline = time.time() - start
+
+    tmp_dir = tempfile.mkdtemp()
+    pipeline = ReturnerPipeline('perf', returner,
+                                os.path.join(tmp_dir, 'perf.queue'),
+                                batch_size=BATCH, buffer_size=1000)
+    pipeline.start()
+    start = time.time()
+    for evt in events:
+        pipeline.put(evt)
+    queued = time.time() - start
+    pipeline.stop()
+    pipeline.join()
+    stored = time.time() - start
+    stats = pipeline.stats()
+    shutil.rmtree(tmp_dir)
+    print('{0:>6} events: inline {1:7.3f}s  pipeline {2:7.3f}s to queue, '
+          '{3:7.3f}s to store ({4} spilled to disk)'.format(
+              count, inline, queued, stored, stats['spilled']))
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (1000, 10000):
+        run(count)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+'''
+Compare building the file lists of the roots fileserver backend by walking
+the file_roots with the incremental snapshot.
+
+Usage: python tests/perf/file_lists.py [count ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+import salt.utils
+from salt.fileserver import roots
+
+
+def populate(root, count):
+    '''
+    Write count files in directories of 100 files
+    '''
+    for num in range(count):
+        path = os.path.join(root, 'dir{0}'.format(num // 100),
+                            'file{0}.sls'.format(num))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write('')
+
+
+def run(count):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(tmpdir, 'base')
+        populate(root, count)
+        opts = roots.__opts__ = {'cachedir': os.path.join(tmpdir, 'cache'),
+                                 'file_roots': {'base': [root]},
+                                 'hash_type': 'md5',
+                                 'fileserver_followsymlinks': True,
+                                 'fileserver_ignoresymlinks': False,
+                                 'fileserver_list_cache_time': 0,
+                                 'file_ignore_regex': False,
+                                 'file_ignore_glob': False}
+        load = {'saltenv': 'base'}
+
+        start = time.time()
+        walked = roots.file_list(load)
+        walk = time.time() - start
+
+        opts['fileserver_list_cache_incremental'] = True
+        start = time.time()
+        roots._update_file_lists()
+        cold = time.time() - start
+        # Let the mtime of the directories settle
+        time.sleep(2)
+        roots._update_file_lists()
+        start = time.time()
+        roots._update_file_lists()
+        warm = time.time() - start
+
+        start = time.time()
+        snapshot = roots.file_list(load)
+        first = time.time() - start
+        start = time.time()
+        roots.file_list(load)
+        again = time.time() - start
+        assert snapshot == walked
+        print('{0:>7} files: walk {1:7.3f}s  index build {2:7.3f}s  '
+              'index update {3:7.3f}s  snapshot read {4:7.3f}s / {5:7.3f}s'
+              .format(count, walk, cold, warm, first, again))
+    finally:
+        roots._SNAPSHOTS.clear()
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (10000, 100000):
+        run(count)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+'''
+Compare storing and reading the returns of a job to many minions with the
+local_cache and local_segment_cache job caches.
+
+Usage: python tests/perf/job_cache.py [count ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import sys
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+import salt.utils.atomicfile  # pylint: disable=unused-import
+from salt.returners import local_cache, local_segment_cache
+
+RETURNERS = (('local_cache', local_cache),
+             ('local_segment_cache', local_segment_cache))
+
+
+def run(count):
+    minions = ['minion{0:06d}'.format(num) for num in range(count)]
+    for name, returner in RETURNERS:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            returner.__opts__ = {'cachedir': tmpdir,
+                                 'hash_type': 'md5',
+                                 'keep_jobs': 0.0000001,
+                                 'job_cache_segment_seconds': 1,
+                                 'job_cache_batch_size': 100,
+                                 'job_cache_batch_interval': 0.1}
+            start = time.time()
+            jid = returner.prep_jid()
+            returner.save_load(jid, {'fun': 'test.ping', 'arg': [],
+                                     'tgt': '*', 'tgt_type': 'glob'},
+                               minions=minions)
+            for minion in minions:
+                returner.returner({'jid': jid, 'id': minion, 'return': True})
+            stored = time.time() - start
+
+            start = time.time()
+            assert len(returner.get_jid(jid)) == count
+            read = time.time() - start
+
+            time.sleep(2)
+            start = time.time()
+            returner.clean_old_jobs()
+            cleaned = time.time() - start
+            assert not returner.get_jid(jid)
+            print('{0:>6} returns: {1:<20} store {2:7.3f}s  read {3:7.3f}s  '
+                  'clean {4:7.3f}s'.format(count, name, stored, read, cleaned))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (1000, 10000):
+        run(count)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+'''
+Compare the time from handing a trivial job to a multiprocessing minion until
+it ran, forking and daemonizing a process per job as the minion does without
+job workers, and running it in a JobWorkerPool.
+
+Usage: python tests/perf/job_workers.py [jobs]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+import salt.config
+import salt.loader
+import salt.minion
+import salt.utils
+from salt.utils.process import SignalHandlingMultiprocessingProcess
+
+
+class PerfMinion(object):
+    '''
+    A minion with its execution modules loaded, jobs write a byte to a pipe
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.proc_dir = salt.minion.get_proc_dir(opts['cachedir'])
+        self.functions = salt.loader.minion_mods(opts)
+        self.functions['test.ping']  # pylint: disable=pointless-statement
+        self.returners = {}
+        self.rfd, self.wfd = os.pipe()
+
+    @classmethod
+    def _target(cls, minion_instance, opts, data, connected):
+        if not getattr(minion_instance, 'job_worker', False):
+            salt.utils.daemonize_if(opts)
+        minion_instance.functions['test.ping']()
+        os.write(minion_instance.wfd, b'x')
+        if not getattr(minion_instance, 'job_worker', False):
+            os._exit(0)  # pylint: disable=protected-access
+
+
+def forked(minion, jobs):
+    start = time.time()
+    for jid in range(jobs):
+        process = SignalHandlingMultiprocessingProcess(
+            target=minion._target,
+            args=(minion, minion.opts, {'jid': str(jid)}, True))
+        process.start()
+        process.join()
+        os.read(minion.rfd, 1)
+    return (time.time() - start) / jobs
+
+
+def pooled(minion, jobs):
+    pool = salt.minion.JobWorkerPool(minion)
+    pool.fill()
+    # Let the workers start
+    pool.dispatch({'jid': 'warm'}, True)
+    os.read(minion.rfd, 1)
+    pool.workers[0].parent_conn.poll(5)
+    start = time.time()
+    for jid in range(jobs):
+        assert pool.dispatch({'jid': str(jid)}, True)
+        os.read(minion.rfd, 1)
+        for worker in pool.workers:
+            if worker.busy:
+                worker.parent_conn.poll(5)
+    elapsed = (time.time() - start) / jobs
+    pool.stop()
+    return elapsed
+
+
+if __name__ == '__main__':
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    opts = salt.config.minion_config(None)
+    opts['cachedir'] = tempfile.mkdtemp()
+    opts['grains'] = salt.loader.grains(opts)
+    opts['job_workers'] = 1
+    opts['job_worker_max_jobs'] = 0
+    try:
+        minion = PerfMinion(opts)
+        print('fork per job: {0:7.2f}ms per job'.format(
+            forked(minion, jobs) * 1000))
+        print('job workers:  {0:7.2f}ms per job'.format(
+            pooled(minion, jobs) * 1000))
+    finally:
+        shutil.rmtree(opts['cachedir'])
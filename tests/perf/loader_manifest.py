@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+'''
+Compare building the execution module loader of a minion and looking up
+functions with it, with and without the loader manifest. Every run is made in
+a new interpreter, the way the minion and its job processes start.
+
+Usage: python tests/perf/loader_manifest.py [function ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import sys
+import time
+import json
+import shutil
+import tempfile
+import subprocess
+
+# Import salt libs
+import salt.config
+import salt.loader
+
+
+def run(cachedir, manifest, funs):
+    '''
+    Look up the functions with a new loader, then load all of them
+    '''
+    opts = salt.config.minion_config(None)
+    opts['cachedir'] = cachedir
+    opts['loader_manifest'] = manifest
+    opts['grains'] = salt.loader.grains(opts)
+    start = time.time()
+    loader = salt.loader.minion_mods(opts)
+    for fun in funs:
+        fun in loader  # pylint: disable=pointless-statement
+    lookup_time = time.time() - start
+    imported = len([name for name in sys.modules
+                    if name.startswith('salt.loaded.int.module.')])
+    start = time.time()
+    functions = sorted(loader)
+    return {'lookup': lookup_time,
+            'imported': imported,
+            'all': time.time() - start,
+            'functions': functions}
+
+
+def spawn(cachedir, manifest, funs):
+    out = subprocess.check_output(
+        [sys.executable, __file__, '--run', cachedir, str(int(manifest))] + funs)
+    return json.loads(out.splitlines()[-1])
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        print(json.dumps(run(sys.argv[2], sys.argv[3] == '1', sys.argv[4:])))
+        sys.exit(0)
+    funs = sys.argv[1:] or ['test.ping', 'pkg.install', 'service.status',
+                            'cmd.run', 'missing.fun']
+    cachedir = tempfile.mkdtemp()
+    try:
+        plain = spawn(cachedir, False, funs)
+        # The first run with the manifest records it
+        spawn(cachedir, True, funs)
+        manifest = spawn(cachedir, True, funs)
+    finally:
+        shutil.rmtree(cachedir)
+    for name, ret in (('no manifest', plain), ('with manifest', manifest)):
+        print('{0:>13}: lookups {1:6.3f}s ({2} modules imported)  '
+              'load all {3:6.3f}s'.format(
+                  name, ret['lookup'], ret['imported'], ret['all']))
+    assert plain['functions'] == manifest['functions']
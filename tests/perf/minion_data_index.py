@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+'''
+Compare grain targeting through the minion data index with a scan of the
+minion data cache.
+
+Usage: python tests/perf/minion_data_index.py [count ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Import salt libs
+import salt.payload
+import salt.utils
+import salt.utils.minions
+
+OSES = ('Ubuntu', 'CentOS', 'Debian', 'SUSE', 'Windows')
+ROLES = ('web', 'db', 'cache', 'queue', 'worker', 'lb')
+TARGETS = (
+    ('exact', 'os:Ubuntu', {}),
+    ('glob', 'role:w*', {}),
+    ('pcre', 'os:(ubuntu|debian)', {'regex_match': True}),
+)
+
+
+def populate(opts, count):
+    '''
+    Write a synthetic minion data cache and accepted keys for count minions
+    '''
+    serial = salt.payload.Serial(opts)
+    pki = os.path.join(opts['pki_dir'], 'minions')
+    os.makedirs(pki)
+    for num in range(count):
+        minion_id = 'minion{0:06d}'.format(num)
+        with salt.utils.fopen(os.path.join(pki, minion_id), 'w+') as fp_:
+            fp_.write('key')
+        cdir = os.path.join(opts['cachedir'], 'minions', minion_id)
+        os.makedirs(cdir)
+        grains = {'id': minion_id,
+                  'os': OSES[num % len(OSES)],
+                  'role': ROLES[num % len(ROLES)],
+                  'num_cpus': 2 ** (num % 5),
+                  'ipv4': ['127.0.0.1', '10.{0}.{1}.{2}'.format(
+                      num >> 16, (num >> 8) & 255, num & 255)]}
+        pillar = {'datacenter': 'dc{0}'.format(num % 3),
+                  'app': {'version': '1.{0}'.format(num % 10)}}
+        with salt.utils.fopen(os.path.join(cdir, 'data.p'), 'w+b') as fp_:
+            fp_.write(serial.dumps({'grains': grains, 'pillar': pillar}))
+
+
+def timeit(fun, repeat=3):
+    '''
+    Return the best wall time of repeat calls to fun, and its last result
+    '''
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        ret = fun()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, ret
+
+
+def run(count):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        opts = {'cachedir': os.path.join(tmpdir, 'cache'),
+                'pki_dir': os.path.join(tmpdir, 'pki'),
+                'minion_data_cache': True,
+                'transport': 'zeromq'}
+        populate(opts, count)
+        ckminions = salt.utils.minions.CkMinions(opts)
+        index = salt.utils.minions.get_data_index(opts)
+        start = time.time()
+        index.refresh()
+        print('{0:>6} minions: cold index build {1:8.3f}s'.format(
+            count, time.time() - start))
+        for name, expr, kwargs in TARGETS:
+            def scan():
+                opts['minion_data_cache_index'] = False
+                return ckminions._check_cache_minions(
+                    expr, ':', False, 'grains', **kwargs)
+
+            def lookup():
+                opts['minion_data_cache_index'] = True
+                return ckminions._check_cache_minions(
+                    expr, ':', False, 'grains', **kwargs)
+
+            scan_time, scanned = timeit(scan)
+            index_time, indexed = timeit(lookup)
+            assert sorted(scanned) == sorted(indexed)
+            print('{0:>6} minions: {1:<5} scan {2:8.3f}s  index {3:8.3f}s  '
+                  '({4} matched, {5:.1f}x)'.format(
+                      count, name, scan_time, index_time, len(indexed),
+                      scan_time / max(index_time, 1e-9)))
+    finally:
+        salt.utils.minions._ACCEPTED_KEYS.clear()
+        salt.utils.minions._DATA_INDEXES.clear()
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (1000, 10000, 50000):
+        run(count)
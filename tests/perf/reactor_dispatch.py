@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+'''
+Compare matching event tags against every entry of a reactor map with fnmatch
+with looking them up in the TagMatcher the reactor compiles the map into.
+
+Usage: python tests/perf/reactor_dispatch.py [rules ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import sys
+import time
+import fnmatch
+
+# Import salt libs
+from salt.utils.tagmatch import TagMatcher
+
+
+def run(count, events=5000):
+    patterns = []
+    for num in range(count):
+        kind = num % 4
+        if kind == 0:
+            patterns.append('app/{0}/deploy'.format(num))
+        elif kind == 1:
+            patterns.append('salt/minion/web{0}/*'.format(num))
+        elif kind == 2:
+            patterns.append('salt/job/*/ret/web{0}'.format(num))
+        else:
+            patterns.append('salt/cloud/vm{0}?/created'.format(num))
+    tags = ['app/{0}/deploy'.format(num % count) for num in range(events // 2)]
+    tags += ['salt/job/{0}/ret/web{1}'.format(num, num % count)
+             for num in range(events // 2)]
+
+    start = time.time()
+    scanned = [[index for index, pattern in enumerate(patterns)
+                if fnmatch.fnmatch(tag, pattern)] for tag in tags]
+    scanned_time = time.time() - start
+    start = time.time()
+    matcher = TagMatcher(
+        (pattern, index) for index, pattern in enumerate(patterns))
+    matched = [sorted(matcher.match(tag)) for tag in tags]
+    matched_time = time.time() - start
+    assert scanned == matched
+    print('{0:>6} rules, {1} events: fnmatch {2:8.3f}s  matcher {3:8.3f}s'
+          .format(count, len(tags), scanned_time, matched_time))
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (10, 100):
+        run(count)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+'''
+Compare running reactions inline, one event after the other, with running
+them on a ReactionPool when some of the events react with a slow runner.
+
+Usage: python tests/perf/reactor_pool.py [events ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import sys
+import time
+import threading
+
+# Import salt libs
+from salt.utils.reactor import ReactionPool
+
+
+def reaction(kind, latencies, queued, lock):
+    # A runner calling out to a slow service, a local publish is quick
+    time.sleep(0.2 if kind == 'runner' else 0.001)
+    with lock:
+        latencies.append(time.time() - queued)
+
+
+def run(count):
+    lock = threading.Lock()
+    events = [('runner' if num % 10 == 0 else 'local', num)
+              for num in range(count)]
+
+    latencies = []
+    start = time.time()
+    for kind, _ in events:
+        reaction(kind, latencies, start, lock)
+    inline = max(latencies)
+
+    latencies = []
+    pool = ReactionPool(10, limits={'runner': 4})
+    start = time.time()
+    for kind, num in events:
+        pool.submit(('tag', num % 50), kind, reaction,
+                    (kind, latencies, start, lock))
+    while len(latencies) < count:
+        time.sleep(0.01)
+    print('{0:>6} events: inline {1:8.3f}s  pool {2:8.3f}s'.format(
+        count, inline, max(latencies)))
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (100, 1000):
+        run(count)
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark the master request server.
+
+A real ReqServer with its MWorkers is started on localhost, then client
+processes simulating many minions authenticate to it and send ``_return``,
+``_pillar``, ``_file_hash`` and ``_serve_file`` requests through the minion
+request channels of the chosen transport. All of the simulated minions share
+one synthetic key pair, accepted on the master under each of their ids.
+
+For each command the number of requests per second, the 50th and 99th
+percentiles of the latency and the CPU time used by the master processes per
+request are reported, so that changes to the transports, the crypto or the
+number of workers can be compared.
+
+Usage: python tests/perf/req_server.py [options]
+'''
+
+# Import Python libs
+from __future__ import absolute_import, print_function
+import math
+import multiprocessing
+import optparse
+import os
+import shutil
+import socket
+import tempfile
+import time
+
+# Import third party libs
+import yaml
+import tornado.gen
+import tornado.ioloop
+try:
+    import zmq.eventloop.ioloop
+    LOOP_CLASS = zmq.eventloop.ioloop.ZMQIOLoop
+except ImportError:
+    LOOP_CLASS = tornado.ioloop.IOLoop
+try:
+    import salt.utils.psutil_compat as psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+# Import salt libs
+import salt.config
+import salt.crypt
+import salt.loader
+import salt.log.setup
+import salt.master
+import salt.transport.client
+import salt.utils
+import salt.utils.event
+import salt.utils.process
+from salt.ext.six.moves import range  # pylint: disable=import-error,redefined-builtin
+
+COMMANDS = ('_auth', '_return', '_pillar', '_file_hash', '_serve_file')
+
+
+def parse():
+    '''
+    Parse the cli options
+    '''
+    parser = optparse.OptionParser()
+    parser.add_option(
+        '-m',
+        '--minions',
+        dest='minions',
+        default=500,
+        type='int',
+        help='The number of minions to simulate')
+    parser.add_option(
+        '-w',
+        '--workers',
+        dest='workers',
+        default=4,
+        type='int',
+        help='The number of MWorkers of the master')
+    parser.add_option(
+        '-t',
+        '--transport',
+        dest='transport',
+        default='zeromq',
+        help='The transport to benchmark, zeromq or tcp')
+    parser.add_option(
+        '-n',
+        '--requests',
+        dest='requests',
+        default=1000,
+        type='int',
+        help='The number of requests sent for each command')
+    parser.add_option(
+        '-c',
+        '--clients',
+        dest='clients',
+        default=2,
+        type='int',
+        help='The number of client processes sending the requests')
+    parser.add_option(
+        '--concurrency',
+        dest='concurrency',
+        default=50,
+        type='int',
+        help='The number of requests in flight in each client process')
+    parser.add_option(
+        '--commands',
+        dest='commands',
+        default=','.join(COMMANDS[1:]),
+        help='The comma separated commands to benchmark')
+    parser.add_option(
+        '--file-size',
+        dest='file_size',
+        default=65536,
+        type='int',
+        help='The size of the file hashed and served')
+    parser.add_option(
+        '--keysize',
+        dest='keysize',
+        default=2048,
+        type='int',
+        help='The size of the RSA keys')
+    parser.add_option(
+        '-l',
+        '--log-level',
+        dest='log_level',
+        default='warning',
+        help='The level of the messages logged to the console')
+    options, _ = parser.parse_args()
+    return options
+
+
+def _free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _write(path, data):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with salt.utils.fopen(path, 'wb') as fp_:
+        fp_.write(data)
+
+
+class ReqServerBench(object):
+    '''
+    Run a master request server and the minions hammering it
+    '''
+    def __init__(self, options):
+        self.options = options
+        self.root = tempfile.mkdtemp(prefix='req-bench-')
+        self.minion_ids = ['minion{0:06d}'.format(num)
+                           for num in range(options.minions)]
+        self.process_manager = None
+        self.clients = []
+
+    def _config(self, name, config):
+        path = os.path.join(self.root, 'conf', name)
+        _write(path, yaml.safe_dump(config, default_flow_style=False))
+        return path
+
+    def setup(self):
+        '''
+        Write the configuration, keys, files and pillar used by the run
+        '''
+        port = _free_port()
+        self.master_opts = salt.config.master_config(self._config('master', {
+            'root_dir': self.root,
+            'pki_dir': os.path.join(self.root, 'pki', 'master'),
+            'cachedir': os.path.join(self.root, 'cache', 'master'),
+            'sock_dir': os.path.join(self.root, 'sock', 'master'),
+            'log_file': os.path.join(self.root, 'master.log'),
+            'user': salt.utils.get_user(),
+            'interface': '127.0.0.1',
+            'ret_port': port,
+            'publish_port': _free_port(),
+            'transport': self.options.transport,
+            'worker_threads': self.options.workers,
+            'keysize': self.options.keysize,
+            'file_roots': {'base': [os.path.join(self.root, 'files')]},
+            'pillar_roots': {'base': [os.path.join(self.root, 'pillar')]},
+        }))
+        self.minion_opts = salt.config.minion_config(self._config('minion', {
+            'root_dir': self.root,
+            'pki_dir': os.path.join(self.root, 'pki', 'minion'),
+            'cachedir': os.path.join(self.root, 'cache', 'minion'),
+            'sock_dir': os.path.join(self.root, 'sock', 'minion'),
+            'log_file': os.path.join(self.root, 'minion.log'),
+            'master': '127.0.0.1',
+            'master_port': port,
+            'transport': self.options.transport,
+            'keysize': self.options.keysize,
+            'acceptance_wait_time': 1,
+        }))
+        self.minion_opts.update({
+            'master_ip': '127.0.0.1',
+            'master_uri': 'tcp://127.0.0.1:{0}'.format(port),
+        })
+
+        for path in (self.master_opts['cachedir'],
+                     self.master_opts['sock_dir'],
+                     self.minion_opts['cachedir'],
+                     self.minion_opts['pki_dir']):
+            os.makedirs(path)
+
+        # One synthetic key pair, accepted for all of the minions
+        salt.crypt.gen_keys(self.minion_opts['pki_dir'], 'minion',
+                            self.options.keysize)
+        with salt.utils.fopen(os.path.join(self.minion_opts['pki_dir'],
+                                           'minion.pub')) as fp_:
+            pub = fp_.read()
+        accepted = os.path.join(self.master_opts['pki_dir'], 'minions')
+        for minion_id in self.minion_ids:
+            _write(os.path.join(accepted, minion_id), pub)
+
+        _write(os.path.join(self.root, 'files', 'bench', 'file'),
+               os.urandom(self.options.file_size))
+        _write(os.path.join(self.root, 'pillar', 'top.sls'),
+               b"base:\n  '*':\n    - bench\n")
+        _write(os.path.join(self.root, 'pillar', 'bench.sls'),
+               yaml.safe_dump({'key{0}'.format(num): {'value': num}
+                               for num in range(50)}))
+
+    def start_master(self):
+        '''
+        Start the event publisher and the request server of the master
+        '''
+        smaster = salt.master.SMaster(self.master_opts)
+        salt.master.SMaster.secrets['aes'] = {
+            'secret': multiprocessing.Array(
+                'c', salt.crypt.Crypticle.generate_key_string().encode('ascii')),
+            'reload': salt.crypt.Crypticle.generate_key_string}
+        self.process_manager = salt.utils.process.ProcessManager(
+            name='ReqServerBench_ProcessManager')
+        self.process_manager.add_process(salt.utils.event.EventPublisher,
+                                         args=(self.master_opts,))
+        self.process_manager.add_process(salt.master.ReqServer,
+                                         args=(self.master_opts,
+                                               smaster.key,
+                                               smaster.master_key))
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(
+                    ('127.0.0.1', self.master_opts['ret_port']), 1).close()
+                break
+            except socket.error:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+        # Let the workers connect to the request server
+        time.sleep(1)
+
+    def start_clients(self):
+        '''
+        Start the client processes, each of them simulating its share of the
+        minions
+        '''
+        for num in range(self.options.clients):
+            conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_client,
+                args=(self.minion_opts,
+                      self.minion_ids[num::self.options.clients],
+                      self.options.concurrency,
+                      child_conn))
+            process.start()
+            self.clients.append((process, conn))
+
+    def _master_cpu(self):
+        '''
+        Return the CPU time used so far by the master processes
+        '''
+        if not HAS_PSUTIL:
+            return None
+        clients = set(process.pid for process, _ in self.clients)
+        cpu = 0
+        for proc in psutil.Process(os.getpid()).children(recursive=True):
+            if proc.pid in clients:
+                continue
+            try:
+                times = proc.cpu_times()
+            except psutil.NoSuchProcess:
+                continue
+            cpu += times.user + times.system
+        return cpu
+
+    def run_command(self, command, count):
+        '''
+        Send count requests of the command and return the latencies of the
+        requests, the elapsed time and the CPU time of the master
+        '''
+        jids = []
+        if command == '_return':
+            # Each minion returns once for each job
+            returners = salt.loader.returners(self.master_opts, {})
+            prep_jid = returners['{0}.prep_jid'.format(
+                self.master_opts['master_job_cache'])]
+            jids = [prep_jid() for _ in range(int(math.ceil(
+                float(count) / len(self.minion_ids))) + 1)]
+        cpu = self._master_cpu()
+        start = time.time()
+        for process, conn in self.clients:
+            conn.send((command, count // len(self.clients), jids))
+        latencies = []
+        for process, conn in self.clients:
+            latencies.extend(conn.recv())
+        elapsed = time.time() - start
+        if cpu is not None:
+            cpu = self._master_cpu() - cpu
+        return latencies, elapsed, cpu
+
+    def stop(self):
+        for process, conn in self.clients:
+            conn.send((None, 0, None))
+            process.join(10)
+        if self.process_manager is not None:
+            self.process_manager.stop_restarting()
+            self.process_manager.kill_children()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _percentile(latencies, percent):
+    return latencies[int(round(percent / 100.0 * (len(latencies) - 1)))]
+
+
+def _client(opts, minion_ids, concurrency, conn):
+    '''
+    Simulate minions until asked to stop, running the commands received
+    from the benchmark
+    '''
+    io_loop = LOOP_CLASS()
+    channels = {}
+    while True:
+        command, count, jids = conn.recv()
+        if command is None:
+            # Leave without tearing down the channels one by one
+            conn.close()
+            os._exit(0)  # pylint: disable=protected-access
+        if command == '_auth':
+            count = len(minion_ids)
+        conn.send(io_loop.run_sync(
+            lambda: _send(io_loop, opts, channels, minion_ids, command,
+                          count, concurrency, jids)))
+
+
+@tornado.gen.coroutine
+def _send(io_loop, opts, channels, minion_ids, command, count, concurrency,
+          jids):
+    '''
+    Send count requests with the given concurrency and return their latency
+    '''
+    latencies = []
+    requests = iter(range(count))
+
+    @tornado.gen.coroutine
+    def _sender():
+        for num in requests:
+            minion_id = minion_ids[num % len(minion_ids)]
+            start = time.time()
+            if minion_id not in channels:
+                minion_opts = dict(opts, id=minion_id)
+                channels[minion_id] = salt.transport.client.AsyncReqChannel.factory(
+                    minion_opts, io_loop=io_loop)
+            channel = channels[minion_id]
+            if command == '_auth':
+                yield channel.auth.authenticate()
+            elif command == '_return':
+                yield channel.send({'cmd': '_return',
+                                    'id': minion_id,
+                                    'jid': jids[num // len(minion_ids)],
+                                    'fun': 'test.ping',
+                                    'fun_args': [],
+                                    'return': True,
+                                    'retcode': 0,
+                                    'success': True})
+            elif command == '_pillar':
+                yield channel.crypted_transfer_decode_dictentry(
+                    {'cmd': '_pillar',
+                     'id': minion_id,
+                     'grains': {'id': minion_id, 'os': 'Bench'},
+                     'saltenv': 'base',
+                     'pillarenv': None,
+                     'pillar_override': {},
+                     'ver': '2'},
+                    dictkey='pillar')
+            elif command == '_file_hash':
+                yield channel.send({'cmd': '_file_hash',
+                                    'path': 'bench/file',
+                                    'saltenv': 'base'})
+            elif command == '_serve_file':
+                yield channel.send({'cmd': '_serve_file',
+                                    'path': 'bench/file',
+                                    'loc': 0,
+                                    'saltenv': 'base'})
+            latencies.append(time.time() - start)
+
+    yield [_sender() for _ in range(concurrency)]
+    raise tornado.gen.Return(latencies)
+
+
+def main():
+    options = parse()
+    salt.log.setup.setup_console_logger(log_level=options.log_level)
+    bench = ReqServerBench(options)
+    try:
+        bench.setup()
+        bench.start_master()
+        bench.start_clients()
+        print('{0} transport, {1} workers, {2} minions, {3} clients sending '
+              '{4} requests at once'.format(
+                  options.transport, options.workers, options.minions,
+                  options.clients, options.clients * options.concurrency))
+        print('{0:<12} {1:>8} {2:>9} {3:>8} {4:>8} {5:>13}'.format(
+            'command', 'requests', 'req/s', 'p50 ms', 'p99 ms', 'cpu ms/req'))
+        commands = ['_auth'] + [command for command in options.commands.split(',')
+                                if command in COMMANDS[1:]]
+        for command in commands:
+            latencies, elapsed, cpu = bench.run_command(command, options.requests)
+            latencies.sort()
+            print('{0:<12} {1:>8} {2:>9.1f} {3:>8.2f} {4:>8.2f} {5:>13}'.format(
+                command,
+                len(latencies),
+                len(latencies) / elapsed,
+                _percentile(latencies, 50) * 1000,
+                _percentile(latencies, 99) * 1000,
+                '-' if cpu is None else '{0:.2f}'.format(
+                    cpu * 1000 / len(latencies))))
+    finally:
+        bench.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+'''
+Load test of the saltnado EventListener: N concurrent HTTP clients long-poll
+for the return of their job while synthetic bus traffic is fed to the
+listener. Compares matching every registered tag prefix with startswith with
+the prefix trie.
+
+Usage: python tests/perf/saltnado_events.py [clients ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import sys
+import time
+from collections import defaultdict
+
+# Import 3rd-party libs
+import tornado.gen
+import tornado.web
+import tornado.ioloop
+import tornado.httpclient
+import tornado.testing
+import tornado.httpserver
+from tornado.concurrent import Future
+
+# Import salt libs
+import salt.payload
+import salt.utils.event
+from salt.netapi.rest_tornado import saltnado
+
+# Bus events per IO loop wakeup which no client waits for
+NOISE = 50
+POLLS = 5
+
+
+class SyntheticBus(object):
+    '''
+    Stands in for the master event bus
+    '''
+    serial = salt.payload.Serial({'serial': 'msgpack'})
+    unpack = staticmethod(salt.utils.event.SaltEvent.unpack)
+
+    def pack(self, tag, data):
+        return tag + salt.utils.event.TAGEND + self.serial.dumps(data)
+
+
+class TrieListener(saltnado.EventListener):
+    def __init__(self):  # pylint: disable=super-init-not-called
+        self.event = SyntheticBus()
+        self.tag_map = saltnado.salt.utils.tagmatch.PrefixTrie()
+        self.request_map = defaultdict(list)
+        self.timeout_map = {}
+
+
+class LinearListener(TrieListener):
+    '''
+    Dispatch events the way the EventListener did before the prefix trie
+    '''
+    def __init__(self):  # pylint: disable=super-init-not-called
+        TrieListener.__init__(self)
+        self.tag_map = defaultdict(list)
+
+    def get_event(self, request, tag='', callback=None, timeout=None):
+        future = Future()
+        self.tag_map[tag].append(future)
+        self.request_map[request].append((tag, future))
+        return future
+
+    def _timeout_future(self, tag, future):
+        if tag not in self.tag_map:
+            return
+        if not future.done():
+            future.set_exception(saltnado.TimeoutException())
+            self.tag_map[tag].remove(future)
+        if len(self.tag_map[tag]) == 0:
+            del self.tag_map[tag]
+
+    def _handle_event_socket_recv(self, raws):
+        for raw in raws:
+            mtag, data = self.event.unpack(raw, self.event.serial)
+            for tag_prefix, futures in list(self.tag_map.items()):
+                if mtag.startswith(tag_prefix):
+                    for future in list(futures):
+                        if future.done():
+                            continue
+                        future.set_result({'data': data, 'tag': mtag})
+                        self.tag_map[tag_prefix].remove(future)
+
+
+class WaitHandler(tornado.web.RequestHandler):  # pylint: disable=W0223
+    @tornado.gen.coroutine
+    def get(self, job):
+        listener = self.application.event_listener
+        ret = yield listener.get_event(
+            self, tag='salt/job/{0}/ret/'.format(job))
+        listener.clean_timeout_futures(self)
+        self.write(ret['data'])
+
+
+def run(clients, listener):
+    io_loop = tornado.ioloop.IOLoop()
+    io_loop.make_current()
+    app = tornado.web.Application([(r'/wait/(\d+)', WaitHandler)])
+    app.event_listener = listener
+    sock, port = tornado.testing.bind_unused_port()
+    server = tornado.httpserver.HTTPServer(app, io_loop=io_loop)
+    server.add_sockets([sock])
+    http = tornado.httpclient.AsyncHTTPClient(io_loop=io_loop,
+                                              max_clients=clients)
+    bus = listener.event
+    noise = [bus.pack('salt/minion/web{0}/start'.format(num), {'id': num})
+             for num in range(NOISE)]
+    state = {'running': True, 'dispatch': 0.0}
+    latencies = []
+
+    @tornado.gen.coroutine
+    def feed():
+        num = 0
+        while state['running']:
+            # The returns of a few jobs among the other traffic
+            raws = list(noise)
+            for _ in range(10):
+                num = (num + 1) % clients
+                raws.append(bus.pack('salt/job/{0}/ret/minion'.format(num),
+                                     {'return': True}))
+            start = time.time()
+            listener._handle_event_socket_recv(raws)
+            state['dispatch'] += time.time() - start
+            yield tornado.gen.sleep(0.001)
+
+    @tornado.gen.coroutine
+    def client(num):
+        for _ in range(POLLS):
+            start = time.time()
+            yield http.fetch('http://127.0.0.1:{0}/wait/{1}'.format(port, num))
+            latencies.append(time.time() - start)
+
+    @tornado.gen.coroutine
+    def main():
+        io_loop.spawn_callback(feed)
+        start = time.time()
+        yield [client(num) for num in range(clients)]
+        state['running'] = False
+        raise tornado.gen.Return(time.time() - start)
+
+    total = io_loop.run_sync(main)
+    server.stop()
+    http.close()
+    io_loop.close(all_fds=True)
+    latencies.sort()
+    return total, state['dispatch'], latencies[len(latencies) // 2]
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (100, 500):
+        results = [run(count, cls()) for cls in (LinearListener, TrieListener)]
+        print('{0:>5} clients: startswith {1:7.3f}s (dispatch {2:.3f}s, '
+              'median poll {3:.3f}s)  trie {4:7.3f}s (dispatch {5:.3f}s, '
+              'median poll {6:.3f}s)'.format(count, *(results[0] + results[1])))
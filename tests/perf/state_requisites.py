@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+'''
+Compare resolving the requisites of every chunk of a state run by matching
+them against all of the chunks with resolving them through RequisiteIndex.
+
+Usage: python tests/perf/state_requisites.py [count ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import sys
+import time
+import fnmatch
+
+# Import salt libs
+from salt.state import RequisiteIndex
+
+
+def scan(chunks, req_key, req_val):
+    '''
+    Match a requisite against every chunk
+    '''
+    found = []
+    for chunk in chunks:
+        if req_key == 'sls':
+            if fnmatch.fnmatch(chunk['__sls__'], req_val):
+                found.append(chunk)
+            continue
+        if (fnmatch.fnmatch(chunk['name'], req_val) or
+                fnmatch.fnmatch(chunk['__id__'], req_val)):
+            if req_key == 'id' or chunk['state'] == req_key:
+                found.append(chunk)
+    return found
+
+
+def run(count):
+    chunks = []
+    for num in range(count):
+        chunk = {'state': 'file',
+                 '__id__': 'id{0}'.format(num),
+                 'name': '/srv/file{0}'.format(num),
+                 '__sls__': 'sls{0}'.format(num // 10),
+                 'fun': 'managed'}
+        if num:
+            chunk['require'] = [{'file': 'id{0}'.format(num - 1)},
+                                {'sls': 'sls{0}'.format(num // 20)}]
+        chunks.append(chunk)
+
+    reqs = [(next(iter(req)), req[next(iter(req))])
+            for chunk in chunks for req in chunk.get('require', [])]
+    start = time.time()
+    scanned = [scan(chunks, key, val) for key, val in reqs]
+    scanned_time = time.time() - start
+    start = time.time()
+    index = RequisiteIndex(chunks)
+    indexed = [index.find(key, val) for key, val in reqs]
+    indexed_time = time.time() - start
+    assert scanned == indexed
+    print('{0:>6} chunks: scan {1:8.3f}s  index {2:8.3f}s'.format(
+        count, scanned_time, indexed_time))
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (1000, 3000):
+        run(count)
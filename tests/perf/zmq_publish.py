@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+'''
+Compare publishing jobs to lists of minions with one message per minion
+(topics) and one message carrying a bloom filter of the targets (bloom).
+
+Usage: python tests/perf/zmq_publish.py [minions ...]
+'''
+
+from __future__ import absolute_import, print_function
+# Import system libs
+import sys
+import threading
+import time
+
+# Import third party libs
+import zmq
+
+# Import salt libs
+import salt.payload
+import salt.transport.zeromq
+
+
+def _receive(sub_sock, expected, result):
+    messages = wire = 0
+    while messages < expected:
+        frames = sub_sock.recv_multipart()
+        messages += 1
+        wire += sum(len(frame) for frame in frames)
+    result.extend([messages, wire])
+
+
+def run(count):
+    jobs = max(2, 10000 // count)
+    context = zmq.Context()
+    pub_sock = context.socket(zmq.PUB)
+    pub_sock.setsockopt(zmq.SNDHWM, 0)
+    port = pub_sock.bind_to_random_port('tcp://127.0.0.1')
+    sub_sock = context.socket(zmq.SUB)
+    sub_sock.setsockopt(zmq.RCVHWM, 0)
+    sub_sock.setsockopt(zmq.SUBSCRIBE, b'')
+    sub_sock.connect('tcp://127.0.0.1:{0}'.format(port))
+    time.sleep(0.5)
+
+    minions = ['minion{0:06d}'.format(num) for num in range(count)]
+    payload = salt.payload.Serial({}).dumps(
+        {'fun': 'test.ping', 'arg': [], 'jid': '20160101000000000000',
+         'tgt': minions, 'tgt_type': 'list', 'ret': '', 'user': 'root'})
+    try:
+        for mode, bloom, topic_lst in (('broadcast', False, None),
+                                       ('topics', False, minions),
+                                       ('bloom', True, minions)):
+            channel = salt.transport.zeromq.ZeroMQPubServerChannel.__new__(
+                salt.transport.zeromq.ZeroMQPubServerChannel)
+            channel.opts = {'zmq_filtering': True,
+                            'zmq_filtering_bloom': bloom}
+            package = {'payload': payload}
+            if topic_lst is not None:
+                package['topic_lst'] = topic_lst
+            package = salt.payload.package(package)
+
+            result = []
+            receiver = threading.Thread(
+                target=_receive,
+                args=(sub_sock, jobs * count if mode == 'topics' else jobs,
+                      result))
+            receiver.start()
+            start = time.time()
+            for _ in range(jobs):
+                channel._publish_package(pub_sock, package)
+            receiver.join()
+            elapsed = time.time() - start
+            print('{0:>6} minions: {1:<10} {2:8.1f} jobs/s  {3:8} messages  '
+                  '{4:11} bytes/job'.format(count, mode, jobs / elapsed,
+                                            result[0], result[1] // jobs))
+    finally:
+        sub_sock.close(0)
+        pub_sock.close(0)
+        context.term()
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or (100, 5000):
+        run(count)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.cache_test
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test the salt.cache banks and its in-memory tier
+'''
+
+# Import python libs
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import time
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+ensure_in_syspath('../')
+
+# Import salt libs
+import salt.cache
+
+
+class CacheTestCase(TestCase):
+    '''
+    Test the msgpack driver through salt.cache.Cache
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = {'cachedir': self.tmpdir}
+
+    def tearDown(self):
+        salt.cache.MemCache.data.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test_factory(self):
+        self.assertIs(type(salt.cache.factory(self.opts)), salt.cache.Cache)
+        self.opts['memcache_expire_seconds'] = 10
+        self.assertIs(type(salt.cache.factory(self.opts)), salt.cache.MemCache)
+
+    def test_banks(self):
+        '''
+        Keys are stored as files of the bank directory
+        '''
+        cache = salt.cache.Cache(self.opts)
+        self.assertIsNone(cache.fetch('minions/web1', 'data'))
+        self.assertIsNone(cache.updated('minions/web1', 'data'))
+        self.assertFalse(cache.contains('minions'))
+        self.assertEqual(cache.list('minions'), [])
+
+        cache.store('minions/web1', 'data', {'grains': {'os': 'Ubuntu'}})
+        cache.store('minions/web1', 'mine', {'test.ping': True})
+        cache.store('minions/web2', 'data', {})
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.tmpdir, 'minions', 'web1', 'data.p')))
+        self.assertEqual(cache.fetch('minions/web1', 'data'),
+                         {'grains': {'os': 'Ubuntu'}})
+        self.assertAlmostEqual(cache.updated('minions/web1', 'data'),
+                               time.time(), delta=5)
+        self.assertEqual(sorted(cache.list('minions')), ['web1', 'web2'])
+        self.assertEqual(sorted(cache.list('minions/web1')), ['data', 'mine'])
+        self.assertTrue(cache.contains('minions/web1'))
+        self.assertTrue(cache.contains('minions/web1', 'mine'))
+
+        self.assertTrue(cache.flush('minions/web1', 'mine'))
+        self.assertFalse(cache.flush('minions/web1', 'mine'))
+        self.assertFalse(cache.contains('minions/web1', 'mine'))
+        self.assertTrue(cache.flush('minions/web1'))
+        self.assertEqual(cache.list('minions'), ['web2'])
+
+    def test_memcache(self):
+        '''
+        Hot keys are served from memory until they expire
+        '''
+        self.opts['memcache_expire_seconds'] = 60
+        cache = salt.cache.MemCache(self.opts)
+        cache.store('minions/web1', 'data', {'pillar': {}})
+        os.remove(os.path.join(self.tmpdir, 'minions', 'web1', 'data.p'))
+        self.assertEqual(cache.fetch('minions/web1', 'data'), {'pillar': {}})
+        self.assertTrue(cache.contains('minions/web1', 'data'))
+        # Shared by the caches of the process
+        self.assertEqual(salt.cache.MemCache(self.opts).fetch('minions/web1', 'data'),
+                         {'pillar': {}})
+        cache.flush('minions/web1')
+        self.assertIsNone(cache.fetch('minions/web1', 'data'))
+
+        expiring = salt.cache.MemCache(self.opts, expire=0.1)
+        expiring.store('minions/web2', 'data', 1)
+        salt.cache.Cache(self.opts).store('minions/web2', 'data', 2)
+        self.assertEqual(expiring.fetch('minions/web2', 'data'), 1)
+        time.sleep(0.2)
+        self.assertEqual(expiring.fetch('minions/web2', 'data'), 2)
+
+    def test_memcache_banks(self):
+        '''
+        Each top level bank is bounded on its own
+        '''
+        self.opts.update({'memcache_expire_seconds': 60,
+                          'memcache_max_items': 2,
+                          'memcache_banks': {'roster': {'max_items': 5},
+                                             'mine': {'expire_seconds': 0}}})
+        cache = salt.cache.MemCache(self.opts)
+        for num in range(4):
+            cache.store('minions/web{0}'.format(num), 'data', num)
+            cache.store('roster', 'web{0}'.format(num), num)
+        cache.store('mine', 'web1', 1)
+        lrus = salt.cache.MemCache.data[('msgpack', self.tmpdir)]
+        self.assertEqual(list(lrus['minions']),
+                         [('minions/web2', 'data'), ('minions/web3', 'data')])
+        self.assertEqual(len(lrus['roster']), 4)
+        self.assertEqual(len(lrus['mine']), 0)
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(CacheTestCase, needs_daemon=False)
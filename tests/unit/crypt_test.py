@@ -2,6 +2,9 @@
 
 # python libs
 from __future__ import absolute_import
+import os
+import hmac
+import hashlib
 
 # salt testing libs
 from salttesting import TestCase, skipIf
@@ -17,6 +20,7 @@ from salt import crypt
 # third-party libs
 try:
     import Crypto.PublicKey.RSA  # pylint: disable=unused-import
+    from Crypto.Cipher import AES
     HAS_PYCRYPTO_RSA = True
 except ImportError:
     HAS_PYCRYPTO_RSA = False
@@ -109,6 +113,53 @@ class CryptTestCase(TestCase):
             self.assertTrue(crypt.verify_signature('/keydir/keyname.pub', MSG, SIG))
 
 
+@skipIf(not HAS_PYCRYPTO_RSA, 'pycrypto >= 2.6 is not available')
+class CrypticleTestCase(TestCase):
+
+    def setUp(self):
+        self.key = crypt.Crypticle.generate_key_string()
+
+    def _old_encrypt(self, data):
+        '''
+        Build a message the way Crypticle.encrypt used to
+        '''
+        aes_key, hmac_key = crypt.Crypticle.extract_keys(self.key, 192)
+        pad = 16 - len(data) % 16
+        data = data + salt.utils.to_bytes(pad * chr(pad))
+        iv_bytes = os.urandom(16)
+        data = iv_bytes + AES.new(aes_key, AES.MODE_CBC, iv_bytes).encrypt(data)
+        return data + hmac.new(hmac_key, data, hashlib.sha256).digest()
+
+    def _check(self, crypticle):
+        for size in (0, 1, 15, 16, 17, 4096):
+            data = os.urandom(size)
+            self.assertEqual(crypticle.decrypt(crypticle.encrypt(data)), data)
+            message = bytearray(crypticle.encrypt(data))
+            message[len(message) // 2] ^= 1
+            self.assertRaises(crypt.AuthenticationError, crypticle.decrypt,
+                              bytes(message))
+        self.assertRaises(crypt.AuthenticationError, crypticle.decrypt, b'x')
+        load = {'fun': 'test.ping', 'arg': [1, 'two']}
+        self.assertEqual(crypticle.loads(crypticle.dumps(load)), load)
+
+    def test_cbc(self):
+        crypticle = crypt.Crypticle({}, self.key)
+        self._check(crypticle)
+        # Messages are framed as before
+        data = os.urandom(33)
+        self.assertEqual(crypticle.decrypt(self._old_encrypt(data)), data)
+        self.assertEqual(len(crypticle.encrypt(data)), 16 + 48 + 32)
+
+    @skipIf(not crypt.HAS_AES_GCM, 'pycryptodome is not available')
+    def test_gcm(self):
+        crypticle = crypt.Crypticle({'aes_gcm': True}, self.key)
+        self._check(crypticle)
+        self.assertEqual(len(crypticle.encrypt(b'data')), 12 + 4 + 16)
+        self.assertRaises(crypt.AuthenticationError,
+                          crypt.Crypticle({}, self.key).decrypt,
+                          crypticle.encrypt(b'data'))
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(CryptTestCase, needs_daemon=False)
+    run_tests(CryptTestCase, CrypticleTestCase, needs_daemon=False)
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.fileserver.roots_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the file hashes served by the roots fileserver backend
+'''
+
+# Import Python libs
+from __future__ import absolute_import
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import MagicMock, patch
+ensure_in_syspath('../../')
+
+# Import salt libs
+import salt.utils
+from salt.fileserver import roots
+
+
+class RootsFileHashTestCase(TestCase):
+    '''
+    Test roots.file_hash
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'base')
+        os.makedirs(self.root)
+        roots.__opts__ = {'cachedir': os.path.join(self.tmpdir, 'cache'),
+                          'file_roots': {'base': [self.root]},
+                          'hash_type': 'md5',
+                          'fileserver_hash_cache_size': 2,
+                          'fileserver_ignoresymlinks': False,
+                          'fileserver_followsymlinks': False,
+                          'file_ignore_regex': False,
+                          'file_ignore_glob': False}
+        # Hashes of files written within the last second are not cached
+        self.mtime = time.time() - 10
+        for name in ('a', 'b', 'c'):
+            self._write(name, name)
+
+    def tearDown(self):
+        roots._HASHES.clear()
+        roots._HASH_INDEX.update({'ino': None, 'offset': 0, 'records': {}})
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, data, mtime=None):
+        path = os.path.join(self.root, name)
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(data)
+        if mtime is None:
+            mtime = self.mtime
+        os.utime(path, (mtime, mtime))
+
+    def _hash(self, name):
+        load = {'saltenv': 'base', 'path': name}
+        return roots.file_hash(load, roots.find_file(name))
+
+    def test_file_hash(self):
+        '''
+        Hashes are computed once and served again until the file changes
+        '''
+        get_hash = MagicMock(side_effect=lambda path, form: hashlib.md5(
+            salt.utils.fopen(path).read()).hexdigest())
+        with patch('salt.utils.get_hash', get_hash):
+            self.assertEqual(self._hash('a'),
+                             {'hsum': hashlib.md5('a').hexdigest(),
+                              'hash_type': 'md5'})
+            self._hash('a')
+            self.assertEqual(get_hash.call_count, 1)
+
+            self._write('a', 'changed')
+            self.assertEqual(self._hash('a')['hsum'],
+                             hashlib.md5('changed').hexdigest())
+            self.assertEqual(get_hash.call_count, 2)
+            self.assertEqual(self._hash('missing'), {})
+
+            # Hashes are bounded in memory and shared through the hash index
+            self._hash('b')
+            self._hash('c')
+            self.assertEqual(list(roots._HASHES),
+                             [('base', 'b'), ('base', 'c')])
+            roots._HASHES.clear()
+            roots._HASH_INDEX.update({'ino': None, 'offset': 0, 'records': {}})
+            self._hash('a')
+            self.assertEqual(get_hash.call_count, 4)
+
+    def test_mtime(self):
+        '''
+        Changes within the same second are not hidden by the cache
+        '''
+        get_hash = MagicMock(side_effect=lambda path, form: hashlib.md5(
+            salt.utils.fopen(path).read()).hexdigest())
+        with patch('salt.utils.get_hash', get_hash):
+            self._write('a', 'x', mtime=time.time())
+            self._hash('a')
+            self._hash('a')
+            self.assertEqual(get_hash.call_count, 2)
+            self.assertEqual(list(roots._HASHES), [])
+
+            self._write('a', 'x', mtime=1000000000.25)
+            self._hash('a')
+            self._write('a', 'y', mtime=1000000000.75)
+            self.assertEqual(self._hash('a')['hsum'], hashlib.md5('y').hexdigest())
+            self.assertEqual(get_hash.call_count, 4)
+
+    def test_compact_hash_index(self):
+        '''
+        Superseded and stale records are dropped from the hash index
+        '''
+        for name in ('a', 'b', 'a'):
+            self._hash(name)
+            self._write('a', 'changed')
+        os.utime(os.path.join(self.root, 'b'), (0, 0))
+        self.assertEqual(len(roots._read_hash_index()), 3)
+        roots._compact_hash_index(
+            roots.salt.fileserver.generate_mtime_map(roots.__opts__['file_roots']))
+        self.assertEqual([record[1] for record in roots._read_hash_index()],
+                         ['a'])
+
+
+class RootsFileListTestCase(TestCase):
+    '''
+    Test the incremental file lists of roots
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'base')
+        self.opts = {'cachedir': os.path.join(self.tmpdir, 'cache'),
+                     'file_roots': {'base': [self.root]},
+                     'hash_type': 'md5',
+                     'fileserver_followsymlinks': True,
+                     'fileserver_ignoresymlinks': False,
+                     'fileserver_list_cache_time': 0,
+                     'file_ignore_regex': False,
+                     'file_ignore_glob': ['*.swp']}
+        roots.__opts__ = self.opts
+        for path in ('top.sls', 'web/init.sls', 'web/files/nginx.conf',
+                     'web/files/.nginx.conf.swp', 'db/init.sls'):
+            self._write(path)
+        os.makedirs(os.path.join(self.root, 'empty'))
+        os.symlink(os.path.join(self.root, 'web'),
+                   os.path.join(self.root, 'web_link'))
+        os.symlink(os.path.join(self.root, 'top.sls'),
+                   os.path.join(self.root, 'db', 'top.sls'))
+
+    def tearDown(self):
+        roots._SNAPSHOTS.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, path):
+        path = os.path.join(self.root, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(path)
+
+    def _check(self):
+        '''
+        Check the snapshot against a walk of the file roots
+        '''
+        self.opts['fileserver_list_cache_incremental'] = True
+        roots.update()
+        for form in roots.FILE_LIST_FORMS:
+            self.opts['fileserver_list_cache_incremental'] = True
+            incremental = roots._file_lists({'saltenv': 'base'}, form)
+            self.opts['fileserver_list_cache_incremental'] = False
+            self.assertEqual(incremental,
+                             roots._file_lists({'saltenv': 'base'}, form),
+                             form)
+
+    def test_file_lists(self):
+        '''
+        The snapshot holds the file lists found by a walk of the file roots
+        '''
+        self.opts['fileserver_list_cache_incremental'] = True
+        self.assertIsNone(roots._snapshot_file_list('base', 'files'))
+        self._check()
+        files = roots._snapshot_file_list('base', 'files')
+        self.assertIn('web_link/files/nginx.conf', files)
+        self.assertNotIn('web/files/.nginx.conf.swp', files)
+
+        self._write('web/files/added.conf')
+        os.remove(os.path.join(self.root, 'db', 'init.sls'))
+        self._check()
+        self.opts['fileserver_ignoresymlinks'] = True
+        self._check()
+        self.opts['fileserver_followsymlinks'] = False
+        self._check()
+
+        # The file lists are only read again from a new snapshot
+        roots._SNAPSHOTS['base'][2]['files'] = ['cached']
+        self.assertEqual(roots._snapshot_file_list('base', 'files'), ['cached'])
+        self.opts['file_roots']['base'] = [os.path.join(self.root, 'web')]
+        self.assertIsNone(roots._snapshot_file_list('base', 'files'))
+
+    def test_scan_tree(self):
+        '''
+        Only the directories which changed are listed again
+        '''
+        tree, changed = roots._scan_tree(self.root, {}, False)
+        self.assertTrue(changed)
+        self.assertEqual(list(tree)[0], '.')
+        # Pretend the tree was scanned long enough ago
+        for rel, entry in tree.items():
+            if not entry[3] and not entry[4]:
+                entry[0] = os.stat(os.path.join(self.root, rel)).st_mtime
+        listdir = MagicMock(side_effect=os.listdir)
+        with patch('os.listdir', listdir):
+            new, changed = roots._scan_tree(self.root, tree, False)
+        self.assertFalse(changed)
+        self.assertEqual(new, tree)
+        # The root and db have symlinks and are always listed
+        self.assertEqual(listdir.call_count, 2)
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(RootsFileHashTestCase, RootsFileListTestCase, needs_daemon=False)
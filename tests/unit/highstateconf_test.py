@@ -2,8 +2,10 @@
 
 # Import Python libs
 from __future__ import absolute_import
+import copy
 import os
 import os.path
+import shutil
 import tempfile
 
 # Import Salt Testing libs
@@ -16,6 +18,7 @@ ensure_in_syspath('../')
 # Import Salt libs
 import integration
 import salt.config
+import salt.utils
 from salt.state import HighState
 from salt.utils.odict import OrderedDict, DefaultOrderedDict
 
@@ -154,6 +157,80 @@ class TopFileMergeTestCase(TestCase):
         self.assertEqual(ret, OrderedDict([('a', [{}]), ('c', [{}]), ('b', [{}])]))
 
 
+class CompileCacheTestCase(TestCase):
+    '''
+    Test running the low chunks stored by state_compile_cache
+    '''
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.state_tree_dir = os.path.join(self.root_dir, 'state_tree')
+        os.makedirs(self.state_tree_dir)
+        self.config = salt.config.minion_config(None)
+        self.config['root_dir'] = self.root_dir
+        self.config['state_events'] = False
+        self.config['id'] = 'match'
+        self.config['file_client'] = 'local'
+        self.config['file_roots'] = dict(base=[self.state_tree_dir])
+        self.config['cachedir'] = os.path.join(self.root_dir, 'cachedir')
+        self.config['test'] = False
+        self.config['state_compile_cache'] = True
+        self._write('top.sls', "base:\n  '*':\n    - web\n")
+        self._write('web/init.sls',
+                    "{% from 'web/map.jinja' import port %}\n"
+                    "web:\n  test.succeed_without_changes:\n"
+                    "    - name: port {{ port }}\n")
+        self._write('web/map.jinja', '{% set port = 80 %}\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def _write(self, path, data):
+        path = os.path.join(self.state_tree_dir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(data)
+
+    def _highstate(self, **kwargs):
+        '''
+        Run a highstate, returns its names and if the states were rendered
+        '''
+        highstate = HighState(copy.deepcopy(self.config))
+        highstate.push_active()
+        try:
+            with patch.object(highstate, 'render_state',
+                              MagicMock(wraps=highstate.render_state)) as render:
+                ret = highstate.call_highstate(**kwargs)
+        finally:
+            highstate.pop_active()
+        return [val['name'] for val in ret.values()], render.called
+
+    def test_compile_cache(self):
+        '''
+        The stored chunks run until a file they were compiled from changes
+        '''
+        self.config['state_compile_cache'] = False
+        self.assertEqual(self._highstate(), (['port 80'], True))
+        self.config['state_compile_cache'] = True
+        self.assertEqual(self._highstate(), (['port 80'], True))
+        self.assertEqual(self._highstate(), (['port 80'], False))
+
+        self._write('web/map.jinja', '{% set port = 8080 %}\n')
+        self.assertEqual(self._highstate(), (['port 8080'], True))
+        self.assertEqual(self._highstate(), (['port 8080'], False))
+        # The highstate cache is written when the chunks are compiled
+        self.assertEqual(self._highstate(cache=True), (['port 8080'], False))
+
+        # The sls file which is used changes
+        self._write('web.sls', "web:\n  test.succeed_without_changes:\n"
+                               "    - name: flat\n")
+        self.assertEqual(self._highstate(), (['flat'], True))
+
+        self.config['grains']['role'] = 'db'
+        self.assertEqual(self._highstate(), (['flat'], True))
+        self.assertEqual(self._highstate(), (['flat'], False))
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(HighStateTestCase, needs_daemon=False)
+    run_tests(HighStateTestCase, CompileCacheTestCase, needs_daemon=False)
@@ -6,11 +6,15 @@
 # Import python libs
 from __future__ import absolute_import
 import os
+import shutil
+import signal
+import tempfile
+import time
 
 # Import Salt Testing libs
 from salttesting import TestCase, skipIf
 from salttesting.helpers import ensure_in_syspath
-from salttesting.mock import NO_MOCK, NO_MOCK_REASON, patch
+from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
 
 # Import salt libs
 from salt import minion
@@ -53,6 +57,167 @@ class MinionTestCase(TestCase):
         self.assertTrue(result)
 
 
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class MatcherTestCase(TestCase):
+    '''
+    Test the matching of publication targets by the minion
+    '''
+    def setUp(self):
+        self.opts = {'id': 'web1',
+                     'grains': {'os': 'Ubuntu', 'ipv4': ['10.0.0.1']},
+                     'pillar': {'role': 'web'},
+                     'matcher_cache_size': 2}
+        self.matcher = minion.Matcher(self.opts)
+
+    def test_compound_match(self):
+        '''
+        Compound targets are evaluated from their compiled plan
+        '''
+        for tgt, match in (('web*', True),
+                           ('G@os:Ubuntu and I@role:web', True),
+                           ('G@os:Ubuntu and not web1', False),
+                           ('db* or ( E@web\\d and S@10.0.0.0/8 )', True),
+                           ('not L@db1,db2', True),
+                           (['G@os:Debian', 'or', 'J@role:w.b'], True),
+                           ('N@webservers', False),
+                           ('and web1', False)):
+            self.assertEqual(self.matcher.compound_match(tgt), match, tgt)
+            self.assertEqual(self.matcher.target_match(tgt, 'compound'),
+                             match, tgt)
+
+    def test_target_match(self):
+        '''
+        Results are cached until the grains or the pillar change
+        '''
+        with patch.object(self.matcher, 'grain_match',
+                          MagicMock(return_value=True)) as grain_match:
+            for _ in range(2):
+                self.assertTrue(self.matcher.target_match('os:Ubuntu', 'grain'))
+            self.assertEqual(grain_match.call_count, 1)
+            grain_match.assert_called_with('os:Ubuntu', ':')
+
+            # The least recently used targets are dropped
+            self.matcher.target_match('web*')
+            self.matcher.target_match(['web1'], 'list')
+            self.matcher.target_match('os:Ubuntu', 'grain')
+            self.assertEqual(grain_match.call_count, 2)
+
+            self.opts['grains'] = {'os': 'Debian'}
+            self.matcher.target_match('os:Ubuntu', 'grain')
+            self.assertEqual(grain_match.call_count, 3)
+            self.matcher.clear_cache()
+            self.matcher.target_match('os:Ubuntu', 'grain')
+            self.assertEqual(grain_match.call_count, 4)
+
+        self.assertFalse(self.matcher.target_match('web1', 'unknown'))
+        with patch.object(self.matcher, 'data_match',
+                          MagicMock(return_value=True)) as data_match:
+            self.matcher.target_match('key:val', 'data')
+            self.matcher.target_match('key:val', 'data')
+            self.assertEqual(data_match.call_count, 2)
+
+
+class JobMinion(object):
+    '''
+    Just enough of a minion for the job workers, the jobs write the pid of the
+    process which ran them
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.proc_dir = os.path.join(opts['cachedir'], 'proc')
+        os.makedirs(self.proc_dir)
+        self.functions = {}
+        self.returners = {}
+
+    @classmethod
+    def _target(cls, minion_instance, opts, data, connected):
+        with open(os.path.join(minion_instance.proc_dir, data['jid']), 'w'):
+            pass
+        time.sleep(data.get('sleep', 0))
+        path = os.path.join(opts['cachedir'], data['jid'])
+        with open(path + '.tmp', 'w') as fp_:
+            fp_.write(str(os.getpid()))
+        os.rename(path + '.tmp', path)
+
+
+class JobWorkerPoolTestCase(TestCase):
+    '''
+    Test running jobs in the pre-forked job workers
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.minion = JobMinion({'cachedir': self.tmpdir,
+                                 'job_workers': 1,
+                                 'job_worker_max_jobs': 0})
+        self.pool = minion.JobWorkerPool(self.minion)
+
+    def tearDown(self):
+        self.pool.stop()
+        for worker in self.pool.retired:
+            worker.join(10)
+        shutil.rmtree(self.tmpdir)
+
+    def _run(self, jid, sleep=0):
+        self.assertTrue(self.pool.dispatch({'jid': jid, 'sleep': sleep}, True))
+
+    def _wait(self, jid):
+        '''
+        Wait for the job to finish and return the pid which ran it
+        '''
+        path = os.path.join(self.tmpdir, jid)
+        for _ in range(1000):
+            if os.path.exists(path):
+                break
+            time.sleep(0.01)
+        with open(path) as fp_:
+            pid = int(fp_.read())
+        for worker in self.pool.workers:
+            if worker.busy:
+                worker.parent_conn.poll(5)
+        return pid
+
+    def test_dispatch(self):
+        '''
+        The jobs run one after the other in the same worker
+        '''
+        self._run('1')
+        pid = self._wait('1')
+        self.assertNotEqual(pid, os.getpid())
+        self._run('2')
+        self.assertEqual(self._wait('2'), pid)
+        self.assertEqual(os.listdir(self.minion.proc_dir), [])
+
+        # Busy workers do not take jobs
+        self._run('3', sleep=1)
+        self.assertFalse(self.pool.dispatch({'jid': '4'}, True))
+        self.assertEqual(self._wait('3'), pid)
+
+    def test_recycle(self):
+        '''
+        Workers are replaced after enough jobs, when the minion changes or
+        when they are killed
+        '''
+        self.minion.opts['job_worker_max_jobs'] = 2
+        self._run('1')
+        pid = self._wait('1')
+        self._run('2')
+        self.assertEqual(self._wait('2'), pid)
+        self._run('3')
+        pid = self._wait('3')
+        self.assertNotIn(pid, (self._wait('2'), os.getpid()))
+
+        self.minion.functions = {}
+        self._run('4')
+        self.assertNotEqual(self._wait('4'), pid)
+        pid = self._wait('4')
+
+        os.kill(pid, signal.SIGKILL)
+        self.pool.workers[0].join(10)
+        self._run('5')
+        self.assertNotEqual(self._wait('5'), pid)
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(MinionTestCase, needs_daemon=False)
+    run_tests(MinionTestCase, MatcherTestCase, JobWorkerPoolTestCase,
+              needs_daemon=False)
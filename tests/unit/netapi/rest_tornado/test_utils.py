@@ -131,6 +131,42 @@ class TestEventListener(AsyncTestCase):
             with self.assertRaises(saltnado.TimeoutException):
                 event_future.result()
 
+    def test_prefixes(self):
+        '''
+        An event sets the futures of all of the prefixes of its tag
+        '''
+        class Request(object):
+            _finished = False
+
+        with eventpublisher_process():
+            me = event.MasterEvent(SOCK_DIR)
+            event_listener = saltnado.EventListener({},
+                                                    {'sock_dir': SOCK_DIR,
+                                                     'transport': 'zeromq'})
+            request = Request()
+            futures = [event_listener.get_event(request, tag)
+                       for tag in ('salt/job/', 'salt/job/1/ret',
+                                   'salt/job/2', 'salt/job/1/ret')]
+            futures[-1].add_done_callback(self.stop)
+
+            def fire():
+                # Until the listener is subscribed the event may be missed
+                if not futures[-1].done():
+                    me.fire_event({'data': 'foo'}, 'salt/job/1/ret/minion')
+                    self.io_loop.call_later(0.5, fire)
+            fire()
+            self.wait()
+
+            self.assertEqual([future.done() for future in futures],
+                             [True, True, False, True])
+            self.assertEqual(futures[0].result()['tag'],
+                             'salt/job/1/ret/minion')
+            self.assertEqual(len(event_listener.tag_map), 1)
+            event_listener.clean_timeout_futures(request)
+            with self.assertRaises(saltnado.TimeoutException):
+                futures[2].result()
+            self.assertEqual(len(event_listener.tag_map), 0)
+
 if __name__ == '__main__':
     from integration import run_tests  # pylint: disable=import-error
     run_tests(TestUtils, needs_daemon=False)
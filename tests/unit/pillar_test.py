@@ -9,7 +9,10 @@
 
 # Import python libs
 from __future__ import absolute_import
+import os
+import shutil
 import tempfile
+import time
 
 # Import Salt Testing libs
 from salttesting import skipIf, TestCase
@@ -18,7 +21,9 @@ from salttesting.mock import NO_MOCK, NO_MOCK_REASON, MagicMock, patch
 ensure_in_syspath('../')
 
 # Import salt libs
+import salt.config
 import salt.pillar
+import salt.utils
 
 
 @skipIf(NO_MOCK, NO_MOCK_REASON)
@@ -258,6 +263,162 @@ p2:
         client.get_state.side_effect = get_state
 
 
+class PillarCompileCacheTestCase(TestCase):
+    '''
+    Test pillar_compile_cache
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'pillar')
+        self.opts = salt.config.minion_config(None)
+        self.opts.update({'cachedir': os.path.join(self.tmpdir, 'cache'),
+                          'pillar_roots': {'base': [self.root]},
+                          'file_roots': {'base': [self.root]},
+                          'file_client': 'remote',
+                          'pillar_compile_cache': True})
+        self.grains = {'role': 'web', 'os': 'Debian', 'mem_total': 512}
+        self._write('top.sls', "base:\n  '*':\n    - web\n"
+                    "  'os:Debian':\n    - match: grain\n    - debian\n")
+        self._write('web/init.sls',
+                    "{% from 'map.jinja' import port %}\n"
+                    "role: {{ grains['role'] }}\nport: {{ port }}\n")
+        self._write('map.jinja', '{% set port = 80 %}')
+        self._write('debian.sls', 'os: debian\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, path, data):
+        path = os.path.join(self.root, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(data)
+
+    def _compile(self):
+        '''
+        Compile the pillar, returns it and whether it came from the cache
+        '''
+        hits = salt.pillar.COMPILE_CACHE_STATS['hits']
+        pillar = salt.pillar.Pillar(self.opts, dict(self.grains), 'minion',
+                                    'base').compile_pillar(ext=False)
+        return pillar, salt.pillar.COMPILE_CACHE_STATS['hits'] > hits
+
+    def test_compile_cache(self):
+        '''
+        Compiled pillar data is used until a file or grain it was compiled
+        from changes
+        '''
+        expected = {'role': 'web', 'port': 80, 'os': 'debian'}
+        self.assertEqual(self._compile(), (expected, False))
+        self.assertEqual(self._compile(), (expected, True))
+
+        # Grains the top file and sls files do not read
+        self.grains['mem_total'] = 1024
+        self.assertEqual(self._compile(), (expected, True))
+        self.grains['role'] = 'db'
+        expected['role'] = 'db'
+        self.assertEqual(self._compile(), (expected, False))
+        self.grains['os'] = 'RedHat'
+        expected.pop('os')
+        self.assertEqual(self._compile(), (expected, False))
+        self.assertEqual(self._compile(), (expected, True))
+
+        # Changed templates and sls files added next to init.sls
+        self._write('map.jinja', '{% set port = 8080 %}')
+        expected['port'] = 8080
+        self.assertEqual(self._compile(), (expected, False))
+        self._write('web.sls', 'role: shadowed\n')
+        self.assertEqual(self._compile(), ({'role': 'shadowed'}, False))
+        self.assertEqual(self._compile(), ({'role': 'shadowed'}, True))
+
+        stats = salt.pillar.compile_cache_stats(self.opts)
+        self.assertEqual((stats['hits'], stats['misses']), (4, 5))
+
+
+class ParallelExtPillarTestCase(TestCase):
+    '''
+    Test fetching the external pillars with ext_pillar_workers
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = salt.config.minion_config(None)
+        self.opts.update({'cachedir': os.path.join(self.tmpdir, 'cache'),
+                          'pillar_roots': {'base': [self.tmpdir]},
+                          'file_roots': {'base': [self.tmpdir]},
+                          'file_client': 'remote',
+                          'ext_pillar_workers': 4,
+                          'ext_pillar': [{'first': 0.3}, {'second': 0.3},
+                                         {'failing': 0}, {'missing': 0},
+                                         {'slow': 5}]})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _ext_pillar(self, name):
+        def ext_pillar(minion_id, pillar, seconds):
+            time.sleep(seconds)
+            if name == 'failing':
+                raise Exception('broken')
+            return {'source': name, name: pillar.get('cli')}
+        return ext_pillar
+
+    def test_parallel_ext_pillar(self):
+        '''
+        External pillars are fetched at the same time and merged in order
+        '''
+        self.opts['ext_pillar_timeout'] = {'slow': 0.6}
+        pillar = salt.pillar.Pillar(self.opts, {}, 'minion', 'base',
+                                    pillar={'cli': 'override'})
+        pillar.ext_pillars = dict((name, self._ext_pillar(name)) for name in
+                                  ('first', 'second', 'failing', 'slow'))
+        start = time.time()
+        data = pillar.compile_pillar()
+        # The slow pillar is not waited for past its timeout
+        self.assertLess(time.time() - start, 3)
+        self.assertEqual(data['source'], 'second')
+        self.assertEqual(data['first'], 'override')
+        self.assertNotIn('slow', data)
+        self.assertEqual(data['_errors'],
+                         ['Failed to load ext_pillar failing: broken',
+                          'ext_pillar slow timed out after 0.6 seconds'])
+        timing = data['_ext_pillar_timing']
+        self.assertEqual([item[0] for item in timing],
+                         ['first', 'second', 'failing', 'slow'])
+        self.assertGreaterEqual(timing[0][1], 0.3)
+        self.assertIsNone(timing[3][1])
+
+    def test_hung_ext_pillar(self):
+        '''
+        External pillars which hang do not hold up the later ones
+        '''
+        self.opts.update({'ext_pillar_workers': 2,
+                          'ext_pillar_timeout': {'slow': 0.3},
+                          'ext_pillar_total_timeout': 1,
+                          'ext_pillar': [{'slow': 3}, {'slow': 3},
+                                         {'first': 0}, {'second': 0}]})
+        for _ in range(3):
+            pillar = salt.pillar.Pillar(self.opts, {}, 'minion', 'base')
+            pillar.ext_pillars = dict((name, self._ext_pillar(name))
+                                      for name in ('first', 'second', 'slow'))
+            data = pillar.compile_pillar()
+            self.assertEqual(data['source'], 'second')
+            self.assertEqual(data['_errors'],
+                             ['ext_pillar slow timed out after 0.3 seconds'] * 2)
+
+        # Without a timeout of their own they are waited for up to the total
+        self.opts['ext_pillar_timeout'] = 0
+        pillar = salt.pillar.Pillar(self.opts, {}, 'minion', 'base')
+        pillar.ext_pillars = dict((name, self._ext_pillar(name))
+                                  for name in ('first', 'second', 'slow'))
+        data = pillar.compile_pillar()
+        self.assertEqual(data['_errors'],
+                         ['ext_pillar slow timed out after 1 seconds'] * 2 +
+                         ['ext_pillar first timed out after 1 seconds',
+                          'ext_pillar second timed out after 1 seconds'])
+
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(PillarTestCase, needs_daemon=False)
+    run_tests(PillarTestCase, PillarCompileCacheTestCase,
+              ParallelExtPillarTestCase, needs_daemon=False)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+'''
+tests.unit.returners.local_segment_cache_test
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Unit tests for the segmented job cache (local_segment_cache).
+'''
+
+# Import Python libs
+from __future__ import absolute_import
+import datetime
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+
+ensure_in_syspath('../../')
+
+# Import Salt libs
+from salt.returners import local_segment_cache
+
+
+class LocalSegmentCacheTestCase(TestCase):
+    '''
+    Tests for the local_segment_cache returner
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        local_segment_cache.__opts__ = {'cachedir': self.tmpdir,
+                                        'hash_type': 'md5',
+                                        'keep_jobs': 24,
+                                        'job_cache_segment_seconds': 3600,
+                                        'job_cache_batch_size': 1,
+                                        'job_cache_batch_interval': 0}
+
+    def tearDown(self):
+        local_segment_cache._PENDING.clear()
+        local_segment_cache._LOG_CACHE.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def _run(self, jid, minions, fun='test.ping'):
+        jid = local_segment_cache.prep_jid(passed_jid=jid)
+        local_segment_cache.save_load(
+            jid, {'fun': fun, 'arg': [], 'tgt': '*', 'tgt_type': 'glob',
+                  'user': 'root', 'jid': jid},
+            minions=minions)
+        for minion in minions:
+            local_segment_cache.returner(
+                {'jid': jid, 'id': minion, 'return': True, 'out': 'nested'})
+        return jid
+
+    def test_job(self):
+        '''
+        Loads and returns are read back from the segment files
+        '''
+        jid = self._run(None, ['web1', 'web2'])
+        local_segment_cache.save_minions(jid, ['web3'], syndic_id='syndic')
+        local_segment_cache.update_endtime(jid, 'now')
+        local_segment_cache.returner({'jid': jid, 'id': 'web1', 'return': False})
+
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, 'job_segments')),
+                         [str(int(time.time() // 3600 * 3600))])
+        self.assertEqual(local_segment_cache.get_jid(jid),
+                         {'web1': {'return': True, 'out': 'nested'},
+                          'web2': {'return': True, 'out': 'nested'}})
+        load = local_segment_cache.get_load(jid)
+        self.assertEqual(load['fun'], 'test.ping')
+        self.assertEqual(load['Minions'], ['web1', 'web2', 'web3'])
+        self.assertEqual(local_segment_cache.get_endtime(jid), 'now')
+        self.assertEqual(list(local_segment_cache.get_jids()), [jid])
+
+        self.assertEqual(local_segment_cache.get_jid('20000101000000000000'), {})
+        self.assertEqual(local_segment_cache.get_load('unknown'), {})
+        self.assertFalse(local_segment_cache.get_endtime('unknown'))
+
+    def test_prep_jid(self):
+        '''
+        Job ids do not collide and nocache jobs do not keep returns
+        '''
+        jid = local_segment_cache.prep_jid()
+        self.assertNotEqual(jid, local_segment_cache.prep_jid())
+        self.assertEqual(local_segment_cache.prep_jid(passed_jid=jid), jid)
+
+        jid = local_segment_cache.prep_jid(nocache=True, passed_jid='custom')
+        local_segment_cache.returner({'jid': jid, 'id': 'web1', 'return': 1})
+        self.assertEqual(local_segment_cache.get_jid('custom'), {})
+        self.assertTrue(os.path.isfile(
+            local_segment_cache._alias_path('custom')))
+
+    def test_batch(self):
+        '''
+        Returns are appended in groups
+        '''
+        local_segment_cache.__opts__.update({'job_cache_batch_size': 3,
+                                             'job_cache_batch_interval': 60})
+        jid = local_segment_cache.prep_jid()
+        path = local_segment_cache._returns_path(jid)
+        for num in range(4):
+            local_segment_cache.returner(
+                {'jid': jid, 'id': 'web{0}'.format(num), 'return': num})
+        self.assertEqual(len(local_segment_cache._read(path)), 3)
+        self.assertEqual(len(local_segment_cache._PENDING[path]), 1)
+        self.assertEqual(len(local_segment_cache.get_jid(jid)), 4)
+        self.assertEqual(local_segment_cache._PENDING, {})
+
+    def test_get_jids_filter(self):
+        '''
+        The most recent jobs are returned oldest first
+        '''
+        jids = []
+        for num in range(5):
+            jid = '2016010{0}120000000000'.format(num + 1)
+            jids.append(self._run(jid, ['web1'],
+                                  fun='saltutil.find_job' if num == 3 else 'test.ping'))
+        self.assertEqual(
+            [job['JID'] for job in local_segment_cache.get_jids_filter(2)],
+            [jids[2], jids[4]])
+        self.assertEqual(
+            [job['JID'] for job in local_segment_cache.get_jids_filter(2, False)],
+            [jids[3], jids[4]])
+
+    def test_clean_old_jobs(self):
+        '''
+        Segments are removed once all of their jobs are too old
+        '''
+        old = '{0:%Y%m%d%H%M%S%f}'.format(
+            datetime.datetime.now() - datetime.timedelta(hours=30))
+        self._run(old, ['web1'])
+        new = self._run(None, ['web1'])
+        local_segment_cache.clean_old_jobs()
+        self.assertEqual(list(local_segment_cache.get_jids()), [new])
+        self.assertEqual(local_segment_cache.get_jid(old), {})
+
+    def test_log_cache(self):
+        '''
+        Only the records of recently read segment files of existing
+        segments are kept in memory
+        '''
+        jids = [self._run('2016010{0}120000000000'.format(num + 1), ['web1'])
+                for num in range(3)]
+        paths = [local_segment_cache._returns_path(jid) for jid in jids]
+        size = local_segment_cache.LOG_CACHE_SIZE
+        local_segment_cache.LOG_CACHE_SIZE = 2
+        try:
+            for path in paths:
+                local_segment_cache._read(path)
+            local_segment_cache._read(paths[1])
+            self.assertEqual(list(local_segment_cache._LOG_CACHE),
+                             [paths[2], paths[1]])
+        finally:
+            local_segment_cache.LOG_CACHE_SIZE = size
+        shutil.rmtree(os.path.dirname(paths[2]))
+        local_segment_cache._segments()
+        self.assertEqual(list(local_segment_cache._LOG_CACHE), [paths[1]])
+
+    def test_flush_at_exit(self):
+        '''
+        The returns still pending when a worker process exits are written
+        '''
+        local_segment_cache.__opts__.update({'job_cache_batch_size': 3,
+                                             'job_cache_batch_interval': 60})
+        jid = local_segment_cache.prep_jid()
+        proc = multiprocessing.Process(
+            target=local_segment_cache.returner,
+            args=({'jid': jid, 'id': 'web1', 'return': 1},))
+        proc.start()
+        proc.join()
+        self.assertEqual(local_segment_cache.get_jid(jid),
+                         {'web1': {'return': 1}})
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(LocalSegmentCacheTestCase, needs_daemon=False)
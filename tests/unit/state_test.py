@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.state_test
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Test running the chunks of a state run in parallel
+'''
+
+# Import Python libs
+from __future__ import absolute_import
+import copy
+import os
+import shutil
+import tempfile
+import fnmatch
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+
+ensure_in_syspath('../')
+
+# Import Salt libs
+import integration
+import salt.config
+import salt.state
+from salt.state import State, RequisiteIndex
+
+
+class ParallelChunksTestCase(TestCase):
+    '''
+    Test State.call_chunks with state_parallel_workers
+    '''
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.config = salt.config.minion_config(None)
+        self.config['root_dir'] = self.root_dir
+        self.config['cachedir'] = os.path.join(self.root_dir, 'cachedir')
+        self.config['state_events'] = False
+        self.config['file_client'] = 'local'
+        self.config['file_roots'] = {'base': [self.root_dir]}
+        self.config['test'] = False
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def _high(self, *states):
+        '''
+        Build high data running one command per state, ordered the way
+        state_auto_order does
+        '''
+        high = {}
+        for num, (name, cmd, extra) in enumerate(states):
+            args = [{'name': cmd}, {'shell': '/bin/sh'}, {'order': num + 1},
+                    {'__auto_order__': True}]
+            args.extend({key: val} for key, val in extra.items())
+            args.append('run')
+            high[name] = {'cmd': args, '__sls__': 'test', '__env__': 'base'}
+        return high
+
+    def _run(self, high, workers):
+        opts = copy.deepcopy(self.config)
+        opts['state_parallel_workers'] = workers
+        state = State(opts)
+        ret = state.call_high(copy.deepcopy(high))
+        return state, ret
+
+    def _summary(self, ret):
+        return sorted((val['__run_num__'], tag.split('_|-')[1], val['result'])
+                      for tag, val in ret.items())
+
+    def _spans(self, ret):
+        '''
+        Return when the state of each id started and finished running, in
+        seconds of the day
+        '''
+        spans = {}
+        for val in ret.values():
+            hours, minutes, seconds = val['start_time'].split(':')
+            start = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            spans[val['__id__']] = (start, start + val['duration'] / 1000.0)
+        return spans
+
+    def test_parallel(self):
+        '''
+        Independent chunks run at the same time and the returns match a
+        serial run
+        '''
+        high = self._high(('a', 'sleep 0.5', {}),
+                          ('b', 'sleep 0.5', {}),
+                          ('c', 'sleep 0.5', {'require': [{'cmd': 'd'}]}),
+                          ('d', 'sleep 0.5', {}))
+        serial_ret = self._run(high, 0)[1]
+        state, ret = self._run(high, 4)
+        self.assertEqual(self._summary(ret), self._summary(serial_ret))
+        self.assertEqual(
+            [item[1] for item in self._summary(ret)], ['a', 'b', 'd', 'c'])
+        self.assertGreaterEqual(state.parallel_stats['critical_path'], 1000)
+        self.assertGreater(state.parallel_stats['serial'], 1900)
+
+        # c waits for d, the others run next to them
+        spans = self._spans(ret)
+        self.assertLess(max(spans[name][0] for name in ('a', 'b', 'd')),
+                        min(spans[name][1] for name in ('a', 'b', 'd')))
+        self.assertGreaterEqual(spans['c'][0], spans['d'][1])
+
+    def test_failhard(self):
+        '''
+        Failing requisites and failhard stop the chunks which follow them
+        '''
+        high = self._high(('a', 'false', {}),
+                          ('b', 'true', {'require': [{'cmd': 'a'}]}),
+                          ('c', 'true', {'onfail': [{'cmd': 'a'}]}))
+        serial_ret = self._run(high, 0)[1]
+        ret = self._run(high, 2)[1]
+        self.assertEqual(self._summary(ret), self._summary(serial_ret))
+        self.assertEqual(self._summary(ret),
+                         [(0, 'a', False), (1, 'b', False), (2, 'c', True)])
+
+        high['a']['cmd'].insert(0, {'failhard': True})
+        high['d'] = {'cmd': [{'name': 'sleep 0.5'}, {'shell': '/bin/sh'}, 'run'],
+                     '__sls__': 'test', '__env__': 'base'}
+        serial_ret = self._run(high, 0)[1]
+        ret = self._run(high, 2)[1]
+        self.assertEqual(self._summary(ret), self._summary(serial_ret))
+        self.assertEqual(self._summary(ret), [(0, 'a', False)])
+
+    def test_order(self):
+        '''
+        Chunks wait for the chunks with a lower explicit order
+        '''
+        high = self._high(('a', 'sleep 0.5', {}),
+                          ('b', 'sleep 0.5', {}),
+                          ('c', 'sleep 0.5', {}))
+        for name in ('a', 'b'):
+            high[name]['cmd'].remove({'__auto_order__': True})
+        # Ordered by state_auto_order next to a
+        high['c']['cmd'][2] = {'order': 1}
+        ret = self._run(high, 4)[1]
+        self.assertEqual(sorted(val['__id__'] for val in ret.values()),
+                         ['a', 'b', 'c'])
+        # b waits for a, c runs next to a
+        spans = self._spans(ret)
+        self.assertGreaterEqual(spans['b'][0], spans['a'][1])
+        self.assertLess(spans['c'][0], spans['a'][1])
+        self.assertLess(spans['a'][0], spans['c'][1])
+
+    def test_lost_return(self):
+        '''
+        A process exiting without sending a return fails its chunk
+        '''
+        high = self._high(('a', 'true', {}), ('b', 'true', {}))
+        opts = copy.deepcopy(self.config)
+        opts['state_parallel_workers'] = 2
+        state = State(opts)
+        state._call_parallel = lambda *args: None
+        ret = state.call_high(high)
+        self.assertEqual(sorted(val['result'] for val in ret.values()),
+                         [False, False])
+        self.assertIn('without a return',
+                      next(iter(ret.values()))['comment'])
+
+
+class RequisiteIndexTestCase(TestCase):
+    '''
+    Test resolving requisites through RequisiteIndex
+    '''
+    def setUp(self):
+        self.chunks = []
+        for num in range(6):
+            self.chunks.append({'state': 'file' if num % 2 else 'pkg',
+                                '__id__': 'id{0}'.format(num // 2),
+                                'name': 'name{0}'.format(num % 3),
+                                '__sls__': 'sls{0}'.format(num % 2),
+                                'fun': 'installed'})
+
+    def _scan(self, req_key, req_val):
+        '''
+        Match a requisite the way the chunks used to be scanned
+        '''
+        found = []
+        for chunk in self.chunks:
+            if req_key == 'sls':
+                if fnmatch.fnmatch(chunk['__sls__'], req_val):
+                    found.append(chunk)
+                continue
+            if (fnmatch.fnmatch(chunk['name'], req_val) or
+                    fnmatch.fnmatch(chunk['__id__'], req_val)):
+                if req_key == 'id' or chunk['state'] == req_key:
+                    found.append(chunk)
+        return found
+
+    def test_find(self):
+        '''
+        The index finds the same chunks as matching every chunk
+        '''
+        index = RequisiteIndex(self.chunks)
+        for req_key in ('id', 'pkg', 'file', 'sls', 'cmd'):
+            for req_val in ('id0', 'id1', 'name1', 'name*', 'id[02]', '*',
+                            'sls1', 'sls?', 'missing'):
+                self.assertEqual(index.find(req_key, req_val),
+                                 self._scan(req_key, req_val),
+                                 (req_key, req_val))
+        self.assertEqual(index.find('id', None), [])
+        # Only the globs are matched against the chunks
+        self.assertIn(('file', 'name*'), index.globs)
+        self.assertNotIn(('file', 'name1'), index.globs)
+
+    def test_find_name(self):
+        '''
+        find_name returns the same IDs from the index as from a scan
+        '''
+        high = {'web': {'file': [{'name': '/etc/web'}, 'managed'],
+                        '__sls__': 'web', '__env__': 'base'},
+                'db': {'pkg': [{'name': 'postgres'}, {'pkgs': ['a']},
+                               'installed'],
+                       '__sls__': 'db', '__env__': 'base'},
+                'db2': {'pkg': [{'name': 'postgres'}, 'installed'],
+                        '__sls__': 'db', '__env__': 'base'}}
+        names = salt.state.index_names(high)
+        for name, state in (('web', 'file'), ('/etc/web', 'file'),
+                            ('postgres', 'pkg'), ('db', 'sls'),
+                            ('postgres', 'file'), ('missing', 'pkg')):
+            self.assertEqual(
+                sorted(salt.state.find_name(name, state, high, names)),
+                sorted(salt.state.find_name(name, state, high)))
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(ParallelChunksTestCase, RequisiteIndexTestCase,
+              needs_daemon=False)
@@ -8,9 +8,12 @@ import tempfile
 import json
 import datetime
 import pprint
+import shutil
+import threading
 
 # Import Salt Testing libs
 from salttesting.unit import skipIf, TestCase
+from salttesting.mock import patch
 from salttesting.case import ModuleCase
 from salttesting.helpers import ensure_in_syspath
 ensure_in_syspath('../../')
@@ -18,6 +21,7 @@ ensure_in_syspath('../../')
 # Import salt libs
 import salt.loader
 import salt.utils
+import salt.utils.jinja
 from salt.exceptions import SaltRenderError
 from salt.ext.six.moves import builtins
 from salt.utils import get_context
@@ -65,6 +69,7 @@ class TestSaltCacheLoader(TestCase):
         TestCase.__init__(self, *args, **kws)
         self.opts = {
             'cachedir': TEMPLATES_DIR,
+            'jinja_bytecode_cache': False,
             'file_roots': {
                 'test': [os.path.join(TEMPLATES_DIR, 'files', 'test')]
             },
@@ -146,6 +151,7 @@ class TestGetTemplate(TestCase):
         TestCase.__init__(self, *args, **kws)
         self.local_opts = {
             'cachedir': TEMPLATES_DIR,
+            'jinja_bytecode_cache': False,
             'file_client': 'local',
             'file_ignore_regex': None,
             'file_ignore_glob': None,
@@ -200,6 +206,7 @@ class TestGetTemplate(TestCase):
         out = render_jinja_tmpl(
                 salt.utils.fopen(filename).read(),
                 dict(opts={'cachedir': TEMPLATES_DIR, 'file_client': 'remote',
+                           'jinja_bytecode_cache': False,
                            'file_roots': self.local_opts['file_roots'],
                            'pillar_roots': self.local_opts['pillar_roots']},
                      a='Hi', b='Salt', saltenv='test'))
@@ -291,6 +298,7 @@ class TestGetTemplate(TestCase):
         out = render_jinja_tmpl(
                 salt.utils.fopen(filename).read(),
                 dict(opts={'cachedir': TEMPLATES_DIR, 'file_client': 'remote',
+                           'jinja_bytecode_cache': False,
                            'file_roots': self.local_opts['file_roots'],
                            'pillar_roots': self.local_opts['pillar_roots']},
                      a='Hi', b='Sàlt', saltenv='test'))
@@ -304,6 +312,7 @@ class TestGetTemplate(TestCase):
         out = render_jinja_tmpl(
                 salt.utils.fopen(filename).read(),
                 dict(opts={'cachedir': TEMPLATES_DIR, 'file_client': 'remote',
+                           'jinja_bytecode_cache': False,
                            'file_roots': self.local_opts['file_roots'],
                            'pillar_roots': self.local_opts['pillar_roots']},
                      a='Hi', b='Sàlt', saltenv='test'))
@@ -447,6 +456,102 @@ class TestGetTemplate(TestCase):
         )
 
 
+class TestBytecodeCache(TestCase):
+    '''
+    Test the Jinja bytecode cache of render_jinja_tmpl
+    '''
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        # The templates are read from the file roots
+        roots = {'test': [os.path.join(TEMPLATES_DIR, 'files', 'test')]}
+        self.opts = {'cachedir': self.cachedir,
+                     'file_client': 'remote',
+                     'file_roots': roots,
+                     'pillar_roots': roots,
+                     'jinja_bytecode_cache_size': 2}
+        salt.utils.jinja._BYTECODE.clear()
+
+    def tearDown(self):
+        salt.utils.jinja._BYTECODE.clear()
+        shutil.rmtree(self.cachedir)
+
+    def _render(self, tmplstr, **context):
+        '''
+        Render a template, returns the output and how often Jinja compiled
+        '''
+        compile_ = Environment.compile
+        compiled = []
+
+        def _compile(env, source, *args, **kwargs):
+            compiled.append(source)
+            return compile_(env, source, *args, **kwargs)
+
+        context.update(opts=self.opts, saltenv='test')
+        with patch.object(Environment, 'compile', _compile), \
+                patch.object(SaltCacheLoader, 'file_client',
+                             lambda loader: MockFileClient()):
+            out = render_jinja_tmpl(tmplstr, context)
+        return out, len(compiled)
+
+    def test_bytecode_cache(self):
+        '''
+        Templates are compiled once and read back from memory or the cachedir
+        '''
+        self.assertEqual(self._render('a {{ b }}', b=1), ('a 1', 1))
+        self.assertEqual(self._render('a {{ b }}', b=2), ('a 2', 0))
+        salt.utils.jinja._BYTECODE.clear()
+        self.assertEqual(self._render('a {{ b }}', b=3), ('a 3', 0))
+
+        # Imported templates are cached as well
+        tmplstr = "{% from 'macro' import mymacro %}{{ mymacro('a', 'b') }}"
+        self.assertEqual(self._render(tmplstr), ('a b !', 2))
+        self.assertEqual(self._render(tmplstr), ('a b !', 0))
+
+        # The options of the environment are part of the key
+        self.opts['jinja_trim_blocks'] = True
+        self.assertEqual(self._render('a {{ b }}', b=4), ('a 4', 1))
+
+        self.assertEqual(len(salt.utils.jinja._BYTECODE), 2)
+        self.assertEqual(len(os.listdir(os.path.join(self.cachedir, 'jinja'))), 2)
+
+    def test_disabled(self):
+        '''
+        Nothing is stored when the cache is turned off
+        '''
+        self.opts['jinja_bytecode_cache'] = False
+        self.assertEqual(self._render('a {{ b }}', b=1), ('a 1', 1))
+        self.assertEqual(self._render('a {{ b }}', b=1), ('a 1', 1))
+        self.assertFalse(os.path.isdir(os.path.join(self.cachedir, 'jinja')))
+
+    def test_threads(self):
+        '''
+        Threads rendering at the same time share the cache
+        '''
+        errors = []
+
+        def _render(num):
+            try:
+                for count in range(50):
+                    tmplstr = '{0} {{{{ b }}}} {1}'.format(num, count % 5)
+                    out = render_jinja_tmpl(
+                        tmplstr, dict(opts=self.opts, saltenv='test', b=count))
+                    if out != '{0} {1} {2}'.format(num, count, count % 5):
+                        errors.append(out)
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+
+        with patch.object(SaltCacheLoader, 'file_client',
+                          lambda loader: MockFileClient()):
+            threads = [threading.Thread(target=_render, args=(num,))
+                       for num in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(salt.utils.jinja._BYTECODE), 2)
+
+
 class TestCustomExtensions(TestCase):
     def test_serialize_json(self):
         dataset = {
@@ -719,6 +824,6 @@ class TestDotNotationLookup(ModuleCase):
 
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(TestSaltCacheLoader, TestGetTemplate, TestCustomExtensions,
-            TestDotNotationLookup,
+    run_tests(TestSaltCacheLoader, TestGetTemplate, TestBytecodeCache,
+              TestCustomExtensions, TestDotNotationLookup,
               needs_daemon=False)
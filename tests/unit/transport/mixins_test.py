@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.transport.mixins_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test streaming large loads over the AES request channels
+'''
+
+# Import python libs
+from __future__ import absolute_import
+import os
+import time
+import shutil
+import tempfile
+
+import tornado.gen
+import tornado.ioloop
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import MagicMock
+ensure_in_syspath('../../')
+
+# Import Salt libs
+import salt.crypt
+import salt.payload
+import salt.daemons.masterapi
+from salt.transport.mixins.auth import AESReqClientMixin, AESReqServerMixin
+
+
+class StreamChannel(AESReqClientMixin, AESReqServerMixin):
+    '''
+    Both ends of a request channel, the requests are handled in process
+    '''
+    def __init__(self, opts, streams=True):
+        self.opts = opts
+        self.serial = salt.payload.Serial(opts)
+        self.crypticle = salt.crypt.Crypticle(
+            opts, salt.crypt.Crypticle.generate_key_string())
+        self.auth = MagicMock(crypticle=self.crypticle)
+        self.streams = streams
+        self.sent = []
+        self.handled = []
+
+    @tornado.gen.coroutine
+    def send(self, payload):
+        self.sent.append(len(payload))
+        load = self.crypticle.loads(payload)
+        if load.get('cmd') == '_stream':
+            if not self.streams:
+                raise tornado.gen.Return(self.crypticle.dumps(False))
+            load = self._receive_stream(load)
+            if not isinstance(load, dict):
+                raise tornado.gen.Return(self.crypticle.dumps(load))
+        self.handled.append(load)
+        raise tornado.gen.Return(self.crypticle.dumps({'ret': True}))
+
+    def send_load(self, load):
+        ret = tornado.ioloop.IOLoop().run_sync(
+            lambda: self._send_load(load, self.send))
+        return self.crypticle.loads(ret)
+
+
+class StreamTestCase(TestCase):
+    '''
+    Test AESReqClientMixin._send_load and AESReqServerMixin._receive_stream
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = {'id': 'minion',
+                     'cachedir': self.tmpdir,
+                     'pki_dir': self.tmpdir,
+                     'req_chunk_size': 1000}
+        self.load = {'cmd': '_return',
+                     'id': 'minion',
+                     'return': os.urandom(2500),
+                     'jid': '20160101000000000000'}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_stream(self):
+        '''
+        Large loads are sent in chunks and handled once whole
+        '''
+        channel = StreamChannel(self.opts)
+        self.assertEqual(channel.send_load(self.load), {'ret': True})
+        self.assertEqual(channel.handled, [self.load])
+        self.assertEqual(len(channel.sent), 3)
+        self.assertTrue(all(size < 1200 for size in channel.sent))
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, 'streams',
+                                                 'minion')), [])
+
+        # Small loads are sent whole
+        channel.send_load({'cmd': '_return', 'id': 'minion'})
+        self.assertEqual(len(channel.sent), 4)
+        self.opts['req_chunk_size'] = 0
+        channel.send_load(self.load)
+        self.assertEqual(len(channel.sent), 5)
+
+    def test_stream_unsupported(self):
+        '''
+        Masters which do not take streams are sent the load whole
+        '''
+        channel = StreamChannel(self.opts, streams=False)
+        self.assertEqual(channel.send_load(self.load), {'ret': True})
+        self.assertEqual(channel.handled, [self.load])
+        self.assertEqual(len(channel.sent), 2)
+        self.assertGreater(channel.sent[1], 2500)
+
+    def test_receive_stream(self):
+        '''
+        Chunks sent again replace the ones sent before, missing chunks and
+        bad streams are refused
+        '''
+        channel = StreamChannel(self.opts)
+        data = channel.serial.dumps(self.load)
+        chunk = {'cmd': '_stream', 'id': 'minion', 'stream': 'ab12'}
+
+        def receive(loc, size, final=False, **kwargs):
+            load = dict(chunk, loc=loc, data=data[loc:loc + size],
+                        final=final)
+            load.update(kwargs)
+            return channel._receive_stream(load)
+
+        self.assertTrue(receive(0, 1000))
+        self.assertTrue(receive(0, 1000))
+        self.assertFalse(receive(2000, 1000))
+        self.assertFalse(receive(1000, 1000, stream='../../etc'))
+        self.assertFalse(receive(1000, 1000, id='../minion'))
+        self.assertTrue(receive(1000, 1000))
+        self.assertEqual(receive(2000, len(data), final=True), self.load)
+
+    def test_stream_limits(self):
+        '''
+        A minion may not spool more than req_stream_max_size, abandoned
+        streams are removed
+        '''
+        self.opts['req_stream_max_size'] = 1
+        channel = StreamChannel(self.opts)
+        megabyte = 1024 * 1024
+        chunk = {'cmd': '_stream', 'id': 'minion', 'data': b'0' * 1000}
+        self.assertTrue(channel._receive_stream(
+            dict(chunk, stream='ab', loc=0)))
+        self.assertTrue(channel._receive_stream(
+            dict(chunk, stream='cd', loc=0)))
+        self.assertFalse(channel._receive_stream(
+            dict(chunk, stream='cd', loc=megabyte - 1000)))
+        sdir = os.path.join(self.tmpdir, 'streams', 'minion')
+        self.assertEqual(os.listdir(sdir), ['ab'])
+        self.assertFalse(channel._receive_stream(
+            dict(chunk, stream='ab', loc=-1)))
+
+        old = time.time() - salt.daemons.masterapi.STREAM_TTL - 1
+        os.utime(os.path.join(sdir, 'ab'), (old, old))
+        salt.daemons.masterapi.clean_streams(self.opts)
+        self.assertFalse(os.path.exists(sdir))
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(StreamTestCase, needs_daemon=False)
@@ -22,11 +22,14 @@ import salt.config
 import salt.utils
 import salt.transport.server
 import salt.transport.client
+import salt.transport.zeromq
+import salt.payload
 import salt.exceptions
 
 # Import Salt Testing libs
 from salttesting import TestCase, skipIf
 from salttesting.helpers import ensure_in_syspath
+from salttesting.mock import MagicMock
 ensure_in_syspath('../')
 
 import integration
@@ -198,7 +201,52 @@ class AsyncPubChannelTest(BaseZMQPubCase, PubChannelMixin):
         return zmq.eventloop.ioloop.ZMQIOLoop()
 
 
+class ZMQPublishTestCase(TestCase):
+    '''
+    Test how the publisher sends jobs to the minions
+    '''
+    def test_bloom_filter(self):
+        minions = ['minion{0}'.format(num) for num in range(1000)]
+        bloom = salt.transport.zeromq.bloom_filter(minions)
+        self.assertEqual(len(bloom), 5 + 1250)
+        for minion in minions:
+            self.assertTrue(salt.transport.zeromq.bloom_match(bloom, minion))
+        false_positives = [num for num in range(1000)
+                           if salt.transport.zeromq.bloom_match(
+                               bloom, 'other{0}'.format(num))]
+        self.assertLess(len(false_positives), 50)
+        self.assertFalse(salt.transport.zeromq.bloom_match(b'', 'minion1'))
+        self.assertFalse(salt.transport.zeromq.bloom_match(bloom[:100], 'minion1'))
+
+    def test_publish_package(self):
+        opts = {'zmq_filtering': True, 'zmq_filtering_bloom': False}
+        channel = salt.transport.zeromq.ZeroMQPubServerChannel.__new__(
+            salt.transport.zeromq.ZeroMQPubServerChannel)
+        channel.opts = opts
+        package = salt.payload.package(
+            {'payload': 'job', 'topic_lst': ['minion1', 'minion2']})
+        sock = MagicMock()
+        channel._publish_package(sock, package)
+        self.assertEqual(sock.send.call_count, 4)
+        self.assertFalse(sock.send_multipart.called)
+
+        opts['zmq_filtering_bloom'] = True
+        sock = MagicMock()
+        channel._publish_package(sock, package)
+        self.assertFalse(sock.send.called)
+        frames = sock.send_multipart.call_args[0][0]
+        self.assertEqual(frames[0], b'bloom')
+        self.assertEqual(frames[2], 'job')
+        self.assertTrue(salt.transport.zeromq.bloom_match(frames[1], 'minion2'))
+
+        sock = MagicMock()
+        channel._publish_package(sock, salt.payload.package({'payload': 'job'}))
+        sock.send.assert_called_with('job')
+        self.assertEqual(sock.send.call_args_list[0][0], ('broadcast',))
+
+
 if __name__ == '__main__':
     from integration import run_tests
     run_tests(ClearReqTestCases, needs_daemon=False)
     run_tests(AESReqTestCases, needs_daemon=False)
+    run_tests(ZMQPublishTestCase, needs_daemon=False)
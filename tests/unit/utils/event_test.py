@@ -10,8 +10,11 @@
 # Import python libs
 from __future__ import absolute_import
 import os
-import hashlib
 import time
+import shutil
+import hashlib
+import tempfile
+import threading
 from tornado.testing import AsyncTestCase
 import zmq
 import zmq.eventloop.ioloop
@@ -31,6 +34,7 @@ ensure_in_syspath('../../')
 import integration
 from salt.utils.process import clean_proc
 from salt.utils import event
+from salt.utils.tagmatch import TagMatcher
 
 # Import 3rd-+arty libs
 from salt.ext.six.moves import range  # pylint: disable=import-error,redefined-builtin
@@ -43,8 +47,9 @@ if getattr(zmq, 'IPC_PATH_MAX_LEN', 103) <= 103:
 
 
 @contextmanager
-def eventpublisher_process():
-    proc = event.EventPublisher({'sock_dir': SOCK_DIR})
+def eventpublisher_process(**opts):
+    opts['sock_dir'] = SOCK_DIR
+    proc = event.EventPublisher(opts)
     proc.start()
     try:
         if os.environ.get('TRAVIS_PYTHON_VERSION', None) is not None:
@@ -339,6 +344,44 @@ class TestSaltEvent(TestCase):
             evt = me.get_event(tag='fire_master')
             self.assertGotEvent(evt, {'data': data, 'tag': 'test_master', 'events': None, 'pretag': None})
 
+    def test_event_filter(self):
+        '''Test that the publisher only sends the events subscribed to'''
+        with eventpublisher_process():
+            me = event.MasterEvent(SOCK_DIR, listen=True)
+            me.set_filter(['evt1*', 'other'])
+            # Let the publisher read the filter
+            time.sleep(0.5)
+            me.fire_event({'data': 'foo2'}, 'evt2')
+            me.fire_event({'data': 'foo1'}, 'evt1')
+            evt1 = me.get_event(tag='')
+            self.assertGotEvent(evt1, {'data': 'foo1'})
+
+            me.set_filter(None)
+            time.sleep(0.5)
+            me.fire_event({'data': 'foo2'}, 'evt2')
+            evt2 = me.get_event(tag='')
+            self.assertGotEvent(evt2, {'data': 'foo2'})
+
+    def test_event_publisher_stats(self):
+        '''Test that the publisher counts the events filtered out'''
+        with eventpublisher_process(event_publisher_stats_interval=1):
+            me = event.MasterEvent(SOCK_DIR, listen=True)
+            me.set_filter(['salt/event/publisher/stats'])
+            time.sleep(0.5)
+            me.fire_event({'data': 'foo2'}, 'evt2')
+            # Skip the stats published before the event was filtered out
+            for _ in range(5):
+                evt = me.get_event(tag='salt/event/publisher/stats', wait=5)
+                self.assertIsNotNone(evt)
+                stats = [sub for sub in evt['subscribers']
+                         if sub['filter'] == ['salt/event/publisher/stats']]
+                if stats and stats[0]['filtered']:
+                    break
+            self.assertEqual(len(stats), 1)
+            self.assertEqual(stats[0]['filtered'], 1)
+            self.assertEqual(stats[0]['queued'], 0)
+            self.assertEqual(stats[0]['dropped'], 0)
+
 
 class TestAsyncEventPublisher(AsyncTestCase):
     def get_new_ioloop(self):
@@ -369,6 +412,127 @@ class TestAsyncEventPublisher(AsyncTestCase):
         self.data.pop('_stamp')  # drop the stamp
         self.assertEqual(self.data, {'data': 'foo1'})
 
+
+class TestEventReturn(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.path = os.path.join(self.tmp_dir, 'test.queue')
+        self.stored = []
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _returner(self, events):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise Exception('down')
+            self.stored.append([evt['tag'] for evt in events])
+
+    def _wait(self, count):
+        for _ in range(100):
+            with self.lock:
+                if sum(len(batch) for batch in self.stored) >= count:
+                    return
+            time.sleep(0.05)
+        self.fail('Events were not stored')
+
+    def test_spill_queue(self):
+        '''Test the items past the memory size go to the file and back'''
+        queue = event.SpillQueue(self.path, 2)
+        self.assertEqual([queue.put(num) for num in range(5)],
+                         [False, False, True, True, True])
+        self.assertEqual((len(queue.memory), queue.spilled), (2, 3))
+        self.assertEqual(queue.head(3), [0, 1])
+        queue.drop(1)
+        self.assertEqual(queue.head(3), [1, 2])
+        queue.drop(2)
+        self.assertEqual(queue.head(3), [3, 4])
+        self.assertFalse(os.path.exists(self.path))
+
+        # The items left are read again by the next queue
+        queue = event.SpillQueue(self.path, 2)
+        for num in range(5):
+            queue.put(num)
+        queue.drop(1)
+        queue.head(2)
+        queue.persist()
+        self.assertEqual(len(queue.memory), 0)
+        queue = event.SpillQueue(self.path, 2)
+        self.assertEqual(len(queue), 4)
+        self.assertEqual(queue.head(5), [1, 2])
+        queue.drop(2)
+        self.assertEqual(queue.head(5), [3, 4])
+
+    def test_pipeline_batches(self):
+        '''Test events are stored by batch size and by age'''
+        pipeline = event.ReturnerPipeline('test', self._returner, self.path,
+                                          batch_size=3, max_seconds=0.3)
+        pipeline.start()
+        for num in range(4):
+            pipeline.put({'tag': str(num)})
+        self._wait(3)
+        self.assertEqual(self.stored, [['0', '1', '2']])
+        self._wait(4)
+        self.assertEqual(self.stored, [['0', '1', '2'], ['3']])
+        stats = pipeline.stats()
+        self.assertEqual(stats['stored'], 4)
+        self.assertEqual(stats['batches'], 2)
+        self.assertGreaterEqual(stats['lag_max'], 0.3)
+        self.assertEqual(stats['queued'], 0)
+        pipeline.put({'tag': '4'})
+        pipeline.stop()
+        pipeline.join(5)
+        self.assertEqual(self.stored[-1], ['4'])
+        self.assertEqual(pipeline.stats()['stored'], 1)
+
+    def test_pipeline_retries(self):
+        '''Test a failed batch is tried again, then dropped or kept'''
+        self.failures = 2
+        pipeline = event.ReturnerPipeline('test', self._returner, self.path,
+                                          retries=2, backoff=(0.05, 0.1))
+        pipeline.start()
+        pipeline.put({'tag': '0'})
+        self._wait(1)
+        self.assertEqual(self.stored, [['0']])
+        self.assertEqual(pipeline.stats()['failures'], 2)
+
+        self.failures = 3
+        pipeline.put({'tag': '1'})
+        pipeline.put({'tag': '2'})
+        self._wait(2)
+        self.assertEqual(self.stored, [['0'], ['2']])
+        self.assertEqual(pipeline.stats()['dropped'], 1)
+
+        # The events still not stored when stopping are kept on disk
+        self.failures = 100
+        pipeline.put({'tag': '3'})
+        time.sleep(0.1)
+        pipeline.stop()
+        pipeline.join(5)
+        queue = event.SpillQueue(self.path, 10)
+        self.assertEqual([item[1]['tag'] for item in queue.head(10)], ['3'])
+
+    def test_filter(self):
+        '''Test the whitelist and blacklist globs'''
+        event_return = event.EventReturn.__new__(event.EventReturn)
+        for whitelist, blacklist, stored in (
+                ([], [], ['salt/auth', 'salt/job/1/ret/web1', 'app/deploy']),
+                (['salt/*'], ['salt/job/*/ret/*'], ['salt/auth']),
+                ([], ['salt/auth', 'app/*'], ['salt/job/1/ret/web1'])):
+            event_return.opts = {'event_return_whitelist': whitelist}
+            event_return.whitelist = TagMatcher(
+                (tag, True) for tag in whitelist)
+            event_return.blacklist = TagMatcher(
+                (tag, True) for tag in blacklist)
+            self.assertEqual(
+                [tag for tag in ('salt/auth', 'salt/job/1/ret/web1',
+                                 'app/deploy')
+                 if event_return._filter({'tag': tag})],
+                stored)
+
 if __name__ == '__main__':
     from integration import run_tests
-    run_tests(TestSaltEvent, needs_daemon=False)
+    run_tests(TestSaltEvent, TestEventReturn, needs_daemon=False)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.utils.minions_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the minion target resolution of the master
+'''
+
+# Import python libs
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+ensure_in_syspath('../../')
+
+# Import salt libs
+import salt.payload
+import salt.utils
+import salt.utils.minions
+
+MINION_DATA = {
+    'web1': {'grains': {'os': 'Ubuntu', 'role': 'web', 'ipv4': ['10.0.0.1'],
+                        'num_cpus': 4, 'roles': ['web', 'db']},
+             'pillar': {'app': {'version': '1.2', 'tier': 'front'}}},
+    'web2': {'grains': {'os': 'CentOS', 'role': 'web', 'ipv4': ['10.0.0.2'],
+                        'num_cpus': 8, 'roles': [{'name': 'web'}]},
+             'pillar': {'app': {'version': '1.3', 'tier': 'front'}}},
+    'db1': {'grains': {'os': 'Ubuntu', 'role': 'db', 'ipv4': ['10.0.1.1'],
+                       'num_cpus': 16, 'url': 'http://db1:5432'},
+            'pillar': {'app': 'none', 'nested': {'a': {'b': 'c'}}}},
+}
+
+TARGETS = [
+    ('grains', 'os:Ubuntu'),
+    ('grains', 'os:ubu*'),
+    ('grains', 'role:w?b'),
+    ('grains', 'ipv4:10.0.0.*'),
+    ('grains', 'num_cpus:8'),
+    ('grains', 'roles:web'),
+    ('grains', 'roles:name:web'),
+    ('grains', 'roles:0:web'),
+    ('grains', 'url:http://db1:5432'),
+    ('grains', 'missing:value'),
+    ('pillar', 'app:version:1.*'),
+    ('pillar', 'app:tier'),
+    ('pillar', 'app:none'),
+    ('pillar', 'nested:a:b:c'),
+    ('pillar', 'nested:*:b'),
+]
+
+
+class CkMinionsTestCase(TestCase):
+    '''
+    Check target resolution against the minion data cache
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.opts = {'cachedir': os.path.join(self.tmpdir, 'cache'),
+                     'pki_dir': os.path.join(self.tmpdir, 'pki'),
+                     'minion_data_cache': True,
+                     'transport': 'zeromq'}
+        os.makedirs(os.path.join(self.opts['pki_dir'], 'minions'))
+        self.serial = salt.payload.Serial(self.opts)
+        for minion_id, data in MINION_DATA.items():
+            self._write(minion_id, data)
+        # An accepted minion which has not sent its data yet
+        self._accept('new1')
+
+    def tearDown(self):
+        salt.utils.minions._ACCEPTED_KEYS.clear()
+        salt.utils.minions._DATA_INDEXES.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def _accept(self, minion_id):
+        path = os.path.join(self.opts['pki_dir'], 'minions', minion_id)
+        with salt.utils.fopen(path, 'w+') as fp_:
+            fp_.write('key')
+
+    def _write(self, minion_id, data):
+        self._accept(minion_id)
+        cdir = os.path.join(self.opts['cachedir'], 'minions', minion_id)
+        if not os.path.isdir(cdir):
+            os.makedirs(cdir)
+        with salt.utils.fopen(os.path.join(cdir, 'data.p'), 'w+b') as fp_:
+            fp_.write(self.serial.dumps(data))
+
+    def _check(self, search_type, expr, greedy, **kwargs):
+        ret = {}
+        for indexed in (True, False):
+            self.opts['minion_data_cache_index'] = indexed
+            ckminions = salt.utils.minions.CkMinions(self.opts)
+            ret[indexed] = sorted(ckminions._check_cache_minions(
+                expr, ':', greedy, search_type, **kwargs))
+        return ret[True], ret[False]
+
+    def test_matches_full_scan(self):
+        '''
+        Glob, PCRE and exact targets return the same minions with the index
+        '''
+        for search_type, expr in TARGETS:
+            for greedy in (True, False):
+                indexed, scanned = self._check(search_type, expr, greedy)
+                self.assertEqual(indexed, scanned, (search_type, expr, greedy))
+                indexed, scanned = self._check(search_type, expr, greedy,
+                                               exact_match=True)
+                self.assertEqual(indexed, scanned, (search_type, expr, greedy))
+        for search_type, expr in (('grains', 'os:(ubuntu|centos)'),
+                                  ('grains', 'ipv4:10\\.0\\.1'),
+                                  ('pillar', 'app:version:1\\.[23]')):
+            indexed, scanned = self._check(search_type, expr, False,
+                                           regex_match=True)
+            self.assertEqual(indexed, scanned, (search_type, expr))
+
+    def test_refresh(self):
+        '''
+        Changed and removed cache files are picked up by the index
+        '''
+        index = salt.utils.minions.get_data_index(self.opts)
+        index.refresh()
+        self.assertEqual(index.match('grains', 'os:Ubuntu'), set(['web1', 'db1']))
+
+        data = {'grains': {'os': 'Debian'}, 'pillar': {}}
+        self._write('web1', data)
+        index.update('web1', data)
+        shutil.rmtree(os.path.join(self.opts['cachedir'], 'minions', 'db1'))
+        index.refresh()
+        self.assertEqual(index.match('grains', 'os:Ubuntu'), set())
+        self.assertEqual(index.match('grains', 'os:Debian'), set(['web1']))
+        self.assertEqual(index.minions, set(['web1', 'web2']))
+        self.assertEqual(sorted(index.postings['grains'][('os',)]),
+                         ['centos', 'debian'])
+
+    def test_compile_compound(self):
+        '''
+        Compound targets are parsed with the operator precedence of sets
+        '''
+        compile_compound = salt.utils.minions.compile_compound
+        self.assertEqual(
+            compile_compound('G@os:Ubuntu or web* and not L@a,b'),
+            ('or',
+             ('term', 'G', 'os:Ubuntu', ':'),
+             ('and',
+              ('term', None, 'web*', None),
+              ('not', ('term', 'L', 'a,b', None)))))
+        self.assertEqual(
+            compile_compound(['(', 'I@app:none', 'not', 'E@db.*', ')']),
+            ('and',
+             ('term', 'I', 'app:none', ':'),
+             ('not', ('term', 'E', 'db.*', None))))
+        self.assertIs(compile_compound('G@os:Ubuntu and web*'),
+                      compile_compound('G@os:Ubuntu and web*'))
+        for expr in ('and web*', '( or web* )', 'web* )', 'web* db*',
+                     'web* and', 'N@group', ''):
+            self.assertIsNone(compile_compound(expr))
+
+    def test_compound(self):
+        '''
+        Compound targets combine the minions matched by their terms
+        '''
+        ckminions = salt.utils.minions.CkMinions(self.opts)
+        for expr, expected in (
+                ('G@os:Ubuntu', ['db1', 'new1', 'web1']),
+                ('G@os:Ubuntu and G@role:web', ['new1', 'web1']),
+                ('G@role:web and not L@web1,new1', ['web2']),
+                ('not G@os:Ubuntu or db*', ['db1', 'web2']),
+                ('web* not ( I@app:tier:front and G@num_cpus:8 )', ['web1']),
+                ('( G@os:CentOS or E@db.', ['db1', 'new1', 'web2']),
+                ('G@os:Ubuntu and', [])):
+            self.assertEqual(
+                sorted(ckminions.check_minions(expr, 'compound')),
+                expected,
+                expr)
+        self.assertIsNone(ckminions._index)
+
+
+class AcceptedKeysTestCase(TestCase):
+    '''
+    Check that the accepted key view follows changes to the pki directory
+    '''
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name in ('b', 'A', 'c', '.hidden'):
+            self._touch(name)
+        os.mkdir(os.path.join(self.tmpdir, 'subdir'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _touch(self, name):
+        with salt.utils.fopen(os.path.join(self.tmpdir, name), 'w+') as fp_:
+            fp_.write('key')
+
+    def _check_changes(self, keys):
+        keys.refresh()
+        self.assertEqual(keys.minions(), ['A', 'b', 'c'])
+        self._touch('B')
+        os.remove(os.path.join(self.tmpdir, 'c'))
+        os.rename(os.path.join(self.tmpdir, 'A'), os.path.join(self.tmpdir, 'd'))
+        keys.refresh()
+        self.assertEqual(keys.minions(), ['B', 'b', 'd'])
+        self.assertIn('d', keys)
+        self.assertNotIn('A', keys)
+
+    def test_polling(self):
+        '''
+        Changes are found from the directory mtime
+        '''
+        keys = salt.utils.minions.AcceptedKeys(self.tmpdir, use_inotify=False)
+        self._check_changes(keys)
+
+    @skipIf(not salt.utils.minions.HAS_PYINOTIFY, 'pyinotify is not available')
+    def test_inotify(self):
+        '''
+        Changes are applied from inotify events without listing the directory
+        '''
+        keys = salt.utils.minions.AcceptedKeys(self.tmpdir)
+        self.assertIsNotNone(keys._notifier)
+        keys.refresh()
+        keys._scan = None
+        self._check_changes(keys)
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(CkMinionsTestCase, AcceptedKeysTestCase, needs_daemon=False)
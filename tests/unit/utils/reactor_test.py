@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+'''
+    tests.unit.utils.reactor_test
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Test the reactor dispatch table, render cache and reaction pool
+'''
+
+# Import python libs
+from __future__ import absolute_import
+import os
+import time
+import shutil
+import fnmatch
+import tempfile
+import threading
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+ensure_in_syspath('../../')
+
+# Import Salt libs
+import integration
+import salt.config
+import salt.utils
+import salt.utils.reactor
+from salt.utils.tagmatch import PrefixTrie, TagMatcher
+
+
+class TagMatcherTestCase(TestCase):
+    '''
+    Test TagMatcher
+    '''
+    patterns = ['salt/job/*/ret/*', 'salt/auth', 'salt/minion/*', 'salt/*',
+                'salt/minion/web?/start', 'salt/minion/[a-m]*/start', '*',
+                'salt/minion/web1/start', 'salt/', 'salt/auth*']
+    tags = ['salt/auth', 'salt/minion/web1/start', 'salt/minion/db/start',
+            'salt/job/1234/ret/web1', 'salt/', 'salt', '', 'salt/authx',
+            'other/tag', 'salt/minion/zed/start']
+
+    def test_match(self):
+        '''
+        The patterns a tag matches are the ones fnmatchcase matches
+        '''
+        matcher = TagMatcher(
+            (pattern, pattern) for pattern in self.patterns)
+        self.assertEqual(len(matcher), len(self.patterns))
+        for tag in self.tags:
+            self.assertEqual(
+                sorted(matcher.match(tag)),
+                sorted(pattern for pattern in self.patterns
+                       if fnmatch.fnmatchcase(tag, pattern)),
+                tag)
+        # Only the globs not ending in their only * are matched in turn
+        self.assertEqual([glob[0] for glob in matcher.globs],
+                         ['salt/job/*/ret/*', 'salt/minion/web?/start',
+                          'salt/minion/[a-m]*/start'])
+
+    def test_remove(self):
+        '''
+        Removed values are not matched anymore
+        '''
+        matcher = TagMatcher(
+            (pattern, pattern) for pattern in self.patterns)
+        for pattern in self.patterns:
+            self.assertTrue(matcher.remove(pattern, pattern))
+            self.assertFalse(matcher.remove(pattern, pattern))
+        self.assertEqual(len(matcher), 0)
+        self.assertEqual(matcher.prefixes.root, {})
+        for tag in self.tags:
+            self.assertEqual(matcher.match(tag), [])
+
+    def test_prefix_pop(self):
+        '''
+        Popping a tag takes the values of all of its prefixes
+        '''
+        trie = PrefixTrie()
+        for num, prefix in enumerate(('salt/job/1/ret', 'salt/', '',
+                                      'salt/job/2', 'salt/job/1/ret')):
+            trie.add(prefix, num)
+        self.assertEqual(trie.pop('salt/job/1/ret/web1'), [2, 1, 0, 4])
+        self.assertEqual(len(trie), 1)
+        self.assertEqual(trie.match('salt/job/2/ret'), [3])
+        self.assertEqual(trie.pop('salt/job/2'), [3])
+        self.assertEqual(trie.root, {})
+
+
+class ReactorTestCase(TestCase):
+    '''
+    Test reading the reactor map and rendering reactions
+    '''
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.opts = salt.config.master_config(None)
+        self.opts['root_dir'] = self.root_dir
+        self.opts['cachedir'] = os.path.join(self.root_dir, 'cache')
+        self.opts['reactor'] = os.path.join(self.root_dir, 'reactor.conf')
+        self.reactor = salt.utils.reactor.Reactor(self.opts)
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def _write(self, name, content):
+        path = os.path.join(self.root_dir, name)
+        with salt.utils.fopen(path, 'w') as fp_:
+            fp_.write(content)
+        # Make sure the stat changes
+        mtime = time.time() + len(content)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_list_reactors(self):
+        '''
+        The reactor map is read again once it changed and matched in order
+        '''
+        self._write('reactor.conf', '- salt/minion/*/start: [/a.sls]\n'
+                                    '- salt/minion/web1/start: /b.sls\n'
+                                    '- salt/minion/web?/*: [/c.sls, /d.sls]\n'
+                                    '- bad\n')
+        self.assertEqual(self.reactor.list_reactors('salt/minion/web1/start'),
+                         ['/a.sls', '/b.sls', '/c.sls', '/d.sls'])
+        self.assertEqual(self.reactor.list_reactors('salt/minion/db/start'),
+                         ['/a.sls'])
+        self.assertEqual(self.reactor.list_reactors('salt/auth'), [])
+
+        self._write('reactor.conf', '- salt/auth: [/e.sls]\n')
+        self.assertEqual(self.reactor.list_reactors('salt/auth'), ['/e.sls'])
+        self.assertEqual(self.reactor.list_all(), [{'salt/auth': ['/e.sls']}])
+
+        # A broken map does not match any tag
+        self._write('reactor.conf', '- salt/auth: [\n')
+        self.assertEqual(self.reactor.list_reactors('salt/auth'), [])
+        os.remove(self.opts['reactor'])
+        self.assertEqual(self.reactor.list_reactors('salt/auth'), [])
+
+    def test_render_cache(self):
+        '''
+        Only the reactions which do not depend on the event are cached
+        '''
+        static = self._write(
+            'static.sls',
+            'restart:\n'
+            '  local.service.restart:\n'
+            '    - tgt: {{ opts["id"] | yaml_dquote }}\n'
+            '    - arg: [web]\n')
+        event = self._write(
+            'event.sls',
+            'restart_event:\n'
+            '  local.service.restart:\n'
+            '    - tgt: {{ data["id"] }}\n')
+        self.assertTrue(self.reactor._is_static(static))
+        self.assertFalse(self.reactor._is_static(event))
+
+        for num in range(3):
+            chunks = self.reactor.reactions(
+                'salt/minion/web{0}/start'.format(num), {'id': num},
+                [static, event])
+            self.assertEqual(sorted(chunk['tgt'] for chunk in chunks),
+                             sorted([self.opts['id'], num]))
+            # The cached high data is not changed by compiling it
+            chunks[0]['tgt'] = 'changed'
+        self.assertEqual(self.reactor.stats['render_hits'], 2)
+        self.assertEqual(self.reactor.stats['render_misses'], 1)
+
+        self._write('static.sls', 'restart:\n'
+                                  '  local.service.stop:\n'
+                                  '    - tgt: web\n')
+        chunks = self.reactor.reactions('salt/auth', {}, [static])
+        self.assertEqual(chunks[0]['fun'], 'service.stop')
+
+        stats = self.reactor.stats_event()
+        self.assertEqual(stats['render_cache'], {'hits': 2, 'misses': 2})
+        self.assertEqual(self.reactor.stats['render_hits'], 0)
+
+    def test_static_jinja(self):
+        '''
+        Templates reading the event or other templates are not static
+        '''
+        for source, static in (
+                ('a: {{ grains["id"] }}', True),
+                ('{% set x = pillar.get("x") %}a: {{ x }}', True),
+                ('a: {{ tag }}', False),
+                ('a: {{ salt["cmd.run"]("date") }}', False),
+                ('a: {{ [1, 2] | random }}', False),
+                ('{% include "other.sls" %}', False),
+                ('a: {{', False)):
+            self.assertEqual(salt.utils.reactor._static_jinja(source), static,
+                             source)
+
+
+class ReactionPoolTestCase(TestCase):
+    '''
+    Test running reactions on a ReactionPool
+    '''
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.most = {}
+        self.done = []
+        self.release = threading.Event()
+
+    def _reaction(self, kind, name, wait=0.05):
+        with self.lock:
+            self.running[kind] = self.running.get(kind, 0) + 1
+            self.most[kind] = max(self.most.get(kind, 0), self.running[kind])
+        if wait:
+            time.sleep(wait)
+        else:
+            self.release.wait(5)
+        with self.lock:
+            self.running[kind] -= 1
+            self.done.append(name)
+
+    def _wait(self, pool, count):
+        for _ in range(200):
+            if len(self.done) >= count and \
+                    not any(pool._running.values()):
+                return
+            time.sleep(0.05)
+        self.fail('Reactions did not finish')
+
+    def test_order_and_limits(self):
+        '''
+        Reactions of a key run in order and the types stay in their limits
+        '''
+        pool = salt.utils.reactor.ReactionPool(6, limits={'runner': 1})
+        for num in range(4):
+            for key in ('a', 'b'):
+                pool.submit(('tag', key), 'local', self._reaction,
+                            ('local', '{0}{1}'.format(key, num)))
+            pool.submit(None, 'runner', self._reaction,
+                        ('runner', 'runner{0}'.format(num)))
+        self._wait(pool, 12)
+        for key in ('a', 'b'):
+            self.assertEqual([name for name in self.done if name[0] == key],
+                             ['{0}{1}'.format(key, num) for num in range(4)])
+        self.assertEqual(self.most, {'local': 2, 'runner': 1})
+        metrics = pool.metrics()
+        self.assertEqual(metrics['completed'], 12)
+        self.assertEqual(metrics['queued'], 0)
+        self.assertGreater(metrics['latency_max'], 0.05)
+        self.assertEqual(pool.metrics()['completed'], 0)
+
+    def test_overflow(self):
+        '''
+        A full backlog drops the new or the oldest reactions, or blocks
+        '''
+        for overflow, done in (('drop_new', ['0', '1', '2']),
+                               ('drop_oldest', ['0', '2', '3'])):
+            self.done = []
+            self.release.clear()
+            pool = salt.utils.reactor.ReactionPool(
+                1, queue_size=2, overflow=overflow)
+            for num in range(4):
+                pool.submit(None, 'local', self._reaction,
+                            ('local', str(num), 0))
+                time.sleep(0.05)
+            self.assertEqual(pool.metrics()['dropped'], 1)
+            self.release.set()
+            self._wait(pool, 3)
+            self.assertEqual(self.done, done)
+
+        self.done = []
+        self.release.clear()
+        pool = salt.utils.reactor.ReactionPool(1, queue_size=1,
+                                               overflow='block')
+        pool.submit(None, 'local', self._reaction, ('local', '0', 0))
+        time.sleep(0.05)
+        pool.submit(None, 'local', self._reaction, ('local', '1', 0))
+        blocked = threading.Thread(
+            target=pool.submit,
+            args=(None, 'local', self._reaction, ('local', '2', 0)))
+        blocked.start()
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+        self.release.set()
+        blocked.join(5)
+        self._wait(pool, 3)
+        self.assertEqual(self.done, ['0', '1', '2'])
+        self.assertEqual(pool.metrics()['dropped'], 0)
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(TagMatcherTestCase, ReactorTestCase, ReactionPoolTestCase,
+              needs_daemon=False)